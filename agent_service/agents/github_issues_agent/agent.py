@@ -1,17 +1,26 @@
 import logging
 from ag_ui_adk import ADKAgent, add_adk_fastapi_endpoint
-from dotenv import load_dotenv
 from fastapi import FastAPI
 from google.adk.agents import Agent
 
 
+from shared.agent_metrics import (
+    record_model_request,
+    record_model_response,
+    record_tool_response,
+    record_tool_start,
+)
+from shared.agent_options import adk_agent_options
 from shared.auth import get_supabase_user_id
 from shared.composio_mcp import ComposioMCPIntegration, ComposioMCPSettings
 from shared.tool_response_utils import normalize_mcp_tool_response_payload
-from shared.env import require_env, require_env_with_fallback
+from shared.config import register_env_specs
+from shared.env import EnvVarSpec, load_env_file, require_env, require_env_with_fallback
 from shared.model_provider import resolve_adk_model
+from shared.session_compaction import HistoryCompactor
+from shared.settings import load_history_compaction_settings
 
-load_dotenv()
+load_env_file(__file__)
 
 AGENT_CONTEXT = "github_issues_agent"
 AGENT_ROUTE = require_env("GITHUB_ISSUES_AGENT_ROUTE", context=AGENT_CONTEXT)
@@ -28,6 +37,21 @@ _MODEL_IDENTIFIER_ENV = "GITHUB_ISSUES_AGENT_MODEL"
 _DEFAULT_MODEL_PROVIDER_ENV = "DEFAULT_MODEL_PROVIDER"
 _DEFAULT_MODEL_ENV = "DEFAULT_MODEL"
 
+register_env_specs(
+    AGENT_CONTEXT,
+    (
+        EnvVarSpec(name="GITHUB_ISSUES_AGENT_ROUTE", description="Route slug of the agent.", required=True),
+        EnvVarSpec(
+            name="GITHUB_ISSUES_AGENT_DISPLAY_NAME", description="Human-readable agent name.", required=True
+        ),
+        EnvVarSpec(
+            name="GITHUB_ISSUES_AGENT_INTERNAL_NAME", description="ADK app name of the agent.", required=True
+        ),
+        EnvVarSpec(name=_MODEL_PROVIDER_ENV, description="Model provider override for this agent."),
+        EnvVarSpec(name=_MODEL_IDENTIFIER_ENV, description="Model override for this agent."),
+    ),
+)
+
 composio_integration = ComposioMCPIntegration(
     ComposioMCPSettings(
         agent_context=AGENT_CONTEXT,
@@ -37,6 +61,8 @@ composio_integration = ComposioMCPIntegration(
     )
 )
 
+history_compactor = HistoryCompactor(load_history_compaction_settings())
+
 AGENT_INSTRUCTION = (
     "You are a GitHub issues specialist. Handle issue triage, creation, updates, and summaries."
     f"\n\n{composio_integration.connection_instruction}"
@@ -52,15 +78,16 @@ def register_agent(app: FastAPI, base_path: str) -> None:
     Attach the agent's FastAPI routes under the provided base path.
     """
 
-    add_adk_fastapi_endpoint(app, _build_adk_agent(), path=base_path)
+    add_adk_fastapi_endpoint(app, _build_adk_agent(app), path=base_path)
     logger.info("Mounted %s at %s", AGENT_DISPLAY_NAME, base_path)
 
 
-def _build_adk_agent() -> ADKAgent:
+def _build_adk_agent(app: FastAPI) -> ADKAgent:
     return ADKAgent(
         adk_agent=root_agent,
         app_name=AGENT_INTERNAL_NAME,
         user_id_extractor=lambda _: get_supabase_user_id(),
+        **adk_agent_options(app),
     )
 
 
@@ -75,8 +102,11 @@ def get_root_agent() -> Agent:
         description="Agent specialized in managing GitHub issues workflows.",
         instruction=AGENT_INSTRUCTION,
         before_agent_callback=composio_integration.before_agent_callback,
+        before_model_callback=[history_compactor.before_model_callback, record_model_request],
+        after_model_callback=record_model_response,
         after_agent_callback=composio_integration.after_agent_callback,
-        after_tool_callback=normalize_mcp_tool_response_payload,
+        before_tool_callback=record_tool_start,
+        after_tool_callback=[record_tool_response, normalize_mcp_tool_response_payload],
     )
 
 
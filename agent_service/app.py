@@ -1,41 +1,76 @@
 import logging
 import os
+import time
 from pathlib import Path
 from typing import Optional
 
+_IMPORT_STARTED = time.perf_counter()
+
 from dotenv import load_dotenv
 
 from shared import create_app
-
-
-def _resolve_log_level(value: str) -> int:
-    level_name = value.strip().upper()
-    return getattr(logging, level_name, logging.INFO)
-
+from shared.logging_setup import configure_logging
+from shared.startup_profiler import StartupProfiler
 
 load_dotenv()
 
-logging.basicConfig(level=_resolve_log_level(os.getenv("LOG_LEVEL", "INFO")))
+# Queue-backed: records are written by a background thread, off the event loop.
+configure_logging()
 
 AGENTS_ROOT = Path(__file__).resolve().parent / "agents"
 ROUTE_PREFIX = os.getenv("AGENT_ROUTE_PREFIX", "/agents")
 APP_TITLE = os.getenv("AGENT_APP_TITLE", "Agent Gateway")
 APP_DESCRIPTION: Optional[str] = os.getenv("AGENT_APP_DESCRIPTION")
+LAZY_AGENTS = os.getenv("AGENT_LAZY_LOADING", "false").lower() == "true"
+HOT_RELOAD = os.getenv("AGENT_HOT_RELOAD", "false").lower() == "true"
+HOT_RELOAD_INTERVAL = float(os.getenv("AGENT_HOT_RELOAD_INTERVAL", "1.0"))
+STARTUP_PROFILER: Optional[StartupProfiler] = (
+    StartupProfiler()
+    if os.getenv("AGENT_STARTUP_PROFILE", "false").lower() == "true"
+    else None
+)
 
 app = create_app(
     agents_root=AGENTS_ROOT,
     base_route=ROUTE_PREFIX,
     title=APP_TITLE,
     description=APP_DESCRIPTION,
+    lazy_agents=LAZY_AGENTS,
+    startup_profiler=STARTUP_PROFILER,
+    hot_reload=HOT_RELOAD,
+    hot_reload_interval=HOT_RELOAD_INTERVAL,
+)
+app.state.startup_report["startup_ms"] = round(
+    (time.perf_counter() - _IMPORT_STARTED) * 1000, 1
 )
+logging.getLogger(__name__).info(
+    "Gateway ready in %.1f ms (%s agent loading)",
+    app.state.startup_report["startup_ms"],
+    app.state.startup_report["mode"],
+)
+if STARTUP_PROFILER is not None:
+    logging.getLogger(__name__).info(
+        "Startup profile:\n%s", STARTUP_PROFILER.format_report()
+    )
 
 
 if __name__ == "__main__":
-    import uvicorn
+    host = os.getenv("HOST", "0.0.0.0")
+    port = int(os.getenv("PORT", "8000"))
 
-    uvicorn.run(
-        "app:app",
-        host=os.getenv("HOST", "0.0.0.0"),
-        port=int(os.getenv("PORT", "8000")),
-        reload=os.getenv("UVICORN_RELOAD", "false").lower() == "true",
-    )
+    if os.getenv("UVICORN_RELOAD", "false").lower() == "true":
+        import uvicorn
+
+        uvicorn.run("app:app", host=host, port=port, reload=True)
+    else:
+        from shared.server import serve
+
+        serve(
+            app,
+            app_import_path="app:app",
+            host=host,
+            port=port,
+            workers=int(os.getenv("AGENT_WORKERS", "1")),
+            preload=os.getenv("AGENT_PRELOAD", "true").lower() == "true",
+            graceful_timeout=float(os.getenv("AGENT_GRACEFUL_TIMEOUT", "30")),
+        )
@@ -0,0 +1,6 @@
+"""
+Benchmarks and local stand-ins for gateway infrastructure.
+
+Run modules from the `agent_service` directory, e.g.
+`python -m benchmarks.session_store_benchmark`.
+"""
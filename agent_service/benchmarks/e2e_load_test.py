@@ -0,0 +1,459 @@
+"""
+End-to-end load test of full agent runs against local stand-ins.
+
+The gateway (`python app.py`, i.e. `create_app` with the real agents) is started
+against fakes for every external service: Supabase auth, the Composio API, a
+streamable-HTTP MCP server with Composio-style tools, and an OpenAI-compatible
+LLM reached through LiteLLM. Each run posts an AG-UI `RunAgentInput`, and the
+fake model calls one MCP tool before streaming its answer. A run therefore covers
+authentication, admission, Composio provisioning, MCP session setup, two model
+calls, one tool call and the SSE stream.
+
+    python -m benchmarks.e2e_load_test --concurrency 8 --duration 30
+    python -m benchmarks.e2e_load_test --save-baseline          # record benchmarks/baselines/e2e.json
+    python -m benchmarks.e2e_load_test                          # compare against it (exit 1 on regression)
+
+Reported: runs per second, time to first SSE event and total run time
+percentiles, and a per-stage breakdown taken from the gateway's `/metrics`
+histograms (scraped before and after the measured window). With several workers
+the breakdown covers whichever worker answered the scrape. Agents need their
+`*_CIO_MCP_CONFIG_IDS` set; the fake Composio API accepts any id.
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import re
+import signal
+import subprocess
+import sys
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Tuple
+
+import httpx
+from dotenv import dotenv_values
+
+from benchmarks.fakes import (
+    FAKE_JWT_SECRET,
+    issue_token,
+    run_fake_composio,
+    run_fake_llm,
+    run_fake_mcp,
+    run_fake_supabase,
+)
+from benchmarks.regression import (
+    BASELINE_DIR,
+    Check,
+    compare_figures,
+    load_baseline,
+    save_baseline,
+)
+from benchmarks.worker_load_test import (
+    SERVICE_ROOT,
+    _discover_agent_path,
+    _free_port,
+    _percentile,
+    _wait_for_port,
+    _wait_until_ready,
+)
+
+DEFAULT_BASELINE = BASELINE_DIR / "e2e.json"
+FAKE_MODEL = "openai/load-test-model"
+
+# (report name, histogram) pairs for the per-stage breakdown, in request order.
+STAGES = (
+    ("auth.jwt_decode", "agent_gateway_auth_jwt_decode_seconds"),
+    ("auth.user_lookup", "agent_gateway_auth_user_lookup_seconds"),
+    ("composio.mcp_generate", "agent_gateway_mcp_generate_seconds"),
+    ("mcp.toolset_open", "agent_gateway_mcp_toolset_open_seconds"),
+    ("llm.time_to_first_token", "agent_gateway_llm_time_to_first_token_seconds"),
+    ("llm.request", "agent_gateway_llm_request_seconds"),
+    ("mcp.url_wait", "agent_gateway_mcp_url_wait_seconds"),
+    ("tool.call", "agent_gateway_tool_call_seconds"),
+    ("mcp.toolset_close", "agent_gateway_mcp_toolset_close_seconds"),
+)
+
+# Stage means below this many milliseconds are too noisy to flag as regressions.
+_STAGE_NOISE_FLOOR_MS = 1.0
+
+_SAMPLE_LINE = re.compile(r'^(\w+?)(_bucket|_sum|_count)(?:\{(.*)\})? (\S+)$')
+_LE_LABEL = re.compile(r'le="([^"]+)"')
+
+Histograms = Dict[str, Dict[str, Any]]
+
+
+def _run_input(prompt: str) -> str:
+    return json.dumps(
+        {
+            "threadId": f"load-{uuid.uuid4().hex}",
+            "runId": uuid.uuid4().hex,
+            "state": {},
+            "messages": [{"id": uuid.uuid4().hex, "role": "user", "content": prompt}],
+            "tools": [],
+            "context": [],
+            "forwardedProps": {},
+        }
+    )
+
+
+async def _drive(
+    url: str,
+    tokens: List[str],
+    prompt: str,
+    duration: float,
+) -> Dict[str, Any]:
+    first_event_ms: List[float] = []
+    run_ms: List[float] = []
+    counts = {"errors": 0, "rejected": 0}
+    deadline = time.monotonic() + duration
+    limits = httpx.Limits(max_connections=len(tokens), max_keepalive_connections=len(tokens))
+
+    async with httpx.AsyncClient(limits=limits, timeout=120.0) as client:
+
+        async def _user(token: str) -> None:
+            headers = {
+                "Authorization": f"Bearer {token}",
+                "Content-Type": "application/json",
+                "Accept": "text/event-stream",
+            }
+            while time.monotonic() < deadline:
+                started = time.perf_counter()
+                first_event: Optional[float] = None
+                finished = failed = False
+                try:
+                    async with client.stream(
+                        "POST", url, content=_run_input(prompt), headers=headers
+                    ) as response:
+                        if response.status_code == 429:
+                            counts["rejected"] += 1
+                            await response.aread()
+                            await asyncio.sleep(float(response.headers.get("Retry-After", "1")))
+                            continue
+                        if response.status_code != 200:
+                            counts["errors"] += 1
+                            await response.aread()
+                            continue
+                        async for line in response.aiter_lines():
+                            if not line.startswith("data:"):
+                                continue
+                            if first_event is None:
+                                first_event = time.perf_counter()
+                            if '"RUN_ERROR"' in line:
+                                failed = True
+                            elif '"RUN_FINISHED"' in line:
+                                finished = True
+                except httpx.HTTPError:
+                    counts["errors"] += 1
+                    continue
+                if failed or not finished or first_event is None:
+                    counts["errors"] += 1
+                    continue
+                first_event_ms.append((first_event - started) * 1000)
+                run_ms.append((time.perf_counter() - started) * 1000)
+
+        await asyncio.gather(*(_user(token) for token in tokens))
+
+    return {"first_event_ms": first_event_ms, "run_ms": run_ms, **counts}
+
+
+def _scrape_histograms(metrics_url: str) -> Histograms:
+    """
+    Sum every histogram's buckets, sum and count over all label sets.
+    """
+
+    histograms: Histograms = {}
+    for line in httpx.get(metrics_url, timeout=10.0).text.splitlines():
+        match = _SAMPLE_LINE.match(line)
+        if match is None:
+            continue
+        name, suffix, labels, value = match.groups()
+        entry = histograms.setdefault(name, {"buckets": {}, "sum": 0.0, "count": 0.0})
+        if suffix == "_bucket":
+            bound = _LE_LABEL.search(labels or "")
+            if bound is not None:
+                le = float(bound.group(1))
+                entry["buckets"][le] = entry["buckets"].get(le, 0.0) + float(value)
+        elif suffix == "_sum":
+            entry["sum"] += float(value)
+        else:
+            entry["count"] += float(value)
+    return histograms
+
+
+def _stage_breakdown(before: Histograms, after: Histograms, runs: int) -> Dict[str, Dict[str, float]]:
+    empty = {"buckets": {}, "sum": 0.0, "count": 0.0}
+    stages: Dict[str, Dict[str, float]] = {}
+    for stage, metric in STAGES:
+        start, end = before.get(metric, empty), after.get(metric, empty)
+        count = end["count"] - start["count"]
+        if count <= 0:
+            continue
+        buckets = sorted(
+            (le, end["buckets"][le] - start["buckets"].get(le, 0.0)) for le in end["buckets"]
+        )
+        p95 = next((le for le, cumulative in buckets if cumulative >= 0.95 * count), float("inf"))
+        stages[stage] = {
+            "per_run": round(count / runs, 2) if runs else 0.0,
+            "mean_ms": round((end["sum"] - start["sum"]) / count * 1000, 2),
+            "p95_le_ms": round(p95 * 1000, 1) if p95 != float("inf") else None,
+        }
+    return stages
+
+
+def _gateway_env(
+    port: int,
+    *,
+    workers: int,
+    supabase_url: str,
+    composio_url: str,
+    llm_url: str,
+) -> Dict[str, str]:
+    env = dict(
+        os.environ,
+        HOST="127.0.0.1",
+        PORT=str(port),
+        AGENT_WORKERS=str(workers),
+        AGENT_PRELOAD="true",
+        AGENT_METRICS_ENABLED="true",
+        AGENT_METRICS_PATH="/metrics",
+        SUPABASE_URL=supabase_url,
+        SUPABASE_JWT_SECRET=FAKE_JWT_SECRET,
+        SUPABASE_JWT_AUDIENCE="authenticated",
+        SUPABASE_JWT_ISSUER=f"{supabase_url}/auth/v1",
+        COMPOSIO_API_KEY="load-test",
+        COMPOSIO_BASE_URL=composio_url,
+        DEFAULT_MODEL_PROVIDER="LITELLM",
+        DEFAULT_MODEL=FAKE_MODEL,
+        OPENAI_API_BASE=f"{llm_url}/v1",
+        OPENAI_API_KEY="load-test",
+        LOG_LEVEL="WARNING",
+    )
+    env.pop("UVICORN_RELOAD", None)
+    # Per-agent model overrides (from the environment or .env) would bypass the
+    # fake LLM; an empty value makes agents fall back to DEFAULT_MODEL*.
+    configured = set(os.environ) | set(dotenv_values(SERVICE_ROOT / ".env"))
+    for name in configured:
+        if name.endswith(("_MODEL", "_MODEL_PROVIDER")) and not name.startswith("DEFAULT_"):
+            env[name] = ""
+    return env
+
+
+@contextmanager
+def running_stack(
+    args: argparse.Namespace, extra_env: Optional[Mapping[str, str]] = None
+) -> Iterator[Dict[str, str]]:
+    """
+    Start the fakes and the gateway; yield their base URLs by name.
+    """
+
+    context = multiprocessing.get_context("spawn")
+    ports = {name: _free_port() for name in ("supabase", "mcp", "composio", "llm", "gateway")}
+    urls = {name: f"http://127.0.0.1:{port}" for name, port in ports.items()}
+    fakes = [
+        context.Process(target=run_fake_supabase, args=("127.0.0.1", ports["supabase"])),
+        context.Process(
+            target=run_fake_mcp,
+            args=("127.0.0.1", ports["mcp"], args.tool_latency_ms, args.tool_payload_bytes),
+        ),
+        context.Process(
+            target=run_fake_composio,
+            args=("127.0.0.1", ports["composio"], f"{urls['mcp']}/mcp", args.composio_latency_ms),
+        ),
+        context.Process(
+            target=run_fake_llm,
+            args=(
+                "127.0.0.1",
+                ports["llm"],
+                args.llm_first_token_ms,
+                args.llm_token_interval_ms,
+                args.llm_chunks,
+            ),
+        ),
+    ]
+    for fake in fakes:
+        fake.daemon = True
+        fake.start()
+
+    gateway: Optional[subprocess.Popen] = None
+    try:
+        for name in ("supabase", "mcp", "composio", "llm"):
+            _wait_for_port(ports[name], timeout=30.0)
+        gateway = subprocess.Popen(
+            [sys.executable, "app.py"],
+            cwd=SERVICE_ROOT,
+            env={
+                **_gateway_env(
+                    ports["gateway"],
+                    workers=args.workers,
+                    supabase_url=urls["supabase"],
+                    composio_url=urls["composio"],
+                    llm_url=urls["llm"],
+                ),
+                **(extra_env or {}),
+            },
+            stdout=subprocess.DEVNULL,
+            stderr=None if args.gateway_logs else subprocess.DEVNULL,
+        )
+        _wait_until_ready(f"{urls['gateway']}/readyz", timeout=120.0)
+        yield urls
+    finally:
+        if gateway is not None:
+            gateway.send_signal(signal.SIGTERM)
+            try:
+                gateway.wait(timeout=60)
+            except subprocess.TimeoutExpired:
+                gateway.kill()
+        for fake in fakes:
+            fake.terminate()
+            fake.join(timeout=10)
+
+
+def run_load_test(args: argparse.Namespace) -> Dict[str, Any]:
+    with running_stack(args) as urls:
+        tokens = [
+            issue_token(f"load-user-{index}", supabase_url=urls["supabase"])
+            for index in range(args.concurrency)
+        ]
+        target = f"{urls['gateway']}{args.path or _discover_agent_path(urls['gateway'], tokens[0])}"
+        metrics_url = f"{urls['gateway']}/metrics"
+
+        if args.warmup > 0:
+            asyncio.run(_drive(target, tokens, args.prompt, args.warmup))
+        before = _scrape_histograms(metrics_url)
+        samples = asyncio.run(_drive(target, tokens, args.prompt, args.duration))
+        after = _scrape_histograms(metrics_url)
+
+    first_event = sorted(samples["first_event_ms"])
+    runs = sorted(samples["run_ms"])
+    return {
+        "scenario": {
+            "path": target[len(urls["gateway"]):],
+            "workers": args.workers,
+            "concurrency": args.concurrency,
+            "duration": args.duration,
+            "tool_latency_ms": args.tool_latency_ms,
+            "tool_payload_bytes": args.tool_payload_bytes,
+            "llm_first_token_ms": args.llm_first_token_ms,
+            "llm_token_interval_ms": args.llm_token_interval_ms,
+            "llm_chunks": args.llm_chunks,
+        },
+        "runs": len(runs),
+        "errors": samples["errors"],
+        "rejected": samples["rejected"],
+        "rps": round(len(runs) / args.duration, 2),
+        "first_event_ms": _summary(first_event),
+        "run_ms": _summary(runs),
+        "stages": _stage_breakdown(before, after, len(runs)),
+    }
+
+
+def _summary(ordered: List[float]) -> Dict[str, float]:
+    return {
+        "p50": round(_percentile(ordered, 0.5), 1),
+        "p95": round(_percentile(ordered, 0.95), 1),
+        "p99": round(_percentile(ordered, 0.99), 1),
+    }
+
+
+def compare_to_baseline(
+    result: Dict[str, Any], baseline: Dict[str, Any], tolerance: float
+) -> Tuple[List[str], List[str]]:
+    """
+    Lines describing the change of each headline figure, and the regressions among them.
+
+    Throughput regresses when it drops by more than `tolerance`; latencies and
+    stage means regress when they grow by more than `tolerance`.
+    """
+
+    checks: List[Check] = [("rps", baseline["rps"], result["rps"], True)]
+    for group in ("first_event_ms", "run_ms"):
+        for quantile in ("p50", "p95", "p99"):
+            checks.append(
+                (f"{group}.{quantile}", baseline[group][quantile], result[group][quantile], False)
+            )
+    for stage, figures in baseline.get("stages", {}).items():
+        current = result["stages"].get(stage)
+        if current is not None and figures["mean_ms"] >= _STAGE_NOISE_FLOOR_MS:
+            checks.append((f"stage {stage}.mean_ms", figures["mean_ms"], current["mean_ms"], False))
+    return compare_figures(checks, tolerance)
+
+
+def format_report(result: Dict[str, Any]) -> str:
+    scenario = result["scenario"]
+    lines = [
+        f"{scenario['path']}: {scenario['concurrency']} concurrent users, "
+        f"{scenario['workers']} worker(s), {scenario['duration']:.0f}s",
+        f"runs {result['runs']}  rps {result['rps']:.2f}  errors {result['errors']}  "
+        f"rejected (429) {result['rejected']}",
+        f"{'':<18} {'p50':>9} {'p95':>9} {'p99':>9}",
+    ]
+    for label, key in (("first event", "first_event_ms"), ("run", "run_ms")):
+        figures = result[key]
+        lines.append(
+            f"{label:<18} {figures['p50']:>7.1f}ms {figures['p95']:>7.1f}ms {figures['p99']:>7.1f}ms"
+        )
+    if result["stages"]:
+        lines.append(f"{'stage':<26} {'per run':>8} {'mean':>10} {'p95 <=':>10}")
+        for stage, figures in result["stages"].items():
+            p95 = "-" if figures["p95_le_ms"] is None else f"{figures['p95_le_ms']:.0f}ms"
+            lines.append(
+                f"{stage:<26} {figures['per_run']:>8.2f} {figures['mean_ms']:>8.1f}ms {p95:>10}"
+            )
+    return "\n".join(lines)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Drive full agent runs against local fakes.")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent users (one run each)")
+    parser.add_argument("--duration", type=float, default=30.0, help="Measured seconds")
+    parser.add_argument("--warmup", type=float, default=5.0, help="Unmeasured seconds first")
+    parser.add_argument("--workers", type=int, default=1, help="Gateway worker processes")
+    parser.add_argument("--path", default=None, help="Agent endpoint to POST to (default: first agent)")
+    parser.add_argument("--prompt", default="List the open issues.", help="User message per run")
+    parser.add_argument("--tool-latency-ms", type=float, default=50.0, help="Fake MCP tool latency")
+    parser.add_argument("--tool-payload-bytes", type=int, default=2048, help="Fake MCP tool response size")
+    parser.add_argument(
+        "--composio-latency-ms", type=float, default=0.0, help="Fake Composio mcp.generate latency"
+    )
+    parser.add_argument("--llm-first-token-ms", type=float, default=300.0, help="Fake LLM time to first chunk")
+    parser.add_argument("--llm-token-interval-ms", type=float, default=20.0, help="Fake LLM delay between chunks")
+    parser.add_argument("--llm-chunks", type=int, default=20, help="Text chunks per fake LLM answer")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE, help="Baseline JSON file")
+    parser.add_argument("--save-baseline", action="store_true", help="Store this run as the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Allowed relative regression")
+    parser.add_argument("--gateway-logs", action="store_true", help="Show the gateway's stderr")
+    parser.add_argument("--json", action="store_true", help="Emit machine-readable JSON")
+    args = parser.parse_args()
+
+    result = run_load_test(args)
+    regressions: List[str] = []
+    comparison: List[str] = []
+    baseline = None if args.save_baseline else load_baseline(args.baseline)
+    if args.save_baseline:
+        save_baseline(args.baseline, result)
+    elif baseline is not None:
+        if baseline.get("scenario") != result["scenario"]:
+            comparison.append("Warning: baseline was recorded with a different scenario.")
+        lines, regressions = compare_to_baseline(result, baseline, args.tolerance)
+        comparison.extend(lines)
+
+    if args.json:
+        print(json.dumps({**result, "regressions": regressions}, indent=2))
+    else:
+        print(format_report(result))
+        if args.save_baseline:
+            print(f"Baseline saved to {args.baseline}")
+        elif comparison:
+            print(f"Compared with {args.baseline} (tolerance {args.tolerance:.0%}):")
+            print("\n".join(comparison))
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
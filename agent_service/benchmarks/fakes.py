@@ -0,0 +1,381 @@
+"""
+Local stand-ins for the gateway's external dependencies, used by load tests.
+
+- `issue_token()` mints HS256 tokens shaped like Supabase access tokens.
+- `fake_supabase_app` answers `GET /auth/v1/user` for any well-formed bearer token.
+- `build_fake_mcp_app()` is a streamable-HTTP MCP server exposing Composio-style
+  tools with configurable latency and response size.
+- `build_fake_composio_app()` answers the two Composio API calls behind
+  `mcp.generate` and hands out the fake MCP server's URL for every config id. It
+  also lists the user's connected accounts, all active unless listed in
+  `disconnected_toolkits`. `generate_latency_ms` delays each `mcp.generate`.
+- `build_fake_llm_app()` is an OpenAI-compatible `/v1/chat/completions` endpoint
+  (streaming and non-streaming) that calls one of the offered tools, then answers
+  in text once the tool result is in the conversation.
+"""
+
+import asyncio
+import json
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Sequence
+
+import jwt
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+FAKE_JWT_SECRET = "load-test-secret"
+
+
+def issue_token(
+    user_id: str,
+    *,
+    supabase_url: str,
+    secret: str = FAKE_JWT_SECRET,
+    audience: Optional[str] = "authenticated",
+    ttl_seconds: int = 3600,
+) -> str:
+    """
+    Mint a Supabase-style access token accepted by `SupabaseAuthMiddleware`.
+    """
+
+    now = int(time.time())
+    claims = {
+        "sub": user_id,
+        "iss": f"{supabase_url.rstrip('/')}/auth/v1",
+        "iat": now,
+        "exp": now + ttl_seconds,
+        "role": "authenticated",
+    }
+    if audience:
+        claims["aud"] = audience
+    return jwt.encode(claims, secret, algorithm="HS256")
+
+
+async def _get_user(request: Request) -> JSONResponse:
+    header = request.headers.get("Authorization", "")
+    if not header.startswith("Bearer "):
+        return JSONResponse({"msg": "missing token"}, status_code=401)
+    try:
+        claims = jwt.decode(header[len("Bearer "):], options={"verify_signature": False})
+    except jwt.InvalidTokenError:
+        return JSONResponse({"msg": "invalid token"}, status_code=401)
+    return JSONResponse(
+        {"id": claims.get("sub"), "aud": claims.get("aud"), "role": claims.get("role")}
+    )
+
+
+fake_supabase_app = Starlette(routes=[Route("/auth/v1/user", _get_user)])
+
+
+# Tool names follow Composio's TOOLKIT_ACTION convention so prompts, logs and
+# metrics look like production ones.
+FAKE_MCP_TOOLS = (
+    ("GITHUB_LIST_REPOSITORY_ISSUES", "List issues in a GitHub repository."),
+    ("GITHUB_CREATE_AN_ISSUE", "Create an issue in a GitHub repository."),
+    ("GOOGLECALENDAR_FIND_EVENT", "Find events in the user's Google Calendar."),
+    ("GOOGLECALENDAR_CREATE_EVENT", "Create an event in the user's Google Calendar."),
+)
+
+
+def build_fake_mcp_app(*, latency_ms: float = 50.0, payload_bytes: int = 2048) -> Starlette:
+    """
+    Streamable-HTTP MCP server (at `/mcp`) whose tools sleep `latency_ms` and return
+    a Composio-shaped result of roughly `payload_bytes`.
+    """
+
+    from mcp.server.fastmcp import FastMCP
+
+    server = FastMCP("fake-composio", stateless_http=True, log_level="WARNING")
+    for name, description in FAKE_MCP_TOOLS:
+        server.add_tool(_fake_tool(name, latency_ms, payload_bytes), name=name, description=description)
+    return server.streamable_http_app()
+
+
+def _fake_tool(name: str, latency_ms: float, payload_bytes: int):
+    async def tool(query: str = "", limit: int = 10) -> str:
+        if latency_ms > 0:
+            await asyncio.sleep(latency_ms / 1000)
+        return json.dumps(
+            {
+                "successful": True,
+                "error": None,
+                "data": {"tool": name, "query": query, "items": _fake_items(limit, payload_bytes)},
+                "logId": f"log_{uuid.uuid4().hex[:12]}",
+            }
+        )
+
+    return tool
+
+
+def _fake_items(limit: int, payload_bytes: int) -> List[Dict[str, Any]]:
+    count = max(1, min(limit, 50))
+    body_size = max(0, payload_bytes // count - 64)
+    return [
+        {"id": index, "title": f"Item {index}", "body": "x" * body_size}
+        for index in range(1, count + 1)
+    ]
+
+
+def build_fake_composio_app(
+    mcp_url: str,
+    disconnected_toolkits: Sequence[str] = (),
+    *,
+    generate_latency_ms: float = 0.0,
+) -> Starlette:
+    """
+    Composio API stand-in: `GET /api/v3/mcp/{id}` and `POST /api/v3/mcp/servers/generate`,
+    the calls made by `Composio.mcp.generate`, plus the auth config and connected
+    account lookups behind the connection status. Point the gateway at it with
+    `COMPOSIO_BASE_URL`.
+    """
+
+    toolkits = ["github", "googlecalendar"]
+
+    async def retrieve(request: Request) -> JSONResponse:
+        config_id = request.path_params["config_id"]
+        return JSONResponse(
+            {
+                "id": config_id,
+                "name": f"fake-{config_id}",
+                "allowed_tools": [name for name, _ in FAKE_MCP_TOOLS],
+                "auth_config_ids": [f"ac_{toolkit}" for toolkit in toolkits],
+                "commands": {"claude": "", "cursor": "", "windsurf": ""},
+                "created_at": "2025-01-01T00:00:00Z",
+                "updated_at": "2025-01-01T00:00:00Z",
+                "deleted": False,
+                "managed_auth_via_composio": True,
+                "mcp_url": mcp_url,
+                "server_instance_count": 1,
+                "toolkit_icons": {},
+                "toolkits": toolkits,
+            }
+        )
+
+    async def auth_config(request: Request) -> JSONResponse:
+        auth_config_id = request.path_params["auth_config_id"]
+        toolkit = auth_config_id.removeprefix("ac_")
+        return JSONResponse(
+            {
+                "id": auth_config_id,
+                "name": f"fake-{toolkit}",
+                "auth_scheme": "OAUTH2",
+                "status": "ENABLED",
+                "type": "default",
+                "toolkit": {"slug": toolkit, "logo": ""},
+            }
+        )
+
+    async def connected_accounts(request: Request) -> JSONResponse:
+        # The Composio client sends list parameters comma-separated.
+        user_ids = _query_list(request, "user_ids") or ["default"]
+        auth_config_ids = _query_list(request, "auth_config_ids") or [
+            f"ac_{toolkit}" for toolkit in toolkits
+        ]
+        items = [
+            {
+                "id": f"ca_{user_id}_{auth_config_id}",
+                "status": "ACTIVE",
+                "is_disabled": False,
+                "auth_config": {"id": auth_config_id, "is_composio_managed": True, "is_disabled": False},
+                "toolkit": {"slug": auth_config_id.removeprefix("ac_")},
+                "created_at": "2025-01-01T00:00:00Z",
+                "updated_at": "2025-01-01T00:00:00Z",
+            }
+            for user_id in user_ids
+            for auth_config_id in auth_config_ids
+            if auth_config_id.removeprefix("ac_") not in disconnected_toolkits
+        ]
+        return JSONResponse(
+            {"items": items, "current_page": 1, "total_items": len(items), "total_pages": 1}
+        )
+
+    async def generate(request: Request) -> JSONResponse:
+        payload = await request.json()
+        if generate_latency_ms > 0:
+            await asyncio.sleep(generate_latency_ms / 1000)
+        return JSONResponse(
+            {
+                "mcp_url": mcp_url,
+                "connected_account_urls": [],
+                "user_ids_url": [f"{mcp_url}?user_id={user}" for user in payload.get("user_ids", [])],
+            }
+        )
+
+    return Starlette(
+        routes=[
+            Route("/api/v3/mcp/servers/generate", generate, methods=["POST"]),
+            Route("/api/v3/mcp/{config_id}", retrieve),
+            Route("/api/v3/auth_configs/{auth_config_id}", auth_config),
+            Route("/api/v3/connected_accounts", connected_accounts),
+        ]
+    )
+
+
+def _query_list(request: Request, name: str) -> List[str]:
+    return [
+        item
+        for value in request.query_params.getlist(name)
+        for item in value.split(",")
+        if item
+    ]
+
+
+def build_fake_llm_app(
+    *,
+    first_token_ms: float = 300.0,
+    token_interval_ms: float = 20.0,
+    text_chunks: int = 20,
+) -> Starlette:
+    """
+    OpenAI-compatible chat completions endpoint for LiteLLM's `openai/<model>` route.
+
+    A turn whose last message is not a tool result calls the first offered business
+    tool (required arguments get placeholder values); otherwise the model streams
+    `text_chunks` text deltas. The first chunk arrives after `first_token_ms`.
+    """
+
+    async def completions(request: Request):
+        payload = await request.json()
+        model = payload.get("model", "fake")
+        messages = payload.get("messages") or []
+        tool = None
+        if not messages or messages[-1].get("role") != "tool":
+            tool = _pick_tool(payload.get("tools") or [])
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+
+        if not payload.get("stream"):
+            await asyncio.sleep((first_token_ms + token_interval_ms * text_chunks) / 1000)
+            if tool is not None:
+                message = {"role": "assistant", "content": None, "tool_calls": [_tool_call(tool)]}
+                finish_reason = "tool_calls"
+            else:
+                message = {"role": "assistant", "content": "".join(_text_chunks(text_chunks))}
+                finish_reason = "stop"
+            return JSONResponse(
+                {
+                    "id": completion_id,
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": model,
+                    "choices": [{"index": 0, "message": message, "finish_reason": finish_reason}],
+                    "usage": _usage(messages, text_chunks),
+                }
+            )
+
+        async def stream():
+            def chunk(delta: Dict[str, Any], finish_reason: Optional[str] = None) -> str:
+                body = {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": int(time.time()),
+                    "model": model,
+                    "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+                }
+                return f"data: {json.dumps(body)}\n\n"
+
+            await asyncio.sleep(first_token_ms / 1000)
+            if tool is not None:
+                call = dict(_tool_call(tool), index=0)
+                yield chunk({"role": "assistant", "content": None, "tool_calls": [call]})
+                yield chunk({}, "tool_calls")
+            else:
+                for index, text in enumerate(_text_chunks(text_chunks)):
+                    if index:
+                        await asyncio.sleep(token_interval_ms / 1000)
+                    yield chunk({"role": "assistant", "content": text})
+                yield chunk({}, "stop")
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(stream(), media_type="text/event-stream")
+
+    return Starlette(routes=[Route("/v1/chat/completions", completions, methods=["POST"])])
+
+
+def _pick_tool(tools: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    functions = [tool.get("function") or {} for tool in tools]
+    for function in functions:
+        if not function.get("name", "").startswith("COMPOSIO_"):
+            return function
+    return functions[0] if functions else None
+
+
+def _tool_call(function: Dict[str, Any]) -> Dict[str, Any]:
+    parameters = function.get("parameters") or {}
+    properties = parameters.get("properties") or {}
+    placeholders = {"integer": 1, "number": 1, "boolean": False, "array": [], "object": {}}
+    arguments = {
+        name: placeholders.get((properties.get(name) or {}).get("type"), "load test")
+        for name in parameters.get("required") or []
+    }
+    return {
+        "id": f"call_{uuid.uuid4().hex[:12]}",
+        "type": "function",
+        "function": {"name": function.get("name"), "arguments": json.dumps(arguments)},
+    }
+
+
+def _text_chunks(count: int) -> List[str]:
+    return [f"word{index} " for index in range(count)]
+
+
+def _usage(messages: List[Dict[str, Any]], completion_tokens: int) -> Dict[str, int]:
+    prompt_tokens = len(json.dumps(messages)) // 4
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+    }
+
+
+def _serve(app, host: str, port: int) -> None:
+    import uvicorn
+
+    uvicorn.run(app, host=host, port=port, log_level="warning", access_log=False)
+
+
+def run_fake_supabase(host: str, port: int) -> None:
+    """
+    Serve `fake_supabase_app` (blocking); intended as a subprocess target.
+    """
+
+    _serve(fake_supabase_app, host, port)
+
+
+def run_fake_mcp(host: str, port: int, latency_ms: float, payload_bytes: int) -> None:
+    _serve(build_fake_mcp_app(latency_ms=latency_ms, payload_bytes=payload_bytes), host, port)
+
+
+def run_fake_composio(host: str, port: int, mcp_url: str, generate_latency_ms: float = 0.0) -> None:
+    _serve(build_fake_composio_app(mcp_url, generate_latency_ms=generate_latency_ms), host, port)
+
+
+def run_fake_llm(
+    host: str, port: int, first_token_ms: float, token_interval_ms: float, text_chunks: int
+) -> None:
+    _serve(
+        build_fake_llm_app(
+            first_token_ms=first_token_ms,
+            token_interval_ms=token_interval_ms,
+            text_chunks=text_chunks,
+        ),
+        host,
+        port,
+    )
+
+
+__all__ = [
+    "FAKE_JWT_SECRET",
+    "FAKE_MCP_TOOLS",
+    "build_fake_composio_app",
+    "build_fake_llm_app",
+    "build_fake_mcp_app",
+    "fake_supabase_app",
+    "issue_token",
+    "run_fake_composio",
+    "run_fake_llm",
+    "run_fake_mcp",
+    "run_fake_supabase",
+]
@@ -0,0 +1,224 @@
+"""
+Leak check: many full agent runs must leave the worker's memory flat.
+
+Runs the end-to-end stack from `benchmarks.e2e_load_test` (the gateway against
+local fakes, one worker) in rounds. After each round, with no run in flight, it
+reads `/admin/memory?gc=true` as an admin user. `tracemalloc` is started after
+the warm-up rounds. The check fails (exit 1) when:
+
+- a Composio MCP toolset or MCP session outlives its run, or a released toolset
+  is still alive after a garbage collection;
+- the session service holds more sessions than `AGENT_SESSION_MAX_COUNT`;
+- the Composio SDK's telemetry queue keeps growing (its sender thread stops at
+  its first network error, e.g. without a route to telemetry.composio.dev);
+- the traced Python heap or the RSS grew by more than the allowed amount per run
+  over the second half of the measured rounds. Bounded caches (ABC caches, lazily
+  built pydantic schemas) fill up during the first half.
+
+    python -m benchmarks.leak_check
+    python -m benchmarks.leak_check --concurrency 8 --max-sessions 8
+    python -m benchmarks.leak_check --json
+
+On failure the allocations that grew most since tracing started are printed.
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+from typing import Any, Dict, List
+
+import httpx
+
+from benchmarks.e2e_load_test import _drive, running_stack
+from benchmarks.fakes import issue_token
+from benchmarks.worker_load_test import _discover_agent_path
+
+ADMIN_USER_ID = "leak-admin"
+
+
+def _memory(client: httpx.Client) -> Dict[str, Any]:
+    response = client.get("/admin/memory", params={"gc": "true", "top": 0})
+    response.raise_for_status()
+    return response.json()
+
+
+def _round_figures(report: Dict[str, Any], runs: int) -> Dict[str, Any]:
+    process = report["process"]
+    composio = report["components"].get("composio_mcp", {})
+    return {
+        "runs": runs,
+        "rss_bytes": process["rss_bytes"],
+        "traced_bytes": process.get("traced_bytes"),
+        "gc_objects": process["gc_objects"],
+        "sessions": report["sessions"]["sessions"],
+        "session_bytes": report["sessions"]["total_bytes"],
+        "open_toolsets": composio.get("open_toolsets", 0),
+        "live_mcp_sessions": composio.get("live_mcp_sessions", 0),
+        "released_toolsets_alive": composio.get("released_toolsets_alive", 0),
+        "sdk_telemetry_queue": composio.get("sdk_telemetry_queue", 0),
+        "components": report["components"],
+    }
+
+
+def run_leak_check(args: argparse.Namespace) -> Dict[str, Any]:
+    args.workers = 1
+    extra_env = {
+        "AGENT_WORKERS": "1",
+        "AGENT_ADMIN_USER_IDS": ADMIN_USER_ID,
+        "AGENT_SESSION_MAX_COUNT": str(args.max_sessions),
+        # ag_ui_adk forgets evicted sessions at its next sweep; sweep every round.
+        "AGENT_SESSION_CLEANUP_INTERVAL": str(max(int(args.round_seconds / 2), 1)),
+        # Tracing and the collections stall the loop; keep one stall report, not 50.
+        "AGENT_LOOP_BLOCK_KEEP": "1",
+        # Finished runs are replayable for the TTL; keep that window under a round.
+        "AGENT_RUN_COALESCING_TTL": str(args.round_seconds / 2),
+    }
+    rounds: List[Dict[str, Any]] = []
+    errors = 0
+    with running_stack(args, extra_env) as urls:
+        tokens = [
+            issue_token(f"load-user-{index}", supabase_url=urls["supabase"])
+            for index in range(args.concurrency)
+        ]
+        admin_headers = {
+            "Authorization": f"Bearer {issue_token(ADMIN_USER_ID, supabase_url=urls['supabase'])}"
+        }
+        target = f"{urls['gateway']}{args.path or _discover_agent_path(urls['gateway'], tokens[0])}"
+        with httpx.Client(base_url=urls["gateway"], headers=admin_headers, timeout=120.0) as admin:
+            total_runs = 0
+            for index in range(args.warmup_rounds + args.rounds):
+                if index == args.warmup_rounds:
+                    admin.post(
+                        "/admin/memory/tracemalloc", params={"frames": args.frames}
+                    ).raise_for_status()
+                samples = asyncio.run(_drive(target, tokens, args.prompt, args.round_seconds))
+                total_runs += len(samples["run_ms"])
+                errors += samples["errors"]
+                if index >= args.warmup_rounds:
+                    rounds.append(_round_figures(_memory(admin), total_runs))
+            growth = admin.post(
+                "/admin/memory/tracemalloc",
+                params={"top": args.top, "frames": args.frames, "group_by": args.group_by},
+            ).json()
+            admin.delete("/admin/memory/tracemalloc")
+    return {
+        "scenario": {
+            "path": target[len(urls["gateway"]):],
+            "concurrency": args.concurrency,
+            "rounds": args.rounds,
+            "round_seconds": args.round_seconds,
+            "max_sessions": args.max_sessions,
+        },
+        "errors": errors,
+        "rounds": rounds,
+        "top_growth": growth["top"],
+    }
+
+
+def check(result: Dict[str, Any], args: argparse.Namespace) -> List[str]:
+    """
+    Problems found in a leak check result; empty when memory stayed flat.
+    """
+
+    rounds = result["rounds"]
+    problems: List[str] = []
+    for number, figures in enumerate(rounds, start=1):
+        for name in ("open_toolsets", "live_mcp_sessions", "released_toolsets_alive"):
+            if figures[name]:
+                problems.append(f"round {number}: {figures[name]} {name.replace('_', ' ')} while idle")
+        if figures["sessions"] > args.max_sessions:
+            problems.append(
+                f"round {number}: {figures['sessions']} sessions, over the cap of {args.max_sessions}"
+            )
+    first, last = rounds[len(rounds) // 2], rounds[-1]
+    if last["sdk_telemetry_queue"] > first["sdk_telemetry_queue"]:
+        problems.append(
+            f"Composio SDK telemetry queue grew from {first['sdk_telemetry_queue']} "
+            f"to {last['sdk_telemetry_queue']} events"
+        )
+    runs = last["runs"] - first["runs"]
+    if runs <= 0:
+        problems.append("no runs completed over the second half of the rounds")
+        return problems
+    for name, limit in (("traced_bytes", args.max_heap_growth), ("rss_bytes", args.max_rss_growth)):
+        if first[name] is None or last[name] is None:
+            continue
+        per_run = (last[name] - first[name]) / runs
+        if per_run > limit:
+            problems.append(
+                f"{name.replace('_', ' ')} grew {per_run:.0f} bytes per run over {runs} runs "
+                f"(limit {limit:.0f})"
+            )
+    return problems
+
+
+def format_report(result: Dict[str, Any], problems: List[str]) -> str:
+    scenario = result["scenario"]
+    lines = [
+        f"Leak check: {scenario['path']}, {scenario['concurrency']} users, "
+        f"{scenario['rounds']} rounds of {scenario['round_seconds']:g}s, {result['errors']} errors",
+        f"  {'round':>5} {'runs':>6} {'rss MB':>8} {'heap MB':>8} {'objects':>9} "
+        f"{'sessions':>8} {'open ts':>7} {'mcp':>4}",
+    ]
+    for number, figures in enumerate(result["rounds"], start=1):
+        heap = figures["traced_bytes"]
+        lines.append(
+            f"  {number:>5} {figures['runs']:>6} {figures['rss_bytes'] / 2**20:>8.1f} "
+            f"{(heap or 0) / 2**20:>8.2f} {figures['gc_objects']:>9} {figures['sessions']:>8} "
+            f"{figures['open_toolsets']:>7} {figures['live_mcp_sessions']:>4}"
+        )
+    lines.append("Components after the last round:")
+    for name, figures in result["rounds"][-1]["components"].items():
+        lines.append(f"  {name}: {json.dumps(figures)}")
+    if problems:
+        lines.append("FAILED:")
+        lines.extend(f"  {problem}" for problem in problems)
+        lines.append("Largest heap growth since tracing started:")
+        for stat in result["top_growth"]:
+            lines.append(f"  {stat['size_diff']:>+10} B {stat['count_diff']:>+7}  {stat['traceback'][-1]}")
+    else:
+        lines.append("OK: memory stayed flat")
+    return "\n".join(lines)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Check that repeated agent runs do not leak memory.")
+    parser.add_argument("--concurrency", type=int, default=4, help="Concurrent users")
+    parser.add_argument("--rounds", type=int, default=8, help="Measured rounds")
+    parser.add_argument("--warmup-rounds", type=int, default=2, help="Unmeasured rounds first")
+    parser.add_argument("--round-seconds", type=float, default=10.0, help="Seconds of runs per round")
+    parser.add_argument("--max-sessions", type=int, default=16, help="AGENT_SESSION_MAX_COUNT for the gateway")
+    parser.add_argument(
+        "--max-heap-growth", type=float, default=1024.0, help="Allowed traced heap growth, bytes per run"
+    )
+    parser.add_argument("--max-rss-growth", type=float, default=16384.0, help="Allowed RSS growth, bytes per run")
+    parser.add_argument("--frames", type=int, default=1, help="tracemalloc frames per allocation")
+    parser.add_argument(
+        "--group-by", default="lineno", help="Group heap growth by lineno, filename or traceback"
+    )
+    parser.add_argument("--top", type=int, default=15, help="Allocation sites listed on failure")
+    parser.add_argument("--path", default=None, help="Agent endpoint to POST to (default: first agent)")
+    parser.add_argument("--prompt", default="List the open issues.", help="User message per run")
+    parser.add_argument("--tool-latency-ms", type=float, default=20.0, help="Fake MCP tool latency")
+    parser.add_argument("--tool-payload-bytes", type=int, default=2048, help="Fake MCP tool response size")
+    parser.add_argument("--composio-latency-ms", type=float, default=0.0, help="Fake Composio latency")
+    parser.add_argument("--llm-first-token-ms", type=float, default=50.0, help="Fake LLM time to first chunk")
+    parser.add_argument("--llm-token-interval-ms", type=float, default=5.0, help="Fake LLM delay between chunks")
+    parser.add_argument("--llm-chunks", type=int, default=10, help="Text chunks per fake LLM answer")
+    parser.add_argument("--gateway-logs", action="store_true", help="Show the gateway's stderr")
+    parser.add_argument("--json", action="store_true", help="Emit machine-readable JSON")
+    args = parser.parse_args()
+
+    result = run_leak_check(args)
+    problems = check(result, args)
+    if args.json:
+        print(json.dumps({**result, "problems": problems}, indent=2))
+    else:
+        print(format_report(result, problems))
+    if problems:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,350 @@
+"""
+Microbenchmarks for the per-request code paths in `shared/`.
+
+Each case times one call of a hot function on a fixture shaped like production
+traffic:
+
+- auth: bearer-token extraction from a browser-sized header set, HS256 JWT
+  validation (`_validate_jwt` / `_decode_hs_token`)
+- tool responses: `extract_structured_payload` on MCP `CallToolResult`s carrying
+  Composio-style JSON text (1 KB to 256 KB), and on nested `functionResponse`
+  dicts (shallow, deep, and wide with the text after many metadata keys)
+- Composio: `_iter_config_ids` resolving MCP config ids from the configuration snapshot
+- agent loading: `_sanitize_slug`, `discover_agents` and
+  `discover_agent_metadata` over a generated tree of small agent packages
+
+    python -m benchmarks.microbenchmarks --save-baseline        # record benchmarks/baselines/micro.json
+    python -m benchmarks.microbenchmarks                        # compare (exit 1 on regression)
+    python -m benchmarks.microbenchmarks --filter tool_response --json
+
+Every case is calibrated to run for about `--min-time` seconds per round; the
+best of `--rounds` rounds is reported and compared, which is the figure least
+affected by other activity on the machine.
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+
+from benchmarks.fakes import FAKE_JWT_SECRET, issue_token
+from benchmarks.regression import BASELINE_DIR, compare_figures, load_baseline, save_baseline
+
+DEFAULT_BASELINE = BASELINE_DIR / "micro.json"
+SUPABASE_URL = "https://benchmark.supabase.co"
+AGENT_TREE_SIZE = 24
+
+Case = Tuple[str, Callable[[], Any]]
+
+
+def _composio_result(payload_bytes: int) -> Dict[str, Any]:
+    # Shape of a Composio list action (e.g. GITHUB_LIST_REPOSITORY_ISSUES) result.
+    item_count = max(1, payload_bytes // 512)
+    items = [
+        {
+            "id": 1000 + index,
+            "number": index,
+            "title": f"Issue {index}: flaky test in CI",
+            "state": "open",
+            "labels": [{"name": "bug"}, {"name": "ci"}],
+            "user": {"login": f"user{index}", "id": 50 + index},
+            "body": "Steps to reproduce the failure on main. " * 6,
+            "created_at": "2025-01-01T00:00:00Z",
+        }
+        for index in range(item_count)
+    ]
+    return {"successful": True, "error": None, "data": {"items": items}, "logId": "log_abc123"}
+
+
+def _function_response(text: str, *, depth: int = 0, width: int = 0) -> Dict[str, Any]:
+    # ADK/Gemini function response event content; `depth` adds wrapper levels and
+    # `width` metadata keys ahead of the containers holding the text.
+    leaf: Dict[str, Any] = {"content": [{"type": "text", "text": text}], "isError": False}
+    for level in range(depth):
+        leaf = {"meta": {"level": level}, "result": leaf}
+    response: Dict[str, Any] = {f"meta_{index}": {"value": index} for index in range(width)}
+    response["result"] = leaf
+    return {
+        "role": "user",
+        "parts": [
+            {
+                "functionResponse": {
+                    "id": "call_1",
+                    "name": "GITHUB_LIST_REPOSITORY_ISSUES",
+                    "response": response,
+                }
+            }
+        ],
+    }
+
+
+def _call_tool_result(text: str):
+    from mcp.types import CallToolResult, TextContent
+
+    return CallToolResult(content=[TextContent(type="text", text=text)], isError=False)
+
+
+def _request_scope(token: str) -> Dict[str, Any]:
+    headers = {
+        "host": "agents.example.com",
+        "user-agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36",
+        "accept": "text/event-stream",
+        "accept-encoding": "gzip, deflate, br",
+        "accept-language": "en-US,en;q=0.9",
+        "content-type": "application/json",
+        "content-length": "512",
+        "origin": "https://app.example.com",
+        "referer": "https://app.example.com/chat",
+        "sec-fetch-mode": "cors",
+        "x-request-id": "9b1f0f3e-1d7a-4c3e-8f00-8f1c2a3b4c5d",
+        "traceparent": "00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-01",
+        "authorization": f"Bearer {token}",
+    }
+    return {
+        "type": "http",
+        "method": "POST",
+        "path": "/agents/github-issues",
+        "headers": [(name.encode(), value.encode()) for name, value in headers.items()],
+    }
+
+
+def _run_coroutine(coroutine) -> Any:
+    # The awaited code never suspends, so it completes on the first send.
+    try:
+        coroutine.send(None)
+    except StopIteration as stop:
+        return stop.value
+    raise RuntimeError("Benchmarked coroutine suspended")
+
+
+def _auth_cases() -> List[Case]:
+    from starlette.requests import Request
+
+    from shared.auth import SupabaseAuthMiddleware
+
+    middleware = SupabaseAuthMiddleware(
+        None,
+        supabase_url=SUPABASE_URL,
+        supabase_jwt_secret=FAKE_JWT_SECRET,
+        required_audiences=["authenticated"],
+    )
+    token = issue_token("3f1c7d2e-5b6a-4c8d-9e0f-1a2b3c4d5e6f", supabase_url=SUPABASE_URL)
+    scope = _request_scope(token)
+    assert middleware._decode_hs_token(token, "HS256") is not None
+    return [
+        (
+            "auth.extract_bearer_token",
+            lambda: SupabaseAuthMiddleware._extract_bearer_token(Request(scope)),
+        ),
+        ("auth.decode_hs_token", lambda: middleware._decode_hs_token(token, "HS256")),
+        ("auth.validate_jwt", lambda: _run_coroutine(middleware._validate_jwt(token))),
+    ]
+
+
+def _tool_response_cases() -> List[Case]:
+    from shared.tool_response_utils import _find_first_text_value, extract_structured_payload
+
+    cases: List[Case] = []
+    for label, size in (("1kb", 1024), ("16kb", 16 * 1024), ("256kb", 256 * 1024)):
+        text = json.dumps(_composio_result(size))
+        result = _call_tool_result(text)
+        shallow = _function_response(text)
+        cases.append(
+            (
+                f"tool_response.call_tool_result[{label}]",
+                lambda result=result: extract_structured_payload(result),
+            )
+        )
+        cases.append(
+            (
+                f"tool_response.function_response[{label}]",
+                lambda shallow=shallow: extract_structured_payload(shallow),
+            )
+        )
+
+    text = json.dumps(_composio_result(1024))
+    deep = _function_response(text, depth=12)
+    wide = _function_response(text, width=200)
+    cases.extend(
+        [
+            ("tool_response.find_text[deep]", lambda: _find_first_text_value(deep)),
+            ("tool_response.find_text[wide]", lambda: _find_first_text_value(wide)),
+            ("tool_response.function_response[wide]", lambda: extract_structured_payload(wide)),
+        ]
+    )
+    return cases
+
+
+def _composio_cases() -> List[Case]:
+    from shared.composio_mcp import ComposioMCPIntegration, ComposioMCPSettings
+
+    os.environ["BENCHMARK_AGENT_CIO_MCP_CONFIG_IDS"] = (
+        "mcp_cfg_1a2b3c, mcp_cfg_4d5e6f mcp_cfg_7a8b9c"
+    )
+    integration = ComposioMCPIntegration(
+        ComposioMCPSettings(
+            agent_context="benchmark_agent",
+            display_name="Benchmark Agent",
+            mcp_config_ids_env="BENCHMARK_AGENT_CIO_MCP_CONFIG_IDS",
+            test_user_env="BENCHMARK_AGENT_CIO_MCP_TEST_USER_ID",
+        )
+    )
+    return [("composio.iter_config_ids", lambda: list(integration._iter_config_ids()))]
+
+
+def _agent_tree(root: Path, count: int) -> None:
+    for index in range(count):
+        package = root / f"benchmark_{index:02d}_agent"
+        package.mkdir()
+        (package / "__init__.py").write_text("", encoding="utf-8")
+        (package / "agent.py").write_text(
+            "AGENT_ROUTE = 'Benchmark_%02d Agent'\n"
+            "AGENT_DISPLAY_NAME = 'Benchmark agent %02d'\n\n\n"
+            "def register_agent(app, base_path):\n"
+            "    return None\n" % (index, index),
+            encoding="utf-8",
+        )
+
+
+def _agent_loading_cases(root: Path) -> List[Case]:
+    from shared.agent_loader import _sanitize_slug, discover_agent_metadata, discover_agents
+
+    _agent_tree(root, AGENT_TREE_SIZE)
+    slugs = ["github_issues_agent", "  Event Organizer!! ", "My__Agent--v2", "calendar-agent"]
+    return [
+        ("agents.sanitize_slug[4]", lambda: [_sanitize_slug(slug) for slug in slugs]),
+        (f"agents.discover_agents[{AGENT_TREE_SIZE}]", lambda: discover_agents(root)),
+        (f"agents.discover_agent_metadata[{AGENT_TREE_SIZE}]", lambda: discover_agent_metadata(root)),
+    ]
+
+
+def build_cases(workdir: Path) -> List[Case]:
+    """
+    Every benchmark case; on-disk fixtures are written to `workdir`.
+    """
+
+    return [
+        *_auth_cases(),
+        *_tool_response_cases(),
+        *_composio_cases(),
+        *_agent_loading_cases(workdir),
+    ]
+
+
+def measure(function: Callable[[], Any], *, rounds: int, min_time: float) -> Dict[str, float]:
+    """
+    Nanoseconds per call: best and median of `rounds` rounds of about `min_time` seconds.
+    """
+
+    function()
+    loops = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(loops):
+            function()
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_time / 4:
+            break
+        loops *= 4
+    loops = max(1, int(loops * min_time / max(elapsed, 1e-9)))
+
+    per_call: List[float] = []
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(rounds):
+            started = time.perf_counter()
+            for _ in range(loops):
+                function()
+            per_call.append((time.perf_counter() - started) / loops * 1e9)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    return {
+        "best_ns": round(min(per_call), 1),
+        "median_ns": round(statistics.median(per_call), 1),
+        "loops": loops,
+    }
+
+
+def run_benchmarks(args: argparse.Namespace) -> Dict[str, Any]:
+    results: Dict[str, Dict[str, float]] = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        for name, function in build_cases(Path(workdir)):
+            if args.filter and not any(term in name for term in args.filter):
+                continue
+            figures = results[name] = measure(function, rounds=args.rounds, min_time=args.min_time)
+            if not args.json:
+                print(
+                    f"{name:<46} best {_format_ns(figures['best_ns']):>10}  "
+                    f"median {_format_ns(figures['median_ns']):>10}",
+                    flush=True,
+                )
+    return {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "results": results,
+    }
+
+
+def _format_ns(value: float) -> str:
+    if value >= 1e6:
+        return f"{value / 1e6:.2f} ms"
+    if value >= 1e3:
+        return f"{value / 1e3:.2f} us"
+    return f"{value:.0f} ns"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Microbenchmarks for shared hot paths.")
+    parser.add_argument("--filter", nargs="*", default=None, help="Only cases containing any of these")
+    parser.add_argument("--rounds", type=int, default=7, help="Timed rounds per case")
+    parser.add_argument("--min-time", type=float, default=0.1, help="Target seconds per round")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE, help="Baseline JSON file")
+    parser.add_argument("--save-baseline", action="store_true", help="Store this run as the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative slowdown")
+    parser.add_argument("--json", action="store_true", help="Emit machine-readable JSON")
+    args = parser.parse_args()
+
+    report = run_benchmarks(args)
+    regressions: List[str] = []
+    comparison: List[str] = []
+    baseline = None if args.save_baseline else load_baseline(args.baseline)
+    if args.save_baseline:
+        if args.filter:
+            parser.error("--save-baseline records every case; drop --filter")
+        save_baseline(args.baseline, report)
+    elif baseline is not None:
+        if baseline.get("python") != report["python"]:
+            comparison.append(
+                f"Warning: baseline was recorded with Python {baseline.get('python')}."
+            )
+        checks = [
+            (name, baseline["results"][name]["best_ns"], figures["best_ns"], False)
+            for name, figures in report["results"].items()
+            if name in baseline.get("results", {})
+        ]
+        lines, regressions = compare_figures(checks, args.tolerance)
+        comparison.extend(lines)
+
+    if args.json:
+        print(json.dumps({**report, "regressions": regressions}, indent=2))
+    else:
+        if args.save_baseline:
+            print(f"Baseline saved to {args.baseline}")
+        elif comparison:
+            print(f"Compared with {args.baseline} in ns per call (tolerance {args.tolerance:.0%}):")
+            print("\n".join(comparison))
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
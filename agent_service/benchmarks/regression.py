@@ -0,0 +1,50 @@
+"""
+Baseline storage and regression checks shared by the benchmark runners.
+
+Baselines are JSON files under `benchmarks/baselines/`. Record them on the machine
+that later runs the comparison; absolute numbers do not transfer between hosts.
+"""
+
+import json
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+BASELINE_DIR = Path(__file__).resolve().parent / "baselines"
+
+# (name, baseline value, current value, higher_is_better)
+Check = Tuple[str, float, float, bool]
+
+
+def load_baseline(path: Path) -> Optional[Dict[str, Any]]:
+    if not path.is_file():
+        return None
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def save_baseline(path: Path, result: Dict[str, Any]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(result, indent=2) + "\n", encoding="utf-8")
+
+
+def compare_figures(checks: Iterable[Check], tolerance: float) -> Tuple[List[str], List[str]]:
+    """
+    One line per figure with its relative change, and the lines that regressed.
+
+    A figure regresses when it moves in the wrong direction by more than
+    `tolerance` (a fraction of the baseline value).
+    """
+
+    lines: List[str] = []
+    regressions: List[str] = []
+    for name, old, new, higher_is_better in checks:
+        change = (new - old) / old if old else 0.0
+        worse = -change if higher_is_better else change
+        line = f"{name:<44} {old:>12.1f} -> {new:>12.1f} ({change:+.1%})"
+        if worse > tolerance:
+            regressions.append(line)
+            line += "  REGRESSION"
+        lines.append(line)
+    return lines, regressions
+
+
+__all__ = ["BASELINE_DIR", "Check", "compare_figures", "load_baseline", "save_baseline"]
@@ -0,0 +1,183 @@
+"""
+Load/append latency of the session backends with realistic conversation histories.
+
+Each history cycles through user text, a model function call, an ~8 KB tool
+response and a model text reply. For every backend and history size the benchmark
+measures `get_session` (full history load, as done before each agent turn) and
+`append_event` (one write per streamed event).
+
+    python -m benchmarks.session_store_benchmark [--sizes 20 100 500] [--json]
+
+The Redis backend is only measured when `--redis-url` points at a server.
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import tempfile
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from google.adk.events.event import Event
+from google.adk.events.event_actions import EventActions
+from google.adk.sessions import InMemorySessionService
+from google.adk.sessions.base_session_service import BaseSessionService
+from google.genai import types
+
+from redis.asyncio import Redis
+
+from shared.session_service import (
+    PersistentSessionService,
+    RedisSessionStore,
+    ThreadedDatabaseSessionService,
+)
+
+APP_NAME = "benchmark_agent"
+USER_ID = "benchmark-user"
+TOOL_PAYLOAD_BYTES = 8 * 1024
+
+
+def build_event(index: int, invocation_id: str) -> Event:
+    kind = index % 4
+    if kind == 0:
+        content = types.Content(
+            role="user",
+            parts=[types.Part(text=f"Please find speakers for meetup #{index} and draft an invite.")],
+        )
+        return Event(author="user", invocation_id=invocation_id, content=content)
+    if kind == 1:
+        call = types.FunctionCall(
+            id=f"call-{index}",
+            name="GMAIL_FETCH_EMAILS",
+            args={"query": f"speaker {index}", "max_results": 20},
+        )
+        return Event(
+            author=APP_NAME,
+            invocation_id=invocation_id,
+            content=types.Content(role="model", parts=[types.Part(function_call=call)]),
+        )
+    if kind == 2:
+        items = []
+        while len(json.dumps(items)) < TOOL_PAYLOAD_BYTES:
+            items.append(
+                {
+                    "id": uuid.uuid4().hex,
+                    "subject": f"Re: talk proposal {len(items)}",
+                    "snippet": "Thanks for reaching out about the meetup, I'd be happy to " * 2,
+                }
+            )
+        response = types.FunctionResponse(
+            id=f"call-{index - 1}", name="GMAIL_FETCH_EMAILS", response={"messages": items}
+        )
+        return Event(
+            author=APP_NAME,
+            invocation_id=invocation_id,
+            content=types.Content(role="user", parts=[types.Part(function_response=response)]),
+        )
+    return Event(
+        author=APP_NAME,
+        invocation_id=invocation_id,
+        content=types.Content(
+            role="model",
+            parts=[types.Part(text="I found three candidate speakers and drafted an invite. " * 4)],
+        ),
+        actions=EventActions(state_delta={"last_turn": index, "user:preferred_tone": "friendly"}),
+    )
+
+
+async def _time_ms(coroutine) -> float:
+    started = time.perf_counter()
+    await coroutine
+    return (time.perf_counter() - started) * 1000
+
+
+def _summary(samples: List[float]) -> Dict[str, float]:
+    ordered = sorted(samples)
+    return {
+        "p50_ms": round(statistics.median(ordered), 3),
+        "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 3),
+        "mean_ms": round(statistics.fmean(ordered), 3),
+    }
+
+
+async def bench_backend(
+    service: BaseSessionService, size: int, *, loads: int, appends: int
+) -> Dict[str, Dict[str, float]]:
+    session = await service.create_session(app_name=APP_NAME, user_id=USER_ID)
+    invocation_id = f"e-{uuid.uuid4()}"
+    for index in range(size):
+        await service.append_event(session, build_event(index, invocation_id))
+
+    load_samples = [
+        await _time_ms(
+            service.get_session(app_name=APP_NAME, user_id=USER_ID, session_id=session.id)
+        )
+        for _ in range(loads)
+    ]
+    append_samples = [
+        await _time_ms(service.append_event(session, build_event(size + index, invocation_id)))
+        for index in range(appends)
+    ]
+
+    loaded = await service.get_session(app_name=APP_NAME, user_id=USER_ID, session_id=session.id)
+    assert loaded is not None and len(loaded.events) == size + appends
+    return {"get_session": _summary(load_samples), "append_event": _summary(append_samples)}
+
+
+async def run(sizes: List[int], loads: int, appends: int, redis_url: Optional[str]) -> Dict:
+    results: Dict[str, Dict] = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        backends: Dict[str, BaseSessionService] = {
+            "memory": InMemorySessionService(),
+            "sqlite": ThreadedDatabaseSessionService(f"sqlite:///{Path(tmp) / 'sessions.sqlite3'}"),
+        }
+        if redis_url is not None:
+            backends["redis"] = PersistentSessionService(
+                RedisSessionStore(Redis.from_url(redis_url), key_prefix=f"bench-{uuid.uuid4().hex[:8]}")
+            )
+        try:
+            for name, service in backends.items():
+                results[name] = {
+                    str(size): await bench_backend(service, size, loads=loads, appends=appends)
+                    for size in sizes
+                }
+        finally:
+            for service in backends.values():
+                close = getattr(service, "close", None)
+                if close is not None:
+                    await close()
+    return results
+
+
+def format_report(results: Dict) -> str:
+    lines = [
+        f"{'backend':<8} {'events':>6} {'load p50':>10} {'load p95':>10} {'append p50':>11} {'append p95':>11}"
+    ]
+    for backend, by_size in results.items():
+        for size, metrics in by_size.items():
+            lines.append(
+                f"{backend:<8} {size:>6} "
+                f"{metrics['get_session']['p50_ms']:>8.2f}ms {metrics['get_session']['p95_ms']:>8.2f}ms "
+                f"{metrics['append_event']['p50_ms']:>9.2f}ms {metrics['append_event']['p95_ms']:>9.2f}ms"
+            )
+    return "\n".join(lines)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark session backends.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[20, 100, 500])
+    parser.add_argument("--loads", type=int, default=30, help="get_session samples per size")
+    parser.add_argument("--appends", type=int, default=50, help="append_event samples per size")
+    parser.add_argument("--redis-url", default=None, help="Also measure a Redis-compatible server")
+    parser.add_argument("--json", action="store_true", help="Emit machine-readable JSON")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args.sizes, args.loads, args.appends, args.redis_url))
+    print(json.dumps(results, indent=2) if args.json else format_report(results))
+
+
+if __name__ == "__main__":
+    main()
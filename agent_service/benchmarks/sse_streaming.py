@@ -0,0 +1,212 @@
+"""
+Bytes on the wire and CPU per answer for agent event streams.
+
+A fake agent endpoint streams an answer the way ADK agents do through AG-UI:
+run and message lifecycle events, one `TEXT_MESSAGE_CONTENT` event per model token
+(`--interval` apart), and a tool call halfway through. The stream goes through
+`SSEStreamingMiddleware` with coalescing and gzip each on or off:
+
+    python -m benchmarks.sse_streaming [--tokens 400] [--interval 0.002] [--json]
+
+For each mode the benchmark reports, per answer, the bytes written to the socket,
+the number of writes and events, and the process CPU time of producing and
+writing the stream. Every stream is decoded and checked against the answer text
+and event order, so a mode that loses or reorders events fails the run.
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+import zlib
+from typing import Any, Dict, List
+
+from ag_ui.core import (
+    EventType,
+    RunFinishedEvent,
+    RunStartedEvent,
+    TextMessageContentEvent,
+    TextMessageEndEvent,
+    TextMessageStartEvent,
+    ToolCallArgsEvent,
+    ToolCallEndEvent,
+    ToolCallResultEvent,
+    ToolCallStartEvent,
+)
+from ag_ui.encoder import EventEncoder
+from starlette.datastructures import State
+from starlette.responses import StreamingResponse
+
+from shared.settings import StreamingSettings
+from shared.sse_streaming import SSEStreamingMiddleware
+
+AGENT_PATH = "/agents/benchmark"
+MODES = {
+    "raw": {"coalesce_ms": 0.0, "compression": False},
+    "coalesce": {"coalesce_ms": 20.0, "compression": False},
+    "gzip": {"coalesce_ms": 0.0, "compression": True},
+    "coalesce+gzip": {"coalesce_ms": 20.0, "compression": True},
+}
+_ANSWER = (
+    "Here are three speakers who could present at the October meetup. "
+    "Dr. Amara Okafor works on retrieval-augmented generation at a Lagos start-up "
+    "and has spoken at PyCon Africa; her talk on evaluating RAG pipelines would "
+    "suit the intermediate track. Jonas Weber maintains an open-source vector "
+    "database client and offered a live-coding session. Mei Lin leads the "
+    "platform team at a logistics company — she can cover cost controls for LLM "
+    "workloads in production. I've drafted an invitation e-mail for each of them. "
+)
+
+
+def answer_tokens(count: int) -> List[str]:
+    # Roughly four characters per token, as with most BPE vocabularies.
+    text = _ANSWER * (count * 4 // len(_ANSWER) + 1)
+    return [text[index * 4 : index * 4 + 4] for index in range(count)]
+
+
+def fake_agent(tokens: List[str], interval: float):
+    encoder = EventEncoder()
+    half = len(tokens) // 2
+
+    async def events():
+        yield encoder.encode(RunStartedEvent(type=EventType.RUN_STARTED, thread_id="t1", run_id="r1"))
+        for part, chunk in enumerate((tokens[:half], tokens[half:])):
+            message_id = f"m{part}"
+            yield encoder.encode(
+                TextMessageStartEvent(type=EventType.TEXT_MESSAGE_START, message_id=message_id, role="assistant")
+            )
+            for token in chunk:
+                await asyncio.sleep(interval)
+                yield encoder.encode(
+                    TextMessageContentEvent(
+                        type=EventType.TEXT_MESSAGE_CONTENT, message_id=message_id, delta=token
+                    )
+                )
+            yield encoder.encode(TextMessageEndEvent(type=EventType.TEXT_MESSAGE_END, message_id=message_id))
+            if part == 0:
+                call_id = "call-1"
+                yield encoder.encode(
+                    ToolCallStartEvent(
+                        type=EventType.TOOL_CALL_START, tool_call_id=call_id, tool_call_name="GMAIL_SEND_EMAIL"
+                    )
+                )
+                yield encoder.encode(
+                    ToolCallArgsEvent(
+                        type=EventType.TOOL_CALL_ARGS, tool_call_id=call_id, delta='{"to":"speakers@example.com"}'
+                    )
+                )
+                yield encoder.encode(ToolCallEndEvent(type=EventType.TOOL_CALL_END, tool_call_id=call_id))
+                yield encoder.encode(
+                    ToolCallResultEvent(
+                        type=EventType.TOOL_CALL_RESULT,
+                        message_id="tool-1",
+                        tool_call_id=call_id,
+                        content='{"successful":true}',
+                    )
+                )
+        yield encoder.encode(RunFinishedEvent(type=EventType.RUN_FINISHED, thread_id="t1", run_id="r1"))
+
+    async def app(scope, receive, send):
+        response = StreamingResponse(events(), media_type=encoder.get_content_type())
+        await response(scope, receive, send)
+
+    return app
+
+
+async def stream_once(mode: Dict[str, Any], tokens: List[str], interval: float) -> Dict[str, Any]:
+    state = State()
+    state.agent_registry = [{"slug": "benchmark", "path": AGENT_PATH}]
+    settings = StreamingSettings(**mode)
+    middleware = SSEStreamingMiddleware(fake_agent(tokens, interval), settings=settings, state=state)
+    scope = {
+        "type": "http",
+        "method": "POST",
+        "path": AGENT_PATH,
+        "headers": [(b"accept", b"text/event-stream"), (b"accept-encoding", b"gzip, deflate, br")],
+    }
+    bodies: List[bytes] = []
+    headers: Dict[bytes, bytes] = {}
+
+    finished = asyncio.Event()
+
+    async def receive():
+        # The client stays connected until the response is complete.
+        await finished.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            headers.update(message["headers"])
+        elif message.get("body"):
+            bodies.append(message["body"])
+
+    cpu = time.process_time()
+    await middleware(scope, receive, send)
+    cpu = time.process_time() - cpu
+    finished.set()
+
+    wire = b"".join(bodies)
+    raw = zlib.decompress(wire, 16 + zlib.MAX_WBITS) if headers.get(b"content-encoding") == b"gzip" else wire
+    events = [json.loads(frame[len(b"data: ") :]) for frame in raw.split(b"\n\n") if frame]
+    check_stream(events, tokens)
+    return {"wire_bytes": len(wire), "raw_bytes": len(raw), "writes": len(bodies), "events": len(events), "cpu_ms": cpu * 1000}
+
+
+def check_stream(events: List[Dict[str, Any]], tokens: List[str]) -> None:
+    text = "".join(event["delta"] for event in events if event["type"] == "TEXT_MESSAGE_CONTENT")
+    if text != "".join(tokens):
+        raise AssertionError("Streamed text does not match the answer")
+    order = [event["type"] for event in events if event["type"] != "TEXT_MESSAGE_CONTENT"]
+    expected = [
+        "RUN_STARTED",
+        "TEXT_MESSAGE_START",
+        "TEXT_MESSAGE_END",
+        "TOOL_CALL_START",
+        "TOOL_CALL_ARGS",
+        "TOOL_CALL_END",
+        "TOOL_CALL_RESULT",
+        "TEXT_MESSAGE_START",
+        "TEXT_MESSAGE_END",
+        "RUN_FINISHED",
+    ]
+    if order != expected:
+        raise AssertionError(f"Lifecycle events out of order: {order}")
+
+
+async def run(tokens: int, interval: float, answers: int) -> Dict[str, Dict[str, float]]:
+    parts = answer_tokens(tokens)
+    results: Dict[str, Dict[str, float]] = {}
+    for name, mode in MODES.items():
+        samples = [await stream_once(mode, parts, interval) for _ in range(answers)]
+        results[name] = {
+            key: round(statistics.median(sample[key] for sample in samples), 3) for key in samples[0]
+        }
+    return results
+
+
+def format_report(results: Dict[str, Dict[str, float]]) -> str:
+    baseline = results["raw"]["wire_bytes"]
+    lines = [f"{'mode':<14} {'wire bytes':>10} {'vs raw':>7} {'writes':>7} {'events':>7} {'cpu/answer':>11}"]
+    for name, figures in results.items():
+        lines.append(
+            f"{name:<14} {figures['wire_bytes']:>10.0f} {figures['wire_bytes'] / baseline:>6.0%} "
+            f"{figures['writes']:>7.0f} {figures['events']:>7.0f} {figures['cpu_ms']:>9.2f}ms"
+        )
+    return "\n".join(lines)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark event stream coalescing and compression.")
+    parser.add_argument("--tokens", type=int, default=400, help="Model tokens per answer")
+    parser.add_argument("--interval", type=float, default=0.002, help="Seconds between tokens")
+    parser.add_argument("--answers", type=int, default=5, help="Answers streamed per mode")
+    parser.add_argument("--json", action="store_true", help="Emit machine-readable JSON")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args.tokens, args.interval, args.answers))
+    print(json.dumps(results, indent=2) if args.json else format_report(results))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,282 @@
+"""
+Prompt tokens saved by per-turn tool selection, and whether the right tools survive.
+
+The catalog mimics the event organizer's Composio configs (Gmail, Google Calendar,
+Notion and web search). Tool names and descriptions are written the way
+Composio writes them, and each tool has a JSON schema of typical size. Each query is a user
+message with the tools a correct answer needs:
+
+    python -m benchmarks.tool_selection [--top-k 8] [--embedder module:function] [--json]
+
+For every query the benchmark reports the declaration tokens of the whole
+catalog and of the declared tools: the top-k of each config plus the search tool.
+It also reports whether every needed tool was declared (recall) and how long
+ranking took.
+"""
+
+import argparse
+import json
+import statistics
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from shared.tool_selection import ToolDocument, ToolIndex, declaration_tokens, load_embedder
+
+_CATALOG: Dict[str, Sequence[Tuple[str, str]]] = {
+    "gmail": (
+        ("SEND_EMAIL", "Send an email to one or more recipients, with optional cc, bcc and attachments."),
+        ("CREATE_EMAIL_DRAFT", "Create a draft email that can be reviewed and sent later."),
+        ("SEND_DRAFT", "Send a previously created draft email."),
+        ("DELETE_DRAFT", "Permanently delete a draft email."),
+        ("LIST_DRAFTS", "List draft emails in the mailbox."),
+        ("FETCH_EMAILS", "Fetch emails from the inbox, filtered by a Gmail search query, labels or date."),
+        ("FETCH_MESSAGE_BY_MESSAGE_ID", "Fetch one email message by its message id."),
+        ("FETCH_MESSAGE_BY_THREAD_ID", "Fetch all messages of an email thread."),
+        ("LIST_THREADS", "List email threads matching a search query."),
+        ("REPLY_TO_THREAD", "Reply to an email thread, keeping the subject and recipients."),
+        ("FORWARD_MESSAGE", "Forward an email message to other recipients."),
+        ("MOVE_TO_TRASH", "Move an email message to the trash."),
+        ("DELETE_MESSAGE", "Permanently delete an email message."),
+        ("ADD_LABEL_TO_EMAIL", "Add or remove labels on an email message."),
+        ("CREATE_LABEL", "Create a new label for organizing email."),
+        ("LIST_LABELS", "List the labels of the mailbox."),
+        ("REMOVE_LABEL", "Delete a label from the mailbox."),
+        ("GET_ATTACHMENT", "Download an attachment of an email message."),
+        ("GET_CONTACTS", "List the user's Google contacts with names and email addresses."),
+        ("SEARCH_PEOPLE", "Search the user's contacts and directory for people by name or email."),
+        ("GET_PROFILE", "Get the email address and message counts of the mailbox."),
+        ("MODIFY_THREAD_LABELS", "Add or remove labels on every message of a thread."),
+        ("BATCH_MODIFY_MESSAGES", "Change labels of many email messages at once."),
+        ("LIST_HISTORY", "List changes to the mailbox since a history id."),
+        ("SETTINGS_GET_VACATION", "Get the vacation auto-reply settings."),
+        ("SETTINGS_UPDATE_VACATION", "Turn the vacation auto-reply on or off and set its message."),
+        ("LIST_SEND_AS", "List the addresses the user can send email from."),
+        ("CREATE_FILTER", "Create a filter that labels, archives or forwards incoming email."),
+        ("LIST_FILTERS", "List the mailbox's email filters."),
+        ("DELETE_FILTER", "Delete an email filter."),
+    ),
+    "googlecalendar": (
+        ("CREATE_EVENT", "Create an event on a Google Calendar with title, time, location and attendees."),
+        ("UPDATE_EVENT", "Update the time, title, location or attendees of a calendar event."),
+        ("PATCH_EVENT", "Change selected fields of a calendar event."),
+        ("DELETE_EVENT", "Delete an event from a calendar."),
+        ("FIND_EVENT", "Find calendar events matching text, within a time range."),
+        ("EVENTS_LIST", "List the events of a calendar between two dates."),
+        ("EVENTS_INSTANCES", "List the occurrences of a recurring event."),
+        ("EVENTS_MOVE", "Move an event to another calendar."),
+        ("QUICK_ADD", "Create an event from a short text such as 'Lunch with Ana tomorrow 1pm'."),
+        ("FIND_FREE_SLOTS", "Find free time slots across calendars, for scheduling a meeting."),
+        ("FREE_BUSY_QUERY", "Get busy intervals of calendars or people in a time range."),
+        ("LIST_CALENDARS", "List the calendars the user can see."),
+        ("GET_CALENDAR", "Get the details of one calendar."),
+        ("CREATE_CALENDAR", "Create a secondary calendar."),
+        ("UPDATE_CALENDAR", "Update the name, description or time zone of a calendar."),
+        ("DELETE_CALENDAR", "Delete a secondary calendar."),
+        ("CLEAR_CALENDAR", "Delete every event of a calendar."),
+        ("ACL_INSERT", "Share a calendar with a person or group."),
+        ("ACL_LIST", "List who a calendar is shared with."),
+        ("ACL_DELETE", "Stop sharing a calendar with someone."),
+        ("GET_CURRENT_DATE_TIME", "Get the current date and time in a time zone."),
+        ("SETTINGS_LIST", "List the user's calendar settings."),
+        ("COLORS_GET", "Get the color palette for calendars and events."),
+        ("REMOVE_ATTENDEE", "Remove an attendee from a calendar event."),
+        ("ADD_ATTENDEE", "Invite an additional attendee to a calendar event."),
+    ),
+    "notion": (
+        ("CREATE_NOTION_PAGE", "Create a page in Notion under a parent page, with a title and content."),
+        ("ADD_PAGE_CONTENT", "Append paragraphs, headings, lists or other blocks to a Notion page."),
+        ("UPDATE_PAGE", "Update the properties, icon or cover of a Notion page."),
+        ("ARCHIVE_NOTION_PAGE", "Archive or restore a Notion page."),
+        ("DUPLICATE_PAGE", "Duplicate a Notion page with its content."),
+        ("GET_PAGE_PROPERTY_ACTION", "Get one property value of a Notion page."),
+        ("FETCH_NOTION_CHILD_BLOCK", "Fetch the child blocks of a Notion page or block."),
+        ("FETCH_BLOCK_METADATA", "Fetch a Notion block by id."),
+        ("UPDATE_BLOCK", "Update the text or type of a Notion block."),
+        ("DELETE_BLOCK", "Delete a Notion block."),
+        ("SEARCH_NOTION_PAGE", "Search Notion pages and databases by title."),
+        ("CREATE_DATABASE", "Create a Notion database with a schema of properties."),
+        ("QUERY_DATABASE", "Query a Notion database with filters and sorts, returning its rows."),
+        ("INSERT_ROW_DATABASE", "Insert a row (page) into a Notion database."),
+        ("UPDATE_ROW_DATABASE", "Update the properties of a row in a Notion database."),
+        ("FETCH_DATABASE", "Fetch the schema of a Notion database."),
+        ("UPDATE_SCHEMA_DATABASE", "Add, rename or remove properties of a Notion database."),
+        ("CREATE_COMMENT", "Add a comment to a Notion page or discussion."),
+        ("FETCH_COMMENTS", "List the comments on a Notion page or block."),
+        ("LIST_USERS", "List the members and guests of the Notion workspace."),
+        ("GET_ABOUT_ME", "Get the Notion bot user behind the integration."),
+        ("GET_ABOUT_USER", "Get a Notion user by id."),
+        ("NOTION_FETCH_DATA", "Fetch the pages and databases the integration can access."),
+    ),
+    "composio_search": (
+        ("SEARCH", "Search the web and return result titles, links and snippets."),
+        ("NEWS_SEARCH", "Search recent news articles on a topic."),
+        ("EVENT_SEARCH", "Search for upcoming events such as conferences, meetups and concerts."),
+        ("SCHOLAR_SEARCH", "Search academic papers and authors."),
+        ("IMAGE_SEARCH", "Search for images on the web."),
+        ("SHOPPING_SEARCH", "Search products and prices from online shops."),
+        ("FINANCE_SEARCH", "Search stock quotes and financial news."),
+        ("TRENDS_SEARCH", "Get search interest over time for a term."),
+        ("FETCH_URL_CONTENT", "Fetch a web page and return its text content."),
+        ("EXA_ANSWER", "Answer a question with sources from a web search."),
+        ("EXA_SIMILARLINK", "Find web pages similar to a given link."),
+        ("TAVILY_SEARCH", "Search the web with a research-oriented engine and return summaries."),
+    ),
+}
+
+# (user message, tools a correct answer needs)
+QUERIES: Sequence[Tuple[str, Sequence[str]]] = (
+    (
+        "Find three speakers on retrieval-augmented generation for the October meetup and email each of them an invitation",
+        ("COMPOSIO_SEARCH_SEARCH", "GMAIL_SEND_EMAIL"),
+    ),
+    (
+        "Schedule the meetup on my calendar for next Thursday at 6pm and invite the organizers",
+        ("GOOGLECALENDAR_CREATE_EVENT",),
+    ),
+    (
+        "When are the organizers all free next week? Find a slot for a planning meeting",
+        ("GOOGLECALENDAR_FIND_FREE_SLOTS",),
+    ),
+    (
+        "Create a Notion page with the agenda for the October meetup",
+        ("NOTION_CREATE_NOTION_PAGE", "NOTION_ADD_PAGE_CONTENT"),
+    ),
+    (
+        "Add the confirmed speakers as rows to the speakers database in Notion",
+        ("NOTION_INSERT_ROW_DATABASE",),
+    ),
+    (
+        "Did any speaker reply to my invitation emails?",
+        ("GMAIL_FETCH_EMAILS",),
+    ),
+    (
+        "Draft an email to the venue asking about catering for 80 people",
+        ("GMAIL_CREATE_EMAIL_DRAFT",),
+    ),
+    (
+        "Are there other AI conferences in Berlin in October that clash with our meetup?",
+        ("COMPOSIO_SEARCH_EVENT_SEARCH",),
+    ),
+    (
+        "Move the meetup event to the 24th and let the attendees know",
+        ("GOOGLECALENDAR_UPDATE_EVENT",),
+    ),
+    (
+        "Reply to Jonas's thread and confirm his live-coding slot",
+        ("GMAIL_REPLY_TO_THREAD",),
+    ),
+)
+
+
+def build_catalog() -> Dict[str, List[Dict[str, Any]]]:
+    catalog: Dict[str, List[Dict[str, Any]]] = {}
+    for toolkit, actions in _CATALOG.items():
+        catalog[toolkit] = [
+            {
+                "name": f"{toolkit.upper()}_{action}",
+                "description": description,
+                "inputSchema": _schema_for(description),
+            }
+            for action, description in actions
+        ]
+    return catalog
+
+
+def _schema_for(description: str) -> Dict[str, Any]:
+    # Composio schemas carry a described property per argument; a handful is typical.
+    words = [word.strip(".,()'").lower() for word in description.split() if len(word) > 4][:6]
+    properties = {
+        f"{word}_value": {
+            "type": "string",
+            "description": f"The {word} to use. Leave empty to use the default behaviour of the action.",
+        }
+        for word in words
+    }
+    properties["user_id"] = {"type": "string", "description": "Account to act for; defaults to 'me'."}
+    return {"type": "object", "properties": properties, "required": list(properties)[:1]}
+
+
+def run(top_k: int, embedder_path: Optional[str]) -> Dict[str, Any]:
+    embedder = load_embedder(embedder_path) if embedder_path else None
+    catalog = build_catalog()
+    tokens = {
+        tool["name"]: declaration_tokens(tool["name"], tool["description"], tool["inputSchema"])
+        for tools in catalog.values()
+        for tool in tools
+    }
+    started = time.perf_counter()
+    indexes = {
+        toolkit: ToolIndex(
+            [ToolDocument(tool["name"], tool["description"]) for tool in tools], embedder=embedder
+        )
+        for toolkit, tools in catalog.items()
+    }
+    build_ms = (time.perf_counter() - started) * 1000
+    # The search tool's own declaration is sent on every selective turn.
+    search_tool_tokens = declaration_tokens(
+        "search_more_tools",
+        "Search the user's connected apps for more tools when none of the declared tools fits the task.",
+        {"type": "object", "properties": {"query": {"type": "string"}}, "required": ["query"]},
+    )
+    total_tokens = sum(tokens.values())
+    rows = []
+    for query, needed in QUERIES:
+        started = time.perf_counter()
+        declared = [name for index in indexes.values() for name in index.search(query, top_k)]
+        rank_ms = (time.perf_counter() - started) * 1000
+        sent = sum(tokens[name] for name in declared) + search_tool_tokens
+        rows.append(
+            {
+                "query": query,
+                "declared": len(declared),
+                "sent_tokens": sent,
+                "recall": sum(name in declared for name in needed) / len(needed),
+                "missing": [name for name in needed if name not in declared],
+                "rank_ms": round(rank_ms, 3),
+            }
+        )
+    sent_tokens = statistics.mean(row["sent_tokens"] for row in rows)
+    return {
+        "tools": len(tokens),
+        "top_k": top_k,
+        "embedder": embedder_path,
+        "index_build_ms": round(build_ms, 3),
+        "all_tokens": total_tokens,
+        "mean_sent_tokens": round(sent_tokens, 1),
+        "reduction": round(1 - sent_tokens / total_tokens, 4),
+        "recall": round(statistics.mean(row["recall"] for row in rows), 4),
+        "queries": rows,
+    }
+
+
+def format_report(results: Dict[str, Any]) -> str:
+    lines = [
+        f"{results['tools']} tools, {results['all_tokens']} declaration tokens per request without selection",
+        f"top-k {results['top_k']} per config: {results['mean_sent_tokens']:.0f} tokens on average "
+        f"({results['reduction']:.0%} fewer), recall {results['recall']:.0%}, "
+        f"index built in {results['index_build_ms']:.1f} ms",
+        "",
+        f"{'declared':>8} {'tokens':>7} {'recall':>7} {'rank':>8}  query",
+    ]
+    for row in results["queries"]:
+        missing = f"  (missing {', '.join(row['missing'])})" if row["missing"] else ""
+        lines.append(
+            f"{row['declared']:>8} {row['sent_tokens']:>7} {row['recall']:>6.0%} "
+            f"{row['rank_ms']:>6.2f}ms  {row['query'][:70]}{missing}"
+        )
+    return "\n".join(lines)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark per-turn tool selection.")
+    parser.add_argument("--top-k", type=int, default=8, help="Tools declared per config")
+    parser.add_argument("--embedder", help="module:function returning text embeddings")
+    parser.add_argument("--json", action="store_true", help="Emit machine-readable JSON")
+    args = parser.parse_args()
+
+    results = run(args.top_k, args.embedder)
+    print(json.dumps(results, indent=2) if args.json else format_report(results))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+"""
+Load test used to pick `AGENT_WORKERS` for a host.
+
+For each worker count the gateway is started with `python app.py` (preloaded
+workers) against a fake Supabase, and authenticated requests are driven at it from
+separate client processes. The default request is an agent POST with an empty body,
+which exercises the per-request CPU work of the gateway (JWT validation, Supabase
+user lookup, routing and AG-UI input validation) without calling an LLM.
+
+    python -m benchmarks.worker_load_test --workers 1 2 4 8 --duration 15 [--json]
+
+Run it on a host shaped like production; the load generator shares the machine
+with the gateway, so compare worker counts against each other rather than reading
+absolute numbers. The recommendation is the smallest worker count within 10% of
+the best throughput.
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+
+from benchmarks.fakes import FAKE_JWT_SECRET, issue_token, run_fake_supabase
+
+SERVICE_ROOT = Path(__file__).resolve().parent.parent
+RECOMMENDATION_THRESHOLD = 0.9
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_until_ready(url: str, timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(url, timeout=1.0).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"{url} did not become ready within {timeout:.0f}s")
+
+
+def _wait_for_port(port: int, timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1.0).close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"Nothing is listening on port {port} after {timeout:.0f}s")
+
+
+def _client_worker(
+    url: str, token: str, body: str, concurrency: int, duration: float
+) -> Tuple[List[float], int]:
+    async def _drive() -> Tuple[List[float], int]:
+        latencies: List[float] = []
+        errors = 0
+        deadline = time.monotonic() + duration
+        headers = {"Authorization": f"Bearer {token}", "Content-Type": "application/json"}
+        limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+        async with httpx.AsyncClient(limits=limits, timeout=30.0) as client:
+
+            async def _loop() -> None:
+                nonlocal errors
+                while time.monotonic() < deadline:
+                    started = time.perf_counter()
+                    try:
+                        response = await client.post(url, content=body, headers=headers)
+                        if response.status_code >= 500 or response.status_code == 401:
+                            errors += 1
+                    except httpx.HTTPError:
+                        errors += 1
+                        continue
+                    latencies.append((time.perf_counter() - started) * 1000)
+
+            await asyncio.gather(*(_loop() for _ in range(concurrency)))
+        return latencies, errors
+
+    return asyncio.run(_drive())
+
+
+def _percentile(ordered: List[float], fraction: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def _discover_agent_path(base_url: str, token: str) -> str:
+    schema = httpx.get(
+        f"{base_url}/openapi.json", headers={"Authorization": f"Bearer {token}"}, timeout=10.0
+    ).json()
+    prefix = os.getenv("AGENT_ROUTE_PREFIX", "/agents").rstrip("/") + "/"
+    for path, operations in schema.get("paths", {}).items():
+        # Skip the gateway's own POST routes (jobs, admin, Composio refresh).
+        if "post" in operations and path.startswith(prefix) and "{" not in path:
+            return path
+    raise RuntimeError("No agent endpoint found; pass --path explicitly")
+
+
+def run_worker_count(
+    workers: int,
+    *,
+    supabase_url: str,
+    path: Optional[str],
+    body: str,
+    clients: int,
+    concurrency: int,
+    duration: float,
+    warmup: float,
+) -> Dict[str, float]:
+    port = _free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    env = dict(
+        os.environ,
+        HOST="127.0.0.1",
+        PORT=str(port),
+        AGENT_WORKERS=str(workers),
+        AGENT_PRELOAD="true",
+        SUPABASE_URL=supabase_url,
+        SUPABASE_JWT_SECRET=FAKE_JWT_SECRET,
+        SUPABASE_JWT_AUDIENCE="authenticated",
+        LOG_LEVEL="WARNING",
+    )
+    env.pop("SUPABASE_JWT_ISSUER", None)
+    env.pop("UVICORN_RELOAD", None)
+    gateway = subprocess.Popen(
+        [sys.executable, "app.py"],
+        cwd=SERVICE_ROOT,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        _wait_until_ready(f"{base_url}/healthz", timeout=120.0)
+        token = issue_token("load-test-user", supabase_url=supabase_url)
+        target = f"{base_url}{path or _discover_agent_path(base_url, token)}"
+
+        per_client = max(1, concurrency // clients)
+        with multiprocessing.get_context("spawn").Pool(clients) as pool:
+            if warmup > 0:
+                pool.starmap(
+                    _client_worker, [(target, token, body, per_client, warmup)] * clients
+                )
+            results = pool.starmap(
+                _client_worker, [(target, token, body, per_client, duration)] * clients
+            )
+    finally:
+        gateway.send_signal(signal.SIGTERM)
+        try:
+            gateway.wait(timeout=60)
+        except subprocess.TimeoutExpired:
+            gateway.kill()
+
+    latencies = sorted(latency for samples, _ in results for latency in samples)
+    errors = sum(error_count for _, error_count in results)
+    return {
+        "workers": workers,
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / duration, 1),
+        "p50_ms": round(statistics.median(latencies), 2) if latencies else 0.0,
+        "p95_ms": round(_percentile(latencies, 0.95), 2),
+        "p99_ms": round(_percentile(latencies, 0.99), 2),
+    }
+
+
+def recommend_workers(results: List[Dict[str, float]]) -> int:
+    """
+    Smallest worker count whose throughput is within 10% of the best observed.
+    """
+
+    best = max(result["rps"] for result in results)
+    for result in sorted(results, key=lambda item: item["workers"]):
+        if result["rps"] >= best * RECOMMENDATION_THRESHOLD:
+            return int(result["workers"])
+    return int(results[-1]["workers"])
+
+
+def format_report(results: List[Dict[str, float]], recommended: int) -> str:
+    lines = [f"{'workers':>7} {'rps':>9} {'p50':>9} {'p95':>9} {'p99':>9} {'errors':>7}"]
+    for result in results:
+        lines.append(
+            f"{result['workers']:>7} {result['rps']:>9.1f} {result['p50_ms']:>7.1f}ms "
+            f"{result['p95_ms']:>7.1f}ms {result['p99_ms']:>7.1f}ms {result['errors']:>7}"
+        )
+    lines.append(f"Recommended AGENT_WORKERS={recommended} (host has {os.cpu_count()} CPUs)")
+    return "\n".join(lines)
+
+
+def main() -> None:
+    cpus = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description="Recommend a worker count for this host.")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        nargs="+",
+        default=sorted({1, 2, max(1, cpus // 2), cpus}),
+        help="Worker counts to compare",
+    )
+    parser.add_argument("--duration", type=float, default=15.0, help="Seconds per worker count")
+    parser.add_argument("--warmup", type=float, default=3.0, help="Unmeasured seconds first")
+    parser.add_argument("--concurrency", type=int, default=64, help="Concurrent requests")
+    parser.add_argument("--clients", type=int, default=max(1, min(4, cpus // 2)), help="Client processes")
+    parser.add_argument("--path", default=None, help="Endpoint to POST to (default: first agent)")
+    parser.add_argument("--body", default="{}", help="JSON request body")
+    parser.add_argument("--json", action="store_true", help="Emit machine-readable JSON")
+    args = parser.parse_args()
+
+    supabase_port = _free_port()
+    supabase_url = f"http://127.0.0.1:{supabase_port}"
+    fake_supabase = multiprocessing.get_context("spawn").Process(
+        target=run_fake_supabase, args=("127.0.0.1", supabase_port), daemon=True
+    )
+    fake_supabase.start()
+    try:
+        _wait_for_port(supabase_port, timeout=30.0)
+        results = [
+            run_worker_count(
+                workers,
+                supabase_url=supabase_url,
+                path=args.path,
+                body=args.body,
+                clients=args.clients,
+                concurrency=args.concurrency,
+                duration=args.duration,
+                warmup=args.warmup,
+            )
+            for workers in args.workers
+        ]
+    finally:
+        fake_supabase.terminate()
+        fake_supabase.join(timeout=10)
+
+    recommended = recommend_workers(results)
+    if args.json:
+        print(json.dumps({"results": results, "recommended_workers": recommended}, indent=2))
+    else:
+        print(format_report(results, recommended))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+"""
+Operator-only routes mounted under `/admin`.
+
+Access requires a valid Supabase session whose user id is listed in
+`AGENT_ADMIN_USER_IDS`; with no ids configured every admin route answers 403.
+"""
+
+import asyncio
+import logging
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.responses import FileResponse
+
+from .agent_reload import AgentReloadError
+from .auth import get_supabase_user_id
+from .config import ConfigError, get_config, reload_config
+from .memory import memory_report, stop_tracemalloc, tracemalloc_diff
+
+logger = logging.getLogger(__name__)
+
+
+def require_admin(request: Request) -> str:
+    """
+    FastAPI dependency that rejects callers who are not configured admins.
+    """
+
+    user_id = get_supabase_user_id()
+    admin_user_ids = request.app.state.admin_settings.admin_user_ids
+    if not user_id or user_id not in admin_user_ids:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin privileges required",
+        )
+    return user_id
+
+
+admin_router = APIRouter(
+    prefix="/admin",
+    dependencies=[Depends(require_admin)],
+    include_in_schema=False,
+)
+
+
+@admin_router.post("/agents/{slug}/reload")
+async def reload_agent(slug: str, request: Request, admin_user_id: str = Depends(require_admin)):
+    logger.info("Admin %s requested reload of agent '%s'", admin_user_id, slug)
+    try:
+        return await request.app.state.agent_reloader.reload(slug)
+    except LookupError as exc:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(exc)) from exc
+    except AgentReloadError as exc:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(exc)) from exc
+
+
+@admin_router.get("/sessions")
+async def session_stats(request: Request, top: int = 20):
+    """
+    This worker's session footprint, largest sessions and history compaction counters.
+    """
+
+    # Imported here so the gateway can start without loading ADK.
+    from .session_compaction import history_compaction_stats
+    from .session_service import get_session_service
+
+    stats = get_session_service(request.app).stats(top=top)
+    stats["backend"] = request.app.state.session_settings.backend
+    stats["history_compaction"] = history_compaction_stats()
+    return stats
+
+
+@admin_router.get("/memory")
+async def memory_stats(request: Request, top: int = 10, gc: bool = False):
+    """
+    This worker's approximate memory footprint by component; `gc` collects first.
+    """
+
+    from .session_service import get_session_service
+
+    report = memory_report(collect=gc)
+    report["sessions"] = get_session_service(request.app).stats(top=min(max(top, 0), 100))
+    return report
+
+
+@admin_router.post("/memory/tracemalloc")
+async def tracemalloc_snapshot(
+    top: int = 20,
+    group_by: str = "lineno",
+    frames: int = 1,
+    admin_user_id: str = Depends(require_admin),
+):
+    """
+    Snapshot this worker's Python heap and diff it against the previous snapshot.
+    """
+
+    if group_by not in ("lineno", "filename", "traceback"):
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="group_by must be one of: lineno, filename, traceback",
+        )
+    report = await asyncio.to_thread(
+        tracemalloc_diff, top=min(max(top, 1), 200), group_by=group_by, frames=min(max(frames, 1), 50)
+    )
+    if report["started"]:
+        logger.info("Admin %s started tracemalloc with %d frame(s)", admin_user_id, report["frames"])
+    return report
+
+
+@admin_router.delete("/memory/tracemalloc")
+async def stop_tracemalloc_tracing(admin_user_id: str = Depends(require_admin)):
+    """
+    Stop tracing allocations in this worker.
+    """
+
+    stopped = stop_tracemalloc()
+    if stopped:
+        logger.info("Admin %s stopped tracemalloc", admin_user_id)
+    return {"stopped": stopped}
+
+
+@admin_router.get("/admission")
+async def admission_stats(request: Request):
+    """
+    This worker's in-flight runs, wait queue depth, queue wait times and rejections.
+    """
+
+    return request.app.state.admission.snapshot()
+
+
+@admin_router.get("/loop")
+async def loop_stats(request: Request):
+    """
+    This worker's event-loop lag and its recent blocking calls, newest first.
+    """
+
+    monitor = request.app.state.loop_monitor
+    if not monitor.settings.enabled:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Event loop monitor is disabled")
+    return monitor.snapshot()
+
+
+@admin_router.get("/usage")
+async def usage_stats(request: Request, group_by: str = "user", hours: int = 24, top: int = 20):
+    """
+    Token usage of the heaviest users, agents or models over the last `hours`.
+    """
+
+    usage = getattr(request.app.state, "usage", None)
+    if usage is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Token usage ledger is disabled")
+    if group_by not in ("user", "agent", "model"):
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="group_by must be one of: user, agent, model",
+        )
+    await usage.flush()
+    hours = min(max(hours, 1), 24 * 400)
+    return {
+        "group_by": group_by,
+        "hours": hours,
+        "top": await usage.top(group_by, hours, min(max(top, 1), 500)),
+    }
+
+
+@admin_router.post("/profiles/arm")
+async def arm_profile(
+    request: Request,
+    agent: Optional[str] = None,
+    user_id: Optional[str] = None,
+    runs: int = 1,
+    ttl_seconds: float = 600.0,
+    admin_user_id: str = Depends(require_admin),
+):
+    """
+    Profile the next `runs` runs of `agent` (any agent if omitted) handled by this worker.
+    """
+
+    arm = request.app.state.request_profiler.arm(
+        agent=agent, user_id=user_id, runs=runs, ttl_seconds=ttl_seconds
+    )
+    logger.info("Admin %s armed profiling: %s", admin_user_id, arm)
+    return {"armed": request.app.state.request_profiler.armed()}
+
+
+@admin_router.post("/profiles/token")
+async def issue_profile_token(request: Request, ttl_seconds: float = 600.0):
+    """
+    Signed `X-Agent-Profile` header value; every worker honours it until it expires.
+    """
+
+    from .profiling import PROFILE_HEADER
+
+    try:
+        token = request.app.state.request_profiler.issue_token(ttl_seconds)
+    except LookupError as exc:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(exc)) from exc
+    return {"header": PROFILE_HEADER, "value": token}
+
+
+@admin_router.get("/profiles")
+async def list_profiles(request: Request):
+    profiler = request.app.state.request_profiler
+    return {"armed": profiler.armed(), "profiles": profiler.profiles()}
+
+
+@admin_router.get("/profiles/{profile_id}")
+async def download_profile(profile_id: str, request: Request):
+    """
+    Speedscope JSON for a stored profile (open it at https://www.speedscope.app).
+    """
+
+    path = request.app.state.request_profiler.profile_path(profile_id)
+    if path is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Unknown profile")
+    return FileResponse(path, media_type="application/json", filename=path.name)
+
+
+@admin_router.get("/config")
+async def config_snapshot():
+    """
+    Declared configuration variables of this worker's snapshot (names only, no values).
+    """
+
+    return get_config().describe()
+
+
+@admin_router.post("/config/reload")
+async def reload_configuration(admin_user_id: str = Depends(require_admin)):
+    """
+    Reload this worker's configuration; send SIGHUP to the launcher to reload all workers.
+
+    `restart_required` lists changed variables this worker keeps using the startup
+    value of until it restarts.
+    """
+
+    logger.info("Admin %s requested a configuration reload", admin_user_id)
+    try:
+        snapshot = reload_config()
+    except ConfigError as exc:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=exc.problems) from exc
+    return {
+        "version": snapshot.version,
+        "loaded_at": snapshot.loaded_at,
+        "restart_required": sorted(snapshot.restart_required),
+    }
+
+
+__all__ = ["admin_router", "require_admin"]
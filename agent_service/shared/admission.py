@@ -0,0 +1,284 @@
+"""
+Admission control for agent runs.
+
+Every POST to an agent mount path needs a slot before it reaches the agent. Slots
+are limited per user (from the Supabase auth context) and per agent, and are held
+until the run's response, including its SSE stream, has finished. Runs that do
+not fit wait in a bounded FIFO queue for up to the queue timeout. When the queue
+is full, the user already has too many runs waiting, or the deadline passes, the
+request gets an immediate `429` with a `Retry-After` header.
+
+Limits are per worker process.
+"""
+
+import asyncio
+import logging
+import math
+import time
+from collections import Counter, deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Deque, Dict, Optional
+
+from fastapi import status
+from fastapi.responses import JSONResponse
+from starlette.datastructures import State
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from .agent_routes import agent_slug_for_path
+from .auth import get_supabase_user_id
+from .settings import AdmissionSettings
+
+logger = logging.getLogger(__name__)
+
+ANONYMOUS_USER = "anonymous"
+
+_MAX_RETRY_AFTER_SECONDS = 60
+_RUN_TIME_SMOOTHING = 0.2
+_WAIT_SAMPLES = 1024
+
+
+class AdmissionRejected(Exception):
+    """
+    Raised when a run cannot be admitted; carries the reason and a retry hint.
+    """
+
+    def __init__(self, reason: str, retry_after: int) -> None:
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+@dataclass
+class _Waiter:
+    user_id: str
+    agent: str
+    future: asyncio.Future
+    granted: bool = False
+
+
+@dataclass
+class _AgentCounters:
+    admitted: int = 0
+    rejected: Counter = field(default_factory=Counter)
+    run_seconds: Optional[float] = None
+
+
+class AdmissionController:
+    """
+    Tracks in-flight runs and the wait queue for one worker.
+    """
+
+    def __init__(self, settings: AdmissionSettings) -> None:
+        self._settings = settings
+        self._user_in_flight: Counter = Counter()
+        self._agent_in_flight: Counter = Counter()
+        self._user_queued: Counter = Counter()
+        self._queue: Deque[_Waiter] = deque()
+        self._waits_ms: Deque[float] = deque(maxlen=_WAIT_SAMPLES)
+        self._agents: Dict[str, _AgentCounters] = {}
+
+    @property
+    def settings(self) -> AdmissionSettings:
+        return self._settings
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._queue)
+
+    @asynccontextmanager
+    async def admit(self, user_id: str, agent: str) -> AsyncIterator[float]:
+        """
+        Hold a run slot for the duration of the block; yields the queue wait in seconds.
+
+        Raises:
+            AdmissionRejected: No slot became available within the limits.
+        """
+
+        requested = time.monotonic()
+        await self._acquire(user_id, agent)
+        admitted = time.monotonic()
+        self._waits_ms.append((admitted - requested) * 1000)
+        self._counters(agent).admitted += 1
+        try:
+            yield admitted - requested
+        finally:
+            self._release(user_id, agent, time.monotonic() - admitted)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Current in-flight and queued runs, recent queue waits and rejection counts.
+        """
+
+        waits = sorted(self._waits_ms)
+        agents = set(self._agents) | set(self._agent_in_flight)
+        queued_by_agent = Counter(waiter.agent for waiter in self._queue)
+        return {
+            "limits": self._settings.dict(),
+            "in_flight": sum(self._agent_in_flight.values()),
+            "queue_depth": len(self._queue),
+            "queue_wait_ms": {
+                "samples": len(waits),
+                "p50": _percentile(waits, 0.5),
+                "p95": _percentile(waits, 0.95),
+                "max": round(waits[-1], 1) if waits else 0.0,
+            },
+            "agents": {
+                agent: {
+                    "in_flight": self._agent_in_flight.get(agent, 0),
+                    "queued": queued_by_agent.get(agent, 0),
+                    "admitted": self._counters(agent).admitted,
+                    "rejected": dict(self._counters(agent).rejected),
+                    "avg_run_seconds": _round(self._counters(agent).run_seconds),
+                }
+                for agent in sorted(agents)
+            },
+            "users_in_flight": len(self._user_in_flight),
+        }
+
+    async def _acquire(self, user_id: str, agent: str) -> None:
+        # Queued runs never fit (they are woken as soon as they do), so a run that
+        # fits now does not overtake anyone it competes with.
+        if self._fits(user_id, agent):
+            self._take(user_id, agent)
+            return
+
+        settings = self._settings
+        if len(self._queue) >= settings.queue_size or settings.queue_timeout_seconds <= 0:
+            self._reject(agent, "queue_full")
+        if settings.max_runs_per_user and self._user_queued[user_id] >= settings.max_runs_per_user:
+            self._reject(agent, "user_limit")
+
+        waiter = _Waiter(user_id, agent, asyncio.get_running_loop().create_future())
+        self._queue.append(waiter)
+        self._user_queued[user_id] += 1
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), settings.queue_timeout_seconds)
+        except asyncio.TimeoutError:
+            if not waiter.granted:
+                self._reject(agent, "queue_timeout")
+        except BaseException:
+            # Client went away while waiting; hand back a slot granted in the meantime.
+            if waiter.granted:
+                self._release(user_id, agent, None)
+            raise
+        finally:
+            self._dequeue(waiter)
+
+    def _fits(self, user_id: str, agent: str) -> bool:
+        settings = self._settings
+        if settings.max_runs_per_user and self._user_in_flight[user_id] >= settings.max_runs_per_user:
+            return False
+        if settings.max_runs_per_agent and self._agent_in_flight[agent] >= settings.max_runs_per_agent:
+            return False
+        return True
+
+    def _take(self, user_id: str, agent: str) -> None:
+        self._user_in_flight[user_id] += 1
+        self._agent_in_flight[agent] += 1
+
+    def _release(self, user_id: str, agent: str, run_seconds: Optional[float]) -> None:
+        self._user_in_flight[user_id] -= 1
+        if self._user_in_flight[user_id] <= 0:
+            del self._user_in_flight[user_id]
+        self._agent_in_flight[agent] -= 1
+        if self._agent_in_flight[agent] <= 0:
+            del self._agent_in_flight[agent]
+        if run_seconds is not None:
+            counters = self._counters(agent)
+            if counters.run_seconds is None:
+                counters.run_seconds = run_seconds
+            else:
+                counters.run_seconds += _RUN_TIME_SMOOTHING * (run_seconds - counters.run_seconds)
+        self._wake()
+
+    def _wake(self) -> None:
+        for waiter in list(self._queue):
+            if waiter.future.done() or not self._fits(waiter.user_id, waiter.agent):
+                continue
+            self._take(waiter.user_id, waiter.agent)
+            waiter.granted = True
+            waiter.future.set_result(None)
+            self._dequeue(waiter)
+
+    def _dequeue(self, waiter: _Waiter) -> None:
+        try:
+            self._queue.remove(waiter)
+        except ValueError:
+            return
+        self._user_queued[waiter.user_id] -= 1
+        if self._user_queued[waiter.user_id] <= 0:
+            del self._user_queued[waiter.user_id]
+
+    def _reject(self, agent: str, reason: str) -> None:
+        self._counters(agent).rejected[reason] += 1
+        raise AdmissionRejected(reason, self._retry_after(agent))
+
+    def _retry_after(self, agent: str) -> int:
+        run_seconds = self._counters(agent).run_seconds or 1.0
+        return max(1, min(_MAX_RETRY_AFTER_SECONDS, math.ceil(run_seconds)))
+
+    def _counters(self, agent: str) -> _AgentCounters:
+        counters = self._agents.get(agent)
+        if counters is None:
+            counters = self._agents[agent] = _AgentCounters()
+        return counters
+
+
+class AdmissionControlMiddleware:
+    """
+    ASGI middleware applying an `AdmissionController` to agent runs.
+
+    Must run inside `SupabaseAuthMiddleware` so the caller's user id is known.
+    Agent mount paths are read from `app.state.agent_registry`.
+    """
+
+    def __init__(self, app: ASGIApp, *, controller: AdmissionController, state: State) -> None:
+        self.app = app
+        self._controller = controller
+        self._state = state
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] != "POST":
+            await self.app(scope, receive, send)
+            return
+        agent = agent_slug_for_path(self._state.agent_registry, scope["path"])
+        if agent is None:
+            await self.app(scope, receive, send)
+            return
+
+        user_id = get_supabase_user_id() or ANONYMOUS_USER
+        try:
+            async with self._controller.admit(user_id, agent):
+                await self.app(scope, receive, send)
+        except AdmissionRejected as exc:
+            logger.warning(
+                "Rejected run for agent '%s' (user %s): %s; queue depth %d",
+                agent,
+                user_id,
+                exc.reason,
+                self._controller.queue_depth,
+            )
+            response = JSONResponse(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                content={"detail": "Too many concurrent agent runs", "reason": exc.reason},
+                headers={"Retry-After": str(exc.retry_after)},
+            )
+            await response(scope, receive, send)
+
+
+def _percentile(ordered, fraction: float) -> float:
+    if not ordered:
+        return 0.0
+    return round(ordered[min(len(ordered) - 1, int(len(ordered) * fraction))], 1)
+
+
+def _round(value: Optional[float]) -> Optional[float]:
+    return None if value is None else round(value, 2)
+
+
+__all__ = [
+    "AdmissionControlMiddleware",
+    "AdmissionController",
+    "AdmissionRejected",
+]
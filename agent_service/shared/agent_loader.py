@@ -1,19 +1,39 @@
+import ast
 import importlib.util
 import logging
+import os
 import re
+import time
+from dataclasses import replace
 from pathlib import Path
 from types import ModuleType
-from typing import Iterable, List, Optional, Sequence
+from typing import TYPE_CHECKING, Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
 
-from .types import AgentDescriptor, AgentRegistrar
+from .env import load_env_file
+from .types import AgentDescriptor, AgentMetadata, AgentRegistrar
+
+if TYPE_CHECKING:
+    from .agent_manifest import AgentManifest
+    from .startup_profiler import StartupProfiler
 
 logger = logging.getLogger(__name__)
 
 _DEFAULT_IGNORE: Sequence[str] = ("shared", "__pycache__")
 _SLUG_SAFE_PATTERN = re.compile(r"[^a-z0-9\-]")
+_STATIC_METADATA_ATTRIBUTES: Sequence[str] = (
+    "AGENT_ROUTE",
+    "AGENT_SLUG",
+    "AGENT_DISPLAY_NAME",
+)
+_UNRESOLVED = object()
 
 
-def discover_agents(root: Path, ignore: Iterable[str] = _DEFAULT_IGNORE) -> List[AgentDescriptor]:
+def discover_agents(
+    root: Path,
+    ignore: Iterable[str] = _DEFAULT_IGNORE,
+    *,
+    profiler: Optional["StartupProfiler"] = None,
+) -> List[AgentDescriptor]:
     """
     Locate agent modules within the given root directory.
 
@@ -23,9 +43,166 @@ def discover_agents(root: Path, ignore: Iterable[str] = _DEFAULT_IGNORE) -> List
         - register_agent(app: FastAPI, base_path: str)
     """
 
-    ignore_set = {entry.lower() for entry in ignore}
     descriptors: List[AgentDescriptor] = []
 
+    for directory, agent_module_path in iter_agent_modules(root, ignore):
+        descriptors.append(
+            load_agent_descriptor(
+                agent_module_path,
+                f"agents.{directory.name}",
+                fallback_slug=directory.name,
+                profiler=profiler,
+            )
+        )
+
+    if not descriptors:
+        logger.warning("No agents discovered under %s", root)
+
+    return descriptors
+
+
+def discover_agent_metadata(
+    root: Path,
+    ignore: Iterable[str] = _DEFAULT_IGNORE,
+    *,
+    manifest: Optional["AgentManifest"] = None,
+    profiler: Optional["StartupProfiler"] = None,
+) -> List[AgentMetadata]:
+    """
+    Describe agent modules without executing them, for lazy mounting.
+
+    A current entry in `manifest` is preferred. Otherwise the slug and display name
+    are read from module-level assignments that are either string literals or
+    `require_env`/`require_env_with_fallback`/`os.getenv` lookups with literal
+    variable names. Modules that cannot be described that way are executed as usual
+    and returned with a populated `descriptor`.
+    """
+
+    entries: List[AgentMetadata] = []
+
+    for directory, agent_module_path in iter_agent_modules(root, ignore):
+        package = f"agents.{directory.name}"
+        # Agent modules apply the nearest .env relative to themselves at import;
+        # mirror that so env-backed routes resolve identically.
+        load_env_file(directory)
+        metadata = manifest.lookup(agent_module_path) if manifest is not None else None
+        if metadata is None:
+            metadata = _read_static_metadata(agent_module_path, package, fallback_slug=directory.name)
+        if metadata is None:
+            logger.info(
+                "Agent module %s cannot be described statically; loading it eagerly.",
+                agent_module_path,
+            )
+            descriptor = load_agent_descriptor(
+                agent_module_path,
+                package,
+                fallback_slug=directory.name,
+                profiler=profiler,
+            )
+            metadata = AgentMetadata(
+                slug=descriptor.slug,
+                display_name=descriptor.display_name,
+                module_path=agent_module_path,
+                package=package,
+                descriptor=descriptor,
+            )
+        entries.append(metadata)
+
+    if not entries:
+        logger.warning("No agents discovered under %s", root)
+
+    return entries
+
+
+def load_agent_descriptor(
+    agent_path: Path,
+    package: str,
+    *,
+    fallback_slug: str,
+    profiler: Optional["StartupProfiler"] = None,
+) -> AgentDescriptor:
+    """
+    Execute a single agent module and build its descriptor.
+
+    When a profiler is supplied, the module's top-level imports are timed one by one
+    before the module itself executes, and the remaining execution time is recorded
+    as the agent's import phase.
+    """
+
+    if profiler is not None:
+        profiler.profile_dependencies(fallback_slug, read_top_level_imports(agent_path))
+
+    started = time.perf_counter()
+    module = _load_module(agent_path, package=package)
+    descriptor = replace(
+        _build_descriptor(module=module, fallback_slug=fallback_slug),
+        module_path=agent_path,
+        package=package,
+    )
+    if profiler is not None:
+        profiler.record_agent_phase(
+            descriptor.slug,
+            "import",
+            (time.perf_counter() - started) * 1000,
+        )
+    return descriptor
+
+
+def read_static_env_dependencies(agent_path: Path) -> List[str]:
+    """
+    Return the environment variables that an agent's route/display name depend on.
+    """
+
+    tree = _parse_module(agent_path)
+    if tree is None:
+        return []
+
+    names: List[str] = []
+    for node in tree.body:
+        if not isinstance(node, ast.Assign) or len(node.targets) != 1:
+            continue
+        target = node.targets[0]
+        if not (isinstance(target, ast.Name) and target.id in _STATIC_METADATA_ATTRIBUTES):
+            continue
+        if isinstance(node.value, ast.Call):
+            for arg in node.value.args:
+                if isinstance(arg, ast.Constant) and isinstance(arg.value, str) and arg.value not in names:
+                    names.append(arg.value)
+    return names
+
+
+def read_top_level_imports(agent_path: Path) -> List[str]:
+    """
+    Return the absolute module names imported at the top level of an agent module.
+    """
+
+    tree = _parse_module(agent_path)
+    if tree is None:
+        return []
+
+    modules: List[str] = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            candidates = [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            candidates = [node.module]
+        else:
+            continue
+        for candidate in candidates:
+            if candidate not in modules:
+                modules.append(candidate)
+    return modules
+
+
+def iter_agent_modules(
+    root: Path, ignore: Iterable[str] = _DEFAULT_IGNORE
+) -> Iterator[Tuple[Path, Path]]:
+    """
+    Yield `(agent_directory, agent_module_path)` pairs under the agent root.
+    """
+
+    ignore_set = {entry.lower() for entry in ignore}
+
     if not root.exists() or not root.is_dir():
         raise RuntimeError(f"Agent root directory does not exist: {root}")
 
@@ -39,13 +216,7 @@ def discover_agents(root: Path, ignore: Iterable[str] = _DEFAULT_IGNORE) -> List
         if not agent_module_path.exists():
             continue
 
-        module = _load_module(agent_module_path, package=f"agents.{entry.name}")
-        descriptors.append(_build_descriptor(module=module, fallback_slug=entry.name))
-
-    if not descriptors:
-        logger.warning("No agents discovered under %s", root)
-
-    return descriptors
+        yield entry, agent_module_path
 
 
 def _load_module(agent_path: Path, package: str) -> ModuleType:
@@ -72,6 +243,72 @@ def _build_descriptor(module: ModuleType, fallback_slug: str) -> AgentDescriptor
     return AgentDescriptor(slug=slug, registrar=registrar, display_name=display_name)
 
 
+def _parse_module(agent_path: Path) -> Optional[ast.Module]:
+    try:
+        return ast.parse(agent_path.read_text(encoding="utf-8"), filename=str(agent_path))
+    except (OSError, SyntaxError):
+        return None
+
+
+def _read_static_metadata(
+    agent_path: Path, package: str, *, fallback_slug: str
+) -> Optional[AgentMetadata]:
+    tree = _parse_module(agent_path)
+    if tree is None:
+        return None
+
+    if not any(
+        isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) and node.name == "register_agent"
+        for node in tree.body
+    ):
+        return None
+
+    values: Dict[str, Any] = {}
+    for node in tree.body:
+        if not isinstance(node, ast.Assign) or len(node.targets) != 1:
+            continue
+        target = node.targets[0]
+        if isinstance(target, ast.Name) and target.id in _STATIC_METADATA_ATTRIBUTES:
+            values[target.id] = _resolve_static_value(node.value)
+
+    if any(value is _UNRESOLVED for value in values.values()):
+        return None
+
+    slug = _sanitize_slug(values.get("AGENT_ROUTE") or values.get("AGENT_SLUG") or fallback_slug)
+    return AgentMetadata(
+        slug=slug,
+        display_name=values.get("AGENT_DISPLAY_NAME") or slug,
+        module_path=agent_path,
+        package=package,
+    )
+
+
+def _resolve_static_value(node: ast.expr) -> Any:
+    if isinstance(node, ast.Constant) and isinstance(node.value, str):
+        return node.value
+    if not isinstance(node, ast.Call):
+        return _UNRESOLVED
+
+    func = node.func
+    func_name = func.id if isinstance(func, ast.Name) else getattr(func, "attr", None)
+    names = [
+        arg.value
+        for arg in node.args
+        if isinstance(arg, ast.Constant) and isinstance(arg.value, str)
+    ]
+    if len(names) != len(node.args) or not names:
+        return _UNRESOLVED
+
+    if func_name == "require_env":
+        return os.getenv(names[0]) or _UNRESOLVED
+    if func_name == "require_env_with_fallback" and len(names) >= 2:
+        return os.getenv(names[0]) or os.getenv(names[1]) or _UNRESOLVED
+    if func_name == "getenv":
+        default = names[1] if len(names) > 1 else None
+        return os.getenv(names[0], default)
+    return _UNRESOLVED
+
+
 def _sanitize_slug(raw_slug: str) -> str:
     normalized = raw_slug.strip().lower().replace("_", "-")
     normalized = _SLUG_SAFE_PATTERN.sub("-", normalized)
@@ -0,0 +1,216 @@
+"""
+Generated agent manifest that lets the loader describe agents without executing them.
+
+The manifest records each agent's slug, display name and module path together with
+the module's mtime, size and SHA-256 digest and the values of the environment
+variables its route/display name were resolved from. An entry is only trusted while
+the file and those variables are unchanged.
+
+Regenerate it after adding or editing agents:
+
+    python -m shared.agent_manifest
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from dotenv import load_dotenv
+
+from .agent_loader import (
+    iter_agent_modules,
+    load_agent_descriptor,
+    read_static_env_dependencies,
+)
+from .types import AgentMetadata
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILENAME = ".agent_manifest.json"
+_MANIFEST_VERSION = 1
+
+
+@dataclass(frozen=True)
+class AgentManifestEntry:
+    """
+    Manifest record for a single agent module.
+    """
+
+    slug: str
+    display_name: str
+    module_path: str
+    package: str
+    mtime_ns: int
+    size: int
+    sha256: str
+    env: Dict[str, Optional[str]]
+
+
+class AgentManifest:
+    """
+    Read-side view of a generated manifest, validating entries on lookup.
+    """
+
+    def __init__(self, root: Path, entries: Iterable[AgentManifestEntry]) -> None:
+        self._root = root
+        self._entries: Dict[str, AgentManifestEntry] = {
+            entry.module_path: entry for entry in entries
+        }
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def lookup(self, agent_path: Path) -> Optional[AgentMetadata]:
+        """
+        Return metadata for the module if its manifest entry is still current.
+        """
+
+        entry = self._entries.get(_relative_module_path(self._root, agent_path))
+        if entry is None:
+            return None
+        if not _entry_is_current(entry, agent_path):
+            logger.info("Agent manifest entry for %s is stale; ignoring it.", agent_path)
+            return None
+        return AgentMetadata(
+            slug=entry.slug,
+            display_name=entry.display_name,
+            module_path=agent_path,
+            package=entry.package,
+        )
+
+
+def default_manifest_path(agents_root: Path) -> Path:
+    return agents_root / MANIFEST_FILENAME
+
+
+def load_agent_manifest(agents_root: Path, path: Optional[Path] = None) -> Optional[AgentManifest]:
+    """
+    Load the manifest for `agents_root`, returning None when it is missing or unreadable.
+    """
+
+    manifest_path = path or default_manifest_path(agents_root)
+    if not manifest_path.is_file():
+        return None
+
+    try:
+        payload = json.loads(manifest_path.read_text(encoding="utf-8"))
+        if payload.get("version") != _MANIFEST_VERSION:
+            logger.warning("Ignoring agent manifest %s with unsupported version", manifest_path)
+            return None
+        entries = [AgentManifestEntry(**raw) for raw in payload.get("agents", [])]
+    except (OSError, ValueError, TypeError) as exc:
+        logger.warning("Ignoring unreadable agent manifest %s: %s", manifest_path, exc)
+        return None
+
+    return AgentManifest(agents_root, entries)
+
+
+def build_agent_manifest(agents_root: Path) -> List[AgentManifestEntry]:
+    """
+    Execute every agent module once and capture its metadata as manifest entries.
+    """
+
+    entries: List[AgentManifestEntry] = []
+    for directory, agent_module_path in iter_agent_modules(agents_root):
+        package = f"agents.{directory.name}"
+        descriptor = load_agent_descriptor(
+            agent_module_path,
+            package,
+            fallback_slug=directory.name,
+        )
+        stat = agent_module_path.stat()
+        entries.append(
+            AgentManifestEntry(
+                slug=descriptor.slug,
+                display_name=descriptor.display_name,
+                module_path=_relative_module_path(agents_root, agent_module_path),
+                package=package,
+                mtime_ns=stat.st_mtime_ns,
+                size=stat.st_size,
+                sha256=_file_digest(agent_module_path),
+                env={
+                    name: os.getenv(name)
+                    for name in read_static_env_dependencies(agent_module_path)
+                },
+            )
+        )
+    return entries
+
+
+def write_agent_manifest(agents_root: Path, path: Optional[Path] = None) -> Path:
+    """
+    Build the manifest for `agents_root` and write it atomically.
+    """
+
+    manifest_path = path or default_manifest_path(agents_root)
+    payload = {
+        "version": _MANIFEST_VERSION,
+        "agents": [asdict(entry) for entry in build_agent_manifest(agents_root)],
+    }
+    temp_path = manifest_path.with_suffix(f"{manifest_path.suffix}.tmp")
+    temp_path.write_text(json.dumps(payload, indent=2) + "\n", encoding="utf-8")
+    os.replace(temp_path, manifest_path)
+    logger.info("Wrote agent manifest with %d agent(s) to %s", len(payload["agents"]), manifest_path)
+    return manifest_path
+
+
+def _entry_is_current(entry: AgentManifestEntry, agent_path: Path) -> bool:
+    try:
+        stat = agent_path.stat()
+    except OSError:
+        return False
+
+    if stat.st_size != entry.size:
+        return False
+    # mtime is the cheap check; fall back to the digest when a checkout or copy
+    # touched the file without changing it.
+    if stat.st_mtime_ns != entry.mtime_ns and _file_digest(agent_path) != entry.sha256:
+        return False
+
+    return all(os.getenv(name) == value for name, value in entry.env.items())
+
+
+def _file_digest(path: Path) -> str:
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+
+def _relative_module_path(agents_root: Path, agent_path: Path) -> str:
+    try:
+        return agent_path.resolve().relative_to(agents_root.resolve()).as_posix()
+    except ValueError:
+        return agent_path.resolve().as_posix()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Generate the agent manifest.")
+    parser.add_argument(
+        "--agents-root",
+        type=Path,
+        default=Path(__file__).resolve().parent.parent / "agents",
+        help="Directory containing agent packages.",
+    )
+    parser.add_argument("--output", type=Path, default=None, help="Manifest path.")
+    args = parser.parse_args(argv)
+
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO)
+    write_agent_manifest(args.agents_root, args.output)
+
+
+__all__ = [
+    "AgentManifest",
+    "AgentManifestEntry",
+    "build_agent_manifest",
+    "default_manifest_path",
+    "load_agent_manifest",
+    "write_agent_manifest",
+]
+
+
+if __name__ == "__main__":
+    main()
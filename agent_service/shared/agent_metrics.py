@@ -0,0 +1,173 @@
+"""
+ADK callbacks feeding the model and tool metrics in `shared.metrics`.
+
+Attach them alongside an agent's own callbacks (ADK accepts lists):
+
+    before_model_callback=[history_compactor.before_model_callback, record_model_request],
+    after_model_callback=record_model_response,
+    before_tool_callback=record_tool_start,
+    after_tool_callback=[record_tool_response, normalize_mcp_tool_response_payload],
+
+Model metrics go last in `before_model_callback` so the timings cover only the
+model call. Tool metrics go first in `after_tool_callback` so the payload size is
+measured before normalization. Every callback returns None and never alters the
+request or response. The request callbacks also bind the invocation id to the
+log context (`shared.logging_setup`).
+
+Tool payloads are sized from their text: strings, bytes and the text blocks of
+MCP results are measured exactly. Other structured responses are serialized for
+one call in `_PAYLOAD_SAMPLE_EVERY` only.
+"""
+
+import contextvars
+import itertools
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+from google.adk.tools.base_tool import BaseTool
+from google.adk.tools.tool_context import ToolContext
+
+from .logging_setup import bind_log_context
+from .memory import register_memory_component
+from .metrics import (
+    LLM_REQUEST_SECONDS,
+    LLM_TIME_TO_FIRST_TOKEN_SECONDS,
+    TOOL_CALL_SECONDS,
+    TOOL_PAYLOAD_BYTES,
+)
+
+# Tool calls whose completion was never observed (errors, cancelled runs) are
+# dropped oldest-first once this many are pending.
+_MAX_PENDING = 1024
+_PAYLOAD_SAMPLE_EVERY = 16
+
+
+class _ModelCall:
+    __slots__ = ("model", "started", "first_chunk_seen")
+
+    def __init__(self, model: str, started: float) -> None:
+        self.model = model
+        self.started = started
+        self.first_chunk_seen = False
+
+
+# ADK runs the before/after model callbacks of one call in the same task, and a
+# model call never overlaps another in that task (tools, including agent tools,
+# run after the response is complete).
+_model_call: "contextvars.ContextVar[Optional[_ModelCall]]" = contextvars.ContextVar(
+    "agent_metrics_model_call", default=None
+)
+_tool_calls: "OrderedDict[Tuple[str, str], float]" = OrderedDict()
+_structured_payloads = itertools.count()
+
+
+def record_model_request(
+    callback_context: CallbackContext, llm_request: LlmRequest
+) -> Optional[LlmResponse]:
+    bind_log_context(invocation_id=callback_context.invocation_id)
+    _model_call.set(_ModelCall(llm_request.model or "unknown", time.perf_counter()))
+    return None
+
+
+def record_model_response(
+    callback_context: CallbackContext, llm_response: LlmResponse
+) -> Optional[LlmResponse]:
+    call = _model_call.get()
+    if call is None:
+        return None
+
+    elapsed = time.perf_counter() - call.started
+    if not call.first_chunk_seen:
+        call.first_chunk_seen = True
+        LLM_TIME_TO_FIRST_TOKEN_SECONDS.labels(callback_context.agent_name, call.model).observe(
+            elapsed
+        )
+    if not llm_response.partial:
+        _model_call.set(None)
+        LLM_REQUEST_SECONDS.labels(callback_context.agent_name, call.model).observe(elapsed)
+    return None
+
+
+def record_tool_start(
+    tool: BaseTool, args: Dict[str, Any], tool_context: ToolContext
+) -> Optional[Dict[str, Any]]:
+    bind_log_context(invocation_id=tool_context.invocation_id)
+    _remember(_tool_calls, _tool_key(tool_context), time.perf_counter())
+    return None
+
+
+def record_tool_response(
+    tool: BaseTool,
+    args: Dict[str, Any],
+    tool_context: ToolContext,
+    tool_response: Any,
+) -> Optional[Dict[str, Any]]:
+    started = _tool_calls.pop(_tool_key(tool_context), None)
+    if started is not None:
+        TOOL_CALL_SECONDS.labels(tool_context.agent_name, tool.name).observe(
+            time.perf_counter() - started
+        )
+    size = _payload_bytes(tool_response)
+    if size is not None:
+        TOOL_PAYLOAD_BYTES.labels(tool_context.agent_name, tool.name).observe(size)
+    return None
+
+
+def _tool_key(tool_context: ToolContext) -> Tuple[str, str]:
+    return (tool_context.invocation_id, tool_context.function_call_id or "")
+
+
+def _remember(pending: OrderedDict, key: Any, value: Any) -> None:
+    pending[key] = value
+    while len(pending) > _MAX_PENDING:
+        pending.popitem(last=False)
+
+
+def _payload_bytes(payload: Any) -> Optional[int]:
+    """
+    Size of a tool response, or None when this structured response is not sampled.
+    """
+
+    if isinstance(payload, (str, bytes)):
+        return len(payload)
+    text_bytes = _text_block_bytes(payload)
+    if text_bytes is not None:
+        return text_bytes
+    if next(_structured_payloads) % _PAYLOAD_SAMPLE_EVERY:
+        return None
+    try:
+        return len(json.dumps(payload, default=str, separators=(",", ":")))
+    except (TypeError, ValueError):
+        return len(str(payload))
+
+
+def _text_block_bytes(payload: Any) -> Optional[int]:
+    # MCP results (`CallToolResult` or its dict form) carry their data as text blocks.
+    if isinstance(payload, dict):
+        content = payload.get("content")
+    else:
+        content = getattr(payload, "content", None)
+    if not isinstance(content, list) or not content:
+        return None
+    total = 0
+    for block in content:
+        text = block.get("text") if isinstance(block, dict) else getattr(block, "text", None)
+        if not isinstance(text, str):
+            return None
+        total += len(text)
+    return total
+
+
+register_memory_component("agent_metrics", lambda: {"pending_tool_calls": len(_tool_calls)})
+
+__all__ = [
+    "record_model_request",
+    "record_model_response",
+    "record_tool_response",
+    "record_tool_start",
+]
@@ -0,0 +1,58 @@
+"""
+Gateway-managed keyword arguments for each agent's `ADKAgent`.
+"""
+
+from typing import Any, Dict
+
+from ag_ui_adk.session_manager import SessionManager
+from fastapi import FastAPI
+
+from .memory import register_memory_component
+from .session_service import get_session_service
+
+
+def adk_agent_options(app: FastAPI) -> Dict[str, Any]:
+    """
+    Keyword arguments every agent passes as `ADKAgent(..., **adk_agent_options(app))`.
+
+    They cover the shared session service, the idle-session TTL, and a concurrency
+    cap matching the gateway's per-agent admission limit, so both layers agree on
+    how many runs an agent may execute at once. Without an admission limit the
+    cap is left to ag_ui_adk (10 concurrent executions).
+    """
+
+    session_settings = app.state.session_settings
+    max_runs = app.state.admission_settings.max_runs_per_agent
+    options: Dict[str, Any] = {
+        "session_service": get_session_service(app),
+        "session_timeout_seconds": session_settings.idle_ttl_seconds,
+        "cleanup_interval_seconds": session_settings.cleanup_interval_seconds,
+    }
+    if max_runs:
+        options["max_concurrent_executions"] = max_runs
+    return options
+
+
+def _session_tracking() -> Dict[str, Any]:
+    """
+    Sizes of ag_ui_adk's per-session bookkeeping (one manager per process).
+    """
+
+    manager = getattr(SessionManager, "_instance", None)
+    if manager is None:
+        return {}
+    # Only the session count is public; the rest is read defensively so an
+    # ag_ui_adk upgrade drops fields from the report instead of breaking it.
+    report: Dict[str, Any] = {"tracked_sessions": manager.get_session_count()}
+    user_sessions = getattr(manager, "_user_sessions", None)
+    if user_sessions is not None:
+        report["users"] = len(user_sessions)
+    processed = getattr(manager, "_processed_message_ids", None)
+    if processed is not None:
+        report["processed_message_ids"] = sum(len(ids) for ids in list(processed.values()))
+    return report
+
+
+register_memory_component("ag_ui_adk", _session_tracking)
+
+__all__ = ["adk_agent_options"]
@@ -0,0 +1,200 @@
+"""
+Hot reload of individual agents without restarting the gateway.
+"""
+
+import asyncio
+import logging
+import sys
+import time
+from contextlib import asynccontextmanager, suppress
+from typing import TYPE_CHECKING, Any, AsyncIterator, Dict, Optional
+
+from fastapi import FastAPI
+
+from .agent_loader import load_agent_descriptor
+from .agent_routes import AgentRoute, build_agent_router, owns_route
+from .lazy_agents import LazyAgentRoute
+from .types import AgentMetadata
+
+if TYPE_CHECKING:
+    from .startup_profiler import StartupProfiler
+
+logger = logging.getLogger(__name__)
+
+
+class AgentReloadError(RuntimeError):
+    """
+    Raised when a reloaded agent module cannot replace the running version.
+    """
+
+
+class AgentReloader:
+    """
+    Re-executes a single agent module and swaps it in under its mount path.
+
+    The new module is executed off the event loop and registered against a private
+    router. The agent's `AgentRoute` then switches to it in one step, and its
+    `app.state.agent_registry` entry is replaced. Requests and SSE streams already
+    running keep using the previous version until they finish. Agents mounted
+    eagerly have their routes replaced by an `AgentRoute` on their first reload.
+    """
+
+    def __init__(
+        self,
+        app: FastAPI,
+        *,
+        profiler: Optional["StartupProfiler"] = None,
+    ) -> None:
+        self._app = app
+        self._profiler = profiler
+        self._sources: Dict[str, AgentMetadata] = {}
+        self._mtimes: Dict[str, Optional[int]] = {}
+        self._lock = asyncio.Lock()
+
+    def track(self, metadata: AgentMetadata) -> None:
+        """
+        Remember where an agent mounted under `metadata.slug` was loaded from.
+        """
+
+        self._sources[metadata.slug] = metadata
+        self._mtimes[metadata.slug] = _module_mtime(metadata)
+
+    async def reload(self, slug: str) -> Dict[str, Any]:
+        """
+        Reload the agent mounted under `slug` and return a summary of the swap.
+
+        Raises:
+            LookupError: No agent with that slug is mounted.
+            AgentReloadError: The module changed its route or failed to load.
+        """
+
+        metadata = self._sources.get(slug)
+        if metadata is None:
+            raise LookupError(f"No agent is mounted with slug '{slug}'")
+
+        mount_path = self._mount_path(slug)
+        async with self._lock:
+            self._mtimes[slug] = _module_mtime(metadata)
+            route = self._find_agent_route(mount_path)
+            if isinstance(route, LazyAgentRoute) and not route.loaded:
+                # The first request will execute the current source anyway.
+                return {"slug": slug, "path": mount_path, "status": "not_loaded"}
+
+            started = time.perf_counter()
+            try:
+                descriptor = await asyncio.to_thread(
+                    load_agent_descriptor,
+                    metadata.module_path,
+                    metadata.package,
+                    fallback_slug=metadata.module_path.parent.name,
+                    profiler=self._profiler,
+                )
+                router = build_agent_router(descriptor, mount_path, self._app.state)
+            except Exception as exc:
+                logger.exception("Failed to reload agent '%s'", slug)
+                raise AgentReloadError(f"Agent '{slug}' failed to reload: {exc}") from exc
+
+            if descriptor.slug != slug:
+                raise AgentReloadError(
+                    f"Agent '{slug}' now declares route '{descriptor.slug}'; "
+                    "changing an agent's route requires a restart."
+                )
+
+            if route is None:
+                route = self._adopt_eager_routes(mount_path, router)
+                version = route.version
+            else:
+                version = route.swap(router)
+            self._replace_registry_entry(slug, descriptor.display_name, mount_path)
+            self._app.openapi_schema = None
+            # A reload is how operators pick up changed Composio MCP configs.
+            composio_mcp = sys.modules.get(f"{__package__}.composio_mcp")
+            if composio_mcp is not None:
+                composio_mcp.invalidate_tool_schemas()
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        draining = route.in_flight() - route.in_flight(version)
+        logger.info(
+            "Reloaded agent '%s' at %s as version %d in %.1f ms (%d request(s) draining)",
+            descriptor.display_name,
+            mount_path,
+            version,
+            elapsed_ms,
+            draining,
+        )
+        return {
+            "slug": slug,
+            "path": mount_path,
+            "status": "reloaded",
+            "version": version,
+            "reload_ms": round(elapsed_ms, 1),
+            "draining": draining,
+        }
+
+    @asynccontextmanager
+    async def watching(self, interval: float) -> AsyncIterator[None]:
+        """
+        Poll tracked agent modules and reload any whose file changed.
+        """
+
+        task = asyncio.create_task(self._watch(interval))
+        logger.info("Watching %d agent module(s) for changes every %.1fs", len(self._sources), interval)
+        try:
+            yield
+        finally:
+            task.cancel()
+            with suppress(asyncio.CancelledError):
+                await task
+
+    async def _watch(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            for slug, metadata in list(self._sources.items()):
+                if _module_mtime(metadata) == self._mtimes.get(slug):
+                    continue
+                logger.info("Detected change in %s", metadata.module_path)
+                try:
+                    await self.reload(slug)
+                except AgentReloadError:
+                    # Already logged; keep serving the previous version.
+                    continue
+
+    def _mount_path(self, slug: str) -> str:
+        for entry in self._app.state.agent_registry:
+            if entry["slug"] == slug:
+                return entry["path"]
+        raise LookupError(f"No agent is mounted with slug '{slug}'")
+
+    def _find_agent_route(self, mount_path: str) -> Optional[AgentRoute]:
+        for route in self._app.router.routes:
+            if isinstance(route, AgentRoute) and route.path == mount_path:
+                return route
+        return None
+
+    def _adopt_eager_routes(self, mount_path: str, router) -> AgentRoute:
+        agent_route = AgentRoute(mount_path, router)
+        routes = self._app.router.routes
+        owned = [index for index, route in enumerate(routes) if owns_route(route, mount_path)]
+        remaining = [route for route in routes if not owns_route(route, mount_path)]
+        insert_at = owned[0] if owned else len(remaining)
+        remaining.insert(insert_at, agent_route)
+        # Single slice assignment so no request observes a partially swapped table.
+        routes[:] = remaining
+        return agent_route
+
+    def _replace_registry_entry(self, slug: str, display_name: str, mount_path: str) -> None:
+        registry = self._app.state.agent_registry
+        for index, entry in enumerate(registry):
+            if entry["slug"] == slug:
+                registry[index] = {"slug": slug, "display_name": display_name, "path": mount_path}
+                return
+
+
+def _module_mtime(metadata: AgentMetadata) -> Optional[int]:
+    try:
+        return metadata.module_path.stat().st_mtime_ns
+    except OSError:
+        return None
+
+
+__all__ = ["AgentReloadError", "AgentReloader"]
@@ -0,0 +1,135 @@
+"""
+Swappable per-agent routes used for lazy mounting and hot reload.
+"""
+
+import logging
+from collections import defaultdict
+from typing import Any, Dict, Iterable, Mapping, Optional, Tuple
+
+from fastapi import FastAPI
+from starlette.datastructures import State
+from starlette.routing import BaseRoute, Match, NoMatchFound, Router
+from starlette.types import Receive, Scope, Send
+
+from .types import AgentDescriptor
+
+logger = logging.getLogger(__name__)
+
+
+class AgentRoute(BaseRoute):
+    """
+    Route that owns everything under `mount_path` for a single agent.
+
+    Requests are dispatched to a private router holding the agent's endpoints.
+    `swap()` replaces that router atomically: new requests use the new version while
+    requests already dispatched (including open SSE streams) finish on the old one.
+    """
+
+    def __init__(self, mount_path: str, router: Optional[Router] = None) -> None:
+        self.path = mount_path
+        self._router = router
+        self._version = 0 if router is None else 1
+        self._in_flight: Dict[int, int] = defaultdict(int)
+
+    @property
+    def loaded(self) -> bool:
+        return self._router is not None
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def in_flight(self, version: Optional[int] = None) -> int:
+        """
+        Number of requests currently being served, optionally for one version only.
+        """
+
+        if version is not None:
+            return self._in_flight.get(version, 0)
+        return sum(self._in_flight.values())
+
+    def swap(self, router: Router) -> int:
+        """
+        Install a new router and return its version number.
+        """
+
+        previous_version = self._version
+        self._router = router
+        self._version += 1
+        if previous_version and self._in_flight.get(previous_version, 0) == 0:
+            self._in_flight.pop(previous_version, None)
+        return self._version
+
+    def matches(self, scope: Scope) -> Tuple[Match, Dict[str, Any]]:
+        if scope["type"] not in ("http", "websocket"):
+            return Match.NONE, {}
+        path = scope["path"]
+        if path == self.path or path.startswith(f"{self.path}/"):
+            return Match.FULL, {}
+        return Match.NONE, {}
+
+    def url_path_for(self, name: str, /, **path_params: Any):
+        raise NoMatchFound(name, path_params)
+
+    async def handle(self, scope: Scope, receive: Receive, send: Send) -> None:
+        router = await self._resolve_router(scope, receive, send)
+        if router is None:
+            return
+
+        version = self._version
+        self._in_flight[version] += 1
+        try:
+            await router(scope, receive, send)
+        finally:
+            self._in_flight[version] -= 1
+            if version != self._version and self._in_flight[version] == 0:
+                del self._in_flight[version]
+                logger.info("Drained agent %s version %d", self.path, version)
+
+    async def _resolve_router(
+        self, scope: Scope, receive: Receive, send: Send
+    ) -> Optional[Router]:
+        return self._router
+
+
+def build_agent_router(
+    descriptor: AgentDescriptor,
+    mount_path: str,
+    state: Optional[State] = None,
+) -> Router:
+    """
+    Run an agent's `register_agent` hook against a private router.
+
+    `state` is the gateway's `app.state`, shared so registrars can reach gateway-wide
+    services (e.g. the session service) exactly as they do when mounted eagerly.
+    """
+
+    agent_app = FastAPI()
+    if state is not None:
+        agent_app.state = state
+    descriptor.registrar(agent_app, mount_path)
+    return agent_app.router
+
+
+def owns_route(route: BaseRoute, mount_path: str) -> bool:
+    """
+    Whether a route registered on the app serves a path under `mount_path`.
+    """
+
+    path = getattr(route, "path", None)
+    return isinstance(path, str) and (path == mount_path or path.startswith(f"{mount_path}/"))
+
+
+def agent_slug_for_path(registry: Iterable[Mapping[str, Any]], path: str) -> Optional[str]:
+    """
+    Slug of the `app.state.agent_registry` entry whose mount path serves `path`.
+    """
+
+    for entry in registry:
+        mount_path = entry["path"]
+        if path == mount_path or path.startswith(f"{mount_path}/"):
+            return entry["slug"]
+    return None
+
+
+__all__ = ["AgentRoute", "agent_slug_for_path", "build_agent_router", "owns_route"]
@@ -1,12 +1,63 @@
+import asyncio
 import logging
+import sys
+import time
+from contextlib import AsyncExitStack, asynccontextmanager
 from pathlib import Path
-from typing import Optional
+from typing import AsyncContextManager, AsyncIterator, Callable, Optional
 
-from fastapi import FastAPI
+import httpx
+from fastapi import FastAPI, HTTPException, status
+from fastapi.responses import JSONResponse
 
-from .agent_loader import discover_agents
-from .auth import SupabaseAuthMiddleware
-from .settings import load_supabase_auth_settings
+from .admin import admin_router
+from .admission import AdmissionControlMiddleware, AdmissionController
+from .agent_loader import discover_agent_metadata, discover_agents
+from .agent_manifest import AgentManifest, load_agent_manifest
+from .agent_reload import AgentReloader
+from .auth import SupabaseAuthMiddleware, get_supabase_user_id
+from .config import get_config, reloading_on_sighup
+from .jobs import JobManager, JobStore, jobs_router
+from .lazy_agents import LazyAgentRoute
+from .logging_setup import LogContextMiddleware
+from .loop_monitor import LoopMonitor
+from .metrics import SSEStreamMetricsMiddleware, metrics_endpoint
+from .profiling import RequestProfiler, RequestProfilingMiddleware
+from .run_coalescing import RunCoalescer, RunCoalescingMiddleware
+from .settings import (
+    AdmissionSettings,
+    JobSettings,
+    LoopMonitorSettings,
+    MetricsSettings,
+    ProfilingSettings,
+    RunCoalescingSettings,
+    SessionServiceSettings,
+    StreamingSettings,
+    TracingSettings,
+    UsageSettings,
+    WarmupSettings,
+    load_admin_settings,
+    load_admission_settings,
+    load_job_settings,
+    load_loop_monitor_settings,
+    load_metrics_settings,
+    load_profiling_settings,
+    load_run_coalescing_settings,
+    load_session_service_settings,
+    load_streaming_settings,
+    load_supabase_auth_settings,
+    load_tracing_settings,
+    load_usage_settings,
+    load_warmup_settings,
+)
+from .sse_streaming import SSEStreamingMiddleware
+from .startup_profiler import StartupProfiler
+from .tracing import RequestTracingMiddleware, configure_tracing, shutdown_tracing
+from .types import AgentDescriptor, AgentMetadata
+from .usage import UsageLedger, UsageQuotaMiddleware, usage_router
+from .warmup import StartupWarmup, warming_up
+
+LifespanHook = Callable[[FastAPI], AsyncContextManager[None]]
 
 logger = logging.getLogger(__name__)
 
@@ -17,6 +68,22 @@ def create_app(
     base_route: str = "/agents",
     title: str = "Agent Gateway",
     description: Optional[str] = None,
+    lazy_agents: bool = False,
+    agent_manifest_path: Optional[Path] = None,
+    startup_profiler: Optional[StartupProfiler] = None,
+    hot_reload: bool = False,
+    hot_reload_interval: float = 1.0,
+    session_settings: Optional[SessionServiceSettings] = None,
+    admission_settings: Optional[AdmissionSettings] = None,
+    metrics_settings: Optional[MetricsSettings] = None,
+    tracing_settings: Optional[TracingSettings] = None,
+    profiling_settings: Optional[ProfilingSettings] = None,
+    warmup_settings: Optional[WarmupSettings] = None,
+    streaming_settings: Optional[StreamingSettings] = None,
+    job_settings: Optional[JobSettings] = None,
+    usage_settings: Optional[UsageSettings] = None,
+    loop_monitor_settings: Optional[LoopMonitorSettings] = None,
+    run_coalescing_settings: Optional[RunCoalescingSettings] = None,
 ) -> FastAPI:
     """
     Construct a FastAPI application with shared authentication and agent routing.
@@ -27,6 +94,53 @@ def create_app(
         base_route: Common prefix applied to every agent endpoint.
         title: FastAPI application title.
         description: Optional FastAPI application description.
+        lazy_agents: When true, agent modules are not executed at startup. Placeholder
+            routes are registered from static metadata and each agent is loaded on the
+            first request to its mount path.
+        agent_manifest_path: Manifest consulted in lazy mode before reading agent
+            sources. Defaults to `.agent_manifest.json` inside `agents_root`; a missing
+            or stale manifest falls back to static metadata.
+        startup_profiler: Optional profiler that records per-agent import and
+            registration time and per-dependency import cost. Exposed as
+            `app.state.startup_profiler`.
+        hot_reload: Watch agent modules and reload an agent in place when its file
+            changes. Reloads can also be triggered via
+            `POST /admin/agents/{slug}/reload` regardless of this flag.
+        hot_reload_interval: Seconds between file checks when `hot_reload` is on.
+        session_settings: Session persistence backend shared by all agents. Defaults
+            to the `AGENT_SESSION_*` environment variables. Agents obtain the service
+            with `shared.session_service.get_session_service(app)`.
+        admission_settings: Per-user and per-agent concurrent run limits and the wait
+            queue applied to agent runs. Defaults to the `AGENT_MAX_RUNS_*` and
+            `AGENT_ADMISSION_*` environment variables. Exposed as
+            `app.state.admission`.
+        metrics_settings: Whether and where Prometheus metrics are served. The
+            endpoint is excluded from authentication. Defaults to the
+            `AGENT_METRICS_*` environment variables.
+        tracing_settings: Opt-in OpenTelemetry tracing. Defaults to the
+            `AGENT_TRACING_*` environment variables.
+        profiling_settings: Storage and sampling options for admin-triggered
+            per-request CPU profiles (`/admin/profiles`). Defaults to the
+            `AGENT_PROFILING_*` / `AGENT_PROFILE_*` environment variables.
+        warmup_settings: Startup warm-up run in the background by each worker;
+            `/readyz` answers 503 until it finishes or its deadline passes.
+            Defaults to the `AGENT_WARMUP_*` environment variables. Exposed as
+            `app.state.warmup`.
+        streaming_settings: Text delta coalescing and gzip negotiation for agent
+            event streams. Defaults to the `AGENT_SSE_*` environment variables.
+        job_settings: Worker pool and SQLite store behind the `/jobs` background
+            run API. Defaults to the `AGENT_JOBS_*` environment variables. Exposed
+            as `app.state.jobs` when enabled.
+        usage_settings: Token usage ledger and quotas checked before agent runs.
+            Defaults to the `AGENT_USAGE_*` environment variables. Exposed as
+            `app.state.usage` when enabled.
+        loop_monitor_settings: Event-loop lag measurement and blocking-call
+            reports (`/admin/loop`). Defaults to the `AGENT_LOOP_*` environment
+            variables. Exposed as `app.state.loop_monitor`.
+        run_coalescing_settings: Whether duplicate run requests (same user, thread
+            and triggering message) attach to the original run or replay its
+            recorded stream. Defaults to the `AGENT_RUN_COALESCING*` environment
+            variables. Exposed as `app.state.run_coalescer` when enabled.
     """
 
     if agents_root is None:
@@ -35,8 +149,61 @@ def create_app(
     route_prefix = _normalize_base_route(base_route)
     settings = load_supabase_auth_settings()
 
-    app = FastAPI(title=title, description=description)
+    app = FastAPI(title=title, description=description, lifespan=_lifespan)
+    app.state.lifespan_hooks = []
+    # Built before workers fork, so they share it until a reload.
+    get_config()
+    app.state.lifespan_hooks.append(reloading_on_sighup)
+    app.state.loop_monitor = LoopMonitor(loop_monitor_settings or load_loop_monitor_settings())
+    if app.state.loop_monitor.settings.enabled:
+        # Entered early, so stalls during warm-up are reported too.
+        app.state.lifespan_hooks.append(app.state.loop_monitor.running)
+    app.state.admin_settings = load_admin_settings()
+    app.state.session_settings = session_settings or load_session_service_settings()
+    app.state.session_service = None
+    # Pooled for the Supabase `/user` lookup; connections are opened lazily, so the
+    # client is safe to create before workers are forked.
+    app.state.http_client = httpx.AsyncClient(timeout=settings.http_timeout)
+    app.state.lifespan_hooks.append(_closing_shared_resources)
+    app.state.warmup = StartupWarmup(warmup_settings or load_warmup_settings())
+    # Entered after the clients it uses, so it is cancelled before they close.
+    app.state.lifespan_hooks.append(warming_up)
+    app.state.admission_settings = admission_settings or load_admission_settings()
+    app.state.admission = AdmissionController(app.state.admission_settings)
+    metrics_settings = metrics_settings or load_metrics_settings()
+    auth_exclude_paths = list(settings.auth_exclude_paths) + ["/readyz"]
+    if metrics_settings.enabled:
+        app.add_route(metrics_settings.path, metrics_endpoint, include_in_schema=False)
+        auth_exclude_paths.append(metrics_settings.path)
 
+    # Innermost, so stream metrics describe what clients actually receive.
+    app.add_middleware(
+        SSEStreamingMiddleware,
+        settings=streaming_settings or load_streaming_settings(),
+        state=app.state,
+    )
+    app.add_middleware(SSEStreamMetricsMiddleware, state=app.state)
+    # Added before auth so it runs inside it and sees the user id.
+    app.add_middleware(
+        AdmissionControlMiddleware,
+        controller=app.state.admission,
+        state=app.state,
+    )
+    usage_settings = usage_settings or load_usage_settings()
+    if usage_settings.enabled:
+        app.state.usage = UsageLedger(usage_settings)
+        app.state.lifespan_hooks.append(app.state.usage.running)
+        # Between auth and admission: over-quota runs never take a slot.
+        app.add_middleware(UsageQuotaMiddleware, ledger=app.state.usage, state=app.state)
+    run_coalescing_settings = run_coalescing_settings or load_run_coalescing_settings()
+    if run_coalescing_settings.enabled:
+        app.state.run_coalescer = RunCoalescer(run_coalescing_settings)
+        # Entered after the usage ledger, so runs are stopped before it flushes.
+        app.state.lifespan_hooks.append(app.state.run_coalescer.running)
+        # Between auth and quotas: duplicates never take a slot or count against a quota.
+        app.add_middleware(
+            RunCoalescingMiddleware, coalescer=app.state.run_coalescer, state=app.state
+        )
     app.add_middleware(
         SupabaseAuthMiddleware,
         supabase_url=settings.supabase_url,
@@ -44,28 +211,173 @@ def create_app(
         supabase_jwt_secret=settings.supabase_jwt_secret,
         required_audiences=settings.jwt_audience,
         issuer=settings.jwt_issuer,
-        exclude_paths=settings.auth_exclude_paths,
+        exclude_paths=auth_exclude_paths,
         http_timeout=settings.http_timeout,
+        http_client=app.state.http_client,
+    )
+    app.state.request_profiler = RequestProfiler(profiling_settings or load_profiling_settings())
+    # Outside auth, so JWT validation shows up in profiles.
+    app.add_middleware(
+        RequestProfilingMiddleware, profiler=app.state.request_profiler, state=app.state
     )
+    if configure_tracing(tracing_settings or load_tracing_settings()):
+        # Outermost, so the request span covers authentication and the whole stream.
+        app.add_middleware(RequestTracingMiddleware, exclude_paths=auth_exclude_paths)
+    # Outermost, so every record logged for the request carries its request id.
+    app.add_middleware(LogContextMiddleware)
 
     @app.get("/healthz", include_in_schema=False)
     async def healthcheck():
         return {"status": "ok"}
 
-    descriptors = discover_agents(agents_root)
+    @app.get("/readyz", include_in_schema=False)
+    async def readiness():
+        warmup = app.state.warmup
+        return JSONResponse(
+            warmup.report(),
+            status_code=status.HTTP_200_OK if warmup.ready else status.HTTP_503_SERVICE_UNAVAILABLE,
+        )
+
+    @app.post("/composio/connections/refresh", include_in_schema=False)
+    async def refresh_composio_connections():
+        # Called by the UI after the user links or unlinks a toolkit, so the next run sees it.
+        user_id = get_supabase_user_id()
+        if not user_id:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED, detail="Authentication required"
+            )
+        composio_mcp = sys.modules.get(f"{__package__}.composio_mcp")
+        if composio_mcp is not None:
+            composio_mcp.invalidate_connection_status(user_id)
+        return {"status": "ok"}
+
+    app.include_router(admin_router)
+    job_settings = job_settings or load_job_settings()
+    if job_settings.enabled:
+        app.state.jobs = JobManager(job_settings, JobStore(Path(job_settings.sqlite_path)))
+        app.state.lifespan_hooks.append(app.state.jobs.running)
+        app.include_router(jobs_router)
+    if usage_settings.enabled:
+        app.include_router(usage_router)
+
+    started = time.perf_counter()
     app.state.agent_registry = []
+    app.state.startup_profiler = startup_profiler
+    app.state.agent_reloader = AgentReloader(app, profiler=startup_profiler)
 
-    for descriptor in descriptors:
-        mount_path = f"{route_prefix}/{descriptor.slug}"
-        descriptor.registrar(app, mount_path)
-        app.state.agent_registry.append(
-            {"slug": descriptor.slug, "display_name": descriptor.display_name, "path": mount_path}
+    if lazy_agents:
+        manifest = load_agent_manifest(agents_root, agent_manifest_path)
+        _register_lazy_agents(app, agents_root, route_prefix, manifest, startup_profiler)
+    else:
+        for descriptor in discover_agents(agents_root, profiler=startup_profiler):
+            _register_agent(app, descriptor, route_prefix, startup_profiler)
+
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    mode = "lazy" if lazy_agents else "eager"
+    app.state.startup_report = {
+        "mode": mode,
+        "agent_count": len(app.state.agent_registry),
+        "registration_ms": round(elapsed_ms, 1),
+    }
+    logger.info(
+        "Registered %d agent(s) in %.1f ms (%s mode)",
+        len(app.state.agent_registry),
+        elapsed_ms,
+        mode,
+    )
+
+    if hot_reload:
+        app.state.lifespan_hooks.append(
+            lambda _app: _app.state.agent_reloader.watching(hot_reload_interval)
         )
-        logger.info("Registered agent '%s' at %s", descriptor.display_name, mount_path)
 
     return app
 
 
+@asynccontextmanager
+async def _lifespan(app: FastAPI) -> AsyncIterator[None]:
+    async with AsyncExitStack() as stack:
+        for hook in app.state.lifespan_hooks:
+            await stack.enter_async_context(hook(app))
+        yield
+
+
+@asynccontextmanager
+async def _closing_shared_resources(app: FastAPI) -> AsyncIterator[None]:
+    """
+    Close per-worker clients once the server has drained (or abandoned) its requests.
+    """
+
+    try:
+        yield
+    finally:
+        # Only present if an agent imported it; no toolsets can be open otherwise.
+        composio_mcp = sys.modules.get(f"{__package__}.composio_mcp")
+        if composio_mcp is not None:
+            await composio_mcp.close_open_toolsets()
+        await app.state.http_client.aclose()
+        service = app.state.session_service
+        close = getattr(service, "close", None)
+        if close is not None:
+            await close()
+        # Flushes spans recorded during shutdown; exporters may block on I/O.
+        await asyncio.to_thread(shutdown_tracing)
+        logger.info("Closed shared clients")
+
+
+def _register_agent(
+    app: FastAPI,
+    descriptor: AgentDescriptor,
+    route_prefix: str,
+    profiler: Optional[StartupProfiler] = None,
+) -> None:
+    mount_path = f"{route_prefix}/{descriptor.slug}"
+    started = time.perf_counter()
+    descriptor.registrar(app, mount_path)
+    if profiler is not None:
+        profiler.record_agent_phase(
+            descriptor.slug, "register", (time.perf_counter() - started) * 1000
+        )
+    if descriptor.module_path is not None and descriptor.package is not None:
+        app.state.agent_reloader.track(
+            AgentMetadata(
+                slug=descriptor.slug,
+                display_name=descriptor.display_name,
+                module_path=descriptor.module_path,
+                package=descriptor.package,
+            )
+        )
+    app.state.agent_registry.append(
+        {"slug": descriptor.slug, "display_name": descriptor.display_name, "path": mount_path}
+    )
+    logger.info("Registered agent '%s' at %s", descriptor.display_name, mount_path)
+
+
+def _register_lazy_agents(
+    app: FastAPI,
+    agents_root: Path,
+    route_prefix: str,
+    manifest: Optional[AgentManifest],
+    profiler: Optional[StartupProfiler],
+) -> None:
+    for metadata in discover_agent_metadata(agents_root, manifest=manifest, profiler=profiler):
+        if metadata.descriptor is not None:
+            _register_agent(app, metadata.descriptor, route_prefix, profiler)
+            continue
+
+        mount_path = f"{route_prefix}/{metadata.slug}"
+        app.router.routes.append(LazyAgentRoute(metadata, mount_path, profiler=profiler, state=app.state))
+        app.state.agent_reloader.track(metadata)
+        app.state.agent_registry.append(
+            {"slug": metadata.slug, "display_name": metadata.display_name, "path": mount_path}
+        )
+        logger.info(
+            "Registered lazy placeholder for agent '%s' at %s",
+            metadata.display_name,
+            mount_path,
+        )
+
+
 def _normalize_base_route(base_route: str) -> str:
     cleaned = base_route.strip()
     if not cleaned:
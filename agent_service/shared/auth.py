@@ -1,7 +1,9 @@
 import logging
+import time
+from contextlib import contextmanager
 from contextvars import ContextVar
 from dataclasses import dataclass
-from typing import Any, Iterable, Mapping, Optional, Sequence, Set
+from typing import Any, Iterable, Iterator, Mapping, Optional, Sequence, Set
 
 import httpx
 from fastapi import Request, status
@@ -10,9 +12,14 @@ from jwt import InvalidTokenError, decode as jwt_decode, get_unverified_header
 from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.responses import Response
 
+from . import tracing
+from .metrics import AUTH_JWT_DECODE_SECONDS, AUTH_USER_LOOKUP_SECONDS
 
 logger = logging.getLogger(__name__)
 
+# Characters of a failed Supabase response body included in log records.
+_MAX_LOGGED_BODY = 200
+
 
 @dataclass(frozen=True)
 class SupabaseAuthContext:
@@ -47,6 +54,19 @@ def get_supabase_user_id() -> Optional[str]:
     return None
 
 
+@contextmanager
+def supabase_auth_context(context: SupabaseAuthContext) -> Iterator[None]:
+    """
+    Run a block as an already authenticated user, outside of their request.
+    """
+
+    context_token = _auth_context_var.set(context)
+    try:
+        yield
+    finally:
+        _auth_context_var.reset(context_token)
+
+
 class SupabaseAuthMiddleware(BaseHTTPMiddleware):
     """
     FastAPI middleware that enforces Supabase JWT authentication.
@@ -54,6 +74,9 @@ class SupabaseAuthMiddleware(BaseHTTPMiddleware):
     The middleware validates bearer tokens using the supplied Supabase JWT secret and
     checks whether the user still exists by hitting the `/auth/v1/user` endpoint.
     A validated user payload is attached to `request.state.supabase_user`.
+
+    Pass a shared `http_client` to reuse pooled connections for the `/user` lookup;
+    without one a client is created per request.
     """
 
     def __init__(
@@ -67,6 +90,7 @@ class SupabaseAuthMiddleware(BaseHTTPMiddleware):
         issuer: Optional[str] = None,
         http_timeout: float = 3.0,
         exclude_paths: Optional[Iterable[str]] = None,
+        http_client: Optional[httpx.AsyncClient] = None,
     ) -> None:
         super().__init__(app)
         if supabase_url.endswith("/"):
@@ -80,6 +104,7 @@ class SupabaseAuthMiddleware(BaseHTTPMiddleware):
         self.issuer = issuer or f"{self.supabase_url}/auth/v1"
         self.http_timeout = http_timeout
         self.exclude_paths = set(exclude_paths or [])
+        self._http_client = http_client
 
     async def dispatch(self, request: Request, call_next) -> Response:
         if request.url.path in self.exclude_paths:
@@ -95,7 +120,12 @@ class SupabaseAuthMiddleware(BaseHTTPMiddleware):
             )
             return self._unauthorized("Missing bearer token")
 
-        payload = await self._validate_jwt(token)
+        started = time.perf_counter()
+        with tracing.span("supabase.jwt_decode"):
+            payload = await self._validate_jwt(token)
+        AUTH_JWT_DECODE_SECONDS.labels("ok" if payload is not None else "rejected").observe(
+            time.perf_counter() - started
+        )
         if payload is None:
             logger.warning(
                 "Auth failure: JWT validation failed for request %s %s (token preview=%s)",
@@ -105,7 +135,12 @@ class SupabaseAuthMiddleware(BaseHTTPMiddleware):
             )
             return self._unauthorized("Invalid authentication token")
 
-        user_profile = await self._fetch_supabase_user(token)
+        started = time.perf_counter()
+        with tracing.span("supabase.user_lookup"):
+            user_profile = await self._fetch_supabase_user(token)
+        AUTH_USER_LOOKUP_SECONDS.labels("ok" if user_profile is not None else "rejected").observe(
+            time.perf_counter() - started
+        )
         if user_profile is None:
             logger.warning(
                 "Auth failure: Supabase user lookup failed for request %s %s (token preview=%s)",
@@ -121,6 +156,10 @@ class SupabaseAuthMiddleware(BaseHTTPMiddleware):
             request.method,
             request.url.path,
         )
+        if tracing.tracing_enabled():
+            tracing.set_request_attributes(
+                {"enduser.id_hash": tracing.hash_user_id(str(user_profile["id"]))}
+            )
         request.state.supabase_user = user_profile
         request.state.supabase_claims = payload
         context_token = _auth_context_var.set(
@@ -191,8 +230,13 @@ class SupabaseAuthMiddleware(BaseHTTPMiddleware):
         if self.supabase_api_key:
             headers["apikey"] = self.supabase_api_key
         try:
-            async with httpx.AsyncClient(timeout=self.http_timeout) as client:
-                response = await client.get(url, headers=headers)
+            if self._http_client is not None:
+                response = await self._http_client.get(
+                    url, headers=headers, timeout=self.http_timeout
+                )
+            else:
+                async with httpx.AsyncClient(timeout=self.http_timeout) as client:
+                    response = await client.get(url, headers=headers)
         except httpx.HTTPError as exc:
             logger.error(
                 "Auth failure: HTTP error when fetching user %s",
@@ -206,7 +250,7 @@ class SupabaseAuthMiddleware(BaseHTTPMiddleware):
                 "Auth failure: Supabase /user returned status %s (token preview=%s, body=%s)",
                 response.status_code,
                 self._safe_token_preview(token),
-                response.text,
+                self._body_preview(response),
             )
             return None
 
@@ -215,7 +259,7 @@ class SupabaseAuthMiddleware(BaseHTTPMiddleware):
             logger.warning(
                 "Auth failure: Supabase /user response missing id (token preview=%s, body=%s)",
                 self._safe_token_preview(token),
-                response.text,
+                self._body_preview(response),
             )
             return None
 
@@ -247,3 +291,10 @@ class SupabaseAuthMiddleware(BaseHTTPMiddleware):
         visible = token[:8]
         hidden_length = max(len(token) - len(visible), 0)
         return f"{visible}...(+{hidden_length} chars)"
+
+    @staticmethod
+    def _body_preview(response: httpx.Response) -> str:
+        body = response.text
+        if len(body) <= _MAX_LOGGED_BODY:
+            return body
+        return f"{body[:_MAX_LOGGED_BODY]}...(+{len(body) - _MAX_LOGGED_BODY} chars)"
@@ -0,0 +1,278 @@
+"""
+Record and replay of LLM and MCP traffic for deterministic performance tests.
+
+With `AGENT_CASSETTE_MODE=record`, every model request an agent makes and every
+Composio MCP tool list and tool call are appended to a JSON-lines cassette
+(`AGENT_CASSETTE_PATH`, gzip-compressed when it ends in `.gz`), with the offset
+of each streamed model chunk and each tool's duration.
+
+With `AGENT_CASSETTE_MODE=replay`, nothing external is contacted. `resolve_adk_model`
+returns a model that answers from the cassette, and Composio toolsets list the
+recorded tools and return the recorded results. Recorded delays are reproduced,
+multiplied by `AGENT_CASSETTE_TIME_SCALE`.
+
+Model requests are matched on their system instruction and conversation contents,
+with function call ids stripped because ADK generates them randomly for some
+providers. Tool calls are matched on tool name and arguments. Identical requests
+recorded several times are served in rotation, so one recorded conversation can be
+replayed by many concurrent users. A request with no recording raises
+`CassetteMiss`, which fails the run.
+"""
+
+import asyncio
+import gzip
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, AsyncGenerator, Dict, List, Optional, Tuple
+
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+from google.adk.tools.mcp_tool.mcp_tool import McpTool
+
+from .settings import CassetteSettings, load_cassette_settings
+
+logger = logging.getLogger(__name__)
+
+_cassette: Optional["Cassette"] = None
+_cassette_lock = threading.Lock()
+
+
+class CassetteMiss(LookupError):
+    """
+    Raised in replay mode when the cassette holds no recording for a request.
+    """
+
+
+class Cassette:
+    """
+    One cassette file, appended to in record mode and indexed in memory for replay.
+    """
+
+    def __init__(self, settings: CassetteSettings) -> None:
+        self._settings = settings
+        self._path = Path(settings.path)
+        self._write_lock = threading.Lock()
+        self._models: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        self._tools: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        self._tool_lists: Dict[str, List[Dict[str, Any]]] = {}
+        self._served: Dict[Tuple[str, str], int] = defaultdict(int)
+        if settings.mode == "replay":
+            self._load()
+
+    @property
+    def recording(self) -> bool:
+        return self._settings.mode == "record"
+
+    @property
+    def replaying(self) -> bool:
+        return self._settings.mode == "replay"
+
+    async def record(self, entry: Dict[str, Any]) -> None:
+        line = json.dumps(entry, separators=(",", ":"), default=str) + "\n"
+        await asyncio.to_thread(self._append, line)
+
+    def model_chunks(self, key: str) -> List[Dict[str, Any]]:
+        return self._next("model", key, self._models)["chunks"]
+
+    def tool_call(self, key: str) -> Dict[str, Any]:
+        return self._next("tool", key, self._tools)
+
+    def tool_list(self, config_id: str) -> List[Dict[str, Any]]:
+        tools = self._tool_lists.get(config_id)
+        if tools is None:
+            raise CassetteMiss(f"No recorded MCP tool list for config {config_id}")
+        return tools
+
+    async def sleep_until(self, started: float, offset: float) -> None:
+        delay = started + offset * self._settings.time_scale - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def _next(
+        self, kind: str, key: str, recordings: Dict[str, List[Dict[str, Any]]]
+    ) -> Dict[str, Any]:
+        candidates = recordings.get(key)
+        if not candidates:
+            raise CassetteMiss(f"No recorded {kind} call matches key {key}")
+        index = self._served[(kind, key)]
+        self._served[(kind, key)] = index + 1
+        return candidates[index % len(candidates)]
+
+    def _append(self, line: str) -> None:
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        opener = gzip.open if self._path.suffix == ".gz" else open
+        with self._write_lock, opener(self._path, "at", encoding="utf-8") as handle:
+            handle.write(line)
+
+    def _load(self) -> None:
+        opener = gzip.open if self._path.suffix == ".gz" else open
+        try:
+            with opener(self._path, "rt", encoding="utf-8") as handle:
+                lines = handle.readlines()
+        except FileNotFoundError:
+            raise RuntimeError(f"Cassette {self._path} does not exist; record one first.") from None
+        for line in lines:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            kind = entry.get("type")
+            if kind == "model":
+                self._models[entry["key"]].append(entry)
+            elif kind == "tool":
+                self._tools[entry["key"]].append(entry)
+            elif kind == "tool_list":
+                self._tool_lists[entry["config_id"]] = entry["tools"]
+        logger.info(
+            "Loaded cassette %s: %d model and %d tool recordings, %d MCP tool lists",
+            self._path,
+            sum(len(entries) for entries in self._models.values()),
+            sum(len(entries) for entries in self._tools.values()),
+            len(self._tool_lists),
+        )
+
+
+def get_cassette() -> Optional[Cassette]:
+    """
+    The process-wide cassette, or None when record/replay is off.
+    """
+
+    global _cassette
+    if _cassette is None:
+        settings = load_cassette_settings()
+        if settings.mode == "off":
+            return None
+        with _cassette_lock:
+            if _cassette is None:
+                _cassette = Cassette(settings)
+                logger.warning("Cassette %s mode active (%s)", settings.mode, settings.path)
+    return _cassette
+
+
+class CassetteLlm(BaseLlm):
+    """
+    Model that records the wrapped model's responses, or replays them without it.
+    """
+
+    inner: Optional[BaseLlm] = None
+
+    async def generate_content_async(
+        self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        cassette = get_cassette()
+        key = model_request_key(llm_request)
+        started = time.perf_counter()
+
+        if cassette is not None and cassette.replaying:
+            for chunk in cassette.model_chunks(key):
+                await cassette.sleep_until(started, chunk["at"])
+                yield LlmResponse.model_validate(chunk["response"])
+            return
+
+        chunks: List[Dict[str, Any]] = []
+        async for response in self.inner.generate_content_async(llm_request, stream=stream):
+            chunks.append(
+                {
+                    "at": round(time.perf_counter() - started, 4),
+                    "response": response.model_dump(mode="json", exclude_none=True),
+                }
+            )
+            yield response
+        if cassette is not None:
+            await cassette.record({"type": "model", "key": key, "model": self.model, "chunks": chunks})
+
+
+class CassetteMcpTool(McpTool):
+    """
+    `McpTool` that records its calls, or returns recorded results without calling MCP.
+    """
+
+    async def _run_async_impl(self, *, args, tool_context, credential) -> Dict[str, Any]:
+        cassette = get_cassette()
+        key = tool_call_key(self.name, args)
+        started = time.perf_counter()
+
+        if cassette is not None and cassette.replaying:
+            recording = cassette.tool_call(key)
+            await cassette.sleep_until(started, recording["duration"])
+            return recording["result"]
+
+        result = await super()._run_async_impl(
+            args=args, tool_context=tool_context, credential=credential
+        )
+        if cassette is not None:
+            await cassette.record(
+                {
+                    "type": "tool",
+                    "key": key,
+                    "name": self.name,
+                    "duration": round(time.perf_counter() - started, 4),
+                    "result": result,
+                }
+            )
+        return result
+
+
+def wrap_model(model: Any) -> Any:
+    """
+    Wrap a resolved ADK model (instance or Gemini model name) for record/replay.
+    """
+
+    if isinstance(model, BaseLlm):
+        return CassetteLlm(model=model.model, inner=model)
+
+    from google.adk.models.registry import LLMRegistry
+
+    cassette = get_cassette()
+    inner = None if cassette is not None and cassette.replaying else LLMRegistry.new_llm(model)
+    return CassetteLlm(model=model, inner=inner)
+
+
+def model_request_key(llm_request: LlmRequest) -> str:
+    config = llm_request.config
+    system_instruction = config.system_instruction if config is not None else None
+    if system_instruction is not None and not isinstance(system_instruction, str):
+        system_instruction = _dump(system_instruction)
+    payload = {
+        "system": system_instruction,
+        "contents": [_strip_ids(_dump(content)) for content in llm_request.contents],
+    }
+    return _digest(payload)
+
+
+def tool_call_key(name: str, args: Dict[str, Any]) -> str:
+    return _digest({"name": name, "args": args})
+
+
+def _dump(value: Any) -> Any:
+    return value.model_dump(mode="json", exclude_none=True)
+
+
+def _strip_ids(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {key: _strip_ids(item) for key, item in value.items() if key != "id"}
+    if isinstance(value, list):
+        return [_strip_ids(item) for item in value]
+    return value
+
+
+def _digest(payload: Any) -> str:
+    encoded = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()[:32]
+
+
+__all__ = [
+    "Cassette",
+    "CassetteLlm",
+    "CassetteMcpTool",
+    "CassetteMiss",
+    "get_cassette",
+    "model_request_key",
+    "tool_call_key",
+    "wrap_model",
+]
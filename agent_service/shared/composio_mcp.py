@@ -1,24 +1,358 @@
+import asyncio
+import contextvars
 import json
 import logging
-import os
 import re
+import sys
+import threading
+import time
+import weakref
+from collections import OrderedDict
 from dataclasses import dataclass
-from typing import Any, Callable, Dict, Iterable, Optional, Sequence
+from functools import cached_property
+from typing import Any, Callable, Collection, Dict, Iterable, List, Mapping, Optional, Sequence, Set, Tuple
 
 from composio import Composio
+from mcp.types import Tool as McpBaseTool
 from google.adk.agents.callback_context import CallbackContext
 from google.adk.tools.base_tool import BaseTool
 from google.adk.tools.mcp_tool.mcp_session_manager import (
+    MCPSessionManager,
     StreamableHTTPConnectionParams,
 )
+from google.adk.agents.readonly_context import ReadonlyContext
+from google.adk.models.llm_request import LlmRequest
+from google.adk.tools.mcp_tool.mcp_tool import McpTool
 from google.adk.tools.mcp_tool.mcp_toolset import McpToolset
 from google.adk.tools.tool_context import ToolContext
+from google.genai import types
 
+from . import tracing
 from .auth import get_supabase_user_id
-from .env import require_env
+from .cassettes import CassetteMcpTool, get_cassette
+from .config import ConfigSnapshot, get_config, register_env_specs
+from .env import EnvVarSpec
+from .logging_setup import bind_log_context
+from .memory import register_memory_component
+from .metrics import (
+    COMPOSIO_CONNECTION_LOOKUPS,
+    MCP_GENERATE_SECONDS,
+    MCP_TOOLSET_CLOSE_SECONDS,
+    MCP_TOOLSET_OPEN_SECONDS,
+    MCP_URL_WAIT_SECONDS,
+    TOOL_DECLARATION_TOKENS,
+    TOOL_SEARCHES,
+)
+from .settings import (
+    ComposioConnectionSettings,
+    ToolSelectionSettings,
+    load_composio_connection_settings,
+    load_tool_selection_settings,
+)
+from .tool_selection import Embedder, ToolDocument, ToolIndex, declaration_tokens, load_embedder
 
 logger = logging.getLogger(__name__)
 
+# Toolsets injected for invocations that have not reached after_agent_callback yet.
+_open_toolsets: "weakref.WeakSet[_ComposioMcpToolset]" = weakref.WeakSet()
+# Every toolset still alive, for the memory report: released toolsets that stay
+# alive (or keep MCP sessions open) are leaks.
+_toolsets: "weakref.WeakSet[_ComposioMcpToolset]" = weakref.WeakSet()
+# MCP tool schemas per Composio MCP config id, with the configuration version
+# they were listed under; the tool set of a config is the same for every user.
+# Entries from an older configuration are listed again, and an agent reload drops
+# them all (`invalidate_tool_schemas`).
+_tool_schemas: Dict[str, Tuple[int, List[McpBaseTool]]] = {}
+# Live integrations, for `preload_tool_schemas`.
+_integrations: "weakref.WeakSet[ComposioMCPIntegration]" = weakref.WeakSet()
+# Toolkits each Composio MCP config needs a connected account for, as
+# {auth config id: toolkit slug}; the same for every user. Versioned and dropped
+# like `_tool_schemas`.
+_config_auth_toolkits: Dict[str, Tuple[int, Dict[str, str]]] = {}
+# Per user, each toolkit's last seen status and when it was checked. Connected
+# toolkits are trusted for `status_ttl_seconds`, others for the much shorter
+# `not_connected_ttl_seconds` so a newly linked toolkit is seen soon.
+_toolkit_statuses: "OrderedDict[str, Dict[str, Tuple[str, float]]]" = OrderedDict()
+_toolkit_statuses_lock = threading.Lock()
+_MAX_STATUS_USERS = 10_000
+_CONNECTED = "ACTIVE"
+_NOT_CONNECTED = "NOT_CONNECTED"
+# Tool index per Composio MCP config id, with the tool names it was built from.
+_tool_indexes: Dict[str, Tuple[Tuple[str, ...], ToolIndex]] = {}
+SEARCH_TOOLS_TOOL_NAME = "search_more_tools"
+# Recent session events scanned for tools the model already called.
+_CALLED_TOOLS_WINDOW = 50
+
+
+class _ComposioMcpToolset(McpToolset):
+    """
+    `McpToolset` scoped to the invocation that provisioned it.
+
+    Toolsets are attached to the shared root agent, so concurrent invocations see
+    each other's toolsets. Tools are only listed for the owning invocation, and
+    `close()` (which ADK's `Runner.close()` calls for every toolset on the agent
+    after each run) is ignored; the owner releases its toolsets with `release()`.
+
+    ADK calls `get_tools` before every model request. Each toolset builds its tools
+    once, from the schemas cached per MCP config (listed by the first toolset of
+    that config, or preloaded during warm-up), so later toolsets open their MCP
+    session only when a tool is actually called. With a cassette active the tools
+    are `CassetteMcpTool`s, and on replay their schemas come from the cassette.
+    With tool selection on, only the tools `_ToolSelection` picks are returned.
+
+    `pending_url` is set when the MCP URL is still being generated: the tools are
+    declared from the cached schemas right away, and only opening the MCP session
+    waits for the URL. MCP sessions are opened and closed by the session manager's
+    own task (see `_ComposioSessionManager`).
+    """
+
+    def __init__(
+        self,
+        *,
+        agent_context: str,
+        owner_invocation_id: str,
+        config_id: str,
+        pending_url: Optional["asyncio.Future[Dict[str, Any]]"] = None,
+        **kwargs: Any,
+    ) -> None:
+        super().__init__(**kwargs)
+        self._mcp_session_manager = _ComposioSessionManager(
+            connection_params=self._connection_params,
+            errlog=self._errlog,
+            agent_context=agent_context,
+            pending_url=pending_url,
+        )
+        self._agent_context = agent_context
+        self._composio_owner_invocation_id = owner_invocation_id
+        self._composio_config_id = config_id
+        self._connection_status: Optional[_ConnectionStatus] = None
+        self._status_lookup: Optional[_ConnectionStatusLookup] = None
+        self._selection: Optional[_ToolSelection] = None
+        self._tool_index: Optional[ToolIndex] = None
+        self._declaration_tokens: Dict[str, int] = {}
+        self._ranked: Optional[Set[str]] = None
+        self._tools: Optional[List[BaseTool]] = None
+        self._created_at = time.monotonic()
+        self._released = False
+        _toolsets.add(self)
+
+    @property
+    def live_mcp_sessions(self) -> int:
+        return len(getattr(self._mcp_session_manager, "_sessions", ()))
+
+    def set_connection_status_lookup(self, lookup: "_ConnectionStatusLookup") -> None:
+        """
+        Take the status from `lookup`, joined before this toolset's first model request.
+        """
+
+        self._status_lookup = lookup
+
+    async def _join_connection_status(self) -> None:
+        # Runs before `_tools` (and the selection's `_ranked`) are built, and only
+        # once: every model request of the invocation sees the same tools.
+        lookup, self._status_lookup = self._status_lookup, None
+        if lookup is not None and self._tools is None:
+            statuses = await lookup.statuses()
+            self._connection_status = statuses.get(self._composio_config_id)
+
+    def set_tool_selection(self, selection: "_ToolSelection") -> None:
+        self._selection = selection
+        selection.toolsets.append(self)
+        self._tools = None
+
+    async def get_tools(self, readonly_context: Optional[ReadonlyContext] = None) -> List[BaseTool]:
+        if (
+            readonly_context is not None
+            and readonly_context.invocation_id != self._composio_owner_invocation_id
+        ):
+            return []
+        if self._tools is None:
+            await self._join_connection_status()
+            self._tools = await self._load_tools(readonly_context)
+        if self._selection is None or readonly_context is None:
+            return self._tools
+        return await self._selection.declared_tools(self, readonly_context)
+
+    async def _load_tools(self, readonly_context: Optional[ReadonlyContext]) -> List[BaseTool]:
+        cassette = get_cassette()
+        if cassette is not None and cassette.replaying:
+            declarations = [
+                McpBaseTool.model_validate(tool)
+                for tool in cassette.tool_list(self._composio_config_id)
+            ]
+        else:
+            declarations = _cached_tool_schemas(self._composio_config_id)
+            if declarations is None:
+                declarations = await self.list_tool_schemas(readonly_context)
+            if cassette is not None:
+                await cassette.record(
+                    {
+                        "type": "tool_list",
+                        "config_id": self._composio_config_id,
+                        "tools": [
+                            tool.model_dump(mode="json", exclude_none=True)
+                            for tool in declarations
+                        ],
+                    }
+                )
+        if self._selection is not None:
+            await self._index_tools(declarations, self._selection.settings)
+        if self._connection_status is not None:
+            declarations = self._connection_status.apply(declarations)
+        tool_class = McpTool if cassette is None else CassetteMcpTool
+        return [
+            tool_class(mcp_tool=declaration, mcp_session_manager=self._mcp_session_manager)
+            for declaration in declarations
+        ]
+
+    async def _index_tools(
+        self, declarations: List[McpBaseTool], settings: ToolSelectionSettings
+    ) -> None:
+        self._declaration_tokens = {
+            declaration.name: declaration_tokens(
+                declaration.name, declaration.description, declaration.inputSchema
+            )
+            for declaration in declarations
+        }
+        if len(declarations) <= settings.min_tools:
+            return
+        names = tuple(declaration.name for declaration in declarations)
+        embedder = self._selection.embedder if self._selection is not None else None
+        cached = _tool_indexes.get(self._composio_config_id)
+        if cached is not None and cached[0] == names and cached[1].embedder is embedder:
+            self._tool_index = cached[1]
+            return
+        documents = [
+            ToolDocument(declaration.name, declaration.description or "")
+            for declaration in declarations
+        ]
+        if embedder is None:
+            index = ToolIndex(documents)
+        else:
+            index = await asyncio.to_thread(lambda: ToolIndex(documents, embedder=embedder))
+        _tool_indexes[self._composio_config_id] = (names, index)
+        self._tool_index = index
+
+    async def process_llm_request(
+        self, *, tool_context: ToolContext, llm_request: LlmRequest
+    ) -> None:
+        await super().process_llm_request(tool_context=tool_context, llm_request=llm_request)
+        if tool_context.invocation_id != self._composio_owner_invocation_id:
+            return
+        # ADK processes the toolset before listing its tools: the first model
+        # request waits here (boundedly) for the status lookup.
+        await self._join_connection_status()
+        status = self._connection_status
+        if status is not None and status.missing:
+            llm_request.append_instructions([status.instruction()])
+
+    async def list_tool_schemas(
+        self, readonly_context: Optional[ReadonlyContext] = None
+    ) -> List[McpBaseTool]:
+        """
+        List the config's tools over MCP and cache their schemas for later toolsets.
+        """
+
+        with MCP_TOOLSET_OPEN_SECONDS.labels(self._agent_context).time(), tracing.span(
+            "mcp.toolset_open"
+        ):
+            listed = await super().get_tools(readonly_context)
+        declarations = [tool.raw_mcp_tool for tool in listed if isinstance(tool, McpTool)]
+        _tool_schemas[self._composio_config_id] = (get_config().version, declarations)
+        return declarations
+
+    async def close(self) -> None:
+        logger.debug(
+            "Ignoring close of Composio MCP toolset owned by invocation %s",
+            self._composio_owner_invocation_id,
+        )
+
+    async def release(self) -> None:
+        with MCP_TOOLSET_CLOSE_SECONDS.labels(self._agent_context).time(), tracing.span(
+            "mcp.toolset_close"
+        ):
+            self._released = True
+            await super().close()
+
+
+class _ComposioSessionManager(MCPSessionManager):
+    """
+    Session manager that opens and closes its MCP sessions in a task of its own.
+
+    The MCP client's anyio task groups must be exited by the task that entered
+    them. A session is opened by whichever tool call needs it first (a task ADK
+    starts per call) and closed by `release()` from the run's task. Closing it
+    there fails, and the stuck cancel scope keeps the finished tool call task and
+    its events alive. So opening and closing run in a host task, started with the
+    first session and ended by `close()`.
+
+    It also waits for a background-generated MCP URL before connecting.
+    """
+
+    def __init__(
+        self,
+        *,
+        agent_context: str,
+        pending_url: Optional["asyncio.Future[Dict[str, Any]]"],
+        **kwargs: Any,
+    ) -> None:
+        super().__init__(**kwargs)
+        self._agent_context = agent_context
+        self._pending_url = pending_url
+        self._host: Optional["asyncio.Task[None]"] = None
+        self._requests: "asyncio.Queue[Tuple[Callable[..., Any], tuple, asyncio.Future]]" = (
+            asyncio.Queue()
+        )
+
+    async def create_session(self, headers: Optional[Dict[str, str]] = None):
+        pending = self._pending_url
+        if pending is not None:
+            started = time.perf_counter()
+            if pending.done():
+                instance = pending.result()
+            else:
+                with tracing.span("composio.await_mcp_url"):
+                    # Shielded: a cancelled tool call must not cancel the other waiters.
+                    instance = await asyncio.shield(pending)
+            MCP_URL_WAIT_SECONDS.labels(self._agent_context).observe(
+                time.perf_counter() - started
+            )
+            self._connection_params.url = instance["url"]
+            self._pending_url = None
+        if self._host is None:
+            self._host = asyncio.get_running_loop().create_task(self._serve())
+        return await self._in_host(super().create_session, headers)
+
+    async def close(self) -> None:
+        if self._host is None:
+            return
+        try:
+            await self._in_host(super().close)
+        finally:
+            self._host.cancel()
+            self._host = None
+
+    async def _in_host(self, operation: Callable[..., Any], *args: Any) -> Any:
+        result = asyncio.get_running_loop().create_future()
+        self._requests.put_nowait((operation, args, result))
+        # Shielded: a cancelled caller must not cancel a session the host is opening.
+        return await asyncio.shield(result)
+
+    async def _serve(self) -> None:
+        while True:
+            operation, args, result = await self._requests.get()
+            try:
+                value = await operation(*args)
+            except Exception as exc:
+                if not result.done():
+                    result.set_exception(exc)
+            except BaseException:
+                result.cancel()
+                raise
+            else:
+                if not result.done():
+                    result.set_result(value)
+
 
 def _default_user_id_resolver() -> Optional[str]:
     return get_supabase_user_id()
@@ -31,6 +365,8 @@ class ComposioMCPSettings:
 
     Specify `mcp_config_ids_env` to indicate the environment variable that stores
     one or more Composio MCP config identifiers (comma or whitespace separated).
+    `composio_base_url_env` optionally points the Composio client at another API
+    host (e.g. the local fake used by `benchmarks.e2e_load_test`).
     """
 
     agent_context: str
@@ -38,6 +374,7 @@ class ComposioMCPSettings:
     mcp_config_ids_env: str
     test_user_env: str
     composio_api_key_env: str = "COMPOSIO_API_KEY"
+    composio_base_url_env: str = "COMPOSIO_BASE_URL"
     initiate_connection_tool_name: str = "COMPOSIO_INITIATE_CONNECTION"
 
 
@@ -47,8 +384,9 @@ def composio_connection_instruction(initiate_connection_tool_name: str) -> str:
     """
     return (
         "Composio connection protocol:\n"
-        "1. Call the required Composio business tool directly; do not run 'COMPOSIO_CHECK_ACTIVE_CONNECTION' beforehand.\n"
-        f"2. If the business tool reports the user is not connected, immediately call '{initiate_connection_tool_name}' to launch the connection flow.\n"
+        "1. Call the required Composio business tool directly; do not run 'COMPOSIO_CHECK_ACTIVE_CONNECTION' beforehand. "
+        "If a Composio connection status list marks the tool's toolkit as not connected, skip the tool and go to step 2.\n"
+        f"2. If the toolkit is listed as not connected or the business tool reports the user is not connected, immediately call '{initiate_connection_tool_name}' to launch the connection flow.\n"
         "3. Tell the user you have initiated the request and that they must finish linking before you can proceed.\n"
         "4. Wait for confirmation that the connection succeeded, then resume the original task and retry the original Composio tool.\n"
         "5. Format any connection links you share as markdown links like [title](url) rather than exposing raw URLs.\n"
@@ -56,6 +394,264 @@ def composio_connection_instruction(initiate_connection_tool_name: str) -> str:
     )
 
 
+@dataclass(frozen=True)
+class _ConnectionStatus:
+    """
+    The current user's connection status for the toolkits of one MCP config.
+    """
+
+    statuses: Mapping[str, str]
+    unavailable_tools: str
+    initiate_connection_tool_name: str
+
+    @property
+    def missing(self) -> Tuple[str, ...]:
+        return tuple(
+            toolkit for toolkit, status in self.statuses.items() if status != _CONNECTED
+        )
+
+    def toolkit_of(self, tool_name: str) -> Optional[str]:
+        # Tool names are prefixed with their toolkit slug (`GOOGLECALENDAR_…`);
+        # the longest match wins for slugs that prefix each other.
+        name = tool_name.upper()
+        matches = [
+            toolkit for toolkit in self.statuses if name.startswith(f"{toolkit.upper()}_")
+        ]
+        return max(matches, key=len) if matches else None
+
+    def apply(self, declarations: List[McpBaseTool]) -> List[McpBaseTool]:
+        """
+        Prune (or flag) the tools of toolkits the user has not connected.
+        """
+
+        missing = set(self.missing)
+        if not missing:
+            return declarations
+        applied = []
+        for declaration in declarations:
+            toolkit = self.toolkit_of(declaration.name)
+            if toolkit not in missing:
+                applied.append(declaration)
+            elif self.unavailable_tools == "flag":
+                note = (
+                    f"[Unavailable: {toolkit} is not connected for this user; call "
+                    f"'{self.initiate_connection_tool_name}' instead.]"
+                )
+                description = f"{note} {declaration.description or ''}".strip()
+                applied.append(declaration.model_copy(update={"description": description}))
+        return applied
+
+    def instruction(self) -> str:
+        lines = ["Composio connection status for this user (checked during this run):"]
+        for toolkit, status in sorted(self.statuses.items()):
+            if status == _CONNECTED:
+                lines.append(f"- {toolkit}: connected")
+            elif status == _NOT_CONNECTED:
+                lines.append(f"- {toolkit}: not connected")
+            else:
+                lines.append(f"- {toolkit}: not connected ({status.lower()})")
+        hidden = (
+            "are not available"
+            if self.unavailable_tools == "prune"
+            else "are marked unavailable and will fail"
+        )
+        lines.append(
+            f"Tools of toolkits that are not connected {hidden}. When the request needs one, "
+            f"call '{self.initiate_connection_tool_name}' for that toolkit right away instead "
+            "of trying its tools."
+        )
+        return "\n".join(lines)
+
+
+class _ConnectionStatusLookup:
+    """
+    One invocation's connection status lookup, shared by its toolsets.
+
+    The lookup runs while the MCP URLs are generated. Before the first model
+    request the toolsets join it, waiting at most until `deadline` (loop time).
+    The first join settles the outcome for the whole invocation: the statuses, or
+    none when the lookup failed or was late. A late result still fills the user's
+    cache for later runs.
+    """
+
+    def __init__(
+        self, future: "asyncio.Future[Dict[str, _ConnectionStatus]]", deadline: float
+    ) -> None:
+        self._future = future
+        self._deadline = deadline
+        self._statuses: Optional[Dict[str, _ConnectionStatus]] = None
+
+    async def statuses(self) -> Dict[str, _ConnectionStatus]:
+        if self._statuses is None:
+            remaining = self._deadline - asyncio.get_running_loop().time()
+            if not self._future.done() and remaining > 0:
+                await asyncio.wait({self._future}, timeout=remaining)
+            if self._statuses is None:
+                self._statuses = self._outcome()
+        return self._statuses
+
+    def _outcome(self) -> Dict[str, _ConnectionStatus]:
+        if not self._future.done():
+            COMPOSIO_CONNECTION_LOOKUPS.labels("late").inc()
+            logger.info("Composio connection status not ready; running without it")
+            return {}
+        if self._future.cancelled() or self._future.exception() is not None:
+            return {}
+        # `_connection_status` logs its own failures and returns no status.
+        return self._future.result() or {}
+
+
+class _ToolSelection:
+    """
+    The Composio tools one invocation declares to the model.
+
+    A toolset whose config has more than `min_tools` tools declares the `top_k`
+    best matches for the turn's user message, the tools already called in the
+    session, the connection tool, and any tool the model enabled with the search
+    tool. The first such toolset also declares the search tool.
+    Smaller configs declare all their tools.
+    """
+
+    def __init__(
+        self, settings: ToolSelectionSettings, agent_context: str, pinned: Iterable[str]
+    ) -> None:
+        self.settings = settings
+        self.agent_context = agent_context
+        self.toolsets: List[_ComposioMcpToolset] = []
+        self.enabled: Set[str] = set(pinned)
+        self.embedder: Optional[Embedder] = None
+        if settings.embedder:
+            try:
+                self.embedder = load_embedder(settings.embedder)
+            except Exception:
+                logger.warning(
+                    "Could not load tool selection embedder %s; using lexical scoring only",
+                    settings.embedder,
+                    exc_info=True,
+                )
+        self._search_tool = _SearchToolsTool(self)
+        self._search_owner: Optional[_ComposioMcpToolset] = None
+
+    async def declared_tools(
+        self, toolset: _ComposioMcpToolset, readonly_context: ReadonlyContext
+    ) -> List[BaseTool]:
+        tools = toolset._tools or []
+        index = toolset._tool_index
+        if index is None:
+            declared = list(tools)
+        else:
+            if toolset._ranked is None:
+                toolset._ranked = set(
+                    await self._search(
+                        index,
+                        _user_message_text(readonly_context),
+                        self.settings.top_k,
+                        {tool.name for tool in tools},
+                    )
+                )
+            keep = toolset._ranked | self.enabled | _called_tool_names(readonly_context)
+            declared = [tool for tool in tools if tool.name in keep]
+            if self._search_owner is None:
+                self._search_owner = toolset
+        tokens = toolset._declaration_tokens
+        sent = [tool.name for tool in declared]
+        TOOL_DECLARATION_TOKENS.labels(self.agent_context, "available").inc(
+            sum(tokens.get(tool.name, 0) for tool in tools)
+        )
+        TOOL_DECLARATION_TOKENS.labels(self.agent_context, "sent").inc(
+            sum(tokens.get(name, 0) for name in sent)
+        )
+        if toolset is self._search_owner:
+            declared.append(self._search_tool)
+        return declared
+
+    async def search(self, query: str) -> Dict[str, Any]:
+        """
+        Enable and describe the undeclared tools that best match `query`.
+        """
+
+        TOOL_SEARCHES.labels(self.agent_context).inc()
+        rankings = []
+        for toolset in self.toolsets:
+            index = toolset._tool_index
+            if index is None or not toolset._tools:
+                continue
+            keep = (toolset._ranked or set()) | self.enabled
+            hidden = {tool.name for tool in toolset._tools if tool.name not in keep}
+            if hidden:
+                ranked = await self._search(index, query, self.settings.top_k, hidden)
+                descriptions = {tool.name: tool.description for tool in toolset._tools}
+                rankings.append([(name, descriptions.get(name) or "") for name in ranked])
+        found: List[Tuple[str, str]] = []
+        # Interleave the configs' rankings so one large config cannot crowd out the others.
+        for position in range(self.settings.top_k):
+            for ranking in rankings:
+                if position < len(ranking) and len(found) < self.settings.top_k:
+                    found.append(ranking[position])
+        self.enabled.update(name for name, _ in found)
+        if not found:
+            return {"tools": [], "message": "No other tools match. Try different keywords."}
+        return {
+            "tools": [{"name": name, "description": description} for name, description in found],
+            "message": "These tools are now available. Call them directly.",
+        }
+
+    async def _search(
+        self, index: ToolIndex, query: str, limit: int, candidates: Set[str]
+    ) -> List[str]:
+        if index.embedder is None:
+            return index.search(query, limit, candidates=candidates)
+        return await asyncio.to_thread(index.search, query, limit, candidates=candidates)
+
+
+class _SearchToolsTool(BaseTool):
+    """
+    Lets the model find and enable Composio tools that were not declared this turn.
+    """
+
+    def __init__(self, selection: _ToolSelection) -> None:
+        super().__init__(
+            name=SEARCH_TOOLS_TOOL_NAME,
+            description=(
+                "Search the user's connected apps for more tools when none of the declared "
+                "tools fits the task. Matching tools are enabled for the rest of this turn."
+            ),
+        )
+        self._selection = selection
+
+    def _get_declaration(self) -> types.FunctionDeclaration:
+        return types.FunctionDeclaration(
+            name=self.name,
+            description=self.description,
+            parameters=types.Schema(
+                type=types.Type.OBJECT,
+                properties={
+                    "query": types.Schema(
+                        type=types.Type.STRING,
+                        description="What the tool should do, e.g. 'create a notion page'.",
+                    )
+                },
+                required=["query"],
+            ),
+        )
+
+    async def run_async(self, *, args: Dict[str, Any], tool_context: ToolContext) -> Any:
+        return await self._selection.search(str(args.get("query") or ""))
+
+
+def _user_message_text(readonly_context: ReadonlyContext) -> str:
+    content = readonly_context.user_content
+    if content is None or not content.parts:
+        return ""
+    return " ".join(part.text for part in content.parts if part.text)
+
+
+def _called_tool_names(readonly_context: ReadonlyContext) -> Set[str]:
+    # Follow-ups ("yes, send it") rarely name the tool they need; keep the recent ones.
+    events = readonly_context._invocation_context.session.events[-_CALLED_TOOLS_WINDOW:]
+    return {call.name for event in events for call in event.get_function_calls() if call.name}
+
+
 class ComposioMCPIntegration:
     """
     Reusable Composio MCP lifecycle hooks that can be attached to any agent.
@@ -76,6 +672,33 @@ class ComposioMCPIntegration:
                 "ComposioMCPSettings.mcp_config_ids_env must be a non-empty environment variable name"
             )
         self._config_ids_env = config_ids_env
+        self._runtime: Optional[_ComposioRuntime] = None
+        register_env_specs(
+            settings.agent_context,
+            (
+                EnvVarSpec(
+                    name=config_ids_env,
+                    description=f"Composio MCP config ids for {settings.display_name}.",
+                    reloadable=True,
+                ),
+                EnvVarSpec(
+                    name=settings.test_user_env,
+                    description=f"Composio user id for unauthenticated {settings.display_name} requests.",
+                    reloadable=True,
+                ),
+                EnvVarSpec(
+                    name=settings.composio_api_key_env,
+                    description="Composio API key.",
+                    reloadable=True,
+                ),
+                EnvVarSpec(
+                    name=settings.composio_base_url_env,
+                    description="Composio API base URL override.",
+                    reloadable=True,
+                ),
+            ),
+        )
+        _integrations.add(self)
 
     @property
     def connection_instruction(self) -> str:
@@ -86,7 +709,7 @@ class ComposioMCPIntegration:
             self._settings.initiate_connection_tool_name
         )
 
-    def before_agent_callback(self, callback_context: CallbackContext) -> None:
+    async def before_agent_callback(self, callback_context: CallbackContext) -> None:
         agent = callback_context._invocation_context.agent
         invocation_id = callback_context._invocation_context.invocation_id
 
@@ -98,9 +721,30 @@ class ComposioMCPIntegration:
             return
 
         user_id_override = self._user_id_resolver()
-        toolsets = self._create_toolsets(invocation_id, user_id_override)
+        tracing.set_request_attributes({"agent.invocation_id": invocation_id})
+        bind_log_context(invocation_id=invocation_id)
+        # A status lookup that misses the cache runs on a worker thread while the
+        # MCP URLs are generated.
+        status_lookup = self._start_connection_status_lookup(user_id_override)
+        with tracing.span(
+            "composio.provision_toolsets",
+            {"agent.name": agent.name, "agent.invocation_id": invocation_id},
+        ):
+            toolsets = self._create_toolsets(invocation_id, user_id_override)
         if not toolsets:
             return
+        if status_lookup is not None:
+            for toolset in toolsets:
+                toolset.set_connection_status_lookup(status_lookup)
+        selection_settings = self._current_runtime().tool_selection_settings
+        if selection_settings.enabled:
+            selection = _ToolSelection(
+                selection_settings,
+                self._settings.agent_context,
+                pinned=(self._settings.initiate_connection_tool_name,),
+            )
+            for toolset in toolsets:
+                toolset.set_tool_selection(selection)
 
         agent.tools = agent.tools + toolsets
         logger.info(
@@ -110,24 +754,175 @@ class ComposioMCPIntegration:
             invocation_id,
         )
 
+    async def preload_tool_schemas(self, user_id: Optional[str] = None) -> int:
+        """
+        List and cache the MCP tool schemas of every config not cached yet.
+
+        `user_id` defaults to the configured test user. Returns the number of
+        configs listed.
+        """
+
+        pending = [
+            config_id
+            for _, config_id in self._iter_config_ids()
+            if _cached_tool_schemas(config_id) is None
+        ]
+        if not pending:
+            return 0
+        instances = await asyncio.to_thread(
+            lambda: list(self._generate_composio_mcp_instances(user_id))
+        )
+        listed = 0
+        for _, config_id, instance in instances:
+            if config_id not in pending:
+                continue
+            toolset = _ComposioMcpToolset(
+                agent_context=self._settings.agent_context,
+                owner_invocation_id="warmup",
+                config_id=config_id,
+                connection_params=StreamableHTTPConnectionParams(url=instance["url"]),
+            )
+            try:
+                await toolset.list_tool_schemas()
+            finally:
+                await toolset.release()
+            listed += 1
+        return listed
+
+    def _start_connection_status_lookup(
+        self, user_id_override: Optional[str]
+    ) -> Optional[_ConnectionStatusLookup]:
+        settings = self._current_runtime().connection_settings
+        if not settings.enabled or get_cassette() is not None:
+            # A status note would change the recorded requests cassettes match on.
+            return None
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + settings.status_wait_seconds
+        cached = self._connection_status(user_id_override, cached_only=True)
+        if cached is not None:
+            future = loop.create_future()
+            future.set_result(cached)
+            return _ConnectionStatusLookup(future, deadline)
+        context = contextvars.copy_context()
+        future = loop.run_in_executor(None, context.run, self._connection_status, user_id_override)
+        return _ConnectionStatusLookup(future, deadline)
+
+    def _connection_status(
+        self, user_id_override: Optional[str], *, cached_only: bool = False
+    ) -> Optional[Dict[str, _ConnectionStatus]]:
+        """
+        Connection status per config id. With `cached_only`, returns None instead
+        of calling the Composio API.
+        """
+
+        runtime = self._current_runtime()
+        settings = runtime.connection_settings
+        try:
+            user_id = self._resolve_effective_user_id(user_id_override)
+            auth_toolkits: Dict[str, Dict[str, str]] = {}
+            for _, config_id in self._iter_config_ids():
+                toolkits = _cached_auth_toolkits(runtime, config_id)
+                if toolkits is None:
+                    if cached_only:
+                        return None
+                    toolkits = self._auth_toolkits(runtime, config_id)
+                auth_toolkits[config_id] = toolkits
+            wanted = {
+                auth_config_id: toolkit
+                for toolkits in auth_toolkits.values()
+                for auth_config_id, toolkit in toolkits.items()
+            }
+            if not wanted:
+                return {}
+            statuses = _cached_connection_status(
+                user_id,
+                set(wanted.values()),
+                settings.status_ttl_seconds,
+                settings.not_connected_ttl_seconds,
+            )
+            if statuses is not None:
+                COMPOSIO_CONNECTION_LOOKUPS.labels("hit").inc()
+            elif cached_only:
+                return None
+            else:
+                COMPOSIO_CONNECTION_LOOKUPS.labels("miss").inc()
+                with tracing.span(
+                    "composio.connection_status", {"composio.toolkits": len(set(wanted.values()))}
+                ):
+                    statuses = _fetch_connection_status(runtime.client, user_id, wanted)
+                _store_connection_status(user_id, statuses)
+        except Exception:
+            # Without a status the agent falls back to the connection protocol.
+            logger.warning(
+                "Could not resolve Composio connection status for %s",
+                self._settings.display_name,
+                exc_info=True,
+            )
+            return {}
+        return {
+            config_id: _ConnectionStatus(
+                statuses={toolkit: statuses[toolkit] for toolkit in toolkits.values()},
+                unavailable_tools=settings.unavailable_tools,
+                initiate_connection_tool_name=self._settings.initiate_connection_tool_name,
+            )
+            for config_id, toolkits in auth_toolkits.items()
+            if toolkits
+        }
+
+    def _auth_toolkits(self, runtime: "_ComposioRuntime", config_id: str) -> Dict[str, str]:
+        toolkits = _cached_auth_toolkits(runtime, config_id)
+        if toolkits is None:
+            server = runtime.client.mcp.get(config_id)
+            toolkits = {}
+            for auth_config_id in server.auth_config_ids:
+                auth_config = runtime.client.auth_configs.get(auth_config_id)
+                if auth_config.auth_scheme != "NO_AUTH":
+                    toolkits[auth_config_id] = auth_config.toolkit.slug.lower()
+            _config_auth_toolkits[config_id] = (runtime.version, toolkits)
+        return toolkits
+
     def _create_toolsets(
         self,
         invocation_id: str,
         user_id_override: Optional[str],
     ):
+        cassette = get_cassette()
+        if cassette is not None and cassette.replaying:
+            # Replayed toolsets never connect, so skip the Composio API round trip.
+            instances = (
+                (label, config_id, {"url": f"cassette://{config_id}"})
+                for label, config_id in self._iter_config_ids()
+            )
+        else:
+            deferred: Set[str] = set()
+            if (
+                cassette is None
+                and self._current_runtime().connection_settings.speculative_provisioning
+            ):
+                # Tools can be declared before the URL exists only from cached schemas.
+                deferred = {
+                    config_id
+                    for _, config_id in self._iter_config_ids()
+                    if _cached_tool_schemas(config_id) is not None
+                }
+            instances = self._generate_composio_mcp_instances(
+                user_id_override, deferred=deferred
+            )
+
         toolsets = []
-        for config_label, config_id, instance in self._generate_composio_mcp_instances(
-            user_id_override
-        ):
-            toolset = McpToolset(
+        for config_label, config_id, instance in instances:
+            toolset = _ComposioMcpToolset(
+                agent_context=self._settings.agent_context,
+                owner_invocation_id=invocation_id,
+                config_id=config_id,
+                pending_url=instance.get("pending"),
                 connection_params=StreamableHTTPConnectionParams(
                     url=instance["url"],
-                )
+                ),
             )
-            setattr(toolset, "_composio_owner_invocation_id", invocation_id)
             setattr(toolset, "_composio_config_label", config_label)
-            setattr(toolset, "_composio_config_id", config_id)
             toolsets.append(toolset)
+            _open_toolsets.add(toolset)
         return toolsets
 
     async def after_agent_callback(self, callback_context: CallbackContext) -> None:
@@ -144,14 +939,19 @@ class ComposioMCPIntegration:
             tool for tool in agent.tools if tool not in owned_toolsets
         ]
 
-        for toolset in owned_toolsets:
-            try:
-                await toolset.close()
-            except Exception:  # pragma: no cover - defensive cleanup
-                logger.exception(
-                    "Failed to close Composio MCP toolset for invocation %s",
-                    invocation_id,
-                )
+        with tracing.span(
+            "composio.close_toolsets",
+            {"agent.name": agent.name, "agent.invocation_id": invocation_id},
+        ):
+            for toolset in owned_toolsets:
+                _open_toolsets.discard(toolset)
+                try:
+                    await toolset.release()
+                except Exception:  # pragma: no cover - defensive cleanup
+                    logger.exception(
+                        "Failed to close Composio MCP toolset for invocation %s",
+                        invocation_id,
+                    )
 
         logger.info(
             "Closed %d Composio MCP toolset(s) for %s invocation %s",
@@ -163,28 +963,57 @@ class ComposioMCPIntegration:
     def _generate_composio_mcp_instances(
         self,
         user_id_override: Optional[str],
+        *,
+        deferred: Collection[str] = (),
     ):
-        composio_client = Composio(
-            api_key=require_env(
-                self._settings.composio_api_key_env,
-                context=self._settings.agent_context,
-            )
-        )
+        """
+        Yield `(label, config_id, instance)` with each config's generated MCP URL.
+
+        Configs in `deferred` are generated on a worker thread instead: their
+        instance has a placeholder URL and the generation future as `"pending"`.
+        """
 
+        composio_client = self._current_runtime().client
         user_id = self._resolve_effective_user_id(user_id_override)
 
         for label, config_id in self._iter_config_ids():
+            if config_id in deferred:
+                context = contextvars.copy_context()
+                pending = asyncio.get_running_loop().run_in_executor(
+                    None,
+                    context.run,
+                    self._generate_composio_mcp_instance,
+                    composio_client,
+                    user_id,
+                    label,
+                    config_id,
+                )
+                pending.add_done_callback(
+                    lambda future, label=label: _log_failed_generation(future, label)
+                )
+                yield label, config_id, {"url": f"pending://{config_id}", "pending": pending}
+            else:
+                yield label, config_id, self._generate_composio_mcp_instance(
+                    composio_client, user_id, label, config_id
+                )
+
+    def _generate_composio_mcp_instance(
+        self, composio_client: Composio, user_id: str, label: str, config_id: str
+    ) -> Dict[str, Any]:
+        with MCP_GENERATE_SECONDS.labels(config_id).time(), tracing.span(
+            "composio.mcp_generate", {"composio.mcp_config_id": config_id}
+        ):
             instance = composio_client.mcp.generate(
                 user_id=user_id,
                 mcp_config_id=config_id,
             )
-            logger.info(
-                "MCP Server URL for %s (config %s): %s",
-                self._settings.display_name,
-                label,
-                instance.get("url"),
-            )
-            yield label, config_id, instance
+        logger.debug(
+            "MCP Server URL for %s (config %s): %s",
+            self._settings.display_name,
+            label,
+            instance.get("url"),
+        )
+        return instance
 
     def _resolve_effective_user_id(
         self,
@@ -196,10 +1025,10 @@ class ComposioMCPIntegration:
             )
             return user_id_override
 
-        fallback_user_id = os.getenv(self._settings.test_user_env)
-        if fallback_user_id and fallback_user_id.strip():
+        fallback_user_id = self._current_runtime().test_user_id
+        if fallback_user_id:
             logger.debug("Using configured test MCP user id for MCP session.")
-            return fallback_user_id.strip()
+            return fallback_user_id
 
         raise RuntimeError(
             "Unable to resolve Composio MCP user id. Ensure the request is authenticated, "
@@ -212,7 +1041,7 @@ class ComposioMCPIntegration:
         invocation_id: str,
     ) -> bool:
         return any(
-            isinstance(tool, McpToolset)
+            isinstance(tool, _ComposioMcpToolset)
             and getattr(tool, "_composio_owner_invocation_id", None)
             == invocation_id
             for tool in tools
@@ -225,7 +1054,7 @@ class ComposioMCPIntegration:
     ):
         for tool in tools:
             if (
-                isinstance(tool, McpToolset)
+                isinstance(tool, _ComposioMcpToolset)
                 and getattr(tool, "_composio_owner_invocation_id", None)
                 == invocation_id
             ):
@@ -234,27 +1063,287 @@ class ComposioMCPIntegration:
     # Extract/parse helpers moved to shared.tool_response_utils
 
     def _iter_config_ids(self):
-        raw_value = require_env(
-            self._config_ids_env,
-            context=self._settings.agent_context,
+        runtime = self._current_runtime()
+        if runtime.config_ids_error is not None:
+            raise RuntimeError(runtime.config_ids_error)
+        return iter(runtime.config_ids)
+
+    def _current_runtime(self) -> "_ComposioRuntime":
+        config = get_config()
+        runtime = self._runtime
+        if runtime is None or runtime.version != config.version:
+            runtime = self._runtime = _ComposioRuntime.from_config(
+                config, self._settings, self._config_ids_env
+            )
+        return runtime
+
+
+@dataclass(frozen=True)
+class _ComposioRuntime:
+    """
+    Composio values parsed from one configuration snapshot, with its API client.
+    """
+
+    version: int
+    context: str
+    config_ids: Tuple[Tuple[str, str], ...]
+    config_ids_error: Optional[str]
+    api_key_env: str
+    api_key: Optional[str]
+    base_url: Optional[str]
+    test_user_id: Optional[str]
+    connection_settings: ComposioConnectionSettings
+    tool_selection_settings: ToolSelectionSettings
+
+    @classmethod
+    def from_config(
+        cls, config: ConfigSnapshot, settings: ComposioMCPSettings, config_ids_env: str
+    ) -> "_ComposioRuntime":
+        config_ids: Tuple[Tuple[str, str], ...] = ()
+        config_ids_error: Optional[str] = None
+        raw_value = config.get(config_ids_env)
+        if not raw_value:
+            config_ids_error = (
+                f"Environment variable '{config_ids_env}' must be set to initialize "
+                f"{settings.agent_context}."
+            )
+        else:
+            candidates = [part.strip() for part in re.split(r"[,\s]+", raw_value) if part.strip()]
+            if not candidates:
+                config_ids_error = (
+                    f"Environment variable '{config_ids_env}' must contain at least one Composio MCP config id."
+                )
+            config_ids = tuple(
+                (f"{config_ids_env}[{index}]", config_id)
+                for index, config_id in enumerate(candidates, start=1)
+            )
+        test_user_id = (config.get(settings.test_user_env) or "").strip() or None
+        return cls(
+            version=config.version,
+            context=settings.agent_context,
+            config_ids=config_ids,
+            config_ids_error=config_ids_error,
+            api_key_env=settings.composio_api_key_env,
+            api_key=config.get(settings.composio_api_key_env),
+            base_url=config.get(settings.composio_base_url_env),
+            test_user_id=test_user_id,
+            connection_settings=load_composio_connection_settings(),
+            tool_selection_settings=load_tool_selection_settings(),
         )
-        candidates = [
-            part.strip()
-            for part in re.split(r"[,\s]+", raw_value)
-            if part and part.strip()
-        ]
 
-        if not candidates:
+    @cached_property
+    def client(self) -> Composio:
+        if not self.api_key:
             raise RuntimeError(
-                f"Environment variable '{self._config_ids_env}' must contain at least one Composio MCP config id."
+                f"Environment variable '{self.api_key_env}' must be set to initialize {self.context}."
+            )
+        return Composio(api_key=self.api_key, base_url=self.base_url)
+
+
+def _log_failed_generation(future: "asyncio.Future[Dict[str, Any]]", label: str) -> None:
+    # Also retrieves the exception, which tool calls may never do.
+    if not future.cancelled() and future.exception() is not None:
+        logger.warning(
+            "Background MCP URL generation failed for config %s",
+            label,
+            exc_info=future.exception(),
+        )
+
+
+def _cached_connection_status(
+    user_id: str, toolkits: Iterable[str], ttl: float, not_connected_ttl: float
+) -> Optional[Dict[str, str]]:
+    """
+    The cached status if every toolkit was checked recently enough: within `ttl`
+    seconds if it was connected, within `not_connected_ttl` seconds otherwise.
+    """
+
+    now = time.monotonic()
+    statuses: Dict[str, str] = {}
+    with _toolkit_statuses_lock:
+        cached = _toolkit_statuses.get(user_id)
+        if cached is None:
+            return None
+        _toolkit_statuses.move_to_end(user_id)
+        for toolkit in toolkits:
+            status, checked_at = cached.get(toolkit, (None, None))
+            if status is None:
+                return None
+            if now - checked_at >= (ttl if status == _CONNECTED else not_connected_ttl):
+                return None
+            statuses[toolkit] = status
+    return statuses
+
+
+def _store_connection_status(user_id: str, statuses: Mapping[str, str]) -> None:
+    now = time.monotonic()
+    with _toolkit_statuses_lock:
+        cached = _toolkit_statuses.setdefault(user_id, {})
+        _toolkit_statuses.move_to_end(user_id)
+        for toolkit, status in statuses.items():
+            cached[toolkit] = (status, now)
+        while len(_toolkit_statuses) > _MAX_STATUS_USERS:
+            _toolkit_statuses.popitem(last=False)
+
+
+def _fetch_connection_status(
+    client: Composio, user_id: str, auth_toolkits: Mapping[str, str]
+) -> Dict[str, str]:
+    """
+    Status of each toolkit from the user's accounts under the configs' auth configs.
+    """
+
+    statuses = {toolkit: _NOT_CONNECTED for toolkit in auth_toolkits.values()}
+    cursor: Optional[str] = None
+    while True:
+        options: Dict[str, Any] = {"cursor": cursor} if cursor else {}
+        page = client.connected_accounts.list(
+            user_ids=[user_id], auth_config_ids=list(auth_toolkits), **options
+        )
+        for account in page.items:
+            toolkit = auth_toolkits.get(account.auth_config.id) or account.toolkit.slug.lower()
+            if statuses.get(toolkit, _CONNECTED) == _CONNECTED:
+                continue
+            if account.status == _CONNECTED and not account.is_disabled:
+                statuses[toolkit] = _CONNECTED
+            elif statuses[toolkit] == _NOT_CONNECTED:
+                statuses[toolkit] = "DISABLED" if account.is_disabled else account.status
+        cursor = page.next_cursor
+        if not cursor or not page.items:
+            return statuses
+
+
+def _cached_tool_schemas(config_id: str) -> Optional[List[McpBaseTool]]:
+    entry = _tool_schemas.get(config_id)
+    if entry is None or entry[0] != get_config().version:
+        return None
+    return entry[1]
+
+
+def _cached_auth_toolkits(runtime: "_ComposioRuntime", config_id: str) -> Optional[Dict[str, str]]:
+    entry = _config_auth_toolkits.get(config_id)
+    if entry is None or entry[0] != runtime.version:
+        return None
+    return entry[1]
+
+
+def invalidate_tool_schemas() -> None:
+    """
+    Forget the cached tool schemas and auth toolkits of every MCP config.
+
+    Called when an agent is reloaded; each config is listed again on its next run.
+    """
+
+    _tool_schemas.clear()
+    _config_auth_toolkits.clear()
+
+
+def invalidate_connection_status(user_id: str) -> None:
+    """
+    Forget the cached connection status of a user, e.g. after they link a toolkit.
+    """
+
+    with _toolkit_statuses_lock:
+        _toolkit_statuses.pop(user_id, None)
+
+
+async def close_open_toolsets() -> int:
+    """
+    Close MCP toolsets whose invocations never reached `after_agent_callback`.
+
+    Called on worker shutdown so runs cancelled at the drain deadline do not leave
+    MCP sessions open. Returns the number of toolsets closed.
+    """
+
+    toolsets = list(_open_toolsets)
+    _open_toolsets.clear()
+    for toolset in toolsets:
+        try:
+            await toolset.release()
+        except Exception:  # pragma: no cover - defensive cleanup
+            logger.exception(
+                "Failed to close Composio MCP toolset for invocation %s",
+                getattr(toolset, "_composio_owner_invocation_id", None),
             )
+    if toolsets:
+        logger.info("Closed %d open Composio MCP toolset(s) on shutdown", len(toolsets))
+    return len(toolsets)
+
+
+def _memory_usage() -> Dict[str, Any]:
+    """
+    Live toolsets and MCP sessions, and the size of this module's caches.
+    """
+
+    now = time.monotonic()
+    open_toolsets = list(_open_toolsets)
+    toolsets = list(_toolsets)
+    released = [toolset for toolset in toolsets if toolset._released]
+    return {
+        "open_toolsets": len(open_toolsets),
+        "oldest_open_toolset_seconds": (
+            round(now - min(toolset._created_at for toolset in open_toolsets), 1)
+            if open_toolsets
+            else None
+        ),
+        "live_mcp_sessions": sum(toolset.live_mcp_sessions for toolset in toolsets),
+        "released_toolsets_alive": len(released),
+        "released_toolsets_with_sessions": sum(1 for toolset in released if toolset.live_mcp_sessions),
+        "tool_schema_configs": len(_tool_schemas),
+        "tool_schemas": sum(len(tools) for _, tools in _tool_schemas.values()),
+        "tool_schema_bytes": sum(
+            len(tool.model_dump_json(exclude_none=True))
+            for _, tools in list(_tool_schemas.values())
+            for tool in tools
+        ),
+        "tool_indexes": len(_tool_indexes),
+        "config_auth_toolkits": len(_config_auth_toolkits),
+        "connection_status_users": len(_toolkit_statuses),
+        **_sdk_telemetry_usage(),
+    }
+
+
+def _sdk_telemetry_usage() -> Dict[str, Any]:
+    # The Composio SDK queues a telemetry event per API call for a sender thread.
+    # The queue is unbounded, and the thread stops at its first network error.
+    telemetry = sys.modules.get("composio.core.models._telemetry")
+    queue = getattr(telemetry, "_queue", None)
+    if queue is None:
+        return {}
+    thread = getattr(telemetry, "_thread", None)
+    return {
+        "sdk_telemetry_queue": queue.qsize(),
+        "sdk_telemetry_sender_alive": thread is not None and thread.is_alive(),
+    }
+
+
+register_memory_component("composio_mcp", _memory_usage)
+
+
+async def preload_tool_schemas(user_id: Optional[str] = None) -> int:
+    """
+    Preload MCP tool schemas for every loaded agent's Composio integration.
+
+    Integrations without a usable user id (no `user_id` and no test user) are
+    skipped. Returns the number of configs listed.
+    """
 
-        for index, config_id in enumerate(candidates, start=1):
-            yield f"{self._config_ids_env}[{index}]", config_id
+    listed = 0
+    for integration in list(_integrations):
+        try:
+            listed += await integration.preload_tool_schemas(user_id)
+        except RuntimeError as exc:
+            logger.info("Skipping Composio tool schema preload: %s", exc)
+    return listed
 
 
 __all__ = [
     "ComposioMCPIntegration",
     "ComposioMCPSettings",
+    "SEARCH_TOOLS_TOOL_NAME",
+    "close_open_toolsets",
     "composio_connection_instruction",
+    "invalidate_connection_status",
+    "invalidate_tool_schemas",
+    "preload_tool_schemas",
 ]
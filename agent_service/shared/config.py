@@ -0,0 +1,278 @@
+"""
+Immutable configuration snapshot shared by every invocation in a worker.
+
+The snapshot holds the values of the declared environment variables: the shared
+ones in `shared.env.SHARED_ENVIRONMENT_VARIABLES` plus the `EnvVarSpec`s each
+agent (and each Composio integration) registers at import with
+`register_env_specs`. It is built once, validated and frozen. Request-time code
+reads `get_config()` instead of `os.environ`. Values derived from it, such as
+parsed id lists or API clients, are cached until `ConfigSnapshot.version` changes,
+so invocations do no environment or parsing work.
+
+`reload_config()` re-reads the `.env` files applied so far, then validates the
+result: required variables are set and the shared settings loaders accept their
+values. Only then is the current snapshot replaced. Invalid configuration raises
+`ConfigError` and leaves the current snapshot in place. A reload runs on SIGHUP
+(see `reloading_on_sighup`) and via `POST /admin/config/reload`.
+
+Only variables declared `reloadable` (the Composio ones, read through the
+snapshot per request) take effect on a reload. Everything else, such as agent
+routes and models or the admission, streaming and session settings built at
+startup, keeps the value the worker started with: a reload that changes one is
+logged and reported in `ConfigSnapshot.restart_required` until the restart.
+"""
+
+import asyncio
+import logging
+import os
+import signal
+import threading
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import (
+    Any,
+    AsyncIterator,
+    Dict,
+    FrozenSet,
+    Iterable,
+    List,
+    Mapping,
+    Optional,
+    Tuple,
+)
+
+from fastapi import FastAPI
+
+from .env import SHARED_ENVIRONMENT_VARIABLES, EnvVarSpec, reload_env_files
+
+logger = logging.getLogger(__name__)
+
+SHARED_OWNER = "shared"
+
+_specs: Dict[str, Tuple[str, EnvVarSpec]] = {
+    spec.name: (SHARED_OWNER, spec) for spec in SHARED_ENVIRONMENT_VARIABLES
+}
+_snapshot: Optional["ConfigSnapshot"] = None
+# Value in effect for each restart-only variable: the one seen when it was declared.
+_started_with: Dict[str, Optional[str]] = {}
+_lock = threading.RLock()
+
+
+class ConfigError(RuntimeError):
+    """
+    Raised when the environment does not form a valid configuration.
+    """
+
+    def __init__(self, problems: List[str]) -> None:
+        super().__init__("; ".join(problems))
+        self.problems = problems
+
+
+@dataclass(frozen=True)
+class ConfigSnapshot:
+    """
+    Values of every declared environment variable at one point in time.
+    """
+
+    version: int
+    loaded_at: float
+    values: Mapping[str, str]
+    owners: Mapping[str, str]
+    required: FrozenSet[str]
+    reloadable: FrozenSet[str] = frozenset()
+    restart_required: FrozenSet[str] = frozenset()
+
+    def get(self, name: str, default: Optional[str] = None) -> Optional[str]:
+        if name not in self.owners:
+            raise KeyError(f"'{name}' is not a declared configuration variable")
+        return self.values.get(name, default)
+
+    def require(self, name: str, *, context: str) -> str:
+        """
+        Like `shared.env.require_env`, against the snapshot.
+        """
+
+        value = self.get(name)
+        if value:
+            return value
+        raise RuntimeError(
+            f"Environment variable '{name}' must be set to initialize {context}."
+        )
+
+    def describe(self) -> Dict[str, Any]:
+        """
+        Which variables are declared, by whom, and whether they are set (no values).
+        """
+
+        return {
+            "version": self.version,
+            "loaded_at": self.loaded_at,
+            "restart_required": sorted(self.restart_required),
+            "variables": [
+                {
+                    "name": name,
+                    "owner": owner,
+                    "required": name in self.required,
+                    "set": name in self.values,
+                    "reloadable": name in self.reloadable,
+                }
+                for name, owner in sorted(self.owners.items())
+            ],
+        }
+
+
+def get_config() -> ConfigSnapshot:
+    """
+    The current snapshot, built on first use.
+    """
+
+    snapshot = _snapshot
+    if snapshot is None:
+        with _lock:
+            snapshot = _snapshot or _swap(_build(version=1))
+    return snapshot
+
+
+def register_env_specs(owner: str, specs: Iterable[EnvVarSpec]) -> ConfigSnapshot:
+    """
+    Declare an agent's environment variables and add them to the snapshot.
+
+    A variable declared before (e.g. a shared one) keeps its first declaration.
+    Raises `ConfigError` when a required variable is not set.
+    """
+
+    specs = tuple(specs)
+    missing = [
+        f"Environment variable '{spec.name}' must be set to initialize {owner}."
+        for spec in specs
+        if spec.required and not os.getenv(spec.name)
+    ]
+    if missing:
+        raise ConfigError(missing)
+    with _lock:
+        for spec in specs:
+            _specs.setdefault(spec.name, (owner, spec))
+        current = get_config()
+        return _swap(_build(version=current.version + 1))
+
+
+def reload_config() -> ConfigSnapshot:
+    """
+    Re-read `.env` files and replace the snapshot if the result is valid.
+    """
+
+    with _lock:
+        reload_env_files()
+        snapshot = _build(version=get_config().version + 1)
+        problems = [
+            f"Required environment variable '{name}' ({snapshot.owners[name]}) is not set."
+            for name in sorted(snapshot.required - snapshot.values.keys())
+        ]
+        problems.extend(_settings_problems())
+        if problems:
+            raise ConfigError(problems)
+        _swap(snapshot)
+    logger.info("Reloaded configuration (version %d)", snapshot.version)
+    if snapshot.restart_required:
+        logger.warning(
+            "Changed configuration variables take effect only after a restart: %s",
+            ", ".join(sorted(snapshot.restart_required)),
+        )
+    return snapshot
+
+
+@asynccontextmanager
+async def reloading_on_sighup(app: FastAPI) -> AsyncIterator[None]:
+    """
+    Lifespan hook reloading the configuration when the worker receives SIGHUP.
+    """
+
+    loop = asyncio.get_running_loop()
+    try:
+        loop.add_signal_handler(signal.SIGHUP, _reload_from_signal)
+    except (AttributeError, NotImplementedError, RuntimeError, ValueError):
+        # No SIGHUP on this platform, or the loop is not on the main thread.
+        yield
+        return
+    try:
+        yield
+    finally:
+        loop.remove_signal_handler(signal.SIGHUP)
+
+
+def _reload_from_signal() -> None:
+    try:
+        reload_config()
+    except ConfigError as exc:
+        logger.error("Ignoring SIGHUP configuration reload: %s", exc)
+
+
+def _build(*, version: int) -> ConfigSnapshot:
+    owners = {name: owner for name, (owner, _) in _specs.items()}
+    values = {name: os.environ[name] for name in owners if os.environ.get(name)}
+    reloadable = frozenset(name for name, (_, spec) in _specs.items() if spec.reloadable)
+    for name in owners.keys() - reloadable - _started_with.keys():
+        _started_with[name] = values.get(name)
+    return ConfigSnapshot(
+        version=version,
+        loaded_at=time.time(),
+        values=MappingProxyType(values),
+        owners=MappingProxyType(owners),
+        required=frozenset(name for name, (_, spec) in _specs.items() if spec.required),
+        reloadable=reloadable,
+        restart_required=frozenset(
+            name
+            for name in owners.keys() - reloadable
+            if values.get(name) != _started_with[name]
+        ),
+    )
+
+
+def _swap(snapshot: ConfigSnapshot) -> ConfigSnapshot:
+    global _snapshot
+    _snapshot = snapshot
+    return snapshot
+
+
+def _settings_problems() -> List[str]:
+    from . import settings
+
+    loaders = (
+        settings.load_supabase_auth_settings,
+        settings.load_admin_settings,
+        settings.load_session_service_settings,
+        settings.load_history_compaction_settings,
+        settings.load_admission_settings,
+        settings.load_metrics_settings,
+        settings.load_tracing_settings,
+        settings.load_profiling_settings,
+        settings.load_cassette_settings,
+        settings.load_warmup_settings,
+        settings.load_streaming_settings,
+        settings.load_job_settings,
+        settings.load_composio_connection_settings,
+        settings.load_tool_selection_settings,
+        settings.load_usage_settings,
+        settings.load_logging_settings,
+        settings.load_loop_monitor_settings,
+        settings.load_run_coalescing_settings,
+    )
+    problems = []
+    for loader in loaders:
+        try:
+            loader()
+        except RuntimeError as exc:
+            problems.append(str(exc))
+    return problems
+
+
+__all__ = [
+    "ConfigError",
+    "ConfigSnapshot",
+    "get_config",
+    "register_env_specs",
+    "reload_config",
+    "reloading_on_sighup",
+]
@@ -1,10 +1,88 @@
 import os
+import threading
 from dataclasses import dataclass
-from typing import Dict, Iterable, Tuple
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple, Union
 
-from dotenv import load_dotenv
+from dotenv import dotenv_values
 
-load_dotenv()
+# The real process environment, which always wins over values from .env files.
+_PROCESS_ENVIRONMENT = dict(os.environ)
+_env_files: List[Path] = []
+# Variables each applied file set, so a reload can unset the ones it no longer defines.
+_env_file_keys: Dict[Path, Set[str]] = {}
+_env_files_lock = threading.Lock()
+
+
+def load_env_file(start: Union[str, Path]) -> Optional[Path]:
+    """
+    Apply the nearest `.env` at or above `start` (a file or directory) once.
+
+    Like `load_dotenv()`, variables already set in the process environment are
+    kept. Repeated calls for an already applied file return immediately, and
+    `reload_env_files` re-reads every file applied so far.
+    """
+
+    directory = Path(start).resolve()
+    if not directory.is_dir():
+        directory = directory.parent
+    for candidate in (directory, *directory.parents):
+        dotenv_path = candidate / ".env"
+        if dotenv_path in _env_files:
+            return dotenv_path
+        if dotenv_path.is_file():
+            with _env_files_lock:
+                if dotenv_path not in _env_files:
+                    _apply_env_file(dotenv_path)
+                    _env_files.append(dotenv_path)
+            return dotenv_path
+    return None
+
+
+def reload_env_files() -> List[Path]:
+    """
+    Re-read every applied `.env` file, updating variables that came from them.
+
+    The files are resolved in the order they were first applied, as on a fresh
+    start. Variables no file defines any more are unset. Variables set in the
+    real process environment are left untouched.
+    """
+
+    with _env_files_lock:
+        loaded = set().union(*_env_file_keys.values())
+        values: Dict[str, str] = {}
+        for dotenv_path in _env_files:
+            owned = _env_file_keys[dotenv_path] = set()
+            for name, value in _read_env_file(dotenv_path).items():
+                if name in values or (name in os.environ and name not in loaded):
+                    continue
+                values[name] = value
+                owned.add(name)
+        for name in loaded - values.keys():
+            os.environ.pop(name, None)
+        os.environ.update(values)
+        return list(_env_files)
+
+
+def _apply_env_file(dotenv_path: Path) -> None:
+    owned = _env_file_keys.setdefault(dotenv_path, set())
+    for name, value in _read_env_file(dotenv_path).items():
+        if name not in os.environ:
+            os.environ[name] = value
+            owned.add(name)
+
+
+def _read_env_file(dotenv_path: Path) -> Dict[str, str]:
+    if not dotenv_path.is_file():
+        return {}
+    return {
+        name: value
+        for name, value in dotenv_values(dotenv_path).items()
+        if value is not None and name not in _PROCESS_ENVIRONMENT
+    }
+
+
+load_env_file(Path(__file__).resolve().parent)
 
 
 def require_env(var_name: str, *, context: str) -> str:
@@ -65,6 +143,9 @@ class EnvVarSpec:
     name: str
     description: str
     required: bool = False
+    # Read through `shared.config.get_config()` at request time, so a
+    # configuration reload applies it; other variables need a restart.
+    reloadable: bool = False
 
 
 SHARED_ENVIRONMENT_VARIABLES: Tuple[EnvVarSpec, ...] = (
@@ -106,6 +187,346 @@ SHARED_ENVIRONMENT_VARIABLES: Tuple[EnvVarSpec, ...] = (
         name="SUPABASE_AUTH_HTTP_TIMEOUT",
         description="Timeout (seconds) for Supabase user validation HTTP requests.",
     ),
+    EnvVarSpec(
+        name="AGENT_ADMIN_USER_IDS",
+        description="Comma-separated Supabase user ids allowed to call the /admin routes.",
+    ),
+    EnvVarSpec(
+        name="AGENT_SESSION_BACKEND",
+        description="Session storage backend shared by all agents: memory (default), sqlite, database or redis.",
+    ),
+    EnvVarSpec(
+        name="AGENT_SESSION_SQLITE_PATH",
+        description="SQLite database file used when AGENT_SESSION_BACKEND=sqlite.",
+    ),
+    EnvVarSpec(
+        name="AGENT_SESSION_DATABASE_URL",
+        description="SQLAlchemy database URL used when AGENT_SESSION_BACKEND=database.",
+    ),
+    EnvVarSpec(
+        name="AGENT_SESSION_REDIS_URL",
+        description="redis:// URL of the Redis-compatible server used when AGENT_SESSION_BACKEND=redis.",
+    ),
+    EnvVarSpec(
+        name="AGENT_SESSION_REDIS_PREFIX",
+        description="Key prefix for sessions stored in Redis.",
+    ),
+    EnvVarSpec(
+        name="AGENT_SESSION_REDIS_POOL_SIZE",
+        description="Maximum Redis connections per worker for the session store.",
+    ),
+    EnvVarSpec(
+        name="AGENT_SESSION_IDLE_TTL",
+        description="Seconds without activity after which a session is deleted.",
+    ),
+    EnvVarSpec(
+        name="AGENT_SESSION_CLEANUP_INTERVAL",
+        description="Seconds between sweeps for idle sessions.",
+    ),
+    EnvVarSpec(
+        name="AGENT_SESSION_MAX_COUNT",
+        description="Maximum sessions tracked per worker before least recently used ones are evicted (0 = unlimited).",
+    ),
+    EnvVarSpec(
+        name="AGENT_SESSION_MAX_MEMORY_MB",
+        description="Approximate session memory per worker before least recently used sessions are evicted (0 = unlimited).",
+    ),
+    EnvVarSpec(
+        name="AGENT_HISTORY_WINDOW",
+        description="Most recent conversation entries sent to the model each turn (0 = all).",
+    ),
+    EnvVarSpec(
+        name="AGENT_HISTORY_SUMMARY_TOKENS",
+        description="Estimated history tokens above which older turns are summarized (0 = never).",
+    ),
+    EnvVarSpec(
+        name="AGENT_HISTORY_SUMMARY_RETAIN",
+        description="Share of the summary threshold kept as verbatim recent history (default 0.5).",
+    ),
+    EnvVarSpec(
+        name="AGENT_HISTORY_SUMMARY_MAX_CHARS",
+        description="Maximum length of the running summary of older turns.",
+    ),
+    EnvVarSpec(
+        name="AGENT_MAX_RUNS_PER_USER",
+        description="Concurrent agent runs allowed per user on each worker (0 = unlimited).",
+    ),
+    EnvVarSpec(
+        name="AGENT_MAX_RUNS_PER_AGENT",
+        description="Concurrent runs allowed per agent on each worker (0 = unlimited).",
+    ),
+    EnvVarSpec(
+        name="AGENT_ADMISSION_QUEUE_SIZE",
+        description="Runs allowed to wait for a free slot before new ones are rejected with 429.",
+    ),
+    EnvVarSpec(
+        name="AGENT_ADMISSION_QUEUE_TIMEOUT",
+        description="Seconds a queued run may wait for a slot before it is rejected with 429.",
+    ),
+    EnvVarSpec(
+        name="AGENT_METRICS_ENABLED",
+        description="Serve Prometheus metrics without authentication (default true).",
+    ),
+    EnvVarSpec(
+        name="AGENT_METRICS_PATH",
+        description="Path of the Prometheus metrics endpoint (default /metrics).",
+    ),
+    EnvVarSpec(
+        name="AGENT_TRACING_ENABLED",
+        description="Export OpenTelemetry spans for requests, Composio callbacks, tools and model calls.",
+    ),
+    EnvVarSpec(
+        name="AGENT_TRACING_EXPORTER",
+        description="Span exporter: console, file (OTLP JSON lines) or otlp (OTLP/HTTP).",
+    ),
+    EnvVarSpec(
+        name="AGENT_TRACING_FILE",
+        description="Output file for the `file` span exporter.",
+    ),
+    EnvVarSpec(
+        name="AGENT_TRACING_SAMPLE_RATIO",
+        description="Share of new traces recorded (0-1); propagated parent decisions are kept.",
+    ),
+    EnvVarSpec(
+        name="AGENT_PROFILING_SECRET",
+        description="HMAC key for X-Agent-Profile headers; unset disables header-triggered profiles.",
+    ),
+    EnvVarSpec(
+        name="AGENT_PROFILE_DIR",
+        description="Directory where per-request speedscope profiles are stored.",
+    ),
+    EnvVarSpec(
+        name="AGENT_PROFILE_INTERVAL_MS",
+        description="Sampling interval of per-request CPU profiles in milliseconds.",
+    ),
+    EnvVarSpec(
+        name="AGENT_PROFILE_MAX_SECONDS",
+        description="Sampling stops after this many seconds of a profiled run.",
+    ),
+    EnvVarSpec(
+        name="AGENT_PROFILE_KEEP",
+        description="Number of most recent profiles kept on disk.",
+    ),
+    EnvVarSpec(
+        name="AGENT_CASSETTE_MODE",
+        description="Record LLM and MCP traffic to a cassette, or replay it instead of calling them: off, record or replay.",
+    ),
+    EnvVarSpec(
+        name="AGENT_CASSETTE_PATH",
+        description="Cassette file written in record mode and read in replay mode (.gz to compress).",
+    ),
+    EnvVarSpec(
+        name="AGENT_CASSETTE_TIME_SCALE",
+        description="Multiplier applied to recorded LLM and tool timings on replay (0 = no delays).",
+    ),
+    EnvVarSpec(
+        name="AGENT_WARMUP_ENABLED",
+        description="Warm up agents, sessions, Supabase, LLM connections and Composio tool schemas before /readyz reports ready.",
+    ),
+    EnvVarSpec(
+        name="AGENT_WARMUP_STEPS",
+        description="Comma separated warm-up steps to run: agents, sessions, supabase, llm, composio.",
+    ),
+    EnvVarSpec(
+        name="AGENT_WARMUP_DEADLINE_SECONDS",
+        description="Seconds after startup when /readyz reports ready in degraded mode even if warm-up is unfinished.",
+    ),
+    EnvVarSpec(
+        name="AGENT_WARMUP_LLM_PING",
+        description="Send a one-token request through each shared model instance during warm-up (default off).",
+    ),
+    EnvVarSpec(
+        name="AGENT_WARMUP_COMPOSIO_USER_ID",
+        description="Composio user id used to list MCP tool schemas during warm-up (defaults to each agent's test user).",
+    ),
+    EnvVarSpec(
+        name="COMPOSIO_API_KEY",
+        description="Composio API key used to provision per-user MCP servers.",
+        reloadable=True,
+    ),
+    EnvVarSpec(
+        name="COMPOSIO_BASE_URL",
+        description="Composio API base URL override (e.g. the load-test fake).",
+        reloadable=True,
+    ),
+    EnvVarSpec(
+        name="AGENT_SSE_COALESCE_MS",
+        description="Milliseconds AG-UI text deltas of one message are merged before being sent (0 = off).",
+    ),
+    EnvVarSpec(
+        name="AGENT_SSE_COALESCE_MAX_BYTES",
+        description="Pending text delta bytes that flush a merged event before the window ends.",
+    ),
+    EnvVarSpec(
+        name="AGENT_SSE_COMPRESSION",
+        description="Gzip AG-UI event streams for clients sending Accept-Encoding: gzip.",
+    ),
+    EnvVarSpec(
+        name="AGENT_SSE_COMPRESSION_LEVEL",
+        description="zlib compression level (1-9) for event streams.",
+    ),
+    EnvVarSpec(
+        name="AGENT_JOBS_ENABLED",
+        description="Serve the /jobs API for background agent runs.",
+    ),
+    EnvVarSpec(
+        name="AGENT_JOBS_CONCURRENCY",
+        description="Background jobs run at once per worker.",
+    ),
+    EnvVarSpec(
+        name="AGENT_JOBS_MAX_QUEUED",
+        description="Background jobs waiting per worker before new ones are rejected.",
+    ),
+    EnvVarSpec(
+        name="AGENT_JOBS_MAX_PER_USER",
+        description="Queued plus running background jobs allowed per user.",
+    ),
+    EnvVarSpec(
+        name="AGENT_JOBS_SQLITE_PATH",
+        description="SQLite database holding background job records and events.",
+    ),
+    EnvVarSpec(
+        name="AGENT_JOBS_RETENTION_HOURS",
+        description="Hours finished background jobs and their events are kept.",
+    ),
+    EnvVarSpec(
+        name="AGENT_JOBS_POLL_INTERVAL",
+        description="Seconds between checks for new events of jobs run by another worker.",
+    ),
+    EnvVarSpec(
+        name="AGENT_COMPOSIO_CONNECTION_STATUS",
+        description="Look up the user's Composio connections before each run and tell the agent.",
+        reloadable=True,
+    ),
+    EnvVarSpec(
+        name="AGENT_COMPOSIO_STATUS_TTL",
+        description="Seconds a toolkit found connected is not checked again.",
+        reloadable=True,
+    ),
+    EnvVarSpec(
+        name="AGENT_COMPOSIO_NOT_CONNECTED_TTL",
+        description="Seconds a toolkit found not connected is not checked again.",
+        reloadable=True,
+    ),
+    EnvVarSpec(
+        name="AGENT_COMPOSIO_UNAVAILABLE_TOOLS",
+        description="What to do with tools of toolkits that are not connected: prune or flag.",
+        reloadable=True,
+    ),
+    EnvVarSpec(
+        name="AGENT_TOOL_SELECTION",
+        description="Declare only the Composio tools relevant to each turn, plus a tool search.",
+        reloadable=True,
+    ),
+    EnvVarSpec(
+        name="AGENT_TOOL_SELECTION_TOP_K",
+        description="Tools of each Composio MCP config declared per turn.",
+        reloadable=True,
+    ),
+    EnvVarSpec(
+        name="AGENT_TOOL_SELECTION_MIN_TOOLS",
+        description="Composio MCP configs with at most this many tools declare all of them.",
+        reloadable=True,
+    ),
+    EnvVarSpec(
+        name="AGENT_TOOL_SELECTION_EMBEDDER",
+        description="Optional module:function returning text embeddings for tool selection.",
+        reloadable=True,
+    ),
+    EnvVarSpec(
+        name="AGENT_USAGE_ENABLED",
+        description="Record per-user token usage of model calls and enforce token quotas.",
+    ),
+    EnvVarSpec(
+        name="AGENT_USAGE_SQLITE_PATH",
+        description="SQLite database holding the token usage ledger.",
+    ),
+    EnvVarSpec(
+        name="AGENT_USAGE_WINDOW_HOURS",
+        description="Hours of token usage counted towards quotas.",
+    ),
+    EnvVarSpec(
+        name="AGENT_USAGE_SOFT_QUOTA",
+        description="Tokens per window after which runs are flagged but still served.",
+    ),
+    EnvVarSpec(
+        name="AGENT_USAGE_HARD_QUOTA",
+        description="Tokens per window after which new runs are refused with 429.",
+    ),
+    EnvVarSpec(
+        name="AGENT_USAGE_QUOTA_SCOPE",
+        description="Whether quotas apply per user (user) or per user and agent (agent).",
+    ),
+    EnvVarSpec(
+        name="AGENT_USAGE_RETENTION_DAYS",
+        description="Days per-call token usage rows are kept; hourly rollups are kept longer.",
+    ),
+    EnvVarSpec(
+        name="LOG_LEVEL",
+        description="Root logging level (DEBUG, INFO, WARNING, ERROR).",
+    ),
+    EnvVarSpec(
+        name="AGENT_LOG_FORMAT",
+        description="Log output format: text (default) or json (one object per line).",
+    ),
+    EnvVarSpec(
+        name="AGENT_LOG_QUEUE_SIZE",
+        description="Log records buffered for the writer thread before new ones are dropped.",
+    ),
+    EnvVarSpec(
+        name="AGENT_LOG_SAMPLING",
+        description="Comma-separated logger=share pairs; share of DEBUG/INFO records kept.",
+    ),
+    EnvVarSpec(
+        name="AGENT_LOG_RATE_LIMITS",
+        description="Comma-separated logger=rate pairs; records per second written per message.",
+    ),
+    EnvVarSpec(
+        name="AGENT_COMPOSIO_SPECULATIVE_PROVISIONING",
+        description="Generate Composio MCP URLs in the background while the first model call runs.",
+        reloadable=True,
+    ),
+    EnvVarSpec(
+        name="AGENT_COMPOSIO_STATUS_WAIT",
+        description="Seconds the first model request waits for a Composio connection status lookup.",
+        reloadable=True,
+    ),
+    EnvVarSpec(
+        name="AGENT_LOOP_MONITOR",
+        description="Measure event-loop lag and report calls that block the loop.",
+    ),
+    EnvVarSpec(
+        name="AGENT_LOOP_MONITOR_INTERVAL_MS",
+        description="Milliseconds between event-loop lag measurements.",
+    ),
+    EnvVarSpec(
+        name="AGENT_LOOP_BLOCK_THRESHOLD_MS",
+        description="Event-loop stall, in milliseconds, reported as a blocking call with its stack.",
+    ),
+    EnvVarSpec(
+        name="AGENT_LOOP_BLOCK_KEEP",
+        description="Blocking-call reports kept per worker for /admin/loop.",
+    ),
+    EnvVarSpec(
+        name="AGENT_RUN_COALESCING",
+        description="Attach duplicate agent run requests to the in-flight or just-finished original run.",
+    ),
+    EnvVarSpec(
+        name="AGENT_RUN_COALESCING_TTL",
+        description="Seconds a finished run's stream is replayed to duplicate requests.",
+    ),
+    EnvVarSpec(
+        name="AGENT_RUN_COALESCING_MAX_RUN_BYTES",
+        description="Largest run stream, in bytes, kept for duplicate requests.",
+    ),
+    EnvVarSpec(
+        name="AGENT_RUN_COALESCING_CACHE_BYTES",
+        description="Bytes of finished run streams kept per worker for replay.",
+    ),
+    EnvVarSpec(
+        name="AGENT_RUN_COALESCING_DETACH_GRACE",
+        description="Seconds a run keeps going after its last client disconnected.",
+    ),
 )
 
 
@@ -0,0 +1,872 @@
+"""
+Background mode for long-running agent runs.
+
+`POST /jobs/{agent}` takes the same `RunAgentInput` body as the agent endpoint and
+answers `202` with a job id straight away. The run is executed by a bounded pool
+of `concurrency` tasks per worker, independently of any client connection, and
+every AG-UI event it produces is stored in SQLite next to the job record.
+
+- `GET /jobs/{job_id}/events` streams the run: stored events first, then new ones
+  as they are produced, until the job has finished. Every event carries its
+  sequence number as the SSE `id`, so a client reconnecting with `Last-Event-ID`
+  (or `?after=`) resumes where it left off.
+- `GET /jobs/{job_id}` returns the job record and `GET /jobs` the caller's jobs.
+- `DELETE /jobs/{job_id}` cancels a queued or running job.
+
+Jobs call the agent's own endpoint in-process as the submitting user, so agents
+need no changes. Besides the pool, the per-worker queue and the per-user job
+limit, each job takes an admission-control slot like an interactive run. When no
+slot is free it waits and retries instead of failing with `429`. Its stream is
+counted in the SSE stream metrics. Token quotas are checked on submission and
+again when the job starts. The other request middlewares (auth, run coalescing,
+tracing, profiling, SSE coalescing and gzip) apply to the submission only.
+
+The database is shared by the workers of one host. Any worker can report on,
+stream and cancel any job. When a worker starts, the jobs of workers that have
+exited are picked up again if they were still queued, and marked `interrupted`
+if they were running (their tool calls may have had side effects). A worker is
+identified by host, PID and process start time, so a restarted container reusing
+a PID still recovers the jobs of its predecessor. Cancelling a running job whose
+worker has exited finishes it at once.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import asynccontextmanager, suppress
+from pathlib import Path
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from ag_ui.core import RunAgentInput
+from fastapi import APIRouter, FastAPI, HTTPException, Request, status
+from fastapi.middleware.asyncexitstack import AsyncExitStackMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import ValidationError
+from starlette.middleware.exceptions import ExceptionMiddleware
+from starlette.types import ASGIApp
+
+from .admission import AdmissionRejected
+from .auth import SupabaseAuthContext, get_supabase_user_id, supabase_auth_context
+from .logging_setup import log_context
+from .metrics import (
+    JOB_QUEUE_WAIT_SECONDS,
+    JOB_RUN_SECONDS,
+    JOBS_QUEUED,
+    JOBS_REJECTED,
+    JOBS_RUNNING,
+    SSEStreamMetricsMiddleware,
+)
+from .settings import JobSettings
+from .usage import quota_exceeded_response, usage_scope
+
+logger = logging.getLogger(__name__)
+
+FINISHED_STATUSES = ("succeeded", "failed", "cancelled", "interrupted")
+
+_EVENT_PAGE_SIZE = 500
+_KEEPALIVE_SECONDS = 15.0
+_PURGE_INTERVAL_SECONDS = 600.0
+_RETRY_AFTER_SECONDS = 30
+_RUN_ERROR_PREFIX = b'data: {"type":"RUN_ERROR"'
+_FRAME_END = b"\n\n"
+_RECORD_FIELDS = (
+    "job_id",
+    "agent",
+    "status",
+    "thread_id",
+    "run_id",
+    "created_at",
+    "started_at",
+    "finished_at",
+    "event_count",
+    "error",
+)
+
+
+class JobRejected(Exception):
+    """
+    Raised when a job cannot be accepted; carries the reason and a retry hint.
+    """
+
+    def __init__(self, reason: str, retry_after: int) -> None:
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class JobStore:
+    """
+    SQLite job records and events. Queries run on a worker thread.
+
+    The database uses WAL mode, so the worker processes of one host share the file.
+    """
+
+    def __init__(self, path: Path, *, busy_timeout: float = 5.0) -> None:
+        self._path = path
+        self._busy_timeout = busy_timeout
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+
+    @property
+    def _connection(self) -> sqlite3.Connection:
+        # Opened on first use (under `_lock`), after workers have been forked.
+        if self._db is None:
+            self._db = self._connect()
+        return self._db
+
+    def _connect(self) -> sqlite3.Connection:
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        connection = sqlite3.connect(
+            str(self._path),
+            timeout=self._busy_timeout,
+            check_same_thread=False,
+            isolation_level=None,
+        )
+        connection.row_factory = sqlite3.Row
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                job_id TEXT PRIMARY KEY,
+                user_id TEXT NOT NULL,
+                agent TEXT NOT NULL,
+                status TEXT NOT NULL,
+                worker TEXT NOT NULL,
+                thread_id TEXT,
+                run_id TEXT,
+                input TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL,
+                event_count INTEGER NOT NULL DEFAULT 0,
+                error TEXT,
+                cancel_requested INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE INDEX IF NOT EXISTS jobs_by_user ON jobs (user_id, created_at);
+            CREATE INDEX IF NOT EXISTS jobs_by_status ON jobs (status);
+            CREATE TABLE IF NOT EXISTS job_events (
+                job_id TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+                frame BLOB NOT NULL,
+                PRIMARY KEY (job_id, seq)
+            ) WITHOUT ROWID;
+            """
+        )
+        return connection
+
+    async def create(self, record: Dict[str, Any]) -> None:
+        def _create() -> None:
+            self._connection.execute(
+                "INSERT INTO jobs (job_id, user_id, agent, status, worker, thread_id, run_id,"
+                " input, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    record["job_id"],
+                    record["user_id"],
+                    record["agent"],
+                    record["status"],
+                    record["worker"],
+                    record["thread_id"],
+                    record["run_id"],
+                    record["input"],
+                    record["created_at"],
+                ),
+            )
+
+        await self._run(_create)
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        def _get() -> Optional[Dict[str, Any]]:
+            row = self._connection.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+            return dict(row) if row is not None else None
+
+        return await self._run(_get)
+
+    async def list_for_user(self, user_id: str, limit: int) -> List[Dict[str, Any]]:
+        def _list() -> List[Dict[str, Any]]:
+            rows = self._connection.execute(
+                "SELECT * FROM jobs WHERE user_id = ? ORDER BY created_at DESC LIMIT ?",
+                (user_id, limit),
+            ).fetchall()
+            return [dict(row) for row in rows]
+
+        return await self._run(_list)
+
+    async def count_active(self, user_id: str) -> int:
+        def _count() -> int:
+            return self._connection.execute(
+                "SELECT COUNT(*) FROM jobs WHERE user_id = ? AND status IN ('queued', 'running')",
+                (user_id,),
+            ).fetchone()[0]
+
+        return await self._run(_count)
+
+    async def mark_started(self, job_id: str, started_at: float) -> bool:
+        """
+        Move a queued job to running; False if it was cancelled in the meantime.
+        """
+
+        def _start() -> bool:
+            cursor = self._connection.execute(
+                "UPDATE jobs SET status = 'running', started_at = ?"
+                " WHERE job_id = ? AND status = 'queued' AND cancel_requested = 0",
+                (started_at, job_id),
+            )
+            return cursor.rowcount == 1
+
+        return await self._run(_start)
+
+    async def append_events(self, job_id: str, first_seq: int, frames: List[bytes]) -> bool:
+        """
+        Store frames numbered from `first_seq`; returns whether cancellation was requested.
+        """
+
+        def _append() -> bool:
+            connection = self._connection
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                connection.executemany(
+                    "INSERT INTO job_events VALUES (?, ?, ?)",
+                    [(job_id, first_seq + index, frame) for index, frame in enumerate(frames)],
+                )
+                connection.execute(
+                    "UPDATE jobs SET event_count = ? WHERE job_id = ?",
+                    (first_seq + len(frames) - 1, job_id),
+                )
+                row = connection.execute(
+                    "SELECT cancel_requested FROM jobs WHERE job_id = ?", (job_id,)
+                ).fetchone()
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+            return bool(row and row[0])
+
+        return await self._run(_append)
+
+    async def finish(self, job_id: str, job_status: str, error: Optional[str], finished_at: float) -> None:
+        def _finish() -> None:
+            self._connection.execute(
+                "UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE job_id = ?",
+                (job_status, error, finished_at, job_id),
+            )
+
+        await self._run(_finish)
+
+    async def request_cancel(self, job_id: str) -> None:
+        """
+        Cancel a queued job at once; flag a running one for its worker to cancel.
+
+        A running job whose worker has exited is cancelled at once too, since no
+        worker would act on the flag.
+        """
+
+        host = socket.gethostname()
+
+        def _cancel() -> None:
+            connection = self._connection
+            connection.execute(
+                "UPDATE jobs SET cancel_requested = 1 WHERE job_id = ? AND status IN ('queued', 'running')",
+                (job_id,),
+            )
+            connection.execute(
+                "UPDATE jobs SET status = 'cancelled', finished_at = ? WHERE job_id = ? AND status = 'queued'",
+                (time.time(), job_id),
+            )
+            row = connection.execute(
+                "SELECT worker FROM jobs WHERE job_id = ? AND status = 'running'", (job_id,)
+            ).fetchone()
+            if row is not None and not _worker_alive(row["worker"], host):
+                connection.execute(
+                    "UPDATE jobs SET status = 'cancelled', finished_at = ?"
+                    " WHERE job_id = ? AND worker = ? AND status = 'running'",
+                    (time.time(), job_id, row["worker"]),
+                )
+
+        await self._run(_cancel)
+
+    async def events_after(self, job_id: str, after: int, limit: int) -> List[Tuple[int, bytes]]:
+        def _events() -> List[Tuple[int, bytes]]:
+            rows = self._connection.execute(
+                "SELECT seq, frame FROM job_events WHERE job_id = ? AND seq > ? ORDER BY seq LIMIT ?",
+                (job_id, after, limit),
+            ).fetchall()
+            return [(row[0], bytes(row[1])) for row in rows]
+
+        return await self._run(_events)
+
+    async def claim_orphans(self, worker: str) -> List[Dict[str, Any]]:
+        """
+        Take over the unfinished jobs of exited workers on this host.
+
+        Queued jobs are reassigned to `worker` and returned; running ones are
+        marked `interrupted`.
+        """
+
+        host = worker.partition(":")[0]
+
+        def _claim() -> List[Dict[str, Any]]:
+            connection = self._connection
+            rows = connection.execute(
+                "SELECT * FROM jobs WHERE status IN ('queued', 'running')"
+            ).fetchall()
+            claimed = []
+            for row in rows:
+                if _worker_alive(row["worker"], host):
+                    continue
+                if row["status"] == "running":
+                    connection.execute(
+                        "UPDATE jobs SET status = 'interrupted', error = ?, finished_at = ?"
+                        " WHERE job_id = ? AND worker = ? AND status = 'running'",
+                        ("The worker running this job exited.", time.time(), row["job_id"], row["worker"]),
+                    )
+                    continue
+                cursor = connection.execute(
+                    "UPDATE jobs SET worker = ? WHERE job_id = ? AND worker = ? AND status = 'queued'",
+                    (worker, row["job_id"], row["worker"]),
+                )
+                if cursor.rowcount == 1:
+                    claimed.append({**dict(row), "worker": worker})
+            return claimed
+
+        return await self._run(_claim)
+
+    async def purge(self, finished_before: float) -> int:
+        def _purge() -> int:
+            connection = self._connection
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                connection.execute(
+                    "DELETE FROM job_events WHERE job_id IN"
+                    " (SELECT job_id FROM jobs WHERE finished_at < ?)",
+                    (finished_before,),
+                )
+                removed = connection.execute(
+                    "DELETE FROM jobs WHERE finished_at < ?", (finished_before,)
+                ).rowcount
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+            return removed
+
+        return await self._run(_purge)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    async def _run(self, operation):
+        def _locked():
+            with self._lock:
+                return operation()
+
+        return await asyncio.to_thread(_locked)
+
+
+class _EventLog:
+    """
+    Splits a run's response body into SSE frames and stores them in batches.
+
+    A background task writes whatever has accumulated since its previous write,
+    so storage keeps up with token-by-token streams without one write per token.
+    """
+
+    def __init__(self, manager: "JobManager", job_id: str) -> None:
+        self._manager = manager
+        self._job_id = job_id
+        self._buffer = b""
+        self._pending: List[bytes] = []
+        self._stored = 0
+        self._ready = asyncio.Event()
+        self._closed = False
+        self.run_error: Optional[str] = None
+        self._task = asyncio.create_task(self._flush_loop())
+
+    def write(self, body: bytes) -> None:
+        *frames, self._buffer = (self._buffer + body).split(_FRAME_END)
+        for frame in frames:
+            if frame.startswith(_RUN_ERROR_PREFIX):
+                self.run_error = _run_error_message(frame)
+        self._pending.extend(frames)
+        if frames:
+            self._ready.set()
+
+    async def close(self) -> None:
+        if self._buffer.strip():
+            self._pending.append(self._buffer)
+            self._buffer = b""
+        self._closed = True
+        self._ready.set()
+        await self._task
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await self._ready.wait()
+            self._ready.clear()
+            frames, self._pending = self._pending, []
+            if frames:
+                cancel_requested = await self._manager.store.append_events(
+                    self._job_id, self._stored + 1, frames
+                )
+                self._stored += len(frames)
+                self._manager.notify(self._job_id)
+                if cancel_requested:
+                    self._manager.cancel_local(self._job_id)
+            if self._closed and not self._pending:
+                return
+
+
+class JobManager:
+    """
+    Per-worker job queue and pool of job runners.
+    """
+
+    def __init__(self, settings: JobSettings, store: JobStore) -> None:
+        self.settings = settings
+        self.store = store
+        self.worker = ""
+        self._queue: Optional[asyncio.Queue] = None
+        self._routes: Optional[ASGIApp] = None
+        self._running: Dict[str, asyncio.Task] = {}
+        self._cancelled: Set[str] = set()
+        self._updates: Dict[str, asyncio.Event] = {}
+        self._stopping = False
+
+    async def submit(self, app: FastAPI, agent: str, user_id: str, body: bytes) -> Dict[str, Any]:
+        """
+        Validate and queue a run; returns the new job record.
+
+        Raises `LookupError` for an unknown agent, `ValidationError` for an invalid
+        body and `JobRejected` when the queue or the user's job limit is full.
+        """
+
+        if _mount_path(app, agent) is None:
+            raise LookupError(f"Unknown agent '{agent}'")
+        run_input = RunAgentInput.model_validate_json(body)
+        if self._queue is None:
+            raise JobRejected("not_started", _RETRY_AFTER_SECONDS)
+        if self._queue.qsize() >= self.settings.max_queued and len(self._running) >= self.settings.concurrency:
+            JOBS_REJECTED.labels(agent, "queue_full").inc()
+            raise JobRejected("queue_full", _RETRY_AFTER_SECONDS)
+        if await self.store.count_active(user_id) >= self.settings.max_per_user:
+            JOBS_REJECTED.labels(agent, "user_limit").inc()
+            raise JobRejected("user_limit", _RETRY_AFTER_SECONDS)
+
+        record = {
+            "job_id": uuid.uuid4().hex,
+            "user_id": user_id,
+            "agent": agent,
+            "status": "queued",
+            "worker": self.worker,
+            "thread_id": run_input.thread_id,
+            "run_id": run_input.run_id,
+            "input": body.decode("utf-8"),
+            "created_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            "event_count": 0,
+            "error": None,
+        }
+        await self.store.create(record)
+        self._enqueue(record)
+        logger.info("Queued job %s for agent '%s'", record["job_id"], agent)
+        return record
+
+    async def cancel(self, record: Dict[str, Any]) -> None:
+        await self.store.request_cancel(record["job_id"])
+        self.cancel_local(record["job_id"])
+
+    def cancel_local(self, job_id: str) -> None:
+        task = self._running.get(job_id)
+        if task is not None and job_id not in self._cancelled:
+            self._cancelled.add(job_id)
+            task.cancel()
+
+    def notify(self, job_id: str) -> None:
+        update = self._updates.pop(job_id, None)
+        if update is not None:
+            update.set()
+
+    async def follow(self, job_id: str, after: int) -> AsyncIterator[bytes]:
+        """
+        SSE frames of a job after sequence number `after`, until the job has finished.
+        """
+
+        last_sent = time.monotonic()
+        while True:
+            events = await self.store.events_after(job_id, after, _EVENT_PAGE_SIZE)
+            for seq, frame in events:
+                yield b"id: %d\n%s\n\n" % (seq, frame)
+                after = seq
+            if events:
+                last_sent = time.monotonic()
+                if len(events) == _EVENT_PAGE_SIZE:
+                    continue
+            record = await self.store.get(job_id)
+            if record is None or (
+                record["status"] in FINISHED_STATUSES and record["event_count"] <= after
+            ):
+                return
+            if time.monotonic() - last_sent >= _KEEPALIVE_SECONDS:
+                # Keeps proxies from closing the stream during long tool calls.
+                yield b": keep-alive\n\n"
+                last_sent = time.monotonic()
+            update = self._updates.setdefault(job_id, asyncio.Event())
+            with suppress(asyncio.TimeoutError):
+                # Jobs run by other workers are only seen by polling.
+                await asyncio.wait_for(update.wait(), self.settings.poll_interval_seconds)
+
+    @asynccontextmanager
+    async def running(self, app: FastAPI) -> AsyncIterator[None]:
+        """
+        Lifespan hook running the job pool of this worker.
+        """
+
+        # Set here rather than in __init__, which runs before workers are forked.
+        self.worker = _worker_id()
+        self._queue = asyncio.Queue()
+        # What FastAPI wraps around the routes, plus stream metrics. Auth applies
+        # to the submission; admission is taken per run in `_dispatch`.
+        self._routes = SSEStreamMetricsMiddleware(
+            ExceptionMiddleware(
+                AsyncExitStackMiddleware(app.router), handlers=app.exception_handlers
+            ),
+            state=app.state,
+        )
+        runners = [
+            asyncio.create_task(self._runner(app)) for _ in range(self.settings.concurrency)
+        ]
+        runners.append(asyncio.create_task(self._purge_periodically()))
+        try:
+            for record in await self.store.claim_orphans(self.worker):
+                logger.info("Resuming queued job %s of an exited worker", record["job_id"])
+                self._enqueue(record)
+        except Exception:
+            logger.exception("Could not recover jobs of exited workers")
+        try:
+            yield
+        finally:
+            self._stopping = True
+            jobs = list(self._running.values())
+            for task in jobs + runners:
+                task.cancel()
+            await asyncio.gather(*jobs, *runners, return_exceptions=True)
+            self.store.close()
+
+    def _enqueue(self, record: Dict[str, Any]) -> None:
+        JOBS_QUEUED.labels(record["agent"]).inc()
+        self._queue.put_nowait(record)
+
+    async def _runner(self, app: FastAPI) -> None:
+        while True:
+            record = await self._queue.get()
+            JOBS_QUEUED.labels(record["agent"]).dec()
+            with log_context(job_id=record["job_id"]):
+                task = asyncio.create_task(self._run(app, record))
+            self._running[record["job_id"]] = task
+            try:
+                await asyncio.wait((task,))
+            finally:
+                self._running.pop(record["job_id"], None)
+                self._cancelled.discard(record["job_id"])
+
+    async def _run(self, app: FastAPI, record: Dict[str, Any]) -> None:
+        job_id, agent = record["job_id"], record["agent"]
+        started = time.time()
+        if not await self.store.mark_started(job_id, started):
+            # Cancelled while it was queued.
+            self.notify(job_id)
+            return
+        JOB_QUEUE_WAIT_SECONDS.labels(agent).observe(started - record["created_at"])
+        running = JOBS_RUNNING.labels(agent)
+        running.inc()
+        events = _EventLog(self, job_id)
+        job_status, error = "succeeded", None
+        try:
+            await self._dispatch(app, record, events)
+        except asyncio.CancelledError:
+            if self._stopping and job_id not in self._cancelled:
+                job_status, error = "interrupted", "The worker shut down while the job was running."
+            else:
+                job_status = "cancelled"
+        except Exception as exc:
+            logger.warning("Job %s failed", job_id, exc_info=True)
+            job_status, error = "failed", f"{type(exc).__name__}: {exc}"
+        finally:
+            running.dec()
+        try:
+            await events.close()
+        except Exception:
+            logger.exception("Could not store the last events of job %s", job_id)
+        if job_status == "succeeded" and events.run_error is not None:
+            job_status, error = "failed", events.run_error
+        finished = time.time()
+        await self.store.finish(job_id, job_status, error, finished)
+        self.notify(job_id)
+        JOB_RUN_SECONDS.labels(agent, job_status).observe(finished - started)
+        logger.info("Job %s %s after %.1f s", job_id, job_status, finished - started)
+
+    async def _dispatch(self, app: FastAPI, record: Dict[str, Any], events: _EventLog) -> None:
+        path = _mount_path(app, record["agent"])
+        if path is None:
+            raise LookupError(f"Agent '{record['agent']}' is no longer registered")
+        body = record["input"].encode("utf-8")
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "POST",
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode("utf-8"),
+            "root_path": "",
+            "query_string": b"",
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"accept", b"text/event-stream"),
+                (b"content-length", str(len(body)).encode("ascii")),
+            ],
+            "client": None,
+            "server": None,
+            "app": app,
+            "state": {},
+        }
+        finished = asyncio.Event()
+        delivered = False
+        response_status = 0
+        error_body = b""
+
+        async def receive():
+            nonlocal delivered
+            if not delivered:
+                delivered = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            # No client to disconnect: the run ends when the agent finishes.
+            await finished.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            nonlocal response_status, error_body
+            if message["type"] == "http.response.start":
+                response_status = message["status"]
+            elif message["type"] == "http.response.body":
+                if response_status == status.HTTP_200_OK:
+                    events.write(message.get("body", b""))
+                else:
+                    error_body += message.get("body", b"")
+
+        usage = getattr(app.state, "usage", None)
+        if usage is not None:
+            # Checked again at start: the user may have spent their quota while it was queued.
+            decision = await usage.check(record["user_id"], record["agent"])
+            if decision.level == "hard":
+                raise RuntimeError(f"Token quota exceeded ({decision.used} tokens)")
+
+        user = SupabaseAuthContext(user={"id": record["user_id"]}, claims={})
+        try:
+            with supabase_auth_context(user), usage_scope(record["user_id"], record["agent"]):
+                await self._admitted(app, record, lambda: self._routes(scope, receive, send))
+        finally:
+            finished.set()
+        if response_status != status.HTTP_200_OK:
+            raise RuntimeError(
+                f"Agent endpoint answered HTTP {response_status}: "
+                f"{error_body[:500].decode('utf-8', 'replace')}"
+            )
+
+    async def _admitted(
+        self, app: FastAPI, record: Dict[str, Any], run: Callable[[], Awaitable[None]]
+    ) -> None:
+        # Jobs share the run slots of interactive requests. Where those would get a
+        # 429, a job waits for the suggested Retry-After and asks again.
+        admission = app.state.admission
+        while True:
+            try:
+                async with admission.admit(record["user_id"], record["agent"]):
+                    await run()
+                return
+            except AdmissionRejected as exc:
+                logger.info(
+                    "Job %s waiting %d s for a run slot (%s)",
+                    record["job_id"],
+                    exc.retry_after,
+                    exc.reason,
+                )
+                await asyncio.sleep(exc.retry_after)
+
+    async def _purge_periodically(self) -> None:
+        while True:
+            try:
+                removed = await self.store.purge(time.time() - self.settings.retention_hours * 3600)
+                if removed:
+                    logger.info("Purged %d finished job(s)", removed)
+            except Exception:
+                logger.exception("Could not purge finished jobs")
+            await asyncio.sleep(_PURGE_INTERVAL_SECONDS)
+
+
+jobs_router = APIRouter(prefix="/jobs", tags=["jobs"])
+
+
+@jobs_router.post("/{agent}", status_code=status.HTTP_202_ACCEPTED)
+async def submit_job(agent: str, request: Request):
+    """
+    Queue a run of `agent` with a `RunAgentInput` body and return its job record.
+    """
+
+    user_id = _require_user()
+    usage = getattr(request.app.state, "usage", None)
+    if usage is not None:
+        decision = await usage.check(user_id, agent)
+        if decision.level == "hard":
+            return quota_exceeded_response(decision)
+    try:
+        record = await request.app.state.jobs.submit(request.app, agent, user_id, await request.body())
+    except LookupError as exc:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(exc)) from exc
+    except ValidationError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=exc.errors(include_url=False)
+        ) from exc
+    except JobRejected as exc:
+        return JSONResponse(
+            {"detail": "Too many background jobs", "reason": exc.reason},
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            headers={"Retry-After": str(exc.retry_after)},
+        )
+    return JSONResponse(
+        _public(record),
+        status_code=status.HTTP_202_ACCEPTED,
+        headers={"Location": f"{jobs_router.prefix}/{record['job_id']}"},
+    )
+
+
+@jobs_router.get("")
+async def list_jobs(request: Request, limit: int = 20):
+    """
+    The caller's most recent jobs.
+    """
+
+    user_id = _require_user()
+    records = await request.app.state.jobs.store.list_for_user(user_id, min(max(limit, 1), 100))
+    return {"jobs": [_public(record) for record in records]}
+
+
+@jobs_router.get("/{job_id}")
+async def get_job(job_id: str, request: Request):
+    return _public(await _owned_job(request, job_id))
+
+
+@jobs_router.get("/{job_id}/events")
+async def job_events(job_id: str, request: Request, after: Optional[int] = None):
+    """
+    Stream the job's AG-UI events, resuming after `Last-Event-ID` or `after`.
+    """
+
+    await _owned_job(request, job_id)
+    if after is None:
+        last_event_id = request.headers.get("last-event-id", "0")
+        after = int(last_event_id) if last_event_id.isdigit() else 0
+    return StreamingResponse(
+        request.app.state.jobs.follow(job_id, after),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache"},
+    )
+
+
+@jobs_router.delete("/{job_id}")
+async def cancel_job(job_id: str, request: Request):
+    record = await _owned_job(request, job_id)
+    if record["status"] not in FINISHED_STATUSES:
+        await request.app.state.jobs.cancel(record)
+    return _public(await request.app.state.jobs.store.get(job_id) or record)
+
+
+def _require_user() -> str:
+    user_id = get_supabase_user_id()
+    if not user_id:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Authentication required")
+    return user_id
+
+
+async def _owned_job(request: Request, job_id: str) -> Dict[str, Any]:
+    record = await request.app.state.jobs.store.get(job_id)
+    # Other users' jobs are reported as missing rather than forbidden.
+    if record is None or record["user_id"] != _require_user():
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found")
+    return record
+
+
+def _public(record: Dict[str, Any]) -> Dict[str, Any]:
+    job = {field: record.get(field) for field in _RECORD_FIELDS}
+    job["events_url"] = f"{jobs_router.prefix}/{record['job_id']}/events"
+    return job
+
+
+def _mount_path(app: FastAPI, agent: str) -> Optional[str]:
+    for entry in app.state.agent_registry:
+        if entry["slug"] == agent:
+            return entry["path"]
+    return None
+
+
+def _run_error_message(frame: bytes) -> str:
+    try:
+        return json.loads(frame[len(b"data: "):]).get("message") or "Run failed"
+    except ValueError:
+        return "Run failed"
+
+
+def _worker_id() -> str:
+    pid = os.getpid()
+    # The start time tells this process apart from an earlier one with the same
+    # PID (e.g. in a restarted container); a random nonce stands in without /proc.
+    return f"{socket.gethostname()}:{pid}:{_process_start(pid) or uuid.uuid4().hex}"
+
+
+def _worker_alive(worker: str, host: str) -> bool:
+    """
+    Whether the worker with id `worker` may still run; other hosts' workers count as alive.
+    """
+
+    owner_host, _, rest = worker.partition(":")
+    owner_pid, _, owner_start = rest.partition(":")
+    if owner_host != host:
+        return True
+    pid = int(owner_pid)
+    if not _process_alive(pid):
+        return False
+    # A live PID with another start time belongs to a newer process.
+    start = _process_start(pid)
+    return start is None or not owner_start or start == owner_start
+
+
+def _process_start(pid: int) -> Optional[str]:
+    try:
+        with open(f"/proc/{pid}/stat", "rb") as stat:
+            # Fields after the parenthesised command name; `starttime` is field 22.
+            return stat.read().rsplit(b")", 1)[1].split()[19].decode()
+    except (OSError, IndexError):
+        return None
+
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+__all__ = ["FINISHED_STATUSES", "JobManager", "JobRejected", "JobStore", "jobs_router"]
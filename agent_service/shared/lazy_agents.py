@@ -0,0 +1,119 @@
+"""
+Placeholder routes that defer agent module execution until the first request.
+"""
+
+import asyncio
+import logging
+import time
+from typing import TYPE_CHECKING, Callable, Optional
+
+from fastapi import status
+from fastapi.responses import JSONResponse
+from starlette.datastructures import State
+from starlette.routing import Router
+from starlette.types import Receive, Scope, Send
+
+from .agent_loader import load_agent_descriptor
+from .agent_routes import AgentRoute, build_agent_router
+from .types import AgentDescriptor, AgentMetadata
+
+if TYPE_CHECKING:
+    from .startup_profiler import StartupProfiler
+
+logger = logging.getLogger(__name__)
+
+AgentLoadedCallback = Callable[[AgentDescriptor, float], None]
+
+
+class LazyAgentRoute(AgentRoute):
+    """
+    Agent route whose router is built on the first matching request.
+
+    The agent module is executed (off the event loop) and its `register_agent` hook
+    invoked against a private FastAPI router on the first matching request.
+    Concurrent first requests share a single load; a failed load answers 503 and is
+    retried by the next request.
+    """
+
+    def __init__(
+        self,
+        metadata: AgentMetadata,
+        mount_path: str,
+        *,
+        on_loaded: Optional[AgentLoadedCallback] = None,
+        profiler: Optional["StartupProfiler"] = None,
+        state: Optional[State] = None,
+    ) -> None:
+        super().__init__(mount_path)
+        self.metadata = metadata
+        self._state = state
+        self._on_loaded = on_loaded
+        self._profiler = profiler
+        self._loading: Optional[asyncio.Task] = None
+
+    async def _resolve_router(
+        self, scope: Scope, receive: Receive, send: Send
+    ) -> Optional[Router]:
+        try:
+            return await self.ensure_loaded()
+        except Exception:
+            response = JSONResponse(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                content={"detail": f"Agent '{self.metadata.slug}' failed to load"},
+            )
+            await response(scope, receive, send)
+            return None
+
+    async def ensure_loaded(self) -> Router:
+        """
+        Load the agent if needed, coalescing concurrent callers onto one load.
+        """
+
+        if self._router is not None:
+            return self._router
+        if self._loading is None:
+            self._loading = asyncio.create_task(self._load())
+        loading = self._loading
+        try:
+            # Shield so a disconnecting client does not cancel the shared load.
+            return await asyncio.shield(loading)
+        finally:
+            if loading.done() and self._loading is loading and self._router is None:
+                self._loading = None
+
+    async def _load(self) -> Router:
+        started = time.perf_counter()
+        try:
+            descriptor = await asyncio.to_thread(
+                load_agent_descriptor,
+                self.metadata.module_path,
+                self.metadata.package,
+                fallback_slug=self.metadata.module_path.parent.name,
+                profiler=self._profiler,
+            )
+            registration_started = time.perf_counter()
+            router = build_agent_router(descriptor, self.path, self._state)
+            if self._profiler is not None:
+                self._profiler.record_agent_phase(
+                    descriptor.slug,
+                    "register",
+                    (time.perf_counter() - registration_started) * 1000,
+                )
+        except Exception:
+            logger.exception("Failed to lazily load agent '%s'", self.metadata.slug)
+            raise
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self.swap(router)
+        logger.info(
+            "Lazily loaded agent '%s' at %s in %.1f ms",
+            descriptor.display_name,
+            self.path,
+            elapsed_ms,
+        )
+        if self._on_loaded is not None:
+            self._on_loaded(descriptor, elapsed_ms)
+        return router
+
+
+__all__ = ["LazyAgentRoute"]
@@ -0,0 +1,407 @@
+"""
+Queue-backed structured logging that keeps log I/O off the event loop.
+
+`configure_logging` replaces the root handlers with a `QueueHandler`. On the
+calling thread a record is only filtered, stamped with the request context and
+put on a bounded queue. A `QueueListener` thread formats it (one JSON object per
+line by default) and writes it to stderr, so a slow terminal or log shipper cannot
+stall streaming responses. When the queue is full, new records are dropped and
+counted rather than waited for.
+
+Two filters run before a record is queued:
+
+- Sampling (`AGENT_LOG_SAMPLING`, e.g. `shared.composio_mcp=0.1`) keeps that share
+  of the DEBUG/INFO records of a logger and its children. Warnings and errors are
+  always kept.
+- Rate limiting (`AGENT_LOG_RATE_LIMITS`, e.g. `shared.auth=10`) lets each
+  message of a logger through at most that many times per second, at any
+  level. The next record written for that message reports how many were
+  suppressed.
+
+`LogContextMiddleware` gives every HTTP request a request id (the client's
+`X-Request-ID` or a new one, echoed in the response). Code running for the
+request adds fields such as the ADK invocation id with `bind_log_context`, and
+every record logged from then on carries them.
+"""
+
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import Context, ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .metrics import LOG_RECORDS_DROPPED
+from .settings import LoggingSettings, load_logging_settings
+
+REQUEST_ID_HEADER = "x-request-id"
+
+# Mutable on purpose: fields bound deep inside a request (e.g. in ADK callbacks
+# running in a copied context) are visible to everything else in the request.
+_log_context: ContextVar[Optional[Dict[str, str]]] = ContextVar("agent_log_context", default=None)
+_VALID_REQUEST_ID = re.compile(r"^[A-Za-z0-9._:-]{1,128}$")
+# Distinct (logger, message) pairs tracked by the rate limiter.
+_MAX_RATE_LIMIT_KEYS = 2048
+_UVICORN_LOGGERS = ("uvicorn", "uvicorn.error", "uvicorn.access")
+
+_handler: Optional["_DroppingQueueHandler"] = None
+_listener: Optional["_DrainingQueueListener"] = None
+_output: Optional[logging.Handler] = None
+_lock = threading.Lock()
+_hooks_installed = False
+
+
+def configure_logging(settings: Optional[LoggingSettings] = None) -> None:
+    """
+    Route all logging through the queue, replacing any handlers on the root logger.
+
+    Safe to call again (e.g. after a settings change); the previous listener is
+    drained and stopped first.
+    """
+
+    global _handler, _output, _hooks_installed
+
+    settings = settings or load_logging_settings()
+    root = logging.getLogger()
+    with _lock:
+        _stop_listener()
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        _output = logging.StreamHandler(sys.stderr)
+        _output.setFormatter(JsonFormatter() if settings.format == "json" else TextFormatter())
+        _handler = _DroppingQueueHandler(queue.Queue(settings.queue_size))
+        if settings.sample_rates:
+            _handler.addFilter(_SamplingFilter(settings.sample_rates))
+        if settings.rate_limits:
+            _handler.addFilter(_RateLimitFilter(settings.rate_limits))
+        _handler.addFilter(_context_filter)
+        root.addHandler(_handler)
+        root.setLevel(getattr(logging, settings.level, logging.INFO))
+        # uvicorn's own handlers would write synchronously; let its records propagate.
+        for name in _UVICORN_LOGGERS:
+            uvicorn_logger = logging.getLogger(name)
+            uvicorn_logger.handlers.clear()
+            uvicorn_logger.propagate = True
+        _start_listener()
+        if not _hooks_installed:
+            atexit.register(shutdown_logging)
+            if hasattr(os, "register_at_fork"):
+                os.register_at_fork(after_in_child=_restart_after_fork)
+            _hooks_installed = True
+
+
+def logging_configured() -> bool:
+    """
+    Whether `configure_logging` installed the queue handler in this process.
+    """
+
+    return _handler is not None
+
+
+def shutdown_logging() -> None:
+    """
+    Write out every queued record and stop the writer thread.
+
+    Call before `os._exit`, which skips `atexit` handlers.
+    """
+
+    with _lock:
+        _stop_listener()
+
+
+def bind_log_context(**fields: Optional[str]) -> None:
+    """
+    Add fields to the log context of the current request, if there is one.
+    """
+
+    context = _log_context.get()
+    if context is not None:
+        context.update({name: str(value) for name, value in fields.items() if value is not None})
+
+
+def current_log_context() -> Dict[str, str]:
+    """
+    Copy of the fields attached to records logged from the current context.
+    """
+
+    return dict(_log_context.get() or {})
+
+
+def log_context_of(context: Context) -> Dict[str, str]:
+    """
+    Copy of the log context fields in `context`, e.g. another task's `get_context()`.
+    """
+
+    return dict(context.get(_log_context) or {})
+
+
+@contextmanager
+def log_context(**fields: Optional[str]) -> Iterator[Dict[str, str]]:
+    """
+    Attach fields to every record logged inside the block (and by its tasks).
+    """
+
+    context = current_log_context()
+    context.update({name: str(value) for name, value in fields.items() if value is not None})
+    token = _log_context.set(context)
+    try:
+        yield context
+    finally:
+        _log_context.reset(token)
+
+
+class LogContextMiddleware:
+    """
+    ASGI middleware giving every HTTP request a request id for its log records.
+
+    A well-formed `X-Request-ID` from the client is reused, otherwise a new id is
+    generated. Either way it is returned in the response's `X-Request-ID` header.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope["headers"]:
+            if name == REQUEST_ID_HEADER.encode("latin-1"):
+                candidate = value.decode("latin-1")
+                if _VALID_REQUEST_ID.match(candidate):
+                    request_id = candidate
+                break
+        request_id = request_id or uuid.uuid4().hex
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                headers = [
+                    (name, value)
+                    for name, value in message.get("headers", [])
+                    if name.lower() != REQUEST_ID_HEADER.encode("latin-1")
+                ]
+                headers.append((REQUEST_ID_HEADER.encode("latin-1"), request_id.encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        with log_context(request_id=request_id):
+            await self.app(scope, receive, send_wrapper)
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per record: time, level, logger, message, context fields.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(
+                timespec="milliseconds"
+            ),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        payload.update(getattr(record, "log_context", None) or {})
+        suppressed = getattr(record, "suppressed", 0)
+        if suppressed:
+            payload["suppressed"] = suppressed
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            payload["exception"] = record.exc_text
+        if record.stack_info:
+            payload["stack"] = record.stack_info
+        return json.dumps(payload, default=str, ensure_ascii=False)
+
+
+class TextFormatter(logging.Formatter):
+    """
+    The `logging.basicConfig` layout, with context fields appended as key=value.
+    """
+
+    def __init__(self) -> None:
+        super().__init__("%(levelname)s:%(name)s:%(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        text = super().format(record)
+        extras = dict(getattr(record, "log_context", None) or {})
+        suppressed = getattr(record, "suppressed", 0)
+        if suppressed:
+            extras["suppressed"] = suppressed
+        if not extras:
+            return text
+        first_line, newline, rest = text.partition("\n")
+        fields = " ".join(f"{name}={value}" for name, value in extras.items())
+        return f"{first_line} [{fields}]{newline}{rest}"
+
+
+class _DroppingQueueHandler(QueueHandler):
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_RECORDS_DROPPED.labels(record.name, "queue_full").inc()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Unlike the default, keep the exception apart from the message so the
+        # formatter can emit it as its own field. Arguments are merged here, on
+        # the logging thread, because they may change once the call returns.
+        message = record.getMessage()
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record = logging.makeLogRecord(record.__dict__)
+        record.msg = message
+        record.args = None
+        record.exc_info = None
+        return record
+
+
+class _DrainingQueueListener(QueueListener):
+    def enqueue_sentinel(self) -> None:
+        # Blocking, unlike the default: the queue may be full, and the listener
+        # is still emptying it.
+        self.queue.put(self._sentinel)
+
+
+class _LoggerRules:
+    """
+    Per-logger value looked up by the longest matching dotted prefix.
+    """
+
+    def __init__(self, rules: Dict[str, float]) -> None:
+        self._rules = dict(rules)
+        self._resolved: Dict[str, Optional[float]] = {}
+
+    def get(self, name: str) -> Optional[float]:
+        try:
+            return self._resolved[name]
+        except KeyError:
+            pass
+        value = None
+        candidate = name
+        while candidate:
+            if candidate in self._rules:
+                value = self._rules[candidate]
+                break
+            candidate = candidate.rpartition(".")[0]
+        if value is None:
+            value = self._rules.get("root") if name != "root" else None
+        self._resolved[name] = value
+        return value
+
+
+class _SamplingFilter(logging.Filter):
+    def __init__(self, rates: Dict[str, float]) -> None:
+        super().__init__()
+        self._rates = _LoggerRules(rates)
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self._rates.get(record.name)
+        if rate is None or rate >= 1 or random.random() < rate:
+            return True
+        LOG_RECORDS_DROPPED.labels(record.name, "sampled").inc()
+        return False
+
+
+class _RateLimitFilter(logging.Filter):
+    def __init__(self, limits: Dict[str, float]) -> None:
+        super().__init__()
+        self._limits = _LoggerRules(limits)
+        # (logger, message template) -> [tokens, last refill, suppressed]
+        self._buckets: "OrderedDict[Tuple[str, str], List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        limit = self._limits.get(record.name)
+        if limit is None:
+            return True
+        key = (record.name, str(record.msg))
+        now = time.monotonic()
+        burst = max(limit, 1.0)
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [burst, now, 0]
+                if len(self._buckets) > _MAX_RATE_LIMIT_KEYS:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+                bucket[0] = min(burst, bucket[0] + (now - bucket[1]) * limit)
+                bucket[1] = now
+            if bucket[0] < 1:
+                bucket[2] += 1
+                allowed = False
+            else:
+                bucket[0] -= 1
+                record.suppressed = int(bucket[2])
+                bucket[2] = 0
+                allowed = True
+        if not allowed:
+            LOG_RECORDS_DROPPED.labels(record.name, "rate_limited").inc()
+        return allowed
+
+
+def _context_filter(record: logging.LogRecord) -> bool:
+    context = _log_context.get()
+    if context:
+        record.log_context = dict(context)
+    return True
+
+
+def _start_listener() -> None:
+    global _listener
+    assert _handler is not None and _output is not None
+    _listener = _DrainingQueueListener(_handler.queue, _output)
+    _listener.start()
+
+
+def _stop_listener() -> None:
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def _restart_after_fork() -> None:
+    # The writer thread does not survive fork, and the queue's lock may have been
+    # held by it at that moment: give the child a fresh queue and thread.
+    global _listener, _lock
+    _lock = threading.Lock()
+    if _handler is None:
+        return
+    _handler.queue = queue.Queue(_handler.queue.maxsize)
+    _listener = None
+    _start_listener()
+
+
+__all__ = [
+    "JsonFormatter",
+    "LogContextMiddleware",
+    "REQUEST_ID_HEADER",
+    "TextFormatter",
+    "bind_log_context",
+    "configure_logging",
+    "current_log_context",
+    "log_context",
+    "log_context_of",
+    "logging_configured",
+    "shutdown_logging",
+]
@@ -0,0 +1,262 @@
+"""
+Event-loop lag monitor and blocking-call detector.
+
+Synchronous work on the event loop (a blocking SDK call in a callback, a large
+`json.loads`, synchronous I/O) stalls every stream the worker is serving. Each
+worker runs a small task that wakes up every `interval_ms` and records how late
+it woke up (`agent_gateway_event_loop_lag_seconds`).
+
+A watchdog thread checks the task's heartbeat. When the loop has not run for
+`block_threshold_ms` longer than it should, the watchdog captures the loop
+thread's stack and attributes it:
+
+- `tool`: a tool's code is on the stack (its name is reported);
+- `callback`: an agent callback is on the stack (module and function);
+- `agent`: some other part of an agent run, such as ADK or the model client;
+- `other`: code outside any agent run (middleware, routes, startup work).
+
+The agent comes from the ADK contexts on the stack, and the request and
+invocation ids come from the running task's log context. Once the loop runs
+again, the report gets its measured duration. Each report is counted in
+`agent_gateway_event_loop_blocks`, logged with its stack, and the last `keep`
+are listed at `/admin/loop`.
+
+Calls that hold the GIL (e.g. `json.loads` of a large string) keep the watchdog
+from running until they return. Such stalls are still counted when the loop
+resumes, but with `kind="unattributed"` and no stack.
+"""
+
+import asyncio
+import logging
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from types import FrameType
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional, Tuple
+
+from fastapi import FastAPI
+
+from .logging_setup import log_context_of
+from .metrics import EVENT_LOOP_BLOCKS, EVENT_LOOP_LAG_SECONDS
+from .settings import LoopMonitorSettings
+
+logger = logging.getLogger(__name__)
+
+# Code under this directory (shared modules and agents) is "ours" for attribution.
+_SERVICE_ROOT = str(Path(__file__).resolve().parent.parent)
+# Deepest frames kept per report.
+_MAX_STACK_FRAMES = 40
+# Names ADK gives the context argument of agent, model and tool callbacks.
+_CONTEXT_ARGUMENTS = ("callback_context", "tool_context")
+
+
+@dataclass
+class LoopBlock:
+    """
+    One stall of the event loop over the blocking threshold.
+    """
+
+    at: float
+    blocked_ms: float
+    kind: str
+    name: Optional[str] = None
+    agent: Optional[str] = None
+    request_id: Optional[str] = None
+    invocation_id: Optional[str] = None
+    culprit: Optional[str] = None
+    stack: List[str] = field(default_factory=list)
+    finished: bool = False
+
+
+class LoopMonitor:
+    """
+    Per-worker loop lag measurements and blocking-call reports.
+    """
+
+    def __init__(self, settings: LoopMonitorSettings) -> None:
+        self._settings = settings
+        self._interval = settings.interval_ms / 1000
+        self._threshold = settings.block_threshold_ms / 1000
+        self._blocks: Deque[LoopBlock] = deque(maxlen=settings.keep)
+        self._lock = threading.Lock()
+        self._beat = time.monotonic()
+        # The report the watchdog opened for the current stall, if any.
+        self._open_block: Optional[LoopBlock] = None
+        self._last_lag = 0.0
+        self._max_lag = 0.0
+
+    @property
+    def settings(self) -> LoopMonitorSettings:
+        return self._settings
+
+    @asynccontextmanager
+    async def running(self, app: FastAPI) -> AsyncIterator[None]:
+        """
+        Lifespan hook measuring this worker's loop and watching it for stalls.
+        """
+
+        loop = asyncio.get_running_loop()
+        stopped = threading.Event()
+        self._beat = time.monotonic()
+        watchdog = threading.Thread(
+            target=self._watch,
+            args=(loop, threading.get_ident(), stopped),
+            name="agent-loop-watchdog",
+            daemon=True,
+        )
+        watchdog.start()
+        ticker = asyncio.create_task(self._tick())
+        try:
+            yield
+        finally:
+            ticker.cancel()
+            stopped.set()
+            await asyncio.gather(ticker, return_exceptions=True)
+            await asyncio.to_thread(watchdog.join)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Recent lag figures and blocking-call reports, newest first.
+        """
+
+        with self._lock:
+            blocks = [asdict(block) for block in reversed(self._blocks)]
+        return {
+            "interval_ms": self._settings.interval_ms,
+            "block_threshold_ms": self._settings.block_threshold_ms,
+            "last_lag_ms": round(self._last_lag * 1000, 1),
+            "max_lag_ms": round(self._max_lag * 1000, 1),
+            "blocks": blocks,
+        }
+
+    async def _tick(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self._interval
+            self._beat = time.monotonic()
+            await asyncio.sleep(self._interval)
+            lag = max(0.0, loop.time() - expected)
+            self._last_lag = lag
+            self._max_lag = max(self._max_lag, lag)
+            EVENT_LOOP_LAG_SECONDS.labels().observe(lag)
+            if lag >= self._threshold:
+                self._finish_block(lag)
+
+    def _finish_block(self, lag: float) -> None:
+        with self._lock:
+            block, self._open_block = self._open_block, None
+            if block is None:
+                # The watchdog never got to run during the stall (the GIL was held).
+                block = LoopBlock(at=time.time() - lag, blocked_ms=0.0, kind="unattributed")
+                self._blocks.append(block)
+            block.blocked_ms = round(lag * 1000, 1)
+            block.finished = True
+        EVENT_LOOP_BLOCKS.labels(block.agent or "", block.kind, block.name or "").inc()
+
+    def _watch(
+        self, loop: asyncio.AbstractEventLoop, loop_thread_id: int, stopped: threading.Event
+    ) -> None:
+        reported_beat = None
+        check_every = max(self._threshold / 2, 0.01)
+        while not stopped.wait(check_every):
+            beat = self._beat
+            stalled = time.monotonic() - beat - self._interval
+            if stalled < self._threshold or beat == reported_beat:
+                continue
+            reported_beat = beat
+            frame = sys._current_frames().get(loop_thread_id)
+            if frame is None:
+                continue
+            try:
+                block = self._describe(loop, frame, stalled)
+            finally:
+                del frame
+            with self._lock:
+                self._open_block = block
+                self._blocks.append(block)
+            logger.warning(
+                "Event loop blocked for over %.0f ms in %s %s (agent %s) at %s\n%s",
+                stalled * 1000,
+                block.kind,
+                block.name or "-",
+                block.agent or "-",
+                block.culprit or "-",
+                "\n".join(block.stack),
+            )
+
+    def _describe(
+        self, loop: asyncio.AbstractEventLoop, frame: FrameType, stalled: float
+    ) -> LoopBlock:
+        kind, name, agent, culprit = _attribute(frame)
+        block = LoopBlock(
+            at=time.time() - stalled,
+            blocked_ms=round(stalled * 1000, 1),
+            kind=kind,
+            name=name,
+            agent=agent,
+            culprit=culprit,
+            stack=_format_stack(frame),
+        )
+        task = asyncio.current_task(loop)
+        if task is not None:
+            context = log_context_of(task.get_context())
+            block.request_id = context.get("request_id")
+            block.invocation_id = context.get("invocation_id")
+        return block
+
+
+def _attribute(frame: FrameType) -> Tuple[str, Optional[str], Optional[str], Optional[str]]:
+    """
+    (kind, name, agent, culprit) for the stack ending at `frame` (innermost first).
+    """
+
+    base_tool = getattr(sys.modules.get("google.adk.tools.base_tool"), "BaseTool", None)
+    tool = callback = agent = culprit = None
+    current: Optional[FrameType] = frame
+    while current is not None:
+        code = current.f_code
+        ours = code.co_filename.startswith(_SERVICE_ROOT)
+        if ours and culprit is None:
+            culprit = f"{code.co_filename[len(_SERVICE_ROOT) + 1:]}:{current.f_lineno} in {code.co_qualname}"
+        arguments = code.co_varnames[: code.co_argcount + code.co_kwonlyargcount]
+        if tool is None and base_tool is not None and "self" in arguments:
+            candidate = current.f_locals.get("self")
+            # Not isinstance(): BaseTool is an ABC, and checking arbitrary objects
+            # against it grows its subclass caches.
+            if base_tool in type(candidate).__mro__:
+                tool = candidate.name
+        context_argument = next((name for name in _CONTEXT_ARGUMENTS if name in arguments), None)
+        if context_argument is not None:
+            if agent is None:
+                agent = getattr(current.f_locals.get(context_argument), "agent_name", None)
+            if callback is None and ours:
+                callback = f"{current.f_globals.get('__name__', '?')}.{code.co_qualname}"
+        elif agent is None and "invocation_context" in arguments:
+            invocation_agent = getattr(current.f_locals.get("invocation_context"), "agent", None)
+            agent = getattr(invocation_agent, "name", None)
+        current = current.f_back
+    if tool is not None:
+        return "tool", tool, agent, culprit
+    if callback is not None:
+        return "callback", callback, agent, culprit
+    if agent is not None:
+        return "agent", None, agent, culprit
+    return "other", None, None, culprit
+
+
+def _format_stack(frame: FrameType) -> List[str]:
+    lines: List[str] = []
+    current: Optional[FrameType] = frame
+    while current is not None and len(lines) < _MAX_STACK_FRAMES:
+        code = current.f_code
+        lines.append(f"{code.co_filename}:{current.f_lineno} in {code.co_qualname}")
+        current = current.f_back
+    lines.reverse()
+    return lines
+
+
+__all__ = ["LoopBlock", "LoopMonitor"]
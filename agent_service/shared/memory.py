@@ -0,0 +1,179 @@
+"""
+Approximate memory footprint of a worker, by component.
+
+`GET /admin/memory` reports:
+
+- `process`: resident set size, peak RSS, garbage collector counts and, while
+  tracing is on, the Python heap traced by `tracemalloc`;
+- `sessions`: sessions and their approximate size per agent (ADK app name), and
+  the largest sessions, from `BoundedSessionService`;
+- `components`: figures from the modules that hold per-run state or caches. Each
+  registers a reporter with `register_memory_component` when imported: Composio
+  MCP toolsets and their live MCP sessions, the tool schema and index caches,
+  in-flight metric bookkeeping, and ag_ui_adk's session tracking.
+
+Sizes are estimates (serialized sizes and counts). They show which component
+grows, not exact byte counts.
+
+`POST /admin/memory/tracemalloc` starts `tracemalloc` if needed and takes a
+snapshot. Each later call returns the allocations that grew most since the
+previous snapshot, grouped by source line. `DELETE` stops tracing. Tracing slows
+down every allocation, so turn it off when done.
+"""
+
+import gc
+import logging
+import os
+import sys
+import threading
+import tracemalloc
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+MemoryReporter = Callable[[], Dict[str, Any]]
+
+_components: Dict[str, MemoryReporter] = {}
+_tracemalloc_lock = threading.Lock()
+# Snapshot the next diff is taken against.
+_baseline: Optional[tracemalloc.Snapshot] = None
+# Allocations made by the snapshotting itself are left out of diffs.
+_SNAPSHOT_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+
+def register_memory_component(name: str, reporter: MemoryReporter) -> None:
+    """
+    Include `reporter()` under `components[name]` in every memory report.
+
+    Reporters run on the event loop, so they should only count what they hold.
+    """
+
+    _components[name] = reporter
+
+
+def memory_report(*, collect: bool = False) -> Dict[str, Any]:
+    """
+    Process figures and every registered component's report.
+
+    With `collect`, a full garbage collection runs first, so objects that are only
+    waiting for the collector are not counted.
+    """
+
+    collected = gc.collect() if collect else None
+    components: Dict[str, Any] = {}
+    for name, reporter in sorted(_components.items()):
+        try:
+            components[name] = reporter()
+        except Exception:  # pragma: no cover - a broken reporter must not hide the others
+            logger.exception("Memory reporter '%s' failed", name)
+            components[name] = {"error": "reporter failed"}
+    return {"process": process_memory(collected), "components": components}
+
+
+def process_memory(collected: Optional[int] = None) -> Dict[str, Any]:
+    """
+    RSS, peak RSS and garbage collector state of this process.
+    """
+
+    report: Dict[str, Any] = {
+        "pid": os.getpid(),
+        "rss_bytes": _rss_bytes(),
+        "peak_rss_bytes": _peak_rss_bytes(),
+        "gc_counts": list(gc.get_count()),
+        "gc_objects": len(gc.get_objects()),
+        "gc_collected": collected,
+        "tracemalloc": tracemalloc.is_tracing(),
+    }
+    if tracemalloc.is_tracing():
+        current, peak = tracemalloc.get_traced_memory()
+        report["traced_bytes"] = current
+        report["peak_traced_bytes"] = peak
+    return report
+
+
+def tracemalloc_diff(*, top: int = 20, group_by: str = "lineno", frames: int = 1) -> Dict[str, Any]:
+    """
+    Take a `tracemalloc` snapshot and diff it against the previous one.
+
+    Starts tracing with `frames` frames per allocation if it is off; the first
+    snapshot after that is only a baseline. Blocking: run it off the event loop.
+    """
+
+    global _baseline
+    with _tracemalloc_lock:
+        started = not tracemalloc.is_tracing()
+        if started:
+            tracemalloc.start(frames)
+            _baseline = None
+        snapshot = tracemalloc.take_snapshot().filter_traces(_SNAPSHOT_FILTERS)
+        previous, _baseline = _baseline, snapshot
+    current, peak = tracemalloc.get_traced_memory()
+    report: Dict[str, Any] = {
+        "started": started,
+        "frames": tracemalloc.get_traceback_limit(),
+        "traced_bytes": current,
+        "peak_traced_bytes": peak,
+        "size_diff": None,
+        "top": [],
+    }
+    if previous is None:
+        return report
+    stats = snapshot.compare_to(previous, group_by)
+    report["size_diff"] = sum(stat.size_diff for stat in stats)
+    report["top"] = [
+        {
+            "size_diff": stat.size_diff,
+            "count_diff": stat.count_diff,
+            "size": stat.size,
+            "count": stat.count,
+            "traceback": [f"{frame.filename}:{frame.lineno}" for frame in stat.traceback],
+        }
+        for stat in stats[:top]
+    ]
+    return report
+
+
+def stop_tracemalloc() -> bool:
+    """
+    Stop tracing and drop the baseline snapshot; False if tracing was off.
+    """
+
+    global _baseline
+    with _tracemalloc_lock:
+        tracing = tracemalloc.is_tracing()
+        tracemalloc.stop()
+        _baseline = None
+    return tracing
+
+
+def _rss_bytes() -> Optional[int]:
+    try:
+        with open("/proc/self/statm", "rb") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        # No procfs (e.g. macOS): fall back to the peak.
+        return _peak_rss_bytes()
+
+
+def _peak_rss_bytes() -> Optional[int]:
+    try:
+        import resource
+    except ImportError:  # pragma: no cover - Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes.
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+__all__ = [
+    "MemoryReporter",
+    "memory_report",
+    "process_memory",
+    "register_memory_component",
+    "stop_tracemalloc",
+    "tracemalloc_diff",
+]
@@ -0,0 +1,442 @@
+"""
+Prometheus metrics for the gateway's request stages.
+
+A small in-process registry rendering the Prometheus text exposition format, so
+scraping needs no extra dependency. `create_app` serves it at `/metrics` (see
+`MetricsSettings`). Values are per worker process.
+
+Label sets are deliberately small (agent, model, tool, MCP config id, outcome) so
+updates stay cheap and series counts stay bounded.
+"""
+
+import bisect
+import threading
+import time
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+from starlette.datastructures import State
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .agent_routes import agent_slug_for_path
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+LLM_LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 15.0, 30.0, 60.0, 120.0)
+BYTES_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+EVENT_LOOP_LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+JOB_DURATION_BUCKETS = (1.0, 5.0, 15.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1200.0, 1800.0, 3600.0)
+
+LabelValues = Tuple[str, ...]
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[LabelValues, object] = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def labels(self, *values: str):
+        key = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}, got {key}")
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def _samples(self) -> Iterable[Tuple[str, LabelValues, Tuple[Tuple[str, str], ...], float]]:
+        raise NotImplementedError
+
+    def render(self, lines: List[str]) -> None:
+        lines.append(f"# HELP {self.name} {self.documentation}")
+        lines.append(f"# TYPE {self.name} {self.kind}")
+        for suffix, values, extra, value in self._samples():
+            pairs = [*zip(self.labelnames, values), *extra]
+            labels = ",".join(f'{name}="{_escape(label)}"' for name, label in pairs)
+            if labels:
+                labels = f"{{{labels}}}"
+            lines.append(f"{self.name}{suffix}{labels} {_format(value)}")
+
+
+class _CounterChild:
+    # Updated from executor threads too (e.g. Composio lookups), so every
+    # read-modify-write holds the child's lock.
+    __slots__ = ("value", "_lock")
+
+    def __init__(self) -> None:
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self) -> _CounterChild:
+        return _CounterChild()
+
+    def _samples(self):
+        for values, child in list(self._children.items()):
+            yield "_total", values, (), child.value
+
+
+class _GaugeChild(_CounterChild):
+    __slots__ = ()
+
+    def dec(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value: float) -> None:
+        with self._lock:
+            self.value = value
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def _new_child(self) -> _GaugeChild:
+        return _GaugeChild()
+
+    def _samples(self):
+        for values, child in list(self._children.items()):
+            yield "", values, (), child.value
+
+
+class _Timer:
+    __slots__ = ("_child", "_started")
+
+    def __init__(self, child: "_HistogramChild") -> None:
+        self._child = child
+
+    def __enter__(self) -> "_Timer":
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._child.observe(time.perf_counter() - self._started)
+
+
+class _HistogramChild:
+    __slots__ = ("_bounds", "counts", "sum", "count", "_lock")
+
+    def __init__(self, bounds: Tuple[float, ...]) -> None:
+        self._bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect.bisect_left(self._bounds, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def time(self) -> _Timer:
+        """
+        Context manager observing the elapsed seconds of its block.
+        """
+
+        return _Timer(self)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        *,
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ) -> None:
+        self._bounds = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self) -> _HistogramChild:
+        return _HistogramChild(self._bounds)
+
+    def _samples(self):
+        for values, child in list(self._children.items()):
+            with child._lock:
+                counts, total, count = list(child.counts), child.sum, child.count
+            cumulative = 0
+            for bound, bucket_count in zip(self._bounds, counts):
+                cumulative += bucket_count
+                yield "_bucket", values, (("le", _format(bound)),), cumulative
+            yield "_bucket", values, (("le", "+Inf"),), count
+            yield "_sum", values, (), total
+            yield "_count", values, (), count
+
+
+_registry: List[_Metric] = []
+
+
+def render_metrics() -> str:
+    """
+    Render every registered metric in the Prometheus text exposition format.
+    """
+
+    lines: List[str] = []
+    for metric in _registry:
+        metric.render(lines)
+    lines.append("")
+    return "\n".join(lines)
+
+
+async def metrics_endpoint(request: Request) -> Response:
+    return Response(render_metrics(), media_type=CONTENT_TYPE)
+
+
+AUTH_JWT_DECODE_SECONDS = Histogram(
+    "agent_gateway_auth_jwt_decode_seconds",
+    "Time spent validating the Supabase JWT.",
+    ("outcome",),
+)
+AUTH_USER_LOOKUP_SECONDS = Histogram(
+    "agent_gateway_auth_user_lookup_seconds",
+    "Time spent on the Supabase /auth/v1/user lookup.",
+    ("outcome",),
+)
+MCP_GENERATE_SECONDS = Histogram(
+    "agent_gateway_mcp_generate_seconds",
+    "Time spent in Composio mcp.generate per MCP config id.",
+    ("config_id",),
+)
+COMPOSIO_CONNECTION_LOOKUPS = Counter(
+    "agent_gateway_composio_connection_lookups",
+    "Per-run Composio connection status lookups answered from cache (hit) or the API (miss),"
+    " and runs whose lookup was not ready for the first model request (late).",
+    ("result",),
+)
+MCP_TOOLSET_OPEN_SECONDS = Histogram(
+    "agent_gateway_mcp_toolset_open_seconds",
+    "Time to open an MCP session and list its tools.",
+    ("agent",),
+)
+MCP_URL_WAIT_SECONDS = Histogram(
+    "agent_gateway_mcp_url_wait_seconds",
+    "Time MCP sessions waited for a Composio MCP URL generated in the background.",
+    ("agent",),
+)
+MCP_TOOLSET_CLOSE_SECONDS = Histogram(
+    "agent_gateway_mcp_toolset_close_seconds",
+    "Time to close an MCP toolset.",
+    ("agent",),
+)
+TOOL_CALL_SECONDS = Histogram(
+    "agent_gateway_tool_call_seconds",
+    "Tool call latency.",
+    ("agent", "tool"),
+    buckets=LLM_LATENCY_BUCKETS,
+)
+TOOL_PAYLOAD_BYTES = Histogram(
+    "agent_gateway_tool_payload_bytes",
+    "Size of tool responses before normalization.",
+    ("agent", "tool"),
+    buckets=BYTES_BUCKETS,
+)
+LLM_TIME_TO_FIRST_TOKEN_SECONDS = Histogram(
+    "agent_gateway_llm_time_to_first_token_seconds",
+    "Time from sending a model request to its first response chunk.",
+    ("agent", "model"),
+    buckets=LLM_LATENCY_BUCKETS,
+)
+LLM_REQUEST_SECONDS = Histogram(
+    "agent_gateway_llm_request_seconds",
+    "Time from sending a model request to its final response.",
+    ("agent", "model"),
+    buckets=LLM_LATENCY_BUCKETS,
+)
+SSE_STREAMS_ACTIVE = Gauge(
+    "agent_gateway_sse_streams_active",
+    "Open server-sent event streams.",
+    ("agent",),
+)
+SSE_EVENTS = Counter(
+    "agent_gateway_sse_events",
+    "AG-UI events produced by agents (stage=in) and written after coalescing (stage=out).",
+    ("agent", "stage"),
+)
+SSE_BYTES = Counter(
+    "agent_gateway_sse_bytes",
+    "Event stream bytes before (stage=raw) and after (stage=wire) compression.",
+    ("agent", "stage"),
+)
+
+JOBS_QUEUED = Gauge(
+    "agent_gateway_jobs_queued",
+    "Background jobs waiting for a worker slot.",
+    ("agent",),
+)
+JOBS_RUNNING = Gauge(
+    "agent_gateway_jobs_running",
+    "Background jobs being executed.",
+    ("agent",),
+)
+JOBS_REJECTED = Counter(
+    "agent_gateway_jobs_rejected",
+    "Background job submissions refused (queue_full, user_limit).",
+    ("agent", "reason"),
+)
+JOB_QUEUE_WAIT_SECONDS = Histogram(
+    "agent_gateway_job_queue_wait_seconds",
+    "Time from job submission to the start of its run.",
+    ("agent",),
+    buckets=JOB_DURATION_BUCKETS,
+)
+JOB_RUN_SECONDS = Histogram(
+    "agent_gateway_job_run_seconds",
+    "Background job run time by final status.",
+    ("agent", "status"),
+    buckets=JOB_DURATION_BUCKETS,
+)
+TOOL_DECLARATION_TOKENS = Counter(
+    "agent_gateway_tool_declaration_tokens",
+    "Estimated prompt tokens of Composio tool declarations per model request (available, sent).",
+    ("agent", "stage"),
+)
+TOOL_SEARCHES = Counter(
+    "agent_gateway_tool_searches",
+    "Calls to the tool-search tool by the model.",
+    ("agent",),
+)
+LLM_TOKENS = Counter(
+    "agent_gateway_llm_tokens",
+    "Tokens reported by model calls (prompt, completion).",
+    ("agent", "model", "kind"),
+)
+USAGE_QUOTA_EXCEEDED = Counter(
+    "agent_gateway_usage_quota_exceeded",
+    "Runs started over the soft token quota (soft) or refused over the hard quota (hard).",
+    ("agent", "level"),
+)
+EVENT_LOOP_LAG_SECONDS = Histogram(
+    "agent_gateway_event_loop_lag_seconds",
+    "How late the event loop ran a periodic check, per check.",
+    buckets=EVENT_LOOP_LAG_BUCKETS,
+)
+EVENT_LOOP_BLOCKS = Counter(
+    "agent_gateway_event_loop_blocks",
+    "Event-loop stalls over the blocking threshold, by the agent and the callback or tool running.",
+    ("agent", "kind", "name"),
+)
+RUNS_COALESCED = Counter(
+    "agent_gateway_runs_coalesced",
+    "Duplicate run requests attached to a run in flight, replayed from a finished one, or refused.",
+    ("agent", "outcome"),
+)
+LOG_RECORDS_DROPPED = Counter(
+    "agent_gateway_log_records_dropped",
+    "Log records not written: sampled out, rate limited or over the queue size.",
+    ("logger", "reason"),
+)
+
+
+class SSEStreamMetricsMiddleware:
+    """
+    ASGI middleware counting open `text/event-stream` responses per agent.
+    """
+
+    def __init__(self, app: ASGIApp, *, state: State) -> None:
+        self.app = app
+        self._state = state
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        agent = agent_slug_for_path(self._state.agent_registry, scope["path"])
+        if agent is None:
+            await self.app(scope, receive, send)
+            return
+
+        gauge = SSE_STREAMS_ACTIVE.labels(agent)
+        streaming = False
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal streaming
+            if message["type"] == "http.response.start" and is_event_stream(message):
+                streaming = True
+                gauge.inc()
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if streaming:
+                gauge.dec()
+
+
+def is_event_stream(message: Message) -> bool:
+    for name, value in message.get("headers", ()):
+        if name.lower() == b"content-type":
+            return value.startswith(b"text/event-stream")
+    return False
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format(value: float) -> str:
+    if value == int(value):
+        return str(int(value))
+    return repr(value)
+
+
+__all__ = [
+    "AUTH_JWT_DECODE_SECONDS",
+    "AUTH_USER_LOOKUP_SECONDS",
+    "COMPOSIO_CONNECTION_LOOKUPS",
+    "CONTENT_TYPE",
+    "Counter",
+    "EVENT_LOOP_BLOCKS",
+    "EVENT_LOOP_LAG_SECONDS",
+    "Gauge",
+    "Histogram",
+    "JOBS_QUEUED",
+    "JOBS_REJECTED",
+    "JOBS_RUNNING",
+    "JOB_QUEUE_WAIT_SECONDS",
+    "JOB_RUN_SECONDS",
+    "LLM_REQUEST_SECONDS",
+    "LLM_TIME_TO_FIRST_TOKEN_SECONDS",
+    "LLM_TOKENS",
+    "LOG_RECORDS_DROPPED",
+    "MCP_GENERATE_SECONDS",
+    "MCP_TOOLSET_CLOSE_SECONDS",
+    "MCP_TOOLSET_OPEN_SECONDS",
+    "MCP_URL_WAIT_SECONDS",
+    "RUNS_COALESCED",
+    "SSEStreamMetricsMiddleware",
+    "SSE_BYTES",
+    "SSE_EVENTS",
+    "SSE_STREAMS_ACTIVE",
+    "TOOL_CALL_SECONDS",
+    "TOOL_DECLARATION_TOKENS",
+    "TOOL_PAYLOAD_BYTES",
+    "TOOL_SEARCHES",
+    "USAGE_QUOTA_EXCEEDED",
+    "is_event_stream",
+    "metrics_endpoint",
+    "render_metrics",
+]
@@ -5,9 +5,12 @@ Helpers for resolving model providers and constructing ADK model instances.
 from __future__ import annotations
 
 import os
-from typing import Any
+from typing import Any, Dict, List, Tuple
 
-from google.adk.models.lite_llm import LiteLlm
+from .settings import load_cassette_settings, load_usage_settings
+
+# Latest model resolved per (provider, identifier), warmed up by `shared.warmup`.
+_resolved_models: Dict[Tuple[str, str], Any] = {}
 
 
 def resolve_model_provider(
@@ -45,11 +48,42 @@ def resolve_adk_model(
 ) -> Any:
     """
     Resolve the ADK model configuration for an agent based on environment settings.
+
+    When `AGENT_CASSETTE_MODE` is `record` or `replay`, the model is wrapped so its
+    traffic is captured to, or served from, the cassette (see `shared.cassettes`).
+    With the usage ledger on, the token usage of every call is recorded against the
+    current user and agent (see `shared.usage`).
     """
 
     provider = resolve_model_provider(
         provider_env, default_provider_env, fallback_provider=fallback_provider
     )
     if provider == google_provider:
-        return model_identifier
-    return LiteLlm(model=model_identifier, max_tokens=64000)
+        model: Any = model_identifier
+    else:
+        # Imported on demand: LiteLLM is expensive to import and lazily mounted agents
+        # should not pay for it before their first request.
+        from google.adk.models.lite_llm import LiteLlm
+
+        model = LiteLlm(model=model_identifier, max_tokens=64000)
+
+    if load_cassette_settings().mode != "off":
+        from .cassettes import wrap_model
+
+        model = wrap_model(model)
+
+    if load_usage_settings().enabled:
+        from .usage_llm import wrap_model as wrap_usage_model
+
+        model = wrap_usage_model(model)
+
+    _resolved_models[(provider, model_identifier)] = model
+    return model
+
+
+def resolved_models() -> List[Any]:
+    """
+    Models returned by `resolve_adk_model` so far: Gemini model names or `BaseLlm`s.
+    """
+
+    return list(_resolved_models.values())
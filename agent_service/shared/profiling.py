@@ -0,0 +1,382 @@
+"""
+Admin-triggered sampling CPU profiles of single agent runs.
+
+A run is profiled when either of these holds:
+
+- it carries an `X-Agent-Profile` header signed with `AGENT_PROFILING_SECRET`
+  (mint one via `POST /admin/profiles/token`), or
+- an admin armed profiling for its agent (and optionally its user) with
+  `POST /admin/profiles/arm`.
+
+While a run is profiled, a background thread samples the event loop thread's stack
+every `interval_ms`. It keeps only the samples taken while a task belonging to
+that run (any task created under its request context) is executing. The stacks
+therefore follow the run across authentication, ADK internals, callbacks and tool
+handling, while other requests' work is left out. Profiles are stored as speedscope
+JSON and can be downloaded from `/admin/profiles/{profile_id}`.
+
+When nothing is armed and no secret is configured, requests pass straight through.
+No sampler thread exists outside a profiled run.
+"""
+
+import asyncio
+import hashlib
+import hmac
+import json
+import logging
+import os
+import re
+import secrets
+import sys
+import threading
+import time
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from starlette.datastructures import State
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from .agent_routes import agent_slug_for_path
+from .settings import ProfilingSettings
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = "X-Agent-Profile"
+
+_HEADER_KEY = PROFILE_HEADER.lower().encode("latin-1")
+_PROFILE_SUFFIX = ".speedscope.json"
+_PROFILE_ID = re.compile(r"^[\w.-]+$")
+
+_active_run: ContextVar[Optional["_ProfiledRun"]] = ContextVar("agent_profiled_run", default=None)
+
+
+@dataclass
+class ProfileArm:
+    """
+    Pending admin request to profile the next matching run(s) in this worker.
+    """
+
+    agent: Optional[str]
+    user_id: Optional[str]
+    runs: int
+    expires_at: float
+
+    def matches(self, agent: str) -> bool:
+        return self.agent in (None, agent) and time.time() < self.expires_at
+
+
+class _ProfiledRun:
+    """
+    Identity marker placed in the request context of the profiled run.
+    """
+
+    __slots__ = ("agent", "trigger")
+
+    def __init__(self, agent: str, trigger: str) -> None:
+        self.agent = agent
+        self.trigger = trigger
+
+
+class _StackSampler(threading.Thread):
+    def __init__(
+        self,
+        loop: asyncio.AbstractEventLoop,
+        run: _ProfiledRun,
+        *,
+        interval: float,
+        max_seconds: float,
+    ) -> None:
+        super().__init__(name="agent-profile-sampler", daemon=True)
+        self._loop = loop
+        self._loop_thread_id = threading.get_ident()
+        self._run = run
+        self._interval = interval
+        self._max_seconds = max_seconds
+        self._stopped = threading.Event()
+        self.frames: List[Tuple[str, str, int]] = []
+        self._frame_index: Dict[Tuple[str, str, int], int] = {}
+        self.samples: List[List[int]] = []
+        self.weights: List[float] = []
+        self.truncated = False
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self.join()
+
+    def run(self) -> None:
+        started = last = time.perf_counter()
+        while not self._stopped.wait(self._interval):
+            now = time.perf_counter()
+            elapsed_ms, last = (now - last) * 1000, now
+            if now - started > self._max_seconds:
+                self.truncated = True
+                return
+            task = asyncio.current_task(self._loop)
+            if task is None or task.get_context().get(_active_run) is not self._run:
+                continue
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is not None:
+                self.samples.append(self._stack(frame))
+                self.weights.append(round(elapsed_ms, 3))
+
+    def _stack(self, frame) -> List[int]:
+        stack: List[int] = []
+        while frame is not None:
+            code = frame.f_code
+            key = (code.co_qualname, code.co_filename, code.co_firstlineno)
+            index = self._frame_index.get(key)
+            if index is None:
+                index = self._frame_index[key] = len(self.frames)
+                self.frames.append(key)
+            stack.append(index)
+            frame = frame.f_back
+        stack.reverse()
+        return stack
+
+
+class RequestProfiler:
+    """
+    Per-worker profiling state: armed requests, the active profile and stored files.
+    """
+
+    def __init__(self, settings: ProfilingSettings) -> None:
+        self._settings = settings
+        self._directory = Path(settings.directory)
+        self._arms: List[ProfileArm] = []
+        self._busy = False
+
+    @property
+    def settings(self) -> ProfilingSettings:
+        return self._settings
+
+    @property
+    def watching(self) -> bool:
+        return bool(self._arms or self._settings.secret)
+
+    def arm(
+        self,
+        *,
+        agent: Optional[str] = None,
+        user_id: Optional[str] = None,
+        runs: int = 1,
+        ttl_seconds: float = 600.0,
+    ) -> ProfileArm:
+        arm = ProfileArm(agent, user_id, max(1, runs), time.time() + ttl_seconds)
+        self._arms.append(arm)
+        return arm
+
+    def armed(self) -> List[Dict[str, Any]]:
+        self._arms = [arm for arm in self._arms if arm.expires_at > time.time()]
+        return [asdict(arm) for arm in self._arms]
+
+    def issue_token(self, ttl_seconds: float) -> str:
+        """
+        Signed `X-Agent-Profile` header value valid for `ttl_seconds`.
+        """
+
+        if not self._settings.secret:
+            raise LookupError("AGENT_PROFILING_SECRET is not configured")
+        expires = int(time.time() + ttl_seconds)
+        return f"{expires}.{self._signature(expires)}"
+
+    def verify_token(self, token: str) -> bool:
+        if not self._settings.secret:
+            return False
+        expires, _, signature = token.partition(".")
+        if not expires.isdigit() or int(expires) < time.time():
+            return False
+        return hmac.compare_digest(signature, self._signature(int(expires)))
+
+    def profiles(self) -> List[Dict[str, Any]]:
+        if not self._directory.is_dir():
+            return []
+        entries = []
+        for path in sorted(self._directory.glob(f"*{_PROFILE_SUFFIX}"), reverse=True):
+            stat = path.stat()
+            entries.append(
+                {
+                    "profile_id": path.name[: -len(_PROFILE_SUFFIX)],
+                    "bytes": stat.st_size,
+                    "created_at": stat.st_mtime,
+                }
+            )
+        return entries
+
+    def profile_path(self, profile_id: str) -> Optional[Path]:
+        if not _PROFILE_ID.match(profile_id):
+            return None
+        path = self._directory / f"{profile_id}{_PROFILE_SUFFIX}"
+        return path if path.is_file() else None
+
+    def _signature(self, expires: int) -> str:
+        return hmac.new(
+            self._settings.secret.encode("utf-8"), str(expires).encode("ascii"), hashlib.sha256
+        ).hexdigest()
+
+    def matching_arm(self, agent: str) -> Optional[ProfileArm]:
+        for arm in self._arms:
+            if arm.matches(agent):
+                return arm
+        return None
+
+    def consume_arm(self, arm: ProfileArm) -> None:
+        arm.runs -= 1
+        if arm.runs <= 0 and arm in self._arms:
+            self._arms.remove(arm)
+
+    def try_begin(self) -> bool:
+        """
+        Reserve the worker's single profiling slot.
+        """
+
+        if self._busy:
+            return False
+        self._busy = True
+        return True
+
+    def end(self) -> None:
+        self._busy = False
+
+    def write(self, profile_id: str, document: Dict[str, Any]) -> None:
+        self._directory.mkdir(parents=True, exist_ok=True)
+        path = self._directory / f"{profile_id}{_PROFILE_SUFFIX}"
+        tmp_path = path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(document, separators=(",", ":")), encoding="utf-8")
+        os.replace(tmp_path, path)
+        stored = sorted(
+            self._directory.glob(f"*{_PROFILE_SUFFIX}"), key=lambda item: item.stat().st_mtime
+        )
+        for stale in stored[: -self._settings.keep]:
+            stale.unlink(missing_ok=True)
+
+
+class RequestProfilingMiddleware:
+    """
+    ASGI middleware starting a `RequestProfiler` sample run for selected agent runs.
+
+    Install it outside `SupabaseAuthMiddleware` so JWT validation is profiled too.
+    """
+
+    def __init__(self, app: ASGIApp, *, profiler: RequestProfiler, state: State) -> None:
+        self.app = app
+        self._profiler = profiler
+        self._state = state
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        profiler = self._profiler
+        if not profiler.watching or scope["type"] != "http" or scope["method"] != "POST":
+            await self.app(scope, receive, send)
+            return
+        agent = agent_slug_for_path(self._state.agent_registry, scope["path"])
+        if agent is None:
+            await self.app(scope, receive, send)
+            return
+
+        arm: Optional[ProfileArm] = None
+        header = _header(scope, _HEADER_KEY)
+        if header is not None and profiler.verify_token(header):
+            trigger = "header"
+        else:
+            arm = profiler.matching_arm(agent)
+            if arm is None:
+                await self.app(scope, receive, send)
+                return
+            trigger = "admin"
+        if not profiler.try_begin():
+            logger.info("Skipping profile of %s run: another profile is in progress", agent)
+            await self.app(scope, receive, send)
+            return
+
+        run = _ProfiledRun(agent, trigger)
+        settings = profiler.settings
+        sampler = _StackSampler(
+            asyncio.get_running_loop(),
+            run,
+            interval=settings.interval_ms / 1000,
+            max_seconds=settings.max_seconds,
+        )
+        token = _active_run.set(run)
+        started = time.time()
+        sampler.start()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _active_run.reset(token)
+            sampler.stop()
+            profiler.end()
+            user_id = ((scope.get("state") or {}).get("supabase_user") or {}).get("id")
+            if arm is not None and arm.user_id and arm.user_id != user_id:
+                logger.debug("Discarded profile of %s run for a different user", agent)
+            else:
+                if arm is not None:
+                    profiler.consume_arm(arm)
+                await self._store(run, sampler, started)
+
+    async def _store(self, run: _ProfiledRun, sampler: _StackSampler, started: float) -> None:
+        profile_id = "-".join(
+            (
+                time.strftime("%Y%m%dT%H%M%S", time.gmtime(started)),
+                run.agent,
+                str(os.getpid()),
+                secrets.token_hex(3),
+            )
+        )
+        document = _speedscope_document(profile_id, run, sampler, time.time() - started)
+        try:
+            await asyncio.to_thread(self._profiler.write, profile_id, document)
+        except OSError:
+            logger.exception("Failed to store profile %s", profile_id)
+            return
+        logger.info(
+            "Stored %s-triggered profile %s (%d samples, %.0f ms on CPU%s)",
+            run.trigger,
+            profile_id,
+            len(sampler.samples),
+            sum(sampler.weights),
+            ", truncated" if sampler.truncated else "",
+        )
+
+
+def _speedscope_document(
+    profile_id: str, run: _ProfiledRun, sampler: _StackSampler, wall_seconds: float
+) -> Dict[str, Any]:
+    return {
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "name": f"{run.agent} run {profile_id}",
+        "exporter": "agent-gateway",
+        "activeProfileIndex": 0,
+        "shared": {
+            "frames": [
+                {"name": name, "file": filename, "line": line}
+                for name, filename, line in sampler.frames
+            ]
+        },
+        "profiles": [
+            {
+                "type": "sampled",
+                "name": f"{run.agent} ({run.trigger}, {wall_seconds:.2f}s wall)",
+                "unit": "milliseconds",
+                "startValue": 0,
+                "endValue": round(sum(sampler.weights), 3),
+                "samples": sampler.samples,
+                "weights": sampler.weights,
+            }
+        ],
+    }
+
+
+def _header(scope: Scope, key: bytes) -> Optional[str]:
+    for name, value in scope["headers"]:
+        if name == key:
+            return value.decode("latin-1")
+    return None
+
+
+__all__ = [
+    "PROFILE_HEADER",
+    "ProfileArm",
+    "RequestProfiler",
+    "RequestProfilingMiddleware",
+]
@@ -0,0 +1,554 @@
+"""
+Coalescing of duplicate agent run requests.
+
+Frontend retries, double submits and the CopilotKit runtime re-posting after a
+network blip send the same run more than once. Without coalescing, every copy is
+a full agent run: the model and tool cost is paid again, and mutating tools (such
+as sending an email) fire again.
+
+`RunCoalescingMiddleware` keys every `POST` to an agent mount path by the user,
+the agent, the AG-UI `threadId` and what triggered the run. That is the
+`Idempotency-Key` header if the client sends one, otherwise the id of the last
+message (the one the run answers), otherwise the `runId`.
+
+- The first request with a key starts the run. The run executes in its own task
+  and its response is recorded; the request streams the recording.
+- A request with the key of a run in flight attaches to it. It gets the recorded
+  events from the start, then new ones as they are produced.
+- A request that succeeded less than `ttl_seconds` ago is replayed from its
+  recording, matched by `Idempotency-Key` or, failing that, by `runId`. A last
+  message id alone only attaches to runs in flight: a regenerate re-posts the
+  same messages under a new `runId` and must get a new run. Error responses,
+  runs ending in `RUN_ERROR` and runs stopped early are not replayed, so retrying
+  a failed run starts a new one.
+- A run is not tied to the connection that started it. When its last client
+  disconnects, it keeps going for `detach_grace_seconds`, so a retry arriving
+  meanwhile can attach. Then it is stopped the way a run is when its client goes
+  away.
+
+The recording is the response as the inner middleware sent it, gzip encoding
+included. A duplicate that does not accept gzip gets it decompressed. Once a
+run's recording exceeds `max_run_bytes`, events every client has received are
+dropped: attached clients keep streaming, and later duplicates get `409` instead
+of a second run.
+
+Runs and recordings are per worker.
+"""
+
+import asyncio
+import json
+import logging
+import time
+import zlib
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from fastapi import FastAPI, status
+from fastapi.responses import JSONResponse
+from starlette.datastructures import State
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .admission import ANONYMOUS_USER
+from .agent_routes import agent_slug_for_path
+from .auth import get_supabase_user_id
+from .memory import register_memory_component
+from .metrics import RUNS_COALESCED
+from .settings import RunCoalescingSettings
+from .sse_streaming import accepts_gzip
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_KEY_HEADER = "Idempotency-Key"
+
+# (user, agent, thread id, trigger kind, trigger id)
+RunKey = Tuple[str, str, str, str, str]
+
+_RUN_ERROR_PREFIX = b'data: {"type":"RUN_ERROR"'
+_GZIP_WBITS = 16 + zlib.MAX_WBITS
+_IDEMPOTENCY_KEY = IDEMPOTENCY_KEY_HEADER.lower().encode("latin-1")
+_SERVER_ERROR_START: Message = {
+    "type": "http.response.start",
+    "status": status.HTTP_500_INTERNAL_SERVER_ERROR,
+    "headers": [(b"content-type", b"text/plain; charset=utf-8")],
+}
+
+
+class _Run:
+    """
+    One agent run executed on behalf of every request with its key, and its recording.
+    """
+
+    def __init__(
+        self, coalescer: "RunCoalescer", key: RunKey, replay_key: Optional[RunKey], agent: str
+    ) -> None:
+        self.key = key
+        self.replay_key = replay_key
+        self.agent = agent
+        self.started_at = time.monotonic()
+        self.expires_at = 0.0
+        self.start: Optional[Message] = None
+        self.done = False
+        self.task: Optional[asyncio.Task] = None
+        self._coalescer = coalescer
+        self._max_bytes = coalescer.settings.max_run_bytes
+        self._chunks: List[bytes] = []
+        # Index of `_chunks[0]` among every chunk the run has produced.
+        self._first = 0
+        self.size = 0
+        self.overflowed = False
+        self._complete = False
+        self._failed = False
+        self._abandoned = asyncio.Event()
+        self._run_error = False
+        self._scan_tail = b""
+        self._inflater: Optional[Any] = None
+        self._changed: asyncio.Future = asyncio.get_running_loop().create_future()
+        self._positions: Dict[int, int] = {}
+        self._next_follower = 0
+        self._grace: Optional[asyncio.TimerHandle] = None
+
+    @property
+    def replayable(self) -> bool:
+        return not self.overflowed
+
+    @property
+    def succeeded(self) -> bool:
+        return (
+            self._complete
+            and not self._failed
+            and not self._run_error
+            and not self._abandoned.is_set()
+            and self.start is not None
+            and self.start["status"] == status.HTTP_200_OK
+        )
+
+    @property
+    def followers(self) -> int:
+        return len(self._positions)
+
+    async def execute(self, app: ASGIApp, scope: Scope, body: bytes) -> None:
+        delivered = False
+
+        async def receive() -> Message:
+            nonlocal delivered
+            if not delivered:
+                delivered = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            # Clients come and go; the run only sees a disconnect once it is abandoned.
+            await self._abandoned.wait()
+            return {"type": "http.disconnect"}
+
+        try:
+            await app(scope, receive, self._record)
+        except Exception:
+            self._failed = True
+            logger.exception("Run of agent '%s' failed (thread %s)", self.agent, self.key[2])
+        except BaseException:
+            self._failed = True
+            raise
+        finally:
+            if self.start is None:
+                self.start = _SERVER_ERROR_START
+                self._append(b"Internal Server Error")
+            self.done = True
+            # Finished runs may stay cached for a while; keep only the recording.
+            self._inflater = None
+            self.task = None
+            if self._grace is not None:
+                self._grace.cancel()
+            self._notify()
+            self._coalescer._finished(self)
+
+    async def follow(self, scope: Scope, receive: Receive, send: Send) -> None:
+        """
+        Stream the recording to one client, from its start until the run ends or the
+        client disconnects.
+        """
+
+        follower, position = self._attach()
+        disconnected = asyncio.ensure_future(_wait_for_disconnect(receive))
+        inflater = None
+        try:
+            while True:
+                changed = self._changed
+                if self.start is not None:
+                    break
+                if self.done or not await _wait(changed, disconnected):
+                    return
+            start = self.start
+            if _encoding(start) == b"gzip" and not accepts_gzip(scope):
+                inflater = zlib.decompressobj(_GZIP_WBITS)
+                start = {
+                    **start,
+                    "headers": [
+                        (name, value)
+                        for name, value in start["headers"]
+                        if name.lower() not in (b"content-encoding", b"content-length")
+                    ],
+                }
+            await send(start)
+            while True:
+                changed = self._changed
+                body, position = self._read(follower, position)
+                if inflater is not None:
+                    body = inflater.decompress(body)
+                if body:
+                    await send({"type": "http.response.body", "body": body, "more_body": True})
+                if self.done and position == self._first + len(self._chunks):
+                    break
+                if not await _wait(changed, disconnected):
+                    return
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+        finally:
+            if not disconnected.cancel():
+                # Retrieved, so a failed receive is not reported as never retrieved.
+                disconnected.exception()
+            self._detach(follower)
+
+    def abandon(self) -> None:
+        if not self.done and not self._abandoned.is_set():
+            logger.info(
+                "Stopping run of agent '%s' (thread %s): no client attached",
+                self.agent,
+                self.key[2],
+            )
+            self._abandoned.set()
+
+    def cancel(self) -> None:
+        if self.task is not None:
+            self.task.cancel()
+
+    async def _record(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            self.start = message
+            if _encoding(message) == b"gzip":
+                self._inflater = zlib.decompressobj(_GZIP_WBITS)
+            self._notify()
+        elif message["type"] == "http.response.body":
+            body = message.get("body", b"")
+            if body:
+                self._scan(body)
+                self._append(body)
+            if not message.get("more_body", False):
+                self._complete = True
+            self._notify()
+
+    def _append(self, body: bytes) -> None:
+        self._chunks.append(body)
+        self.size += len(body)
+        if not self.overflowed and self.size > self._max_bytes:
+            self.overflowed = True
+            logger.info(
+                "Run of agent '%s' (thread %s) streamed over %d bytes; duplicates will get 409",
+                self.agent,
+                self.key[2],
+                self._max_bytes,
+            )
+        if self.overflowed:
+            self._trim()
+
+    def _scan(self, body: bytes) -> None:
+        if self._run_error:
+            return
+        text = self._inflater.decompress(body) if self._inflater is not None else body
+        window = self._scan_tail + text
+        if _RUN_ERROR_PREFIX in window:
+            self._run_error = True
+        self._scan_tail = window[-(len(_RUN_ERROR_PREFIX) - 1):]
+
+    def _read(self, follower: int, position: int) -> Tuple[bytes, int]:
+        end = self._first + len(self._chunks)
+        if position >= end:
+            return b"", position
+        body = b"".join(self._chunks[position - self._first:])
+        self._positions[follower] = end
+        if self.overflowed:
+            self._trim()
+        return body, end
+
+    def _trim(self) -> None:
+        # Only what every attached client has already received can go.
+        keep_from = min(self._positions.values(), default=self._first + len(self._chunks))
+        dropped = self._chunks[: keep_from - self._first]
+        if dropped:
+            del self._chunks[: len(dropped)]
+            self.size -= sum(len(chunk) for chunk in dropped)
+            self._first += len(dropped)
+
+    def _attach(self) -> Tuple[int, int]:
+        if self._grace is not None:
+            self._grace.cancel()
+            self._grace = None
+        follower = self._next_follower
+        self._next_follower += 1
+        self._positions[follower] = self._first
+        return follower, self._first
+
+    def _detach(self, follower: int) -> None:
+        self._positions.pop(follower, None)
+        if self.overflowed:
+            self._trim()
+        if self._positions or self.done:
+            return
+        grace = self._coalescer.settings.detach_grace_seconds
+        if grace <= 0:
+            self.abandon()
+        else:
+            self._grace = asyncio.get_running_loop().call_later(grace, self.abandon)
+
+    def _notify(self) -> None:
+        changed, self._changed = self._changed, asyncio.get_running_loop().create_future()
+        changed.set_result(None)
+
+
+class RunCoalescer:
+    """
+    Per-worker registry of runs in flight and recently finished, by key.
+    """
+
+    def __init__(self, settings: RunCoalescingSettings) -> None:
+        self._settings = settings
+        self._in_flight: Dict[RunKey, _Run] = {}
+        # Finished runs in the order they finished, so the oldest expire first.
+        self._finished_runs: "OrderedDict[RunKey, _Run]" = OrderedDict()
+        self._cached_bytes = 0
+        register_memory_component("run_coalescing", self.memory_usage)
+
+    @property
+    def settings(self) -> RunCoalescingSettings:
+        return self._settings
+
+    def get(self, key: RunKey, replay_key: Optional[RunKey]) -> Optional[_Run]:
+        self._expire()
+        run = self._in_flight.get(key)
+        if run is None and replay_key is not None:
+            run = self._finished_runs.get(replay_key)
+        return run
+
+    def start(
+        self,
+        key: RunKey,
+        replay_key: Optional[RunKey],
+        agent: str,
+        app: ASGIApp,
+        scope: Scope,
+        body: bytes,
+    ) -> _Run:
+        """
+        Start a run for `key` in its own task; it inherits the caller's context.
+
+        Once it succeeds it is kept for replay under `replay_key`, if any.
+        """
+
+        run = _Run(self, key, replay_key, agent)
+        self._in_flight[key] = run
+        run.task = asyncio.create_task(run.execute(app, dict(scope), body))
+        return run
+
+    @asynccontextmanager
+    async def running(self, app: FastAPI) -> AsyncIterator[None]:
+        """
+        Lifespan hook stopping runs still in flight when the worker shuts down.
+        """
+
+        try:
+            yield
+        finally:
+            runs = list(self._in_flight.values())
+            for run in runs:
+                run.cancel()
+            await asyncio.gather(*(run.task for run in runs if run.task), return_exceptions=True)
+            self._finished_runs.clear()
+            self._cached_bytes = 0
+
+    def memory_usage(self) -> Dict[str, Any]:
+        return {
+            "in_flight_runs": len(self._in_flight),
+            "in_flight_bytes": sum(run.size for run in self._in_flight.values()),
+            "followers": sum(run.followers for run in self._in_flight.values()),
+            "cached_runs": len(self._finished_runs),
+            "cached_bytes": self._cached_bytes,
+        }
+
+    def _finished(self, run: _Run) -> None:
+        if self._in_flight.get(run.key) is run:
+            del self._in_flight[run.key]
+        self._expire()
+        if run.replay_key is None or not run.succeeded or self._settings.ttl_seconds <= 0:
+            return
+        # Too large to replay: kept without its events, so duplicates get 409.
+        size = 0 if run.overflowed else run.size
+        run.expires_at = time.monotonic() + self._settings.ttl_seconds
+        previous = self._finished_runs.pop(run.replay_key, None)
+        if previous is not None and not previous.overflowed:
+            self._cached_bytes -= previous.size
+        self._finished_runs[run.replay_key] = run
+        self._cached_bytes += size
+        while self._cached_bytes > self._settings.cache_bytes and self._finished_runs:
+            self._evict()
+
+    def _expire(self) -> None:
+        now = time.monotonic()
+        while self._finished_runs and next(iter(self._finished_runs.values())).expires_at <= now:
+            self._evict()
+
+    def _evict(self) -> None:
+        _, run = self._finished_runs.popitem(last=False)
+        if not run.overflowed:
+            self._cached_bytes -= run.size
+
+
+class RunCoalescingMiddleware:
+    """
+    ASGI middleware running duplicate agent run requests once.
+
+    Must run inside `SupabaseAuthMiddleware` so the caller's user id is known, and
+    outside admission control and quota checks so duplicates use neither.
+    """
+
+    def __init__(self, app: ASGIApp, *, coalescer: RunCoalescer, state: State) -> None:
+        self.app = app
+        self._coalescer = coalescer
+        self._state = state
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] != "POST":
+            await self.app(scope, receive, send)
+            return
+        agent = agent_slug_for_path(self._state.agent_registry, scope["path"])
+        if agent is None:
+            await self.app(scope, receive, send)
+            return
+
+        body = await _read_body(receive)
+        if body is None:
+            return
+        keys = run_keys(get_supabase_user_id() or ANONYMOUS_USER, agent, scope, body)
+        if keys is None:
+            await self.app(scope, _replaying(body, receive), send)
+            return
+
+        key, replay_key = keys
+        run = self._coalescer.get(key, replay_key)
+        if run is None:
+            run = self._coalescer.start(key, replay_key, agent, self.app, scope, body)
+        elif not run.replayable:
+            RUNS_COALESCED.labels(agent, "conflict").inc()
+            logger.warning(
+                "Refused duplicate run for agent '%s' (user %s, thread %s): too large to replay",
+                agent,
+                key[0],
+                key[2],
+            )
+            response = JSONResponse(
+                status_code=status.HTTP_409_CONFLICT,
+                content={
+                    "detail": "This run was already started and its events are too large to replay",
+                    "reason": "not_replayable",
+                },
+            )
+            await response(scope, receive, send)
+            return
+        else:
+            outcome = "replayed" if run.done else "attached"
+            RUNS_COALESCED.labels(agent, outcome).inc()
+            logger.info(
+                "Duplicate run for agent '%s' (user %s, thread %s) %s to the run started %.1f s ago",
+                agent,
+                key[0],
+                key[2],
+                outcome,
+                time.monotonic() - run.started_at,
+            )
+        await run.follow(scope, receive, send)
+
+
+def run_keys(
+    user_id: str, agent: str, scope: Scope, body: bytes
+) -> Optional[Tuple[RunKey, Optional[RunKey]]]:
+    """
+    Keys of a run request: the one that attaches it to a run in flight, and the one
+    that replays a finished run (None when only the last message id identifies
+    it). None if the body names no thread or trigger.
+    """
+
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        return None
+    if not isinstance(payload, dict):
+        return None
+    thread_id = payload.get("threadId") or payload.get("thread_id")
+    if not isinstance(thread_id, str) or not thread_id:
+        return None
+    for name, value in scope["headers"]:
+        if name == _IDEMPOTENCY_KEY and value:
+            key = (user_id, agent, thread_id, "key", value.decode("latin-1"))
+            return key, key
+    run_id = payload.get("runId") or payload.get("run_id")
+    replay_key: Optional[RunKey] = None
+    if isinstance(run_id, str) and run_id:
+        replay_key = (user_id, agent, thread_id, "run", run_id)
+    messages = payload.get("messages")
+    if isinstance(messages, list) and messages and isinstance(messages[-1], dict):
+        message_id = messages[-1].get("id")
+        if isinstance(message_id, str) and message_id:
+            return (user_id, agent, thread_id, "message", message_id), replay_key
+    if replay_key is not None:
+        return replay_key, replay_key
+    return None
+
+
+async def _read_body(receive: Receive) -> Optional[bytes]:
+    parts = []
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            return None
+        parts.append(message.get("body", b""))
+        if not message.get("more_body", False):
+            return b"".join(parts)
+
+
+def _replaying(body: bytes, receive: Receive) -> Receive:
+    delivered = False
+
+    async def replay() -> Message:
+        nonlocal delivered
+        if not delivered:
+            delivered = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        return await receive()
+
+    return replay
+
+
+async def _wait_for_disconnect(receive: Receive) -> None:
+    while (await receive())["type"] != "http.disconnect":
+        pass
+
+
+async def _wait(changed: asyncio.Future, disconnected: asyncio.Future) -> bool:
+    """
+    Wait for the run to change; False if the client disconnected first.
+    """
+
+    await asyncio.wait((changed, disconnected), return_when=asyncio.FIRST_COMPLETED)
+    return not disconnected.done()
+
+
+def _encoding(message: Message) -> Optional[bytes]:
+    for name, value in message.get("headers", ()):
+        if name.lower() == b"content-encoding":
+            return value.strip().lower()
+    return None
+
+
+__all__ = [
+    "IDEMPOTENCY_KEY_HEADER",
+    "RunCoalescer",
+    "RunCoalescingMiddleware",
+    "RunKey",
+    "run_keys",
+]
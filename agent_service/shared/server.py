@@ -0,0 +1,226 @@
+"""
+Production launcher: multiple uvicorn workers with preloading and graceful draining.
+
+With `preload=True` the gateway (shared modules, agent modules and ADK/LiteLLM
+imports) is built once in the supervisor process and workers are forked from it, so
+they start instantly and share those pages copy-on-write. Without preloading each
+worker imports the application itself via uvicorn's own supervisor.
+
+SIGHUP reloads the configuration snapshot (`shared.config`) in every worker
+without restarting it; the prefork supervisor forwards it to its workers.
+
+On SIGTERM/SIGINT every worker stops accepting connections, lets in-flight requests
+(including streaming AG-UI runs) finish for up to `graceful_timeout` seconds,
+cancels whatever is left, and then runs the lifespan shutdown that closes pooled
+clients, open MCP sessions and the session store.
+"""
+
+import logging
+import os
+import signal
+import socket
+import time
+from contextlib import suppress
+from typing import Dict, Optional
+
+import uvicorn
+from fastapi import FastAPI
+
+from .config import ConfigError, reload_config
+from .logging_setup import logging_configured, shutdown_logging
+
+logger = logging.getLogger(__name__)
+
+# Extra time the supervisor allows past the drain deadline for lifespan shutdown.
+_SHUTDOWN_GRACE_SECONDS = 5.0
+# Workers that exit sooner than this after starting are considered crash-looping.
+_MIN_WORKER_LIFETIME_SECONDS = 1.0
+
+
+def serve(
+    app: FastAPI,
+    *,
+    app_import_path: str,
+    host: str,
+    port: int,
+    workers: int = 1,
+    preload: bool = True,
+    graceful_timeout: float = 30.0,
+    log_level: Optional[str] = None,
+) -> None:
+    """
+    Run the gateway until it receives SIGTERM/SIGINT, then drain and exit.
+
+    Args:
+        app: The already-built application (used when preloading).
+        app_import_path: `module:attribute` path workers import when not preloading.
+        workers: Number of worker processes.
+        preload: Build the app once and fork workers from it.
+        graceful_timeout: Seconds in-flight requests may run after shutdown starts.
+    """
+
+    workers = max(1, workers)
+    options = {
+        "host": host,
+        "port": port,
+        "timeout_graceful_shutdown": graceful_timeout,
+        "log_level": log_level,
+    }
+    if logging_configured():
+        # Keep uvicorn's records on the queue handler instead of its own stream handlers.
+        options["log_config"] = None
+    if workers == 1:
+        uvicorn.run(app if preload else app_import_path, **options)
+        return
+    if not preload or not hasattr(os, "fork"):
+        uvicorn.run(app_import_path, workers=workers, **options)
+        return
+
+    PreforkSupervisor(
+        uvicorn.Config(app, **options),
+        workers=workers,
+        graceful_timeout=graceful_timeout,
+    ).run()
+
+
+class PreforkSupervisor:
+    """
+    Forks uvicorn workers sharing one listening socket and supervises them.
+
+    Workers that die unexpectedly are replaced. SIGHUP reloads the configuration
+    in the supervisor (so replacements start with it) and is forwarded to every
+    worker. On SIGTERM/SIGINT the supervisor forwards SIGTERM to every worker and
+    waits up to `graceful_timeout` plus a short grace period before killing
+    stragglers.
+    """
+
+    def __init__(self, config: uvicorn.Config, *, workers: int, graceful_timeout: float) -> None:
+        self._config = config
+        self._worker_count = workers
+        self._graceful_timeout = graceful_timeout
+        self._workers: Dict[int, float] = {}
+        self._stopping = False
+        self._socket: Optional[socket.socket] = None
+
+    def run(self) -> None:
+        self._socket = self._config.bind_socket()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(sig, self._request_stop)
+        if hasattr(signal, "SIGHUP"):
+            signal.signal(signal.SIGHUP, self._forward_reload)
+
+        logger.info(
+            "Starting %d preloaded worker(s) on %s:%d (supervisor pid %d)",
+            self._worker_count,
+            self._config.host,
+            self._config.port,
+            os.getpid(),
+        )
+        for _ in range(self._worker_count):
+            self._spawn_worker()
+
+        try:
+            while not self._stopping:
+                self._reap_workers(respawn=True)
+                time.sleep(0.2)
+        finally:
+            self._stop_workers()
+            self._socket.close()
+
+    def _request_stop(self, signum: int, frame) -> None:
+        if not self._stopping:
+            logger.info(
+                "Received %s; draining %d worker(s) for up to %.0fs",
+                signal.Signals(signum).name,
+                len(self._workers),
+                self._graceful_timeout,
+            )
+        self._stopping = True
+
+    def _forward_reload(self, signum: int, frame) -> None:
+        try:
+            reload_config()
+        except ConfigError as exc:
+            logger.error("Not reloading workers; the new configuration is invalid: %s", exc)
+            return
+        for pid in list(self._workers):
+            with suppress(ProcessLookupError):
+                os.kill(pid, signal.SIGHUP)
+
+    def _spawn_worker(self) -> None:
+        pid = os.fork()
+        if pid == 0:
+            self._run_worker()
+        self._workers[pid] = time.monotonic()
+
+    def _run_worker(self) -> None:
+        # Child process: uvicorn installs its own handlers while serving.
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(sig, signal.SIG_DFL)
+        if hasattr(signal, "SIGHUP"):
+            # Handled by the worker's event loop once its lifespan has started.
+            signal.signal(signal.SIGHUP, signal.SIG_IGN)
+        exit_code = 0
+        try:
+            server = uvicorn.Server(self._config)
+            server.run(sockets=[self._socket])
+            if not server.started:
+                exit_code = 3
+        except BaseException:
+            logger.exception("Worker %d crashed", os.getpid())
+            exit_code = 1
+        finally:
+            # os._exit skips atexit, so write out the queued log records first.
+            shutdown_logging()
+            os._exit(exit_code)
+
+    def _reap_workers(self, *, respawn: bool) -> None:
+        while self._workers:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                self._workers.clear()
+                return
+            if pid == 0:
+                return
+            started = self._workers.pop(pid, None)
+            if started is None or not respawn or self._stopping:
+                continue
+            lifetime = time.monotonic() - started
+            logger.warning(
+                "Worker %d exited (%s) after %.1fs; starting a replacement",
+                pid,
+                _describe_status(status),
+                lifetime,
+            )
+            if lifetime < _MIN_WORKER_LIFETIME_SECONDS:
+                time.sleep(_MIN_WORKER_LIFETIME_SECONDS)
+            self._spawn_worker()
+
+    def _stop_workers(self) -> None:
+        for pid in list(self._workers):
+            with suppress(ProcessLookupError):
+                os.kill(pid, signal.SIGTERM)
+
+        deadline = time.monotonic() + self._graceful_timeout + _SHUTDOWN_GRACE_SECONDS
+        while self._workers and time.monotonic() < deadline:
+            self._reap_workers(respawn=False)
+            time.sleep(0.1)
+
+        for pid in list(self._workers):
+            logger.error("Worker %d did not exit before the drain deadline; killing it", pid)
+            with suppress(ProcessLookupError):
+                os.kill(pid, signal.SIGKILL)
+        while self._workers:
+            self._reap_workers(respawn=False)
+            time.sleep(0.05)
+        logger.info("All workers stopped")
+
+
+def _describe_status(status: int) -> str:
+    if os.WIFSIGNALED(status):
+        return f"signal {signal.Signals(os.WTERMSIG(status)).name}"
+    return f"exit code {os.WEXITSTATUS(status)}"
+
+
+__all__ = ["PreforkSupervisor", "serve"]
@@ -0,0 +1,294 @@
+"""
+Bounds the conversation history each agent sends to its model.
+
+Attach `HistoryCompactor.before_model_callback` to an agent. The stored session is
+never modified; only the request for the current model call is trimmed:
+
+- Sliding window: only the most recent `max_contents` history entries are sent.
+- Summaries: once the estimated history size crosses `summary_threshold_tokens`,
+  older entries are folded into a running summary kept in session state, and only
+  the summary plus recent entries are sent. Later turns reuse the stored summary
+  and extend it only when the threshold is crossed again.
+
+Cuts never separate a function response from the call that produced it.
+"""
+
+import json
+import logging
+import threading
+import weakref
+from collections import defaultdict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence
+
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+from google.genai import types
+
+from .settings import HistoryCompactionSettings
+
+logger = logging.getLogger(__name__)
+
+Summarizer = Callable[[Optional[str], Sequence[types.Content], int], Awaitable[str]]
+
+SUMMARY_STATE_KEY = "history_summary"
+SUMMARY_UPTO_STATE_KEY = "history_summary_upto"
+
+_SUMMARY_HEADER = "Summary of the earlier conversation (older turns were condensed):\n"
+_CHARS_PER_TOKEN = 4
+_EXCERPT_CHARS = 240
+
+
+class HistoryCompactor:
+    """
+    `before_model_callback` that applies a sliding window and summarization.
+
+    `summarizer` receives the previous summary, the entries being folded in and the
+    character budget, and returns the new summary. The default is extractive and
+    makes no model calls; pass an LLM-backed summarizer for higher fidelity.
+    """
+
+    def __init__(
+        self,
+        settings: HistoryCompactionSettings,
+        *,
+        summarizer: Optional[Summarizer] = None,
+    ) -> None:
+        self._settings = settings
+        self._summarizer = summarizer or extractive_summary
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, int]] = defaultdict(
+            lambda: {"requests": 0, "compacted": 0, "summaries": 0}
+        )
+        _compactors.add(self)
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self._settings.max_contents or self._settings.summary_threshold_tokens)
+
+    async def before_model_callback(
+        self, callback_context: CallbackContext, llm_request: LlmRequest
+    ) -> Optional[LlmResponse]:
+        if not self.enabled or not llm_request.contents:
+            return None
+
+        contents = llm_request.contents
+        state = callback_context.state
+        summary: Optional[str] = state.get(SUMMARY_STATE_KEY)
+        summarized_upto = int(state.get(SUMMARY_UPTO_STATE_KEY) or 0)
+        if summarized_upto > len(contents):
+            # History was rewritten (e.g. session recreated); the summary is stale.
+            summary, summarized_upto = None, 0
+
+        cut = summarized_upto if summary else 0
+        if self._settings.max_contents and len(contents) - cut > self._settings.max_contents:
+            cut = len(contents) - self._settings.max_contents
+
+        summarize = False
+        threshold = self._settings.summary_threshold_tokens
+        if threshold:
+            retain_cut = _retain_cut(contents, cut, threshold, self._settings.summary_retain_ratio)
+            if retain_cut is not None:
+                cut = max(cut, retain_cut)
+                summarize = True
+
+        cut = _align_cut(contents, cut)
+        if cut <= 0:
+            self._record(callback_context.agent_name, compacted=False)
+            return None
+
+        if threshold and cut > summarized_upto:
+            summarize = True
+        if summarize and cut > summarized_upto:
+            summary = await self._summarizer(
+                summary, contents[summarized_upto:cut], self._settings.summary_max_chars
+            )
+            state[SUMMARY_STATE_KEY] = summary
+            state[SUMMARY_UPTO_STATE_KEY] = cut
+
+        tokens_before = estimate_tokens(contents) if logger.isEnabledFor(logging.DEBUG) else 0
+        kept = list(contents[cut:])
+        if summary and threshold:
+            kept = _prepend_summary(kept, summary)
+        llm_request.contents = kept
+
+        self._record(callback_context.agent_name, compacted=True, summarized=summarize)
+        logger.debug(
+            "Compacted history for %s invocation %s: %d -> %d entries (~%d -> ~%d tokens)",
+            callback_context.agent_name,
+            callback_context.invocation_id,
+            len(contents),
+            len(kept),
+            tokens_before,
+            estimate_tokens(kept) if tokens_before else 0,
+        )
+        return None
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {agent: dict(values) for agent, values in self._stats.items()}
+
+    def _record(
+        self,
+        agent_name: str,
+        *,
+        compacted: bool,
+        summarized: bool = False,
+    ) -> None:
+        with self._lock:
+            stats = self._stats[agent_name]
+            stats["requests"] += 1
+            stats["compacted"] += int(compacted)
+            stats["summaries"] += int(summarized)
+
+
+# Weak so compactors of hot-reloaded agent modules can be collected.
+_compactors: "weakref.WeakSet[HistoryCompactor]" = weakref.WeakSet()
+
+
+def history_compaction_stats() -> Dict[str, Dict[str, int]]:
+    """
+    Per-agent compaction counters for this worker.
+    """
+
+    merged: Dict[str, Dict[str, int]] = {}
+    for compactor in _compactors:
+        for agent, values in compactor.stats().items():
+            target = merged.setdefault(agent, dict.fromkeys(values, 0))
+            for key, value in values.items():
+                target[key] += value
+    return merged
+
+
+async def extractive_summary(
+    previous: Optional[str], contents: Sequence[types.Content], max_chars: int
+) -> str:
+    """
+    Condense history entries into one line each, keeping the most recent lines.
+    """
+
+    lines = [previous] if previous else []
+    for content in contents:
+        for part in content.parts or []:
+            line = _describe_part(content.role, part)
+            if line:
+                lines.append(line)
+    summary = "\n".join(lines)
+    if len(summary) > max_chars:
+        summary = "…" + summary[-(max_chars - 1):]
+    return summary
+
+
+def estimate_tokens(contents: Sequence[types.Content]) -> int:
+    """
+    Rough token estimate (characters / 4) including tool arguments and payloads.
+    """
+
+    return sum(_content_chars(content) for content in contents) // _CHARS_PER_TOKEN
+
+
+def _content_chars(content: types.Content) -> int:
+    total = 0
+    for part in content.parts or []:
+        if part.text:
+            total += len(part.text)
+        if part.function_call is not None:
+            total += len(part.function_call.name or "") + _json_len(part.function_call.args)
+        if part.function_response is not None:
+            total += len(part.function_response.name or "") + _json_len(
+                part.function_response.response
+            )
+    return total
+
+
+def _json_len(value: Any) -> int:
+    if not value:
+        return 0
+    return len(json.dumps(value, default=str))
+
+
+def _retain_cut(
+    contents: Sequence[types.Content], start: int, threshold: int, retain_ratio: float
+) -> Optional[int]:
+    """
+    Index from which the newest entries fit in the retain budget, or None if the
+    history from `start` is still under the threshold.
+    """
+
+    budget_chars = int(threshold * retain_ratio) * _CHARS_PER_TOKEN
+    threshold_chars = threshold * _CHARS_PER_TOKEN
+    total = 0
+    retain_from: Optional[int] = None
+    for index in range(len(contents) - 1, start - 1, -1):
+        total += _content_chars(contents[index])
+        if retain_from is None and total > budget_chars:
+            retain_from = index + 1
+        if total > threshold_chars:
+            return retain_from
+    return None
+
+
+def _align_cut(contents: Sequence[types.Content], cut: int) -> int:
+    """
+    Move `cut` forward to a safe boundary, preferring the start of a user turn.
+    """
+
+    if cut <= 0:
+        return 0
+    # Always keep the latest entry.
+    last = len(contents) - 1
+    for index in range(min(cut, last), last + 1):
+        if _is_user_turn(contents[index]):
+            return index
+    for index in range(min(cut, last), last + 1):
+        if not _has_function_response(contents[index]):
+            return index
+    return 0
+
+
+def _is_user_turn(content: types.Content) -> bool:
+    return content.role == "user" and not _has_function_response(content) and any(
+        part.text for part in content.parts or []
+    )
+
+
+def _has_function_response(content: types.Content) -> bool:
+    return any(part.function_response is not None for part in content.parts or [])
+
+
+def _prepend_summary(contents: List[types.Content], summary: str) -> List[types.Content]:
+    summary_part = types.Part(text=f"{_SUMMARY_HEADER}{summary}")
+    if contents and _is_user_turn(contents[0]):
+        first = contents[0].model_copy(update={"parts": [summary_part, *contents[0].parts]})
+        return [first, *contents[1:]]
+    return [types.Content(role="user", parts=[summary_part]), *contents]
+
+
+def _describe_part(role: Optional[str], part: types.Part) -> Optional[str]:
+    if part.function_call is not None:
+        args = json.dumps(part.function_call.args or {}, default=str)
+        return f"- Called {part.function_call.name}({_excerpt(args)})"
+    if part.function_response is not None:
+        response = json.dumps(part.function_response.response or {}, default=str)
+        return f"- {part.function_response.name} returned {_excerpt(response)}"
+    if part.text and not part.thought:
+        speaker = "User" if role == "user" else "Assistant"
+        return f"- {speaker}: {_excerpt(part.text)}"
+    return None
+
+
+def _excerpt(text: str) -> str:
+    text = " ".join(text.split())
+    if len(text) <= _EXCERPT_CHARS:
+        return text
+    return text[: _EXCERPT_CHARS - 1] + "…"
+
+
+__all__ = [
+    "HistoryCompactor",
+    "SUMMARY_STATE_KEY",
+    "SUMMARY_UPTO_STATE_KEY",
+    "estimate_tokens",
+    "extractive_summary",
+    "history_compaction_stats",
+]
@@ -0,0 +1,311 @@
+"""
+Per-worker bounds and size statistics for ADK sessions.
+
+`BoundedSessionService` wraps the configured session service. It tracks the
+approximate size of every session this worker has touched, and evicts the least
+recently used ones once the session count or memory cap is exceeded. With the
+in-memory backend, eviction deletes the session, which is the only way to free
+its memory. With persistent backends only the worker's bookkeeping is dropped,
+and the session stays in the store.
+
+Sessions still in use are not evicted: evicting the session of a running
+invocation drops its later events, so the model never sees its tool results and
+keeps calling the tools. A session is in use while a `Session` object this
+service returned for it is still referenced (by the invocation's runner). The
+limits may be exceeded until those invocations finish.
+
+Idle sessions are expired separately, by ag_ui_adk's session manager, using
+`AGENT_SESSION_IDLE_TTL`.
+"""
+
+import logging
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+from google.adk.events.event import Event
+from google.adk.sessions.base_session_service import (
+    BaseSessionService,
+    GetSessionConfig,
+    ListSessionsResponse,
+)
+from google.adk.sessions.session import Session
+
+logger = logging.getLogger(__name__)
+
+SessionKey = Tuple[str, str, str]
+
+_BYTES_PER_TOKEN = 4
+# Event id, author, invocation id and timestamps.
+_EVENT_OVERHEAD_BYTES = 200
+_SCALAR_BYTES = 8
+_MAX_WALK_DEPTH = 8
+_LIST_SAMPLE = 8
+
+
+@dataclass
+class SessionStats:
+    """
+    Approximate footprint of one session, as tracked by this worker.
+    """
+
+    events: int = 0
+    bytes: int = 0
+    last_access: float = 0.0
+
+    def as_dict(self, key: SessionKey, now: float) -> Dict[str, Any]:
+        app_name, user_id, session_id = key
+        return {
+            "app_name": app_name,
+            "user_id": user_id,
+            "session_id": session_id,
+            "events": self.events,
+            "bytes": self.bytes,
+            "approx_tokens": self.bytes // _BYTES_PER_TOKEN,
+            "idle_seconds": round(now - self.last_access, 1),
+        }
+
+
+class BoundedSessionService(BaseSessionService):
+    """
+    Session service wrapper enforcing per-worker LRU limits and recording sizes.
+    """
+
+    def __init__(
+        self,
+        inner: BaseSessionService,
+        *,
+        max_sessions: int = 0,
+        max_bytes: int = 0,
+        evict_from_backend: bool = False,
+    ) -> None:
+        self._inner = inner
+        self._max_sessions = max_sessions
+        self._max_bytes = max_bytes
+        self._evict_from_backend = evict_from_backend
+        self._sessions: "OrderedDict[SessionKey, SessionStats]" = OrderedDict()
+        self._total_bytes = 0
+        self._evictions = 0
+        # Number of live `Session` objects handed out per session.
+        self._in_use: Dict[SessionKey, int] = {}
+        # Reentrant: finalizers may run during a garbage collection inside `_hold`.
+        self._in_use_lock = threading.RLock()
+
+    @property
+    def inner(self) -> BaseSessionService:
+        return self._inner
+
+    async def create_session(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        state: Optional[Dict[str, Any]] = None,
+        session_id: Optional[str] = None,
+    ) -> Session:
+        session = await self._inner.create_session(
+            app_name=app_name, user_id=user_id, state=state, session_id=session_id
+        )
+        self._track(session)
+        self._hold(session)
+        await self._enforce_limits(keep=_key(session))
+        return session
+
+    async def get_session(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        session_id: str,
+        config: Optional[GetSessionConfig] = None,
+    ) -> Optional[Session]:
+        session = await self._inner.get_session(
+            app_name=app_name, user_id=user_id, session_id=session_id, config=config
+        )
+        key = (app_name, user_id, session_id)
+        if session is None:
+            self._forget(key)
+            return None
+        self._hold(session)
+        if key in self._sessions:
+            self._touch(key)
+        elif config is None:
+            # First sight of a session loaded from a persistent store.
+            self._track(session)
+            await self._enforce_limits(keep=key)
+        return session
+
+    async def list_sessions(
+        self, *, app_name: str, user_id: Optional[str] = None
+    ) -> ListSessionsResponse:
+        return await self._inner.list_sessions(app_name=app_name, user_id=user_id)
+
+    async def delete_session(self, *, app_name: str, user_id: str, session_id: str) -> None:
+        await self._inner.delete_session(app_name=app_name, user_id=user_id, session_id=session_id)
+        self._forget((app_name, user_id, session_id))
+
+    async def append_event(self, session: Session, event: Event) -> Event:
+        event = await self._inner.append_event(session, event)
+        if event.partial:
+            return event
+
+        key = _key(session)
+        stats = self._sessions.get(key)
+        if stats is None:
+            self._track(session)
+        else:
+            size = _event_bytes(event)
+            stats.events += 1
+            stats.bytes += size
+            self._total_bytes += size
+            self._touch(key)
+        await self._enforce_limits(keep=key)
+        return event
+
+    async def close(self) -> None:
+        close = getattr(self._inner, "close", None)
+        if close is not None:
+            await close()
+
+    def stats(self, *, top: int = 20) -> Dict[str, Any]:
+        """
+        Totals for this worker and per app, plus the `top` largest sessions.
+        """
+
+        now = time.time()
+        largest = sorted(self._sessions.items(), key=lambda item: item[1].bytes, reverse=True)
+        by_app: Dict[str, Dict[str, int]] = {}
+        for (app_name, _, _), stats in self._sessions.items():
+            totals = by_app.setdefault(app_name, {"sessions": 0, "bytes": 0, "events": 0})
+            totals["sessions"] += 1
+            totals["bytes"] += stats.bytes
+            totals["events"] += stats.events
+        return {
+            "sessions": len(self._sessions),
+            "total_bytes": self._total_bytes,
+            "by_app": by_app,
+            "max_sessions": self._max_sessions or None,
+            "max_bytes": self._max_bytes or None,
+            "evictions": self._evictions,
+            "in_use": len(self._in_use),
+            "largest": [stats.as_dict(key, now) for key, stats in largest[:top]],
+        }
+
+    def session_stats(self, app_name: str, user_id: str, session_id: str) -> Optional[Dict[str, Any]]:
+        stats = self._sessions.get((app_name, user_id, session_id))
+        if stats is None:
+            return None
+        return stats.as_dict((app_name, user_id, session_id), time.time())
+
+    def _track(self, session: Session) -> None:
+        key = _key(session)
+        self._forget(key)
+        stats = SessionStats(
+            events=len(session.events),
+            bytes=_state_bytes(session) + sum(_event_bytes(event) for event in session.events),
+            last_access=time.time(),
+        )
+        self._sessions[key] = stats
+        self._total_bytes += stats.bytes
+
+    def _touch(self, key: SessionKey) -> None:
+        self._sessions[key].last_access = time.time()
+        self._sessions.move_to_end(key)
+
+    def _hold(self, session: Session) -> None:
+        key = _key(session)
+        with self._in_use_lock:
+            self._in_use[key] = self._in_use.get(key, 0) + 1
+        weakref.finalize(session, self._release, key)
+
+    def _release(self, key: SessionKey) -> None:
+        with self._in_use_lock:
+            remaining = self._in_use.get(key, 0) - 1
+            if remaining > 0:
+                self._in_use[key] = remaining
+            else:
+                self._in_use.pop(key, None)
+
+    def _forget(self, key: SessionKey) -> None:
+        stats = self._sessions.pop(key, None)
+        if stats is not None:
+            self._total_bytes -= stats.bytes
+
+    def _over_limit(self) -> bool:
+        if self._max_sessions and len(self._sessions) > self._max_sessions:
+            return True
+        return bool(self._max_bytes and self._total_bytes > self._max_bytes)
+
+    async def _enforce_limits(self, *, keep: SessionKey) -> None:
+        while self._over_limit():
+            victim = next(
+                (key for key in self._sessions if key != keep and key not in self._in_use), None
+            )
+            if victim is None:
+                return
+            stats = self._sessions[victim]
+            self._forget(victim)
+            self._evictions += 1
+            if self._evict_from_backend:
+                app_name, user_id, session_id = victim
+                await self._inner.delete_session(
+                    app_name=app_name, user_id=user_id, session_id=session_id
+                )
+            logger.info(
+                "Evicted least recently used session %s (%d events, ~%d KB, idle %.0fs)",
+                victim[2],
+                stats.events,
+                stats.bytes // 1024,
+                time.time() - stats.last_access,
+            )
+
+
+def _key(session: Session) -> SessionKey:
+    return (session.app_name, session.user_id, session.id)
+
+
+def _event_bytes(event: Event) -> int:
+    # Runs for every appended event: estimated from the parts, never serialized.
+    total = _EVENT_OVERHEAD_BYTES
+    content = event.content
+    for part in (content.parts or []) if content is not None else []:
+        if part.text:
+            total += len(part.text)
+        if part.function_call is not None:
+            total += len(part.function_call.name or "") + _value_bytes(part.function_call.args)
+        if part.function_response is not None:
+            total += len(part.function_response.name or "") + _value_bytes(
+                part.function_response.response
+            )
+        if part.inline_data is not None and part.inline_data.data:
+            total += len(part.inline_data.data)
+    if event.actions is not None and event.actions.state_delta:
+        total += _value_bytes(event.actions.state_delta)
+    return total
+
+
+def _value_bytes(value: Any, depth: int = 0) -> int:
+    # Tool payloads are mostly a few large strings (MCP returns JSON text), so
+    # walking the containers is much cheaper than serializing them.
+    if isinstance(value, (str, bytes)):
+        return len(value)
+    if depth >= _MAX_WALK_DEPTH:
+        return _SCALAR_BYTES
+    if isinstance(value, dict):
+        return sum(len(str(key)) + _value_bytes(item, depth + 1) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        # Long lists of records are sampled and scaled rather than walked.
+        sample = value[:_LIST_SAMPLE]
+        sampled = sum(_value_bytes(item, depth + 1) for item in sample)
+        return sampled * len(value) // len(sample) if sample else 0
+    return _SCALAR_BYTES
+
+
+def _state_bytes(session: Session) -> int:
+    return sum(len(str(key)) + len(str(value)) for key, value in session.state.items())
+
+
+__all__ = ["BoundedSessionService", "SessionStats"]
@@ -0,0 +1,519 @@
+"""
+Pluggable ADK session persistence shared by every agent in the gateway.
+
+`create_app` records the configured backend and agents obtain the service with
+`get_session_service(app)` when they build their `ADKAgent`. Backends:
+
+- `memory`: ADK's `InMemorySessionService` (per worker, lost on restart).
+- `sqlite`: ADK's `DatabaseSessionService` on a local SQLite file; workers on one
+  host can share it.
+- `database`: ADK's `DatabaseSessionService` on any SQLAlchemy database URL
+  (e.g. PostgreSQL); workers on many hosts can share it.
+- `redis`: any Redis-compatible server, through redis-py; workers on many hosts
+  can share it.
+
+Persistent backends store session state, app/user-scoped state and the event log
+with the same semantics as the in-memory service: `app:`/`user:` keys are stored
+once per app/user and merged into every session, `temp:` keys are never stored.
+"""
+
+import abc
+import asyncio
+import json
+import logging
+import time
+import uuid
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Coroutine, Dict, List, Optional, TypeVar
+
+from fastapi import FastAPI
+from google.adk.errors.already_exists_error import AlreadyExistsError
+from google.adk.events.event import Event
+from google.adk.sessions import DatabaseSessionService, InMemorySessionService
+from google.adk.sessions.base_session_service import (
+    BaseSessionService,
+    GetSessionConfig,
+    ListSessionsResponse,
+)
+from google.adk.sessions.session import Session
+from google.adk.sessions.state import State
+from redis.asyncio import Redis
+
+from .session_limits import BoundedSessionService
+from .settings import SessionServiceSettings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+_APP_SCOPE = ""
+_SQLITE_BUSY_TIMEOUT_SECONDS = 5.0
+
+
+@dataclass
+class StoredSession:
+    """
+    Session row as persisted by a `SessionStore`, with events still serialized.
+    """
+
+    app_name: str
+    user_id: str
+    session_id: str
+    state: Dict[str, Any]
+    last_update_time: float
+    events: List[str] = field(default_factory=list)
+
+
+class SessionStore(abc.ABC):
+    """
+    Storage primitives backing `PersistentSessionService`.
+
+    Scoped state is keyed by `(app_name, user_id)`; app-wide state uses an empty
+    user id.
+    """
+
+    @abc.abstractmethod
+    async def create_session(
+        self, app_name: str, user_id: str, session_id: str, state: Dict[str, Any], update_time: float
+    ) -> bool:
+        """Create a session, returning False if it already exists."""
+
+    @abc.abstractmethod
+    async def load_session(
+        self,
+        app_name: str,
+        user_id: str,
+        session_id: str,
+        num_recent_events: Optional[int] = None,
+    ) -> Optional[StoredSession]:
+        """Load a session and (optionally only the most recent) events."""
+
+    @abc.abstractmethod
+    async def list_sessions(self, app_name: str, user_id: Optional[str]) -> List[StoredSession]:
+        """List sessions without events."""
+
+    @abc.abstractmethod
+    async def delete_session(self, app_name: str, user_id: str, session_id: str) -> None:
+        """Delete a session and its events."""
+
+    @abc.abstractmethod
+    async def append_event(
+        self,
+        app_name: str,
+        user_id: str,
+        session_id: str,
+        event_payload: str,
+        state_delta: Dict[str, Any],
+        update_time: float,
+    ) -> None:
+        """Append a serialized event and merge its session-scoped state delta."""
+
+    @abc.abstractmethod
+    async def load_scoped_state(self, app_name: str, user_id: str) -> Dict[str, Any]:
+        """Load app-wide (empty user id) or user-scoped state."""
+
+    @abc.abstractmethod
+    async def merge_scoped_state(self, app_name: str, user_id: str, delta: Dict[str, Any]) -> None:
+        """Merge a delta into app-wide or user-scoped state."""
+
+    async def close(self) -> None:
+        """Release connections held by the store."""
+
+
+class PersistentSessionService(BaseSessionService):
+    """
+    ADK session service that keeps sessions in a `SessionStore`.
+    """
+
+    def __init__(self, store: SessionStore) -> None:
+        self._store = store
+
+    @property
+    def store(self) -> SessionStore:
+        return self._store
+
+    async def create_session(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        state: Optional[Dict[str, Any]] = None,
+        session_id: Optional[str] = None,
+    ) -> Session:
+        session_id = session_id.strip() if session_id and session_id.strip() else str(uuid.uuid4())
+        deltas = _split_state(state)
+        now = time.time()
+        created = await self._store.create_session(
+            app_name, user_id, session_id, deltas["session"], now
+        )
+        if not created:
+            raise AlreadyExistsError(f"Session with id {session_id} already exists.")
+        await self._merge_scoped_deltas(app_name, user_id, deltas)
+
+        session = Session(
+            app_name=app_name,
+            user_id=user_id,
+            id=session_id,
+            state=deltas["session"],
+            last_update_time=now,
+        )
+        return await self._with_scoped_state(session)
+
+    async def get_session(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        session_id: str,
+        config: Optional[GetSessionConfig] = None,
+    ) -> Optional[Session]:
+        stored = await self._store.load_session(
+            app_name,
+            user_id,
+            session_id,
+            num_recent_events=config.num_recent_events if config else None,
+        )
+        if stored is None:
+            return None
+
+        events = [Event.model_validate_json(payload) for payload in stored.events]
+        if config and config.after_timestamp:
+            events = [event for event in events if event.timestamp >= config.after_timestamp]
+
+        session = Session(
+            app_name=app_name,
+            user_id=user_id,
+            id=session_id,
+            state=stored.state,
+            events=events,
+            last_update_time=stored.last_update_time,
+        )
+        return await self._with_scoped_state(session)
+
+    async def list_sessions(
+        self, *, app_name: str, user_id: Optional[str] = None
+    ) -> ListSessionsResponse:
+        sessions = []
+        for stored in await self._store.list_sessions(app_name, user_id):
+            session = Session(
+                app_name=stored.app_name,
+                user_id=stored.user_id,
+                id=stored.session_id,
+                state=stored.state,
+                last_update_time=stored.last_update_time,
+            )
+            sessions.append(await self._with_scoped_state(session))
+        return ListSessionsResponse(sessions=sessions)
+
+    async def delete_session(self, *, app_name: str, user_id: str, session_id: str) -> None:
+        await self._store.delete_session(app_name, user_id, session_id)
+
+    async def append_event(self, session: Session, event: Event) -> Event:
+        if event.partial:
+            return event
+
+        event = await super().append_event(session=session, event=event)
+        session.last_update_time = event.timestamp
+
+        deltas = _split_state(event.actions.state_delta if event.actions else None)
+        await self._store.append_event(
+            session.app_name,
+            session.user_id,
+            session.id,
+            event.model_dump_json(exclude_none=True),
+            deltas["session"],
+            event.timestamp,
+        )
+        await self._merge_scoped_deltas(session.app_name, session.user_id, deltas)
+        return event
+
+    async def close(self) -> None:
+        await self._store.close()
+
+    async def _merge_scoped_deltas(
+        self, app_name: str, user_id: str, deltas: Dict[str, Dict[str, Any]]
+    ) -> None:
+        if deltas["app"]:
+            await self._store.merge_scoped_state(app_name, _APP_SCOPE, deltas["app"])
+        if deltas["user"]:
+            await self._store.merge_scoped_state(app_name, user_id, deltas["user"])
+
+    async def _with_scoped_state(self, session: Session) -> Session:
+        app_state, user_state = await asyncio.gather(
+            self._store.load_scoped_state(session.app_name, _APP_SCOPE),
+            self._store.load_scoped_state(session.app_name, session.user_id),
+        )
+        for key, value in app_state.items():
+            session.state[State.APP_PREFIX + key] = value
+        for key, value in user_state.items():
+            session.state[State.USER_PREFIX + key] = value
+        return session
+
+
+class ThreadedDatabaseSessionService(DatabaseSessionService):
+    """
+    ADK's SQLAlchemy-backed session service, with its queries run on a worker thread.
+
+    `DatabaseSessionService` issues blocking SQLAlchemy calls from its coroutines;
+    each call is run to completion on a thread so the event loop never blocks.
+    SQLite databases are switched to WAL mode, so several worker processes on one
+    host can share the same file.
+    """
+
+    def __init__(self, db_url: str, **kwargs: Any) -> None:
+        super().__init__(db_url, **kwargs)
+        if self.db_engine.dialect.name == "sqlite":
+            with self.db_engine.connect() as connection:
+                connection.exec_driver_sql("PRAGMA journal_mode=WAL")
+
+    async def create_session(self, **kwargs: Any) -> Session:
+        return await _off_loop(super().create_session(**kwargs))
+
+    async def get_session(self, **kwargs: Any) -> Optional[Session]:
+        return await _off_loop(super().get_session(**kwargs))
+
+    async def list_sessions(self, **kwargs: Any) -> ListSessionsResponse:
+        return await _off_loop(super().list_sessions(**kwargs))
+
+    async def delete_session(self, **kwargs: Any) -> None:
+        await _off_loop(super().delete_session(**kwargs))
+
+    async def append_event(self, session: Session, event: Event) -> Event:
+        if event.partial:
+            return event
+        return await _off_loop(super().append_event(session, event))
+
+    async def close(self) -> None:
+        await asyncio.to_thread(self.db_engine.dispose)
+
+
+# Deletes a session and unindexes it atomically; the user is dropped from the app
+# index once their own index is empty, so listing never walks departed users.
+_DELETE_SESSION_SCRIPT = """
+redis.call('DEL', KEYS[1], KEYS[2], KEYS[3])
+redis.call('SREM', KEYS[4], ARGV[1])
+if redis.call('SCARD', KEYS[4]) == 0 then
+  redis.call('SREM', KEYS[5], ARGV[2])
+end
+"""
+
+
+class RedisSessionStore(SessionStore):
+    """
+    Store backed by any Redis-compatible server, through redis-py's asyncio client.
+
+    Per session: `<prefix>:<app>:<user>:<session>:meta` (hash with the last update
+    time), `...:state` (hash of JSON values) and `...:events` (list of JSON events).
+    Session ids are indexed per user and user ids per app for listing; a user leaves
+    the app index with their last session. Every write is a MULTI/EXEC transaction
+    (or, for deletes, a Lua script) and every read a single pipelined round trip.
+    """
+
+    def __init__(self, client: Redis, *, key_prefix: str = "agent-sessions") -> None:
+        self._client = client
+        self._prefix = key_prefix
+        self._delete_script = client.register_script(_DELETE_SESSION_SCRIPT)
+
+    async def create_session(self, app_name, user_id, session_id, state, update_time) -> bool:
+        base = self._session_key(app_name, user_id, session_id)
+        created = await self._client.hsetnx(f"{base}:meta", "last_update_time", update_time)
+        if not created:
+            return False
+        async with self._client.pipeline(transaction=True) as pipe:
+            pipe.sadd(self._user_index_key(app_name, user_id), session_id)
+            pipe.sadd(self._app_index_key(app_name), user_id)
+            if state:
+                pipe.hset(f"{base}:state", mapping=_encode_json_fields(state))
+            await pipe.execute()
+        return True
+
+    async def load_session(self, app_name, user_id, session_id, num_recent_events=None):
+        base = self._session_key(app_name, user_id, session_id)
+        start = -num_recent_events if num_recent_events else 0
+        async with self._client.pipeline(transaction=False) as pipe:
+            pipe.hget(f"{base}:meta", "last_update_time")
+            pipe.hgetall(f"{base}:state")
+            pipe.lrange(f"{base}:events", start, -1)
+            last_update_time, state, events = await pipe.execute()
+        if last_update_time is None:
+            return None
+        return StoredSession(
+            app_name=app_name,
+            user_id=user_id,
+            session_id=session_id,
+            state=_decode_json_fields(state),
+            last_update_time=float(last_update_time),
+            events=[payload.decode() for payload in events],
+        )
+
+    async def list_sessions(self, app_name, user_id):
+        if user_id is None:
+            user_ids = [
+                member.decode()
+                for member in await self._client.smembers(self._app_index_key(app_name))
+            ]
+        else:
+            user_ids = [user_id]
+
+        keys = []
+        for candidate in user_ids:
+            session_ids = await self._client.smembers(self._user_index_key(app_name, candidate))
+            keys.extend((candidate, session_id.decode()) for session_id in session_ids)
+        if not keys:
+            return []
+
+        async with self._client.pipeline(transaction=False) as pipe:
+            for candidate, session_id in keys:
+                base = self._session_key(app_name, candidate, session_id)
+                pipe.hget(f"{base}:meta", "last_update_time")
+                pipe.hgetall(f"{base}:state")
+            replies = await pipe.execute()
+
+        sessions = []
+        for index, (candidate, session_id) in enumerate(keys):
+            last_update_time, state = replies[2 * index], replies[2 * index + 1]
+            if last_update_time is None:
+                continue
+            sessions.append(
+                StoredSession(
+                    app_name=app_name,
+                    user_id=candidate,
+                    session_id=session_id,
+                    state=_decode_json_fields(state),
+                    last_update_time=float(last_update_time),
+                )
+            )
+        return sessions
+
+    async def delete_session(self, app_name, user_id, session_id) -> None:
+        base = self._session_key(app_name, user_id, session_id)
+        await self._delete_script(
+            keys=[
+                f"{base}:meta",
+                f"{base}:state",
+                f"{base}:events",
+                self._user_index_key(app_name, user_id),
+                self._app_index_key(app_name),
+            ],
+            args=[session_id, user_id],
+        )
+
+    async def append_event(
+        self, app_name, user_id, session_id, event_payload, state_delta, update_time
+    ) -> None:
+        base = self._session_key(app_name, user_id, session_id)
+        async with self._client.pipeline(transaction=True) as pipe:
+            pipe.rpush(f"{base}:events", event_payload)
+            pipe.hset(f"{base}:meta", "last_update_time", update_time)
+            if state_delta:
+                pipe.hset(f"{base}:state", mapping=_encode_json_fields(state_delta))
+            await pipe.execute()
+
+    async def load_scoped_state(self, app_name, user_id) -> Dict[str, Any]:
+        reply = await self._client.hgetall(self._scoped_state_key(app_name, user_id))
+        return _decode_json_fields(reply)
+
+    async def merge_scoped_state(self, app_name, user_id, delta) -> None:
+        await self._client.hset(
+            self._scoped_state_key(app_name, user_id), mapping=_encode_json_fields(delta)
+        )
+
+    async def close(self) -> None:
+        await self._client.aclose()
+
+    def _session_key(self, app_name: str, user_id: str, session_id: str) -> str:
+        return f"{self._prefix}:s:{app_name}:{user_id}:{session_id}"
+
+    def _user_index_key(self, app_name: str, user_id: str) -> str:
+        return f"{self._prefix}:idx:{app_name}:{user_id}"
+
+    def _app_index_key(self, app_name: str) -> str:
+        return f"{self._prefix}:users:{app_name}"
+
+    def _scoped_state_key(self, app_name: str, user_id: str) -> str:
+        scope = user_id or "@app"
+        return f"{self._prefix}:scoped:{app_name}:{scope}"
+
+
+def create_session_service(settings: SessionServiceSettings) -> BoundedSessionService:
+    """
+    Build the session service for the configured backend, with per-worker limits.
+    """
+
+    if settings.backend == "memory":
+        inner: BaseSessionService = InMemorySessionService()
+    elif settings.backend == "sqlite":
+        path = Path(settings.sqlite_path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        inner = ThreadedDatabaseSessionService(
+            f"sqlite:///{path}", connect_args={"timeout": _SQLITE_BUSY_TIMEOUT_SECONDS}
+        )
+    elif settings.backend == "database":
+        inner = ThreadedDatabaseSessionService(settings.database_url)
+    elif settings.backend == "redis":
+        client = Redis.from_url(settings.redis_url, max_connections=settings.redis_pool_size)
+        inner = PersistentSessionService(
+            RedisSessionStore(client, key_prefix=settings.redis_key_prefix)
+        )
+    else:
+        raise ValueError(f"Unsupported session backend '{settings.backend}'")
+
+    return BoundedSessionService(
+        inner,
+        max_sessions=settings.max_sessions,
+        max_bytes=int(settings.max_memory_mb * 1024 * 1024),
+        evict_from_backend=settings.backend == "memory",
+    )
+
+
+def get_session_service(app: FastAPI) -> BoundedSessionService:
+    """
+    Return the gateway-wide session service, creating it on first use.
+
+    Every agent and every worker configured with the same backend shares
+    conversation state through it.
+    """
+
+    service = getattr(app.state, "session_service", None)
+    if service is None:
+        service = create_session_service(app.state.session_settings)
+        app.state.session_service = service
+        logger.info("Using %s session backend", app.state.session_settings.backend)
+    return service
+
+
+def _split_state(state: Optional[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    deltas: Dict[str, Dict[str, Any]] = {"app": {}, "user": {}, "session": {}}
+    for key, value in (state or {}).items():
+        if key.startswith(State.APP_PREFIX):
+            deltas["app"][key[len(State.APP_PREFIX):]] = value
+        elif key.startswith(State.USER_PREFIX):
+            deltas["user"][key[len(State.USER_PREFIX):]] = value
+        elif not key.startswith(State.TEMP_PREFIX):
+            deltas["session"][key] = value
+    return deltas
+
+
+def _encode_json_fields(values: Dict[str, Any]) -> Dict[str, str]:
+    return {key: json.dumps(value) for key, value in values.items()}
+
+
+def _decode_json_fields(reply: Optional[Dict[bytes, bytes]]) -> Dict[str, Any]:
+    return {key.decode(): json.loads(value) for key, value in (reply or {}).items()}
+
+
+async def _off_loop(coroutine: Coroutine[Any, Any, T]) -> T:
+    # The coroutine only makes blocking calls, so it runs to completion on its own loop.
+    return await asyncio.to_thread(asyncio.run, coroutine)
+
+
+__all__ = [
+    "PersistentSessionService",
+    "RedisSessionStore",
+    "SessionStore",
+    "StoredSession",
+    "ThreadedDatabaseSessionService",
+    "create_session_service",
+    "get_session_service",
+]
@@ -1,5 +1,5 @@
 import os
-from typing import Iterable, List, Optional, Sequence
+from typing import Dict, Iterable, List, Optional, Sequence
 
 from pydantic import BaseModel, Field, ValidationError, validator
 
@@ -80,3 +80,843 @@ def load_supabase_auth_settings() -> SupabaseAuthSettings:
         raise RuntimeError(
             "Invalid Supabase authentication configuration. Please verify environment variables."
         ) from exc
+
+
+class AdminSettings(BaseModel):
+    """
+    Configuration for the operator-only `/admin` routes.
+    """
+
+    admin_user_ids: List[str] = Field(default_factory=list)
+
+    @validator("admin_user_ids", pre=True)
+    def _parse_admin_user_ids(cls, value: Optional[Sequence[str]]) -> List[str]:
+        return _normalize_list(value)
+
+
+def load_admin_settings() -> AdminSettings:
+    """
+    Load admin settings from environment variables.
+
+    Expected environment variables:
+        AGENT_ADMIN_USER_IDS (optional, comma separated Supabase user ids)
+    """
+
+    raw_value = os.getenv("AGENT_ADMIN_USER_IDS")
+    try:
+        return AdminSettings(admin_user_ids=raw_value)
+    except ValidationError as exc:
+        raise RuntimeError(
+            "Invalid admin configuration. Please verify environment variables."
+        ) from exc
+
+
+class SessionServiceSettings(BaseModel):
+    """
+    Configuration for the ADK session service shared by all agents.
+    """
+
+    backend: str = Field(default="memory")
+    sqlite_path: str = Field(default="data/sessions.sqlite3")
+    database_url: Optional[str] = Field(default=None)
+    redis_url: str = Field(default="redis://127.0.0.1:6379/0")
+    redis_key_prefix: str = Field(default="agent-sessions")
+    redis_pool_size: int = Field(default=8, gt=0)
+    idle_ttl_seconds: int = Field(default=1200, gt=0)
+    cleanup_interval_seconds: int = Field(default=300, gt=0)
+    max_sessions: int = Field(default=0, ge=0)
+    max_memory_mb: float = Field(default=0, ge=0)
+
+    @validator("backend", pre=True)
+    def _parse_backend(cls, value: Optional[str]) -> str:
+        backend = (value or "memory").strip().lower()
+        if backend not in ("memory", "sqlite", "database", "redis"):
+            raise ValueError("backend must be one of: memory, sqlite, database, redis")
+        return backend
+
+    @validator("database_url", always=True)
+    def _require_database_url(cls, value: Optional[str], values: dict) -> Optional[str]:
+        if values.get("backend") == "database" and not value:
+            raise ValueError("database_url is required for the database backend")
+        return value
+
+
+def load_session_service_settings() -> SessionServiceSettings:
+    """
+    Load session persistence settings from environment variables.
+
+    Expected environment variables:
+        AGENT_SESSION_BACKEND (optional, memory | sqlite | database | redis)
+        AGENT_SESSION_SQLITE_PATH (optional, SQLite database file)
+        AGENT_SESSION_DATABASE_URL (optional, SQLAlchemy URL for the database backend)
+        AGENT_SESSION_REDIS_URL (optional, redis://[:password@]host:port/db)
+        AGENT_SESSION_REDIS_PREFIX (optional, key prefix)
+        AGENT_SESSION_REDIS_POOL_SIZE (optional, connections per worker)
+        AGENT_SESSION_IDLE_TTL (optional, seconds before an idle session is deleted)
+        AGENT_SESSION_CLEANUP_INTERVAL (optional, seconds between idle sweeps)
+        AGENT_SESSION_MAX_COUNT (optional, sessions held per worker, 0 = unlimited)
+        AGENT_SESSION_MAX_MEMORY_MB (optional, session memory per worker, 0 = unlimited)
+    """
+
+    raw_config = {
+        "backend": os.getenv("AGENT_SESSION_BACKEND"),
+        "sqlite_path": os.getenv("AGENT_SESSION_SQLITE_PATH"),
+        "database_url": os.getenv("AGENT_SESSION_DATABASE_URL"),
+        "redis_url": os.getenv("AGENT_SESSION_REDIS_URL"),
+        "redis_key_prefix": os.getenv("AGENT_SESSION_REDIS_PREFIX"),
+        "redis_pool_size": os.getenv("AGENT_SESSION_REDIS_POOL_SIZE"),
+        "idle_ttl_seconds": os.getenv("AGENT_SESSION_IDLE_TTL"),
+        "cleanup_interval_seconds": os.getenv("AGENT_SESSION_CLEANUP_INTERVAL"),
+        "max_sessions": os.getenv("AGENT_SESSION_MAX_COUNT"),
+        "max_memory_mb": os.getenv("AGENT_SESSION_MAX_MEMORY_MB"),
+    }
+    filtered_config = {key: value for key, value in raw_config.items() if value is not None}
+    try:
+        return SessionServiceSettings(**filtered_config)
+    except ValidationError as exc:
+        raise RuntimeError(
+            "Invalid session service configuration. Please verify environment variables."
+        ) from exc
+
+
+class HistoryCompactionSettings(BaseModel):
+    """
+    Limits applied to the conversation history sent to the model each turn.
+
+    Zero disables a limit.
+    """
+
+    max_contents: int = Field(default=0, ge=0)
+    summary_threshold_tokens: int = Field(default=0, ge=0)
+    summary_retain_ratio: float = Field(default=0.5, gt=0, le=1)
+    summary_max_chars: int = Field(default=4000, gt=0)
+
+
+def load_history_compaction_settings() -> HistoryCompactionSettings:
+    """
+    Load history compaction settings from environment variables.
+
+    Expected environment variables:
+        AGENT_HISTORY_WINDOW (optional, most recent history entries sent to the model)
+        AGENT_HISTORY_SUMMARY_TOKENS (optional, estimated tokens that trigger a summary)
+        AGENT_HISTORY_SUMMARY_RETAIN (optional, share of the threshold kept verbatim)
+        AGENT_HISTORY_SUMMARY_MAX_CHARS (optional, summary length cap)
+    """
+
+    raw_config = {
+        "max_contents": os.getenv("AGENT_HISTORY_WINDOW"),
+        "summary_threshold_tokens": os.getenv("AGENT_HISTORY_SUMMARY_TOKENS"),
+        "summary_retain_ratio": os.getenv("AGENT_HISTORY_SUMMARY_RETAIN"),
+        "summary_max_chars": os.getenv("AGENT_HISTORY_SUMMARY_MAX_CHARS"),
+    }
+    filtered_config = {key: value for key, value in raw_config.items() if value is not None}
+    try:
+        return HistoryCompactionSettings(**filtered_config)
+    except ValidationError as exc:
+        raise RuntimeError(
+            "Invalid history compaction configuration. Please verify environment variables."
+        ) from exc
+
+
+class AdmissionSettings(BaseModel):
+    """
+    Per-worker admission limits for agent runs. Zero disables a limit.
+    """
+
+    max_runs_per_user: int = Field(default=4, ge=0)
+    max_runs_per_agent: int = Field(default=10, ge=0)
+    queue_size: int = Field(default=64, ge=0)
+    queue_timeout_seconds: float = Field(default=15.0, ge=0)
+
+
+def load_admission_settings() -> AdmissionSettings:
+    """
+    Load admission control settings from environment variables.
+
+    Expected environment variables:
+        AGENT_MAX_RUNS_PER_USER (optional, concurrent runs per user)
+        AGENT_MAX_RUNS_PER_AGENT (optional, concurrent runs per agent)
+        AGENT_ADMISSION_QUEUE_SIZE (optional, runs allowed to wait for a slot)
+        AGENT_ADMISSION_QUEUE_TIMEOUT (optional, seconds a run may wait)
+    """
+
+    raw_config = {
+        "max_runs_per_user": os.getenv("AGENT_MAX_RUNS_PER_USER"),
+        "max_runs_per_agent": os.getenv("AGENT_MAX_RUNS_PER_AGENT"),
+        "queue_size": os.getenv("AGENT_ADMISSION_QUEUE_SIZE"),
+        "queue_timeout_seconds": os.getenv("AGENT_ADMISSION_QUEUE_TIMEOUT"),
+    }
+    filtered_config = {key: value for key, value in raw_config.items() if value is not None}
+    try:
+        return AdmissionSettings(**filtered_config)
+    except ValidationError as exc:
+        raise RuntimeError(
+            "Invalid admission control configuration. Please verify environment variables."
+        ) from exc
+
+
+class MetricsSettings(BaseModel):
+    """
+    Configuration for the unauthenticated Prometheus `/metrics` endpoint.
+    """
+
+    enabled: bool = Field(default=True)
+    path: str = Field(default="/metrics")
+
+    @validator("path")
+    def _validate_path(cls, value: str) -> str:
+        value = value.strip()
+        if not value.startswith("/"):
+            raise ValueError("metrics path must start with '/'")
+        return value
+
+
+def load_metrics_settings() -> MetricsSettings:
+    """
+    Load metrics endpoint settings from environment variables.
+
+    Expected environment variables:
+        AGENT_METRICS_ENABLED (optional, serve the metrics endpoint)
+        AGENT_METRICS_PATH (optional, path of the metrics endpoint)
+    """
+
+    raw_config = {
+        "enabled": os.getenv("AGENT_METRICS_ENABLED"),
+        "path": os.getenv("AGENT_METRICS_PATH"),
+    }
+    filtered_config = {key: value for key, value in raw_config.items() if value is not None}
+    try:
+        return MetricsSettings(**filtered_config)
+    except ValidationError as exc:
+        raise RuntimeError(
+            "Invalid metrics configuration. Please verify environment variables."
+        ) from exc
+
+
+class TracingSettings(BaseModel):
+    """
+    Configuration for opt-in OpenTelemetry tracing.
+
+    The OTLP exporter honours the standard `OTEL_EXPORTER_OTLP_*` variables and the
+    service name comes from `OTEL_SERVICE_NAME`.
+    """
+
+    enabled: bool = Field(default=False)
+    exporter: str = Field(default="console")
+    file_path: str = Field(default="data/traces.otlp.jsonl")
+    sample_ratio: float = Field(default=1.0, ge=0, le=1)
+
+    @validator("exporter", pre=True)
+    def _parse_exporter(cls, value: Optional[str]) -> str:
+        exporter = (value or "console").strip().lower()
+        if exporter not in ("console", "file", "otlp"):
+            raise ValueError("exporter must be one of: console, file, otlp")
+        return exporter
+
+
+def load_tracing_settings() -> TracingSettings:
+    """
+    Load tracing settings from environment variables.
+
+    Expected environment variables:
+        AGENT_TRACING_ENABLED (optional, export OpenTelemetry spans)
+        AGENT_TRACING_EXPORTER (optional, console | file | otlp)
+        AGENT_TRACING_FILE (optional, OTLP JSON lines file for the `file` exporter)
+        AGENT_TRACING_SAMPLE_RATIO (optional, share of new traces recorded)
+    """
+
+    raw_config = {
+        "enabled": os.getenv("AGENT_TRACING_ENABLED"),
+        "exporter": os.getenv("AGENT_TRACING_EXPORTER"),
+        "file_path": os.getenv("AGENT_TRACING_FILE"),
+        "sample_ratio": os.getenv("AGENT_TRACING_SAMPLE_RATIO"),
+    }
+    filtered_config = {key: value for key, value in raw_config.items() if value is not None}
+    try:
+        return TracingSettings(**filtered_config)
+    except ValidationError as exc:
+        raise RuntimeError(
+            "Invalid tracing configuration. Please verify environment variables."
+        ) from exc
+
+
+class ProfilingSettings(BaseModel):
+    """
+    Configuration for admin-triggered per-request CPU profiles.
+    """
+
+    secret: Optional[str] = Field(default=None)
+    directory: str = Field(default="data/profiles")
+    interval_ms: float = Field(default=5.0, gt=0)
+    max_seconds: float = Field(default=120.0, gt=0)
+    keep: int = Field(default=20, gt=0)
+
+
+def load_profiling_settings() -> ProfilingSettings:
+    """
+    Load request profiling settings from environment variables.
+
+    Expected environment variables:
+        AGENT_PROFILING_SECRET (optional, key for signed profiling headers)
+        AGENT_PROFILE_DIR (optional, where profiles are stored)
+        AGENT_PROFILE_INTERVAL_MS (optional, sampling interval)
+        AGENT_PROFILE_MAX_SECONDS (optional, longest profile recorded)
+        AGENT_PROFILE_KEEP (optional, profiles kept per worker directory)
+    """
+
+    raw_config = {
+        "secret": os.getenv("AGENT_PROFILING_SECRET") or None,
+        "directory": os.getenv("AGENT_PROFILE_DIR"),
+        "interval_ms": os.getenv("AGENT_PROFILE_INTERVAL_MS"),
+        "max_seconds": os.getenv("AGENT_PROFILE_MAX_SECONDS"),
+        "keep": os.getenv("AGENT_PROFILE_KEEP"),
+    }
+    filtered_config = {key: value for key, value in raw_config.items() if value is not None}
+    try:
+        return ProfilingSettings(**filtered_config)
+    except ValidationError as exc:
+        raise RuntimeError(
+            "Invalid profiling configuration. Please verify environment variables."
+        ) from exc
+
+
+class CassetteSettings(BaseModel):
+    """
+    Configuration for recording or replaying LLM and MCP traffic.
+
+    `time_scale` multiplies recorded delays on replay (0 replays without waiting).
+    """
+
+    mode: str = Field(default="off")
+    path: str = Field(default="data/cassette.jsonl")
+    time_scale: float = Field(default=1.0, ge=0)
+
+    @validator("mode", pre=True)
+    def _parse_mode(cls, value: Optional[str]) -> str:
+        mode = (value or "off").strip().lower()
+        if mode not in ("off", "record", "replay"):
+            raise ValueError("mode must be one of: off, record, replay")
+        return mode
+
+
+def load_cassette_settings() -> CassetteSettings:
+    """
+    Load record/replay settings from environment variables.
+
+    Expected environment variables:
+        AGENT_CASSETTE_MODE (optional, off | record | replay)
+        AGENT_CASSETTE_PATH (optional, cassette file; a .gz suffix compresses it)
+        AGENT_CASSETTE_TIME_SCALE (optional, multiplier for replayed delays)
+    """
+
+    raw_config = {
+        "mode": os.getenv("AGENT_CASSETTE_MODE"),
+        "path": os.getenv("AGENT_CASSETTE_PATH"),
+        "time_scale": os.getenv("AGENT_CASSETTE_TIME_SCALE"),
+    }
+    filtered_config = {key: value for key, value in raw_config.items() if value is not None}
+    try:
+        return CassetteSettings(**filtered_config)
+    except ValidationError as exc:
+        raise RuntimeError(
+            "Invalid cassette configuration. Please verify environment variables."
+        ) from exc
+
+
+WARMUP_STEPS = ("agents", "sessions", "supabase", "llm", "composio")
+
+
+class WarmupSettings(BaseModel):
+    """
+    Configuration for the startup warm-up that gates `/readyz`.
+
+    `deadline_seconds` bounds the whole warm-up; a worker still warming up then
+    reports ready in degraded mode. `llm_ping` sends a one-token request through
+    each shared model instance so its client and connection pool are open before
+    the first user; it is off by default because every ping is a billed request.
+    """
+
+    enabled: bool = Field(default=True)
+    steps: List[str] = Field(default_factory=lambda: list(WARMUP_STEPS))
+    deadline_seconds: float = Field(default=30.0, gt=0)
+    llm_ping: bool = Field(default=False)
+    composio_user_id: Optional[str] = Field(default=None)
+
+    @validator("steps", pre=True)
+    def _parse_steps(cls, value: Optional[Sequence[str]]) -> List[str]:
+        if value is None:
+            return list(WARMUP_STEPS)
+        steps = [item.lower() for item in _normalize_list(value)]
+        unknown = sorted(set(steps) - set(WARMUP_STEPS))
+        if unknown:
+            raise ValueError(f"unknown warm-up steps: {', '.join(unknown)}")
+        return steps
+
+
+def load_warmup_settings() -> WarmupSettings:
+    """
+    Load startup warm-up settings from environment variables.
+
+    Expected environment variables:
+        AGENT_WARMUP_ENABLED (optional, run the warm-up before reporting ready)
+        AGENT_WARMUP_STEPS (optional, comma separated subset of the warm-up steps)
+        AGENT_WARMUP_DEADLINE_SECONDS (optional, longest wait before degraded mode)
+        AGENT_WARMUP_LLM_PING (optional, send a one-token request per model)
+        AGENT_WARMUP_COMPOSIO_USER_ID (optional, user id used to list MCP tools)
+    """
+
+    raw_config = {
+        "enabled": os.getenv("AGENT_WARMUP_ENABLED"),
+        "steps": os.getenv("AGENT_WARMUP_STEPS"),
+        "deadline_seconds": os.getenv("AGENT_WARMUP_DEADLINE_SECONDS"),
+        "llm_ping": os.getenv("AGENT_WARMUP_LLM_PING"),
+        "composio_user_id": os.getenv("AGENT_WARMUP_COMPOSIO_USER_ID") or None,
+    }
+    filtered_config = {key: value for key, value in raw_config.items() if value is not None}
+    try:
+        return WarmupSettings(**filtered_config)
+    except ValidationError as exc:
+        raise RuntimeError(
+            "Invalid warm-up configuration. Please verify environment variables."
+        ) from exc
+
+
+class StreamingSettings(BaseModel):
+    """
+    Configuration for coalescing and compressing AG-UI event streams.
+
+    Text deltas of one message are merged for up to `coalesce_ms` or until
+    `coalesce_max_bytes` are pending (`coalesce_ms=0` disables merging).
+    """
+
+    coalesce_ms: float = Field(default=20.0, ge=0)
+    coalesce_max_bytes: int = Field(default=4096, gt=0)
+    compression: bool = Field(default=True)
+    compression_level: int = Field(default=6, ge=1, le=9)
+
+
+def load_streaming_settings() -> StreamingSettings:
+    """
+    Load event stream coalescing and compression settings from environment variables.
+
+    Expected environment variables:
+        AGENT_SSE_COALESCE_MS (optional, longest a text delta is held back)
+        AGENT_SSE_COALESCE_MAX_BYTES (optional, pending delta bytes forcing a flush)
+        AGENT_SSE_COMPRESSION (optional, gzip streams for clients that accept it)
+        AGENT_SSE_COMPRESSION_LEVEL (optional, zlib level 1-9)
+    """
+
+    raw_config = {
+        "coalesce_ms": os.getenv("AGENT_SSE_COALESCE_MS"),
+        "coalesce_max_bytes": os.getenv("AGENT_SSE_COALESCE_MAX_BYTES"),
+        "compression": os.getenv("AGENT_SSE_COMPRESSION"),
+        "compression_level": os.getenv("AGENT_SSE_COMPRESSION_LEVEL"),
+    }
+    filtered_config = {key: value for key, value in raw_config.items() if value is not None}
+    try:
+        return StreamingSettings(**filtered_config)
+    except ValidationError as exc:
+        raise RuntimeError(
+            "Invalid event streaming configuration. Please verify environment variables."
+        ) from exc
+
+
+class JobSettings(BaseModel):
+    """
+    Configuration for background agent runs (`/jobs`).
+
+    Each worker runs at most `concurrency` jobs and holds up to `max_queued` more.
+    Records and events of finished jobs are kept for `retention_hours`.
+    """
+
+    enabled: bool = Field(default=True)
+    concurrency: int = Field(default=4, gt=0)
+    max_queued: int = Field(default=100, ge=0)
+    max_per_user: int = Field(default=5, gt=0)
+    sqlite_path: str = Field(default="data/jobs.sqlite3")
+    retention_hours: float = Field(default=24.0, gt=0)
+    poll_interval_seconds: float = Field(default=0.5, gt=0)
+
+
+def load_job_settings() -> JobSettings:
+    """
+    Load background job settings from environment variables.
+
+    Expected environment variables:
+        AGENT_JOBS_ENABLED (optional, serve the `/jobs` API)
+        AGENT_JOBS_CONCURRENCY (optional, jobs run at once per worker)
+        AGENT_JOBS_MAX_QUEUED (optional, jobs waiting per worker before 429)
+        AGENT_JOBS_MAX_PER_USER (optional, queued plus running jobs per user)
+        AGENT_JOBS_SQLITE_PATH (optional, SQLite file for job records and events)
+        AGENT_JOBS_RETENTION_HOURS (optional, how long finished jobs are kept)
+        AGENT_JOBS_POLL_INTERVAL (optional, seconds between checks for jobs run by other workers)
+    """
+
+    raw_config = {
+        "enabled": os.getenv("AGENT_JOBS_ENABLED"),
+        "concurrency": os.getenv("AGENT_JOBS_CONCURRENCY"),
+        "max_queued": os.getenv("AGENT_JOBS_MAX_QUEUED"),
+        "max_per_user": os.getenv("AGENT_JOBS_MAX_PER_USER"),
+        "sqlite_path": os.getenv("AGENT_JOBS_SQLITE_PATH"),
+        "retention_hours": os.getenv("AGENT_JOBS_RETENTION_HOURS"),
+        "poll_interval_seconds": os.getenv("AGENT_JOBS_POLL_INTERVAL"),
+    }
+    filtered_config = {key: value for key, value in raw_config.items() if value is not None}
+    try:
+        return JobSettings(**filtered_config)
+    except ValidationError as exc:
+        raise RuntimeError(
+            "Invalid background job configuration. Please verify environment variables."
+        ) from exc
+
+
+class ComposioConnectionSettings(BaseModel):
+    """
+    Configuration for the per-user Composio connection status given to agents,
+    and for how each run's MCP toolsets are provisioned.
+
+    Toolkits found connected are not checked again for `status_ttl_seconds`, and
+    toolkits found not connected for `not_connected_ttl_seconds`; tools of
+    toolkits that are not connected are pruned or flagged. Both caches are per
+    worker: `POST /composio/connections/refresh` clears the caller's entry on the
+    worker that receives it, and the TTLs bound how long other workers lag. With
+    `speculative_provisioning`, MCP URLs of configs whose tool schemas are cached
+    are generated in the background while the first model call runs. The first
+    model request waits up to `status_wait_seconds` from the start of the run for
+    a status lookup that misses the cache.
+    """
+
+    enabled: bool = Field(default=True)
+    status_ttl_seconds: float = Field(default=60.0, ge=0)
+    not_connected_ttl_seconds: float = Field(default=10.0, ge=0)
+    unavailable_tools: str = Field(default="prune")
+    speculative_provisioning: bool = Field(default=True)
+    status_wait_seconds: float = Field(default=1.0, ge=0)
+
+    @validator("unavailable_tools", pre=True)
+    def _parse_unavailable_tools(cls, value: Optional[str]) -> str:
+        mode = (value or "prune").strip().lower()
+        if mode not in ("prune", "flag"):
+            raise ValueError("unavailable_tools must be one of: prune, flag")
+        return mode
+
+
+def load_composio_connection_settings() -> ComposioConnectionSettings:
+    """
+    Load Composio connection status settings from environment variables.
+
+    Expected environment variables:
+        AGENT_COMPOSIO_CONNECTION_STATUS (optional, look up connections before each run)
+        AGENT_COMPOSIO_STATUS_TTL (optional, seconds a connected toolkit stays cached)
+        AGENT_COMPOSIO_NOT_CONNECTED_TTL (optional, seconds an unconnected toolkit stays cached)
+        AGENT_COMPOSIO_UNAVAILABLE_TOOLS (optional, prune | flag)
+        AGENT_COMPOSIO_SPECULATIVE_PROVISIONING (optional, generate MCP URLs during the first model call)
+        AGENT_COMPOSIO_STATUS_WAIT (optional, seconds the first model request waits for the status)
+    """
+
+    raw_config = {
+        "enabled": os.getenv("AGENT_COMPOSIO_CONNECTION_STATUS"),
+        "status_ttl_seconds": os.getenv("AGENT_COMPOSIO_STATUS_TTL"),
+        "not_connected_ttl_seconds": os.getenv("AGENT_COMPOSIO_NOT_CONNECTED_TTL"),
+        "unavailable_tools": os.getenv("AGENT_COMPOSIO_UNAVAILABLE_TOOLS"),
+        "speculative_provisioning": os.getenv("AGENT_COMPOSIO_SPECULATIVE_PROVISIONING"),
+        "status_wait_seconds": os.getenv("AGENT_COMPOSIO_STATUS_WAIT"),
+    }
+    filtered_config = {key: value for key, value in raw_config.items() if value is not None}
+    try:
+        return ComposioConnectionSettings(**filtered_config)
+    except ValidationError as exc:
+        raise RuntimeError(
+            "Invalid Composio connection configuration. Please verify environment variables."
+        ) from exc
+
+
+class ToolSelectionSettings(BaseModel):
+    """
+    Configuration for declaring only the relevant Composio tools on each turn.
+
+    Configs with more than `min_tools` tools declare the `top_k` best matches for
+    the user's message plus a tool-search tool. `embedder` optionally names a
+    `module:function` used next to lexical scoring.
+    """
+
+    enabled: bool = Field(default=True)
+    top_k: int = Field(default=8, ge=1)
+    min_tools: int = Field(default=20, ge=0)
+    embedder: Optional[str] = Field(default=None)
+
+    @validator("embedder", pre=True)
+    def _parse_embedder(cls, value: Optional[str]) -> Optional[str]:
+        if value is None or not value.strip():
+            return None
+        module_name, _, attribute = value.strip().partition(":")
+        if not module_name or not attribute:
+            raise ValueError("embedder must look like 'module:function'")
+        return value.strip()
+
+
+def load_tool_selection_settings() -> ToolSelectionSettings:
+    """
+    Load per-turn tool selection settings from environment variables.
+
+    Expected environment variables:
+        AGENT_TOOL_SELECTION (optional, declare only the relevant tools per turn)
+        AGENT_TOOL_SELECTION_TOP_K (optional, tools declared per config)
+        AGENT_TOOL_SELECTION_MIN_TOOLS (optional, configs this small declare every tool)
+        AGENT_TOOL_SELECTION_EMBEDDER (optional, module:function returning text embeddings)
+    """
+
+    raw_config = {
+        "enabled": os.getenv("AGENT_TOOL_SELECTION"),
+        "top_k": os.getenv("AGENT_TOOL_SELECTION_TOP_K"),
+        "min_tools": os.getenv("AGENT_TOOL_SELECTION_MIN_TOOLS"),
+        "embedder": os.getenv("AGENT_TOOL_SELECTION_EMBEDDER"),
+    }
+    filtered_config = {key: value for key, value in raw_config.items() if value is not None}
+    try:
+        return ToolSelectionSettings(**filtered_config)
+    except ValidationError as exc:
+        raise RuntimeError(
+            "Invalid tool selection configuration. Please verify environment variables."
+        ) from exc
+
+
+class UsageSettings(BaseModel):
+    """
+    Configuration for the token usage ledger and per-user quotas.
+
+    Quotas count prompt plus completion tokens over the last `window_hours`, per
+    user (`quota_scope="user"`) or per user and agent (`"agent"`). Unset quotas
+    are not enforced.
+    """
+
+    enabled: bool = Field(default=True)
+    sqlite_path: str = Field(default="data/usage.sqlite3")
+    window_hours: int = Field(default=24, ge=1, le=24 * 31)
+    soft_quota: Optional[int] = Field(default=None, ge=1)
+    hard_quota: Optional[int] = Field(default=None, ge=1)
+    quota_scope: str = Field(default="user")
+    retention_days: float = Field(default=7.0, gt=0)
+    flush_interval_seconds: float = Field(default=1.0, gt=0)
+
+    @validator("soft_quota", "hard_quota", pre=True)
+    def _parse_quota(cls, value: Optional[str]) -> Optional[str]:
+        if isinstance(value, str) and not value.strip():
+            return None
+        return value
+
+    @validator("quota_scope", pre=True)
+    def _parse_quota_scope(cls, value: Optional[str]) -> str:
+        scope = (value or "user").strip().lower()
+        if scope not in ("user", "agent"):
+            raise ValueError("quota_scope must be one of: user, agent")
+        return scope
+
+    @validator("hard_quota")
+    def _check_quotas(cls, value: Optional[int], values) -> Optional[int]:
+        soft_quota = values.get("soft_quota")
+        if value is not None and soft_quota is not None and soft_quota > value:
+            raise ValueError("soft_quota must not exceed hard_quota")
+        return value
+
+
+def load_usage_settings() -> UsageSettings:
+    """
+    Load token usage ledger and quota settings from environment variables.
+
+    Expected environment variables:
+        AGENT_USAGE_ENABLED (optional, record token usage and enforce quotas)
+        AGENT_USAGE_SQLITE_PATH (optional, ledger database path)
+        AGENT_USAGE_WINDOW_HOURS (optional, hours counted towards quotas)
+        AGENT_USAGE_SOFT_QUOTA (optional, tokens after which runs are flagged)
+        AGENT_USAGE_HARD_QUOTA (optional, tokens after which runs are refused)
+        AGENT_USAGE_QUOTA_SCOPE (optional, user | agent)
+        AGENT_USAGE_RETENTION_DAYS (optional, days per-call rows are kept)
+    """
+
+    raw_config = {
+        "enabled": os.getenv("AGENT_USAGE_ENABLED"),
+        "sqlite_path": os.getenv("AGENT_USAGE_SQLITE_PATH"),
+        "window_hours": os.getenv("AGENT_USAGE_WINDOW_HOURS"),
+        "soft_quota": os.getenv("AGENT_USAGE_SOFT_QUOTA"),
+        "hard_quota": os.getenv("AGENT_USAGE_HARD_QUOTA"),
+        "quota_scope": os.getenv("AGENT_USAGE_QUOTA_SCOPE"),
+        "retention_days": os.getenv("AGENT_USAGE_RETENTION_DAYS"),
+    }
+    filtered_config = {key: value for key, value in raw_config.items() if value is not None}
+    try:
+        return UsageSettings(**filtered_config)
+    except ValidationError as exc:
+        raise RuntimeError(
+            "Invalid token usage configuration. Please verify environment variables."
+        ) from exc
+
+
+class LoggingSettings(BaseModel):
+    """
+    Configuration for queue-backed structured logging.
+
+    `sample_rates` keeps that share of the DEBUG/INFO records of a logger and its
+    children. `rate_limits` caps how many records per second each message of a
+    logger (and its children) may write; the rest are counted and reported on the
+    next record written.
+    """
+
+    level: str = Field(default="INFO")
+    format: str = Field(default="text")
+    queue_size: int = Field(default=10000, ge=1)
+    sample_rates: Dict[str, float] = Field(default_factory=dict)
+    rate_limits: Dict[str, float] = Field(default_factory=lambda: {"shared.auth": 10.0})
+
+    @validator("level", pre=True)
+    def _parse_level(cls, value: Optional[str]) -> str:
+        return (value or "INFO").strip().upper()
+
+    @validator("format", pre=True)
+    def _parse_format(cls, value: Optional[str]) -> str:
+        log_format = (value or "text").strip().lower()
+        if log_format not in ("json", "text"):
+            raise ValueError("format must be one of: json, text")
+        return log_format
+
+    @validator("sample_rates", pre=True)
+    def _parse_sample_rates(cls, value) -> Dict[str, float]:
+        rates = _parse_logger_mapping(value)
+        if any(not 0 <= rate <= 1 for rate in rates.values()):
+            raise ValueError("sample rates must be between 0 and 1")
+        return rates
+
+    @validator("rate_limits", pre=True)
+    def _parse_rate_limits(cls, value) -> Dict[str, float]:
+        limits = _parse_logger_mapping(value)
+        if any(limit <= 0 for limit in limits.values()):
+            raise ValueError("rate limits must be positive")
+        return limits
+
+
+def _parse_logger_mapping(value) -> Dict[str, float]:
+    if isinstance(value, dict):
+        return {str(name): float(number) for name, number in value.items()}
+    mapping = {}
+    for item in _normalize_list(value):
+        name, separator, number = item.partition("=")
+        if not separator or not name.strip():
+            raise ValueError("entries must look like 'logger.name=number'")
+        mapping[name.strip()] = float(number)
+    return mapping
+
+
+def load_logging_settings() -> LoggingSettings:
+    """
+    Load logging settings from environment variables.
+
+    Expected environment variables:
+        LOG_LEVEL (optional, root logging level)
+        AGENT_LOG_FORMAT (optional, text | json)
+        AGENT_LOG_QUEUE_SIZE (optional, records buffered for the writer thread)
+        AGENT_LOG_SAMPLING (optional, comma-separated logger=share of DEBUG/INFO kept)
+        AGENT_LOG_RATE_LIMITS (optional, comma-separated logger=records per second per message)
+    """
+
+    raw_config = {
+        "level": os.getenv("LOG_LEVEL"),
+        "format": os.getenv("AGENT_LOG_FORMAT"),
+        "queue_size": os.getenv("AGENT_LOG_QUEUE_SIZE"),
+        "sample_rates": os.getenv("AGENT_LOG_SAMPLING"),
+        "rate_limits": os.getenv("AGENT_LOG_RATE_LIMITS"),
+    }
+    filtered_config = {key: value for key, value in raw_config.items() if value is not None}
+    try:
+        return LoggingSettings(**filtered_config)
+    except ValidationError as exc:
+        raise RuntimeError(
+            "Invalid logging configuration. Please verify environment variables."
+        ) from exc
+
+
+class LoopMonitorSettings(BaseModel):
+    """
+    Configuration for the event-loop lag monitor and blocking-call detector.
+
+    The loop is checked every `interval_ms`. When it has not run for
+    `block_threshold_ms` past that, the stack of the loop thread is captured and
+    attributed; the last `keep` reports are kept for `/admin/loop`.
+    """
+
+    enabled: bool = Field(default=True)
+    interval_ms: float = Field(default=100.0, gt=0)
+    block_threshold_ms: float = Field(default=100.0, gt=0)
+    keep: int = Field(default=50, ge=1)
+
+
+def load_loop_monitor_settings() -> LoopMonitorSettings:
+    """
+    Load event-loop monitor settings from environment variables.
+
+    Expected environment variables:
+        AGENT_LOOP_MONITOR (optional, measure loop lag and report blocking calls)
+        AGENT_LOOP_MONITOR_INTERVAL_MS (optional, how often the loop is checked)
+        AGENT_LOOP_BLOCK_THRESHOLD_MS (optional, stall reported as a blocking call)
+        AGENT_LOOP_BLOCK_KEEP (optional, blocking-call reports kept per worker)
+    """
+
+    raw_config = {
+        "enabled": os.getenv("AGENT_LOOP_MONITOR"),
+        "interval_ms": os.getenv("AGENT_LOOP_MONITOR_INTERVAL_MS"),
+        "block_threshold_ms": os.getenv("AGENT_LOOP_BLOCK_THRESHOLD_MS"),
+        "keep": os.getenv("AGENT_LOOP_BLOCK_KEEP"),
+    }
+    filtered_config = {key: value for key, value in raw_config.items() if value is not None}
+    try:
+        return LoopMonitorSettings(**filtered_config)
+    except ValidationError as exc:
+        raise RuntimeError(
+            "Invalid event loop monitor configuration. Please verify environment variables."
+        ) from exc
+
+
+class RunCoalescingSettings(BaseModel):
+    """
+    Configuration for coalescing duplicate agent run requests.
+
+    A request repeating the user, thread and triggering message of a run still in
+    flight attaches to that run's stream; one repeating a run that finished less
+    than `ttl_seconds` ago gets its recorded stream. Runs whose stream exceeds
+    `max_run_bytes` are not replayed, and completed streams are kept within
+    `cache_bytes` per worker. A run keeps going for `detach_grace_seconds` after
+    its last client disconnected, so a retry can pick it up.
+    """
+
+    enabled: bool = Field(default=True)
+    ttl_seconds: float = Field(default=60.0, ge=0)
+    max_run_bytes: int = Field(default=4 * 1024 * 1024, ge=0)
+    cache_bytes: int = Field(default=64 * 1024 * 1024, ge=0)
+    detach_grace_seconds: float = Field(default=10.0, ge=0)
+
+
+def load_run_coalescing_settings() -> RunCoalescingSettings:
+    """
+    Load run coalescing settings from environment variables.
+
+    Expected environment variables:
+        AGENT_RUN_COALESCING (optional, attach duplicate run requests to the original run)
+        AGENT_RUN_COALESCING_TTL (optional, seconds a finished run is replayed to duplicates)
+        AGENT_RUN_COALESCING_MAX_RUN_BYTES (optional, largest stream kept for replay)
+        AGENT_RUN_COALESCING_CACHE_BYTES (optional, finished streams kept per worker)
+        AGENT_RUN_COALESCING_DETACH_GRACE (optional, seconds a run outlives its last client)
+    """
+
+    raw_config = {
+        "enabled": os.getenv("AGENT_RUN_COALESCING"),
+        "ttl_seconds": os.getenv("AGENT_RUN_COALESCING_TTL"),
+        "max_run_bytes": os.getenv("AGENT_RUN_COALESCING_MAX_RUN_BYTES"),
+        "cache_bytes": os.getenv("AGENT_RUN_COALESCING_CACHE_BYTES"),
+        "detach_grace_seconds": os.getenv("AGENT_RUN_COALESCING_DETACH_GRACE"),
+    }
+    filtered_config = {key: value for key, value in raw_config.items() if value is not None}
+    try:
+        return RunCoalescingSettings(**filtered_config)
+    except ValidationError as exc:
+        raise RuntimeError(
+            "Invalid run coalescing configuration. Please verify environment variables."
+        ) from exc
@@ -0,0 +1,221 @@
+"""
+Coalescing and compression for AG-UI `text/event-stream` responses.
+
+ADK agents stream one `TEXT_MESSAGE_CONTENT` event per model token. Relayed
+through a proxy such as the CopilotKit runtime, that is one tiny write per token
+and a lot of per-event framing. `SSEStreamingMiddleware` sits between the agent
+endpoints and the server:
+
+- Consecutive text deltas of the same message are merged into one event. A merged
+  event is written `coalesce_ms` after its first delta, once `coalesce_max_bytes`
+  of delta text are pending, or as soon as any other event arrives, whichever
+  comes first.
+- Every other event (run and message lifecycle, tool calls, state, errors) is
+  written immediately, after any pending text, so ordering is preserved.
+- Clients that send `Accept-Encoding: gzip` get a gzip stream. The stream is
+  flushed (`Z_SYNC_FLUSH`) after every write, so events are not held in the
+  compressor.
+
+Nothing is decoded. Text deltas are recognised by the fixed layout the AG-UI
+encoder emits and their escaped JSON strings are concatenated; any other frame,
+including a delta in an unexpected layout, is forwarded unchanged.
+"""
+
+import asyncio
+import logging
+import zlib
+from typing import List, Optional
+
+from starlette.datastructures import State
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .agent_routes import agent_slug_for_path
+from .metrics import SSE_BYTES, SSE_EVENTS, is_event_stream
+from .settings import StreamingSettings
+
+logger = logging.getLogger(__name__)
+
+_FRAME_END = b"\n\n"
+_DELTA_PREFIX = b'data: {"type":"TEXT_MESSAGE_CONTENT",'
+_DELTA_FIELD = b',"delta":"'
+_FRAME_TAIL = b'"}'
+_GZIP_WBITS = 16 + zlib.MAX_WBITS
+
+
+class SSEStreamingMiddleware:
+    """
+    ASGI middleware coalescing text deltas and gzip-compressing agent event streams.
+    """
+
+    def __init__(self, app: ASGIApp, *, settings: StreamingSettings, state: State) -> None:
+        self.app = app
+        self._settings = settings
+        self._state = state
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        settings = self._settings
+        compress = settings.compression and accepts_gzip(scope)
+        if not settings.coalesce_ms and not compress:
+            await self.app(scope, receive, send)
+            return
+        agent = agent_slug_for_path(self._state.agent_registry, scope["path"])
+        if agent is None:
+            await self.app(scope, receive, send)
+            return
+
+        stream: Optional[_EventStream] = None
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal stream
+            if message["type"] == "http.response.start":
+                if is_event_stream(message) and not _has_header(message, b"content-encoding"):
+                    stream = _EventStream(send, settings, agent, compress=compress)
+                    message = stream.start_message(message)
+                await send(message)
+            elif stream is not None and message["type"] == "http.response.body":
+                await stream.write(message.get("body", b""), message.get("more_body", False))
+            else:
+                await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if stream is not None:
+                stream.cancel_flush()
+
+
+class _EventStream:
+    """
+    One response's frame buffer, pending merged delta and compressor.
+    """
+
+    def __init__(self, send: Send, settings: StreamingSettings, agent: str, *, compress: bool) -> None:
+        self._send = send
+        self._window = settings.coalesce_ms / 1000
+        self._max_bytes = settings.coalesce_max_bytes
+        self._compressor = (
+            zlib.compressobj(settings.compression_level, zlib.DEFLATED, _GZIP_WBITS)
+            if compress
+            else None
+        )
+        self._events_in = SSE_EVENTS.labels(agent, "in")
+        self._events_out = SSE_EVENTS.labels(agent, "out")
+        self._bytes_raw = SSE_BYTES.labels(agent, "raw")
+        self._bytes_wire = SSE_BYTES.labels(agent, "wire")
+        self._buffer = b""
+        self._pending_head: Optional[bytes] = None
+        self._pending_parts: List[bytes] = []
+        self._pending_bytes = 0
+        self._flush_task: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+        self._closed = False
+
+    def start_message(self, message: Message) -> Message:
+        if self._compressor is None:
+            return message
+        headers = [
+            (name, value)
+            for name, value in message.get("headers", ())
+            if name.lower() != b"content-length"
+        ]
+        headers.append((b"content-encoding", b"gzip"))
+        headers.append((b"vary", b"Accept-Encoding"))
+        return {**message, "headers": headers}
+
+    async def write(self, body: bytes, more_body: bool) -> None:
+        async with self._lock:
+            *frames, self._buffer = (self._buffer + body).split(_FRAME_END)
+            out: List[bytes] = []
+            for frame in frames:
+                self._events_in.inc()
+                if self._window and frame.startswith(_DELTA_PREFIX):
+                    self._add_delta(frame, out)
+                else:
+                    self._take_pending(out)
+                    out.append(frame + _FRAME_END)
+            if not more_body:
+                self._take_pending(out)
+                if self._buffer:
+                    out.append(self._buffer)
+                    self._buffer = b""
+            await self._emit(out, more_body=more_body)
+            if self._pending_head is not None and self._flush_task is None:
+                self._flush_task = asyncio.create_task(self._flush_after_window())
+
+    def cancel_flush(self) -> None:
+        if self._flush_task is not None and self._flush_task is not asyncio.current_task():
+            self._flush_task.cancel()
+        self._flush_task = None
+
+    def _add_delta(self, frame: bytes, out: List[bytes]) -> None:
+        # `data: {"type":"TEXT_MESSAGE_CONTENT","messageId":"…","delta":"…"}`: the
+        # escaped deltas of one message can be joined without decoding them.
+        head, separator, delta = frame.rpartition(_DELTA_FIELD)
+        if not separator or not delta.endswith(_FRAME_TAIL):
+            self._take_pending(out)
+            out.append(frame + _FRAME_END)
+            return
+        if self._pending_head != head:
+            self._take_pending(out)
+            self._pending_head = head
+        self._pending_parts.append(delta[: -len(_FRAME_TAIL)])
+        self._pending_bytes += len(delta)
+        if self._pending_bytes >= self._max_bytes:
+            self._take_pending(out)
+
+    def _take_pending(self, out: List[bytes]) -> None:
+        if self._pending_head is None:
+            return
+        out.append(
+            b"".join((self._pending_head, _DELTA_FIELD, *self._pending_parts, _FRAME_TAIL, _FRAME_END))
+        )
+        self._pending_head = None
+        self._pending_parts = []
+        self._pending_bytes = 0
+        self.cancel_flush()
+
+    async def _flush_after_window(self) -> None:
+        await asyncio.sleep(self._window)
+        async with self._lock:
+            self._flush_task = None
+            out: List[bytes] = []
+            self._take_pending(out)
+            try:
+                await self._emit(out, more_body=True)
+            except Exception:
+                # The client went away; the response task notices on its next write.
+                logger.debug("Dropping coalesced event stream write", exc_info=True)
+
+    async def _emit(self, out: List[bytes], *, more_body: bool) -> None:
+        if self._closed or (not out and more_body):
+            return
+        data = b"".join(out)
+        self._events_out.inc(len(out))
+        self._bytes_raw.inc(len(data))
+        if self._compressor is not None:
+            data = self._compressor.compress(data) + self._compressor.flush(
+                zlib.Z_SYNC_FLUSH if more_body else zlib.Z_FINISH
+            )
+        self._bytes_wire.inc(len(data))
+        self._closed = not more_body
+        await self._send({"type": "http.response.body", "body": data, "more_body": more_body})
+
+
+def accepts_gzip(scope: Scope) -> bool:
+    for name, value in scope["headers"]:
+        if name == b"accept-encoding":
+            for item in value.decode("latin-1").lower().split(","):
+                coding, _, params = item.strip().partition(";")
+                if coding.strip() == "gzip":
+                    return params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000")
+    return False
+
+
+def _has_header(message: Message, key: bytes) -> bool:
+    return any(name.lower() == key for name, _ in message.get("headers", ()))
+
+
+__all__ = ["SSEStreamingMiddleware", "accepts_gzip"]
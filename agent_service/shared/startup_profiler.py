@@ -0,0 +1,169 @@
+"""
+Startup profiler recording where gateway boot time goes.
+
+Per agent it records the module import and `register_agent` time. Per dependency it
+records the cost of each top-level import in an agent module, measured by importing
+those modules one at a time before the agent module executes. A dependency is
+charged to the first agent that imports it; later agents find it in `sys.modules`.
+
+Print a report for the current configuration with:
+
+    python -m shared.startup_profiler [--lazy] [--json]
+"""
+
+import argparse
+import importlib
+import json
+import os
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional
+
+
+
+@dataclass
+class AgentStartupTiming:
+    slug: str
+    phases: Dict[str, float] = field(default_factory=dict)
+
+    @property
+    def total_ms(self) -> float:
+        return sum(self.phases.values())
+
+
+@dataclass(frozen=True)
+class DependencyImportTiming:
+    module: str
+    duration_ms: float
+    imported_by: str
+
+
+class StartupProfiler:
+    """
+    Collects per-agent phase timings and per-dependency import costs.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._agents: Dict[str, AgentStartupTiming] = {}
+        self._dependencies: List[DependencyImportTiming] = []
+
+    def record_agent_phase(self, slug: str, phase: str, duration_ms: float) -> None:
+        with self._lock:
+            timing = self._agents.setdefault(slug, AgentStartupTiming(slug=slug))
+            timing.phases[phase] = timing.phases.get(phase, 0.0) + duration_ms
+
+    def profile_dependencies(self, imported_by: str, modules: Iterable[str]) -> None:
+        """
+        Import each not-yet-loaded module and record how long it took.
+
+        Import errors are left for the agent module itself to raise.
+        """
+
+        for module_name in modules:
+            if module_name in sys.modules:
+                continue
+            started = time.perf_counter()
+            try:
+                importlib.import_module(module_name)
+            except Exception:
+                continue
+            duration_ms = (time.perf_counter() - started) * 1000
+            with self._lock:
+                self._dependencies.append(
+                    DependencyImportTiming(
+                        module=module_name,
+                        duration_ms=duration_ms,
+                        imported_by=imported_by,
+                    )
+                )
+
+    def as_dict(self) -> Dict[str, Any]:
+        agents = []
+        for timing in self._snapshot_agents():
+            entry: Dict[str, Any] = {"slug": timing.slug, "total_ms": round(timing.total_ms, 1)}
+            for phase, duration_ms in timing.phases.items():
+                entry[f"{phase}_ms"] = round(duration_ms, 1)
+            agents.append(entry)
+        dependencies = [
+            {
+                "module": timing.module,
+                "duration_ms": round(timing.duration_ms, 1),
+                "imported_by": timing.imported_by,
+            }
+            for timing in self._snapshot_dependencies()
+        ]
+        return {"agents": agents, "dependencies": dependencies}
+
+    def format_report(self) -> str:
+        """
+        Render the collected timings as a plain-text table.
+        """
+
+        lines = ["Agent startup:"]
+        agents = self._snapshot_agents()
+        if not agents:
+            lines.append("  (no agents loaded)")
+        for timing in agents:
+            phases = ", ".join(
+                f"{phase}={duration_ms:.1f} ms" for phase, duration_ms in timing.phases.items()
+            )
+            lines.append(f"  {timing.slug:<32} {timing.total_ms:>9.1f} ms  ({phases})")
+
+        lines.append("Dependency imports:")
+        dependencies = self._snapshot_dependencies()
+        if not dependencies:
+            lines.append("  (none recorded)")
+        for timing in dependencies:
+            lines.append(
+                f"  {timing.module:<40} {timing.duration_ms:>9.1f} ms"
+                f"  (first imported by {timing.imported_by})"
+            )
+        return "\n".join(lines)
+
+    def _snapshot_agents(self) -> List[AgentStartupTiming]:
+        with self._lock:
+            return [
+                AgentStartupTiming(slug=timing.slug, phases=dict(timing.phases))
+                for timing in self._agents.values()
+            ]
+
+    def _snapshot_dependencies(self) -> List[DependencyImportTiming]:
+        with self._lock:
+            return sorted(self._dependencies, key=lambda item: item.duration_ms, reverse=True)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Profile gateway startup.")
+    parser.add_argument("--lazy", action="store_true", help="Profile lazy agent loading.")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON.")
+    args = parser.parse_args(argv)
+
+    os.environ["AGENT_STARTUP_PROFILE"] = "true"
+    if args.lazy:
+        os.environ["AGENT_LAZY_LOADING"] = "true"
+
+    gateway = importlib.import_module("app").app
+    profiler: StartupProfiler = gateway.state.startup_profiler
+    if args.json:
+        print(
+            json.dumps(
+                {"startup": gateway.state.startup_report, **profiler.as_dict()},
+                indent=2,
+            )
+        )
+    else:
+        print(profiler.format_report())
+
+
+__all__ = [
+    "AgentStartupTiming",
+    "DependencyImportTiming",
+    "StartupProfiler",
+]
+
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,8 @@ import json
 import logging
 from typing import Any, Dict, Optional, Union
 
+from . import tracing
+
 logger = logging.getLogger(__name__)
 
 
@@ -101,7 +103,8 @@ def normalize_mcp_tool_response_payload(
     Returns a dict or string to override the raw tool response if normalization
     succeeds; otherwise returns None to keep the original response unchanged.
     """
-    payload = extract_structured_payload(tool_response)
+    with tracing.span("tool.normalize_response", {"tool.name": getattr(tool, "name", "")}):
+        payload = extract_structured_payload(tool_response)
     return payload
 
 
@@ -0,0 +1,184 @@
+"""
+Per-turn selection of the tools declared to the model.
+
+A Composio MCP config can expose hundreds of tools, and every declaration goes
+into every model request. `ToolIndex` indexes the tools of one config by name and
+description. `ToolIndex.search` ranks them against the turn's user message with
+BM25. When an embedder is configured (`AGENT_TOOL_SELECTION_EMBEDDER`, a
+`module:function` that takes a list of texts and returns one vector per text),
+the lexical and embedding rankings are merged with reciprocal rank fusion.
+
+`shared.composio_mcp` declares only the top-ranked tools of each config, plus a
+search tool the model can call to find and enable the others.
+`declaration_tokens` estimates the prompt tokens one declaration costs, so the
+saving can be measured.
+"""
+
+import importlib
+import json
+import math
+import re
+from collections import Counter
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Callable, Collection, Dict, List, Optional, Sequence
+
+Embedder = Callable[[List[str]], Sequence[Sequence[float]]]
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset(
+    "a an and are as at be by can for from have i in is it me my of on or please "
+    "the this to we what with you your".split()
+)
+# Name tokens count this many times, since names are short and precise.
+_NAME_WEIGHT = 3
+_BM25_K1 = 1.2
+_BM25_B = 0.75
+_RRF_K = 60
+
+
+@dataclass(frozen=True)
+class ToolDocument:
+    """
+    What the index knows about one tool.
+    """
+
+    name: str
+    description: str
+
+
+class ToolIndex:
+    """
+    Lexical (and optionally embedding) index over the tools of one MCP config.
+    """
+
+    def __init__(self, documents: Sequence[ToolDocument], *, embedder: Optional[Embedder] = None) -> None:
+        self.names = [document.name for document in documents]
+        self.embedder = embedder
+        self._term_counts = [
+            Counter(tokenize(document.name) * _NAME_WEIGHT + tokenize(document.description))
+            for document in documents
+        ]
+        self._lengths = [sum(counts.values()) for counts in self._term_counts]
+        self._average_length = sum(self._lengths) / len(self._lengths) if documents else 0.0
+        document_frequency: Counter = Counter()
+        for counts in self._term_counts:
+            document_frequency.update(counts.keys())
+        total = len(documents)
+        self._idf = {
+            term: math.log(1 + (total - frequency + 0.5) / (frequency + 0.5))
+            for term, frequency in document_frequency.items()
+        }
+        self._vectors: Optional[List[List[float]]] = None
+        if embedder is not None and documents:
+            texts = [f"{document.name}: {document.description}" for document in documents]
+            self._vectors = [_normalize(vector) for vector in embedder(texts)]
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def search(
+        self, query: str, limit: int, *, candidates: Optional[Collection[str]] = None
+    ) -> List[str]:
+        """
+        Names of up to `limit` tools matching `query`, best first.
+
+        Only tools in `candidates` are considered when it is given. Tools that
+        share no term with the query are left out unless an embedder ranks them.
+        """
+
+        allowed = [
+            position
+            for position, name in enumerate(self.names)
+            if candidates is None or name in candidates
+        ]
+        lexical = self._lexical_ranking(query, allowed)
+        if self._vectors is None or self.embedder is None:
+            return [self.names[position] for position in lexical[:limit]]
+        semantic = self._semantic_ranking(query, allowed)
+        fused: Dict[int, float] = {}
+        for ranking in (lexical, semantic):
+            for rank, position in enumerate(ranking):
+                fused[position] = fused.get(position, 0.0) + 1 / (_RRF_K + rank + 1)
+        ranked = sorted(fused, key=lambda position: (-fused[position], position))
+        return [self.names[position] for position in ranked[:limit]]
+
+    def _lexical_ranking(self, query: str, allowed: List[int]) -> List[int]:
+        terms = set(tokenize(query))
+        scores = []
+        for position in allowed:
+            counts = self._term_counts[position]
+            norm = _BM25_K1 * (1 - _BM25_B + _BM25_B * self._lengths[position] / (self._average_length or 1))
+            score = 0.0
+            for term in terms:
+                frequency = counts.get(term)
+                if frequency:
+                    score += self._idf[term] * frequency * (_BM25_K1 + 1) / (frequency + norm)
+            if score > 0:
+                scores.append((score, position))
+        scores.sort(key=lambda item: (-item[0], item[1]))
+        return [position for _, position in scores]
+
+    def _semantic_ranking(self, query: str, allowed: List[int]) -> List[int]:
+        assert self._vectors is not None and self.embedder is not None
+        query_vector = _normalize(self.embedder([query])[0])
+        scores = [
+            (sum(a * b for a, b in zip(query_vector, self._vectors[position])), position)
+            for position in allowed
+        ]
+        scores.sort(key=lambda item: (-item[0], item[1]))
+        return [position for _, position in scores]
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lower-cased word tokens without stopwords, with a plural `s` stripped.
+    """
+
+    tokens = []
+    for token in _TOKEN.findall(text.lower()):
+        if token in _STOPWORDS:
+            continue
+        if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+def declaration_tokens(name: str, description: Optional[str], schema: Any) -> int:
+    """
+    Rough prompt tokens of one tool declaration (four characters per token).
+    """
+
+    size = len(name) + len(description or "") + len(json.dumps(schema or {}, separators=(",", ":")))
+    return max(1, size // 4)
+
+
+@lru_cache(maxsize=None)
+def load_embedder(path: str) -> Embedder:
+    """
+    Import the `module:function` embedder named by `AGENT_TOOL_SELECTION_EMBEDDER`.
+    """
+
+    module_name, _, attribute = path.partition(":")
+    if not module_name or not attribute:
+        raise RuntimeError(f"Tool selection embedder '{path}' must look like 'module:function'.")
+    embedder = getattr(importlib.import_module(module_name), attribute)
+    if not callable(embedder):
+        raise RuntimeError(f"Tool selection embedder '{path}' is not callable.")
+    return embedder
+
+
+def _normalize(vector: Sequence[float]) -> List[float]:
+    norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+    return [value / norm for value in vector]
+
+
+__all__ = [
+    "Embedder",
+    "ToolDocument",
+    "ToolIndex",
+    "declaration_tokens",
+    "load_embedder",
+    "tokenize",
+]
@@ -0,0 +1,222 @@
+"""
+Opt-in OpenTelemetry tracing.
+
+When enabled (`AGENT_TRACING_ENABLED`), every request gets a server span. It is
+the parent of the auth checks, Composio provisioning and cleanup, MCP session
+setup, tool-response normalization, and the spans ADK emits for each invocation,
+model request (`call_llm`) and tool call (`execute_tool`). An incoming W3C
+`traceparent` header (e.g. from the AG-UI client) becomes the parent.
+
+When disabled, nothing from OpenTelemetry is imported and `span()` is a no-op.
+"""
+
+import base64
+import hashlib
+import json
+import logging
+import os
+import threading
+from contextlib import nullcontext
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, ContextManager, Iterable, Mapping, Optional
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .settings import TracingSettings
+
+logger = logging.getLogger(__name__)
+
+_tracer = None
+_provider = None
+_request_span: ContextVar[Optional[Any]] = ContextVar("agent_request_span", default=None)
+
+_ID_FIELDS = ("traceId", "spanId", "parentSpanId")
+
+
+def configure_tracing(settings: TracingSettings) -> bool:
+    """
+    Install the global tracer provider and exporter. Returns whether tracing is on.
+    """
+
+    global _tracer, _provider
+    if not settings.enabled:
+        return False
+    if _tracer is not None:
+        return True
+
+    from opentelemetry import trace
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor
+    from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+
+    resource = Resource.create(
+        {"service.name": os.getenv("OTEL_SERVICE_NAME") or "agent-gateway"}
+    )
+    _provider = TracerProvider(
+        resource=resource,
+        sampler=ParentBased(TraceIdRatioBased(settings.sample_ratio)),
+    )
+    _provider.add_span_processor(BatchSpanProcessor(_build_exporter(settings)))
+    trace.set_tracer_provider(_provider)
+    _tracer = trace.get_tracer("agent_gateway")
+    logger.info(
+        "OpenTelemetry tracing enabled (exporter=%s, sample ratio=%s)",
+        settings.exporter,
+        settings.sample_ratio,
+    )
+    return True
+
+
+def shutdown_tracing() -> None:
+    """
+    Flush pending spans and stop the exporter.
+    """
+
+    if _provider is not None:
+        _provider.shutdown()
+
+
+def tracing_enabled() -> bool:
+    return _tracer is not None
+
+
+def span(name: str, attributes: Optional[Mapping[str, Any]] = None) -> ContextManager[Any]:
+    """
+    Child span of the current span, or a no-op context when tracing is disabled.
+    """
+
+    if _tracer is None:
+        return nullcontext()
+    return _tracer.start_as_current_span(name, attributes=attributes)
+
+
+def set_request_attributes(attributes: Mapping[str, Any]) -> None:
+    """
+    Add attributes to the current request's server span, from anywhere in the request.
+    """
+
+    request_span = _request_span.get()
+    if request_span is not None:
+        request_span.set_attributes(attributes)
+
+
+def hash_user_id(user_id: str) -> str:
+    """
+    Stable pseudonymous identifier used instead of raw user ids in span attributes.
+    """
+
+    return hashlib.sha256(user_id.encode("utf-8")).hexdigest()[:16]
+
+
+class RequestTracingMiddleware:
+    """
+    ASGI middleware opening the server span for each request.
+
+    The span stays open until the response, including any SSE stream, has been
+    fully sent. Install it outermost so authentication runs inside it.
+    """
+
+    def __init__(self, app: ASGIApp, *, exclude_paths: Iterable[str] = ()) -> None:
+        from opentelemetry import propagate, trace
+
+        self.app = app
+        self._exclude_paths = set(exclude_paths)
+        self._propagate = propagate
+        self._trace = trace
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if _tracer is None or scope["type"] != "http" or scope["path"] in self._exclude_paths:
+            await self.app(scope, receive, send)
+            return
+
+        carrier = {
+            name.decode("latin-1"): value.decode("latin-1") for name, value in scope["headers"]
+        }
+        method = scope["method"]
+        request_span = _tracer.start_span(
+            f"{method} {scope['path']}",
+            context=self._propagate.extract(carrier),
+            kind=self._trace.SpanKind.SERVER,
+            attributes={"http.request.method": method, "url.path": scope["path"]},
+        )
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                request_span.set_attribute("http.response.status_code", message["status"])
+            await send(message)
+
+        token = _request_span.set(request_span)
+        try:
+            with self._trace.use_span(request_span, end_on_exit=True):
+                await self.app(scope, receive, send_wrapper)
+        finally:
+            _request_span.reset(token)
+
+
+def _build_exporter(settings: TracingSettings):
+    if settings.exporter == "otlp":
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+
+        return OTLPSpanExporter()
+    if settings.exporter == "file":
+        return _otlp_json_file_exporter(Path(settings.file_path))
+
+    from opentelemetry.sdk.trace.export import ConsoleSpanExporter
+
+    return ConsoleSpanExporter()
+
+
+def _otlp_json_file_exporter(path: Path):
+    """
+    Exporter appending one OTLP/JSON `ExportTraceServiceRequest` per line, the format
+    read by the OpenTelemetry Collector's `otlpjsonfile` receiver.
+    """
+
+    from google.protobuf.json_format import MessageToDict
+    from opentelemetry.exporter.otlp.proto.common.trace_encoder import encode_spans
+    from opentelemetry.sdk.trace.export import SpanExporter, SpanExportResult
+
+    class OtlpJsonFileSpanExporter(SpanExporter):
+        def __init__(self) -> None:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            self._lock = threading.Lock()
+
+        def export(self, spans) -> "SpanExportResult":
+            payload = MessageToDict(encode_spans(spans))
+            _hex_ids(payload)
+            line = json.dumps(payload, separators=(",", ":")) + "\n"
+            try:
+                with self._lock, path.open("a", encoding="utf-8") as handle:
+                    handle.write(line)
+            except OSError:
+                logger.exception("Failed to write spans to %s", path)
+                return SpanExportResult.FAILURE
+            return SpanExportResult.SUCCESS
+
+    return OtlpJsonFileSpanExporter()
+
+
+def _hex_ids(value: Any) -> None:
+    # OTLP/JSON encodes trace and span ids as hex, not protobuf's default base64.
+    if isinstance(value, dict):
+        for key, item in value.items():
+            if key in _ID_FIELDS and isinstance(item, str):
+                value[key] = base64.b64decode(item).hex()
+            else:
+                _hex_ids(item)
+    elif isinstance(value, list):
+        for item in value:
+            _hex_ids(item)
+
+
+__all__ = [
+    "RequestTracingMiddleware",
+    "configure_tracing",
+    "hash_user_id",
+    "set_request_attributes",
+    "shutdown_tracing",
+    "span",
+    "tracing_enabled",
+]
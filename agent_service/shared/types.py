@@ -1,5 +1,6 @@
 from dataclasses import dataclass
-from typing import Callable
+from pathlib import Path
+from typing import Callable, Optional
 
 from fastapi import FastAPI
 
@@ -15,8 +16,33 @@ class AgentDescriptor:
         slug: URL-safe identifier used to construct the mount path.
         registrar: Callable responsible for attaching routes to the FastAPI app.
         display_name: Human friendly name for observability/logging purposes.
+        module_path: Location of the module the descriptor was built from, if known.
+        package: Package name the module was executed under, if known.
     """
 
     slug: str
     registrar: AgentRegistrar
     display_name: str
+    module_path: Optional[Path] = None
+    package: Optional[str] = None
+
+
+@dataclass(frozen=True)
+class AgentMetadata:
+    """
+    Cheap, import-free metadata describing an agent module on disk.
+
+    Attributes:
+        slug: URL-safe identifier used to construct the mount path.
+        display_name: Human friendly name for observability/logging purposes.
+        module_path: Location of the agent's `agent.py` module.
+        package: Package name the module is executed under (e.g. `agents.foo`).
+        descriptor: Populated when the module could not be described statically and
+            had to be executed during discovery.
+    """
+
+    slug: str
+    display_name: str
+    module_path: Path
+    package: str
+    descriptor: Optional[AgentDescriptor] = None
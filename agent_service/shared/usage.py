@@ -0,0 +1,491 @@
+"""
+Per-user, per-agent token usage ledger with quotas.
+
+Every model call made through `resolve_adk_model` reports its prompt and
+completion tokens (see `shared.usage_llm`), keyed by the Supabase user id and the
+slug of the agent being run. `UsageLedger` appends them to SQLite:
+
+- `usage_calls` has one row per model call and is kept for `retention_days`.
+- `usage_hourly` holds hourly totals per user, agent and model. It is updated in the
+  same transaction, so summaries and quota checks read a few rows per hour
+  instead of scanning calls. Rollups are kept for about a year.
+
+Calls are buffered in memory and written in one transaction every
+`flush_interval_seconds`. Quota checks add the worker's unflushed usage, and the
+database is shared by the workers of one host.
+
+`UsageQuotaMiddleware` checks the caller's tokens over the last `window_hours`
+before an agent run starts. Above `hard_quota` the run is refused with `429` and
+`reason: hard_quota`. Above `soft_quota` it is served with an
+`X-Token-Quota: soft` header. Background jobs are checked when they are submitted
+and again when they start.
+
+`GET /usage` returns the caller's usage and quota state. `GET /admin/usage` lists
+the heaviest users, agents or models.
+"""
+
+import asyncio
+import logging
+import math
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from contextlib import asynccontextmanager, contextmanager, suppress
+from contextvars import ContextVar
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
+
+from fastapi import APIRouter, FastAPI, HTTPException, Request, status
+from fastapi.responses import JSONResponse
+from starlette.datastructures import State
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .admission import ANONYMOUS_USER
+from .agent_routes import agent_slug_for_path
+from .auth import get_supabase_user_id
+from .metrics import LLM_TOKENS, USAGE_QUOTA_EXCEEDED
+from .settings import UsageSettings
+
+logger = logging.getLogger(__name__)
+
+QUOTA_HEADER = "X-Token-Quota"
+
+_HOUR = 3600
+_ROLLUP_RETENTION_DAYS = 400
+_PURGE_INTERVAL_SECONDS = 3600.0
+_GROUP_COLUMNS = {"user": "user_id", "agent": "agent", "model": "model"}
+
+# (user id, agent slug) of the run in progress, set around each agent run.
+_usage_scope: ContextVar[Optional[Tuple[str, str]]] = ContextVar("agent_usage_scope", default=None)
+# The ledger of this worker, set while its lifespan hook runs.
+_active_ledger: Optional["UsageLedger"] = None
+
+
+@dataclass(frozen=True)
+class QuotaDecision:
+    """
+    Where a user stands against the token quotas before a run.
+    """
+
+    level: str
+    used: int
+    soft_quota: Optional[int]
+    hard_quota: Optional[int]
+    retry_after: int
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "level": self.level,
+            "used": self.used,
+            "soft_quota": self.soft_quota,
+            "hard_quota": self.hard_quota,
+        }
+
+
+class UsageLedger:
+    """
+    Append-only SQLite token ledger with hourly rollups. Queries run on a worker thread.
+    """
+
+    def __init__(self, settings: UsageSettings, *, busy_timeout: float = 5.0) -> None:
+        self.settings = settings
+        self._path = Path(settings.sqlite_path)
+        self._busy_timeout = busy_timeout
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._pending: List[Tuple[float, str, str, str, int, int]] = []
+        self._pending_tokens: Dict[Tuple[str, str], int] = defaultdict(int)
+
+    @property
+    def _connection(self) -> sqlite3.Connection:
+        # Opened on first use (under `_lock`), after workers have been forked.
+        if self._db is None:
+            self._db = self._connect()
+        return self._db
+
+    def _connect(self) -> sqlite3.Connection:
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        connection = sqlite3.connect(
+            str(self._path),
+            timeout=self._busy_timeout,
+            check_same_thread=False,
+            isolation_level=None,
+        )
+        connection.row_factory = sqlite3.Row
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS usage_calls (
+                at REAL NOT NULL,
+                user_id TEXT NOT NULL,
+                agent TEXT NOT NULL,
+                model TEXT NOT NULL,
+                prompt_tokens INTEGER NOT NULL,
+                completion_tokens INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS usage_calls_by_time ON usage_calls (at);
+            CREATE TABLE IF NOT EXISTS usage_hourly (
+                user_id TEXT NOT NULL,
+                hour INTEGER NOT NULL,
+                agent TEXT NOT NULL,
+                model TEXT NOT NULL,
+                calls INTEGER NOT NULL,
+                prompt_tokens INTEGER NOT NULL,
+                completion_tokens INTEGER NOT NULL,
+                PRIMARY KEY (user_id, hour, agent, model)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS usage_hourly_by_hour ON usage_hourly (hour);
+            """
+        )
+        return connection
+
+    def record(
+        self, user_id: str, agent: str, model: str, prompt_tokens: int, completion_tokens: int
+    ) -> None:
+        """
+        Buffer one model call; written by the next flush.
+        """
+
+        self._pending.append((time.time(), user_id, agent, model, prompt_tokens, completion_tokens))
+        self._pending_tokens[(user_id, agent)] += prompt_tokens + completion_tokens
+
+    async def flush(self) -> int:
+        """
+        Write buffered calls and their rollups in one transaction; returns the count.
+        """
+
+        if not self._pending:
+            return 0
+        calls, self._pending = self._pending, []
+        pending_tokens, self._pending_tokens = self._pending_tokens, defaultdict(int)
+        hourly: Dict[Tuple[str, int, str, str], List[int]] = defaultdict(lambda: [0, 0, 0])
+        for at, user_id, agent, model, prompt_tokens, completion_tokens in calls:
+            totals = hourly[(user_id, int(at // _HOUR), agent, model)]
+            totals[0] += 1
+            totals[1] += prompt_tokens
+            totals[2] += completion_tokens
+
+        def _write() -> None:
+            connection = self._connection
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                connection.executemany(
+                    "INSERT INTO usage_calls (at, user_id, agent, model, prompt_tokens,"
+                    " completion_tokens) VALUES (?, ?, ?, ?, ?, ?)",
+                    calls,
+                )
+                connection.executemany(
+                    "INSERT INTO usage_hourly (user_id, hour, agent, model, calls, prompt_tokens,"
+                    " completion_tokens) VALUES (?, ?, ?, ?, ?, ?, ?)"
+                    " ON CONFLICT (user_id, hour, agent, model) DO UPDATE SET"
+                    " calls = calls + excluded.calls,"
+                    " prompt_tokens = prompt_tokens + excluded.prompt_tokens,"
+                    " completion_tokens = completion_tokens + excluded.completion_tokens",
+                    [(*key, *totals) for key, totals in hourly.items()],
+                )
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+
+        try:
+            await self._run(_write)
+        except Exception:
+            # Keep the calls for the next flush rather than losing them.
+            self._pending[:0] = calls
+            for key, tokens in pending_tokens.items():
+                self._pending_tokens[key] += tokens
+            raise
+        return len(calls)
+
+    async def check(self, user_id: str, agent: str) -> QuotaDecision:
+        """
+        The user's tokens in the current window against the soft and hard quotas.
+        """
+
+        settings = self.settings
+        if settings.soft_quota is None and settings.hard_quota is None:
+            return QuotaDecision("ok", 0, None, None, 0)
+        scoped_agent = agent if settings.quota_scope == "agent" else None
+        used = await self._window_tokens(user_id, scoped_agent)
+        used += sum(
+            tokens
+            for (pending_user, pending_agent), tokens in list(self._pending_tokens.items())
+            if pending_user == user_id and scoped_agent in (None, pending_agent)
+        )
+        level = "ok"
+        if settings.hard_quota is not None and used >= settings.hard_quota:
+            level = "hard"
+        elif settings.soft_quota is not None and used >= settings.soft_quota:
+            level = "soft"
+        # The oldest hour of the window drops out at the next hour boundary.
+        retry_after = max(1, math.ceil(_HOUR - time.time() % _HOUR))
+        return QuotaDecision(level, used, settings.soft_quota, settings.hard_quota, retry_after)
+
+    async def summary(self, user_id: str, hours: int) -> Dict[str, Any]:
+        """
+        The user's usage per agent and model over the last `hours`.
+        """
+
+        since = _window_start(hours)
+
+        def _query() -> List[Dict[str, Any]]:
+            rows = self._connection.execute(
+                "SELECT agent, model, SUM(calls) AS calls, SUM(prompt_tokens) AS prompt_tokens,"
+                " SUM(completion_tokens) AS completion_tokens FROM usage_hourly"
+                " WHERE user_id = ? AND hour >= ? GROUP BY agent, model"
+                " ORDER BY SUM(prompt_tokens + completion_tokens) DESC",
+                (user_id, since),
+            ).fetchall()
+            return [dict(row) for row in rows]
+
+        rows = await self._run(_query)
+        return {
+            "user_id": user_id,
+            "hours": hours,
+            "prompt_tokens": sum(row["prompt_tokens"] for row in rows),
+            "completion_tokens": sum(row["completion_tokens"] for row in rows),
+            "usage": rows,
+        }
+
+    async def top(self, group_by: str, hours: int, limit: int) -> List[Dict[str, Any]]:
+        """
+        The heaviest users, agents or models over the last `hours`.
+        """
+
+        column = _GROUP_COLUMNS[group_by]
+        since = _window_start(hours)
+
+        def _query() -> List[Dict[str, Any]]:
+            rows = self._connection.execute(
+                f"SELECT {column} AS {group_by}, SUM(calls) AS calls,"
+                " SUM(prompt_tokens) AS prompt_tokens, SUM(completion_tokens) AS completion_tokens"
+                f" FROM usage_hourly WHERE hour >= ? GROUP BY {column}"
+                " ORDER BY SUM(prompt_tokens + completion_tokens) DESC LIMIT ?",
+                (since, limit),
+            ).fetchall()
+            return [dict(row) for row in rows]
+
+        return await self._run(_query)
+
+    async def purge(self, now: Optional[float] = None) -> int:
+        now = time.time() if now is None else now
+        calls_before = now - self.settings.retention_days * 86400
+        hours_before = int((now - _ROLLUP_RETENTION_DAYS * 86400) // _HOUR)
+
+        def _purge() -> int:
+            removed = self._connection.execute(
+                "DELETE FROM usage_calls WHERE at < ?", (calls_before,)
+            ).rowcount
+            self._connection.execute("DELETE FROM usage_hourly WHERE hour < ?", (hours_before,))
+            return removed
+
+        return await self._run(_purge)
+
+    @asynccontextmanager
+    async def running(self, app: FastAPI) -> AsyncIterator[None]:
+        """
+        Lifespan hook flushing the ledger periodically and on shutdown.
+        """
+
+        global _active_ledger
+        _active_ledger = self
+        tasks = [
+            asyncio.create_task(self._flush_periodically()),
+            asyncio.create_task(self._purge_periodically()),
+        ]
+        try:
+            yield
+        finally:
+            _active_ledger = None
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Could not write token usage on shutdown")
+            self.close()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    async def _window_tokens(self, user_id: str, agent: Optional[str]) -> int:
+        since = _window_start(self.settings.window_hours)
+
+        def _query() -> int:
+            sql = (
+                "SELECT COALESCE(SUM(prompt_tokens + completion_tokens), 0) FROM usage_hourly"
+                " WHERE user_id = ? AND hour >= ?"
+            )
+            params: Tuple[Any, ...] = (user_id, since)
+            if agent is not None:
+                sql += " AND agent = ?"
+                params += (agent,)
+            return int(self._connection.execute(sql, params).fetchone()[0])
+
+        return await self._run(_query)
+
+    async def _flush_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self.settings.flush_interval_seconds)
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Could not write token usage")
+
+    async def _purge_periodically(self) -> None:
+        while True:
+            try:
+                removed = await self.purge()
+                if removed:
+                    logger.info("Purged %d token usage row(s)", removed)
+            except Exception:
+                logger.exception("Could not purge token usage")
+            await asyncio.sleep(_PURGE_INTERVAL_SECONDS)
+
+    async def _run(self, operation):
+        def _locked():
+            with self._lock:
+                return operation()
+
+        return await asyncio.to_thread(_locked)
+
+
+@contextmanager
+def usage_scope(user_id: str, agent: str) -> Iterator[None]:
+    """
+    Attribute model calls made inside the block to `user_id` and `agent`.
+    """
+
+    token = _usage_scope.set((user_id, agent))
+    try:
+        yield
+    finally:
+        _usage_scope.reset(token)
+
+
+def record_model_usage(model: str, prompt_tokens: int, completion_tokens: int) -> None:
+    """
+    Record the tokens of one model call against the current run, if any.
+
+    Calls made outside an agent run (such as the warm-up ping) are not recorded.
+    """
+
+    scope = _usage_scope.get()
+    if scope is None:
+        return
+    user_id, agent = scope
+    LLM_TOKENS.labels(agent, model, "prompt").inc(prompt_tokens)
+    LLM_TOKENS.labels(agent, model, "completion").inc(completion_tokens)
+    ledger = _active_ledger
+    if ledger is not None:
+        ledger.record(user_id, agent, model, prompt_tokens, completion_tokens)
+
+
+def quota_exceeded_response(decision: QuotaDecision) -> JSONResponse:
+    return JSONResponse(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        content={"detail": "Token quota exceeded", "reason": "hard_quota", **decision.describe()},
+        headers={"Retry-After": str(decision.retry_after), QUOTA_HEADER: "hard"},
+    )
+
+
+class UsageQuotaMiddleware:
+    """
+    ASGI middleware checking token quotas before agent runs and attributing their usage.
+
+    Must run inside `SupabaseAuthMiddleware` so the caller's user id is known.
+    """
+
+    def __init__(self, app: ASGIApp, *, ledger: UsageLedger, state: State) -> None:
+        self.app = app
+        self._ledger = ledger
+        self._state = state
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] != "POST":
+            await self.app(scope, receive, send)
+            return
+        agent = agent_slug_for_path(self._state.agent_registry, scope["path"])
+        if agent is None:
+            await self.app(scope, receive, send)
+            return
+
+        user_id = get_supabase_user_id() or ANONYMOUS_USER
+        decision = await self._ledger.check(user_id, agent)
+        if decision.level == "hard":
+            USAGE_QUOTA_EXCEEDED.labels(agent, "hard").inc()
+            logger.warning(
+                "Refused run for agent '%s' (user %s): %d tokens in the last %d h",
+                agent,
+                user_id,
+                decision.used,
+                self._ledger.settings.window_hours,
+            )
+            await quota_exceeded_response(decision)(scope, receive, send)
+            return
+
+        async def _soft_quota_send(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", ()))
+                headers.append((QUOTA_HEADER.lower().encode("latin-1"), b"soft"))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        if decision.level == "soft":
+            USAGE_QUOTA_EXCEEDED.labels(agent, "soft").inc()
+        send_wrapper = _soft_quota_send if decision.level == "soft" else send
+        with usage_scope(user_id, agent):
+            await self.app(scope, receive, send_wrapper)
+
+
+def _window_start(hours: int) -> int:
+    # The current hour counts as the newest of the window's hours.
+    return int(time.time() // _HOUR) - hours + 1
+
+
+usage_router = APIRouter(tags=["usage"])
+
+
+@usage_router.get("/usage")
+async def my_usage(request: Request, hours: Optional[int] = None):
+    """
+    The caller's token usage per agent and model, and where they stand against the quotas.
+    """
+
+    user_id = get_supabase_user_id()
+    if not user_id:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Authentication required")
+    ledger: UsageLedger = request.app.state.usage
+    hours = min(max(hours or ledger.settings.window_hours, 1), 24 * 31)
+    with suppress(Exception):
+        await ledger.flush()
+    summary = await ledger.summary(user_id, hours)
+    if ledger.settings.quota_scope == "agent":
+        agents = sorted({row["agent"] for row in summary["usage"]})
+        summary["quota"] = {
+            agent: (await ledger.check(user_id, agent)).describe() for agent in agents
+        }
+    else:
+        summary["quota"] = (await ledger.check(user_id, "")).describe()
+    summary["quota_window_hours"] = ledger.settings.window_hours
+    return summary
+
+
+__all__ = [
+    "QUOTA_HEADER",
+    "QuotaDecision",
+    "UsageLedger",
+    "UsageQuotaMiddleware",
+    "quota_exceeded_response",
+    "record_model_usage",
+    "usage_router",
+    "usage_scope",
+]
@@ -0,0 +1,56 @@
+"""
+Model wrapper reporting the token usage of every call to `shared.usage`.
+
+Kept apart from `shared.usage` so the gateway can start without loading ADK.
+"""
+
+from typing import Any, AsyncGenerator, Optional
+
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+
+from .usage import record_model_usage
+
+
+class UsageRecordingLlm(BaseLlm):
+    """
+    Model that passes calls to the wrapped model and records their token usage.
+    """
+
+    inner: Optional[BaseLlm] = None
+
+    async def generate_content_async(
+        self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        usage = None
+        try:
+            async for response in self.inner.generate_content_async(llm_request, stream=stream):
+                # Streaming providers report usage on the last chunk, some cumulatively.
+                if response.usage_metadata is not None:
+                    usage = response.usage_metadata
+                yield response
+        finally:
+            # Also on errors and cancellation: the provider counted the tokens anyway.
+            if usage is not None:
+                record_model_usage(
+                    self.model,
+                    usage.prompt_token_count or 0,
+                    (usage.candidates_token_count or 0) + (usage.thoughts_token_count or 0),
+                )
+
+
+def wrap_model(model: Any) -> UsageRecordingLlm:
+    """
+    Wrap a resolved ADK model (instance or Gemini model name) to record its usage.
+    """
+
+    if isinstance(model, BaseLlm):
+        return UsageRecordingLlm(model=model.model, inner=model)
+
+    from google.adk.models.registry import LLMRegistry
+
+    return UsageRecordingLlm(model=model, inner=LLMRegistry.new_llm(model))
+
+
+__all__ = ["UsageRecordingLlm", "wrap_model"]
@@ -0,0 +1,219 @@
+"""
+Startup warm-up that gates the `/readyz` readiness endpoint.
+
+`/healthz` answers as soon as the worker accepts connections. `/readyz` answers
+503 until the warm-up below has run, so a load balancer only routes users to
+workers with imported agents and open connections:
+
+- `agents`: load lazily mounted agents (module imports, ADK and LiteLLM).
+- `sessions`: create the session service.
+- `supabase`: open a pooled connection to Supabase Auth on the shared HTTP client.
+- `llm`: with `llm_ping`, send a one-token request through each model instance
+  the agents share (LiteLLM, or a wrapped Gemini model), which opens LiteLLM's
+  shared client and the DNS/TLS connection pool. Agents configured with a plain
+  Gemini model name get a new client on every call, so nothing is warmed there.
+- `composio`: list and cache the MCP tool schemas of each Composio config.
+
+The first three run concurrently, then the last two (they need loaded agents).
+A failed step is logged and the worker reports ready in degraded mode, with the
+steps that did not finish listed under `failed_steps`. So does a worker still
+warming up at `deadline_seconds`; its unfinished steps are cancelled.
+"""
+
+import asyncio
+import importlib
+import logging
+import sys
+import time
+from contextlib import asynccontextmanager, suppress
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional
+
+from fastapi import FastAPI
+
+from .lazy_agents import LazyAgentRoute
+from .settings import WarmupSettings, load_cassette_settings
+
+logger = logging.getLogger(__name__)
+
+_PING_TEXT = "Reply with OK."
+
+
+class StartupWarmup:
+    """
+    Per-worker warm-up state reported by `/readyz`.
+    """
+
+    def __init__(self, settings: WarmupSettings) -> None:
+        self._settings = settings
+        self.status = "warming" if settings.enabled else "ready"
+        self._started: Optional[float] = None
+        self._elapsed_ms: Optional[float] = None
+        self._steps: Dict[str, Dict[str, Any]] = {}
+
+    @property
+    def ready(self) -> bool:
+        return self.status in ("ready", "degraded")
+
+    def report(self) -> Dict[str, Any]:
+        elapsed_ms = self._elapsed_ms
+        if elapsed_ms is None and self._started is not None:
+            elapsed_ms = round((time.perf_counter() - self._started) * 1000, 1)
+        return {
+            "status": self.status,
+            "elapsed_ms": elapsed_ms,
+            "deadline_seconds": self._settings.deadline_seconds,
+            "steps": self._steps,
+            "failed_steps": [
+                name
+                for name, result in self._steps.items()
+                if result["status"] not in ("ok", "running")
+            ],
+        }
+
+    async def run(self, app: FastAPI) -> None:
+        if not self._settings.enabled:
+            return
+        self._started = time.perf_counter()
+        steps = self._settings.steps
+        first = [name for name in ("agents", "sessions", "supabase") if name in steps]
+        second = [name for name in ("llm", "composio") if name in steps]
+        try:
+            await asyncio.wait_for(
+                self._run_phases(app, first, second), self._settings.deadline_seconds
+            )
+        except asyncio.TimeoutError:
+            for result in self._steps.values():
+                if result["status"] == "running":
+                    result["status"] = "timed_out"
+            for name in first + second:
+                self._steps.setdefault(name, {"status": "not_started"})
+        self._elapsed_ms = round((time.perf_counter() - self._started) * 1000, 1)
+        healthy = all(result["status"] == "ok" for result in self._steps.values())
+        self.status = "ready" if healthy else "degraded"
+        if healthy:
+            logger.info("Warm-up finished in %.0f ms: %s", self._elapsed_ms, self._steps)
+        else:
+            logger.warning(
+                "Warm-up finished in %.0f ms, degraded (failed: %s): %s",
+                self._elapsed_ms,
+                ", ".join(self.report()["failed_steps"]),
+                self._steps,
+            )
+
+    async def _run_phases(self, app: FastAPI, *phases) -> None:
+        for phase in phases:
+            await asyncio.gather(*(self._run_step(app, name) for name in phase))
+
+    async def _run_step(self, app: FastAPI, name: str) -> None:
+        step: Callable[[FastAPI, WarmupSettings], Awaitable[str]] = _STEPS[name]
+        result: Dict[str, Any] = {"status": "running"}
+        self._steps[name] = result
+        started = time.perf_counter()
+        try:
+            result["detail"] = await step(app, self._settings)
+            result["status"] = "ok"
+        except Exception as exc:
+            logger.warning("Warm-up step '%s' failed", name, exc_info=True)
+            result["status"] = "failed"
+            result["detail"] = f"{type(exc).__name__}: {exc}"
+        finally:
+            result["ms"] = round((time.perf_counter() - started) * 1000, 1)
+
+
+@asynccontextmanager
+async def warming_up(app: FastAPI) -> AsyncIterator[None]:
+    """
+    Lifespan hook running `app.state.warmup` in the background while serving.
+    """
+
+    task = asyncio.create_task(app.state.warmup.run(app))
+    try:
+        yield
+    finally:
+        task.cancel()
+        with suppress(asyncio.CancelledError):
+            await task
+
+
+async def _warm_agents(app: FastAPI, settings: WarmupSettings) -> str:
+    routes = [route for route in app.router.routes if isinstance(route, LazyAgentRoute)]
+    await asyncio.gather(*(route.ensure_loaded() for route in routes))
+    return f"{len(routes)} lazy agent(s) loaded"
+
+
+async def _warm_sessions(app: FastAPI, settings: WarmupSettings) -> str:
+    # Importing ADK's session modules takes seconds; keep it off the event loop.
+    module = await asyncio.to_thread(importlib.import_module, f"{__package__}.session_service")
+    module.get_session_service(app)
+    return f"{app.state.session_settings.backend} backend"
+
+
+async def _warm_supabase(app: FastAPI, settings: WarmupSettings) -> str:
+    from .settings import load_supabase_auth_settings
+
+    auth_settings = load_supabase_auth_settings()
+    headers = {}
+    if auth_settings.supabase_api_key:
+        headers["apikey"] = auth_settings.supabase_api_key
+    # Any response means the pooled connection (and TLS session) is established.
+    response = await app.state.http_client.get(
+        f"{auth_settings.supabase_url.rstrip('/')}/auth/v1/health", headers=headers
+    )
+    return f"HTTP {response.status_code}"
+
+
+async def _warm_llm(app: FastAPI, settings: WarmupSettings) -> str:
+    if not settings.llm_ping:
+        return "skipped: AGENT_WARMUP_LLM_PING is off"
+    # Replayed models have no connection to open and would miss on the ping.
+    if load_cassette_settings().mode == "replay":
+        return "skipped: models are replayed from the cassette"
+
+    from google.adk.models.base_llm import BaseLlm
+
+    from .model_provider import resolved_models
+
+    # Only shared instances keep their client between calls; a Gemini model name
+    # is turned into a new client (and connection pool) on every call.
+    models = resolved_models()
+    shared = [model for model in models if isinstance(model, BaseLlm)]
+    skipped = len(models) - len(shared)
+    for llm in shared:
+        await _ping_model(llm)
+    return f"{len(shared)} shared model(s) pinged, {skipped} per-call skipped"
+
+
+async def _ping_model(llm: Any) -> None:
+    from google.adk.models.llm_request import LlmRequest
+    from google.genai import types
+
+    request = LlmRequest(
+        model=llm.model,
+        contents=[types.Content(role="user", parts=[types.Part(text=_PING_TEXT)])],
+        config=types.GenerateContentConfig(max_output_tokens=1),
+    )
+    async for _ in llm.generate_content_async(request, stream=False):
+        pass
+
+
+async def _warm_composio(app: FastAPI, settings: WarmupSettings) -> str:
+    # Only present if a loaded agent uses Composio.
+    composio_mcp = sys.modules.get(f"{__package__}.composio_mcp")
+    if composio_mcp is None:
+        return "no Composio agents loaded"
+    if load_cassette_settings().mode == "replay":
+        return "skipped: tool schemas come from the cassette"
+    listed = await composio_mcp.preload_tool_schemas(settings.composio_user_id)
+    return f"{listed} MCP config(s) listed"
+
+
+_STEPS: Dict[str, Callable[[FastAPI, WarmupSettings], Awaitable[str]]] = {
+    "agents": _warm_agents,
+    "sessions": _warm_sessions,
+    "supabase": _warm_supabase,
+    "llm": _warm_llm,
+    "composio": _warm_composio,
+}
+
+
+__all__ = ["StartupWarmup", "warming_up"]
@@ -6,6 +6,8 @@ import {
   ComposioToolkitNotFoundError,
 } from "@composio/core";
 
+import { refreshAgentConnectionStatus } from "@/lib/composio/agentConnectionStatus";
+
 const invalidRequest = NextResponse.json(
   {
     error: {
@@ -30,7 +32,7 @@ const missingApiKey = NextResponse.json(
 type RouteParams = { nanoid?: string };
 type RouteContext = { params: Promise<RouteParams> };
 
-export async function DELETE(_req: NextRequest, context: RouteContext) {
+export async function DELETE(req: NextRequest, context: RouteContext) {
   const { nanoid } = await context.params;
 
   if (typeof nanoid !== "string" || !nanoid.trim()) {
@@ -48,6 +50,8 @@ export async function DELETE(_req: NextRequest, context: RouteContext) {
   try {
     const response = await composio.connectedAccounts.delete(nanoid);
 
+    await refreshAgentConnectionStatus(req);
+
     return NextResponse.json({ response });
   } catch (error) {
     if (error instanceof ComposioConnectedAccountNotFoundError) {
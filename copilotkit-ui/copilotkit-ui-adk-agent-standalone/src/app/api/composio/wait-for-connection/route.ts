@@ -6,6 +6,8 @@ import {
   ConnectionRequestTimeoutError,
 } from "@composio/core";
 
+import { refreshAgentConnectionStatus } from "@/lib/composio/agentConnectionStatus";
+
 const BAD_REQUEST = NextResponse.json(
   {
     error: {
@@ -64,6 +66,8 @@ export async function POST(req: NextRequest) {
         timeout
       );
 
+    await refreshAgentConnectionStatus(req);
+
     return NextResponse.json({ connectedAccount });
   } catch (error) {
     if (error instanceof ConnectionRequestTimeoutError) {
@@ -0,0 +1,53 @@
+import type { NextRequest } from "next/server";
+
+import { getValidatedUserAndToken } from "@/lib/supabase/auth";
+import { getSupabaseServerClient } from "@/lib/supabase/server";
+
+// The agent service caches each user's Composio connection status. Drop it after
+// a toolkit is linked or unlinked so the user's next run sees the change. Only
+// the worker answering this call is cleared; other workers catch up within
+// their cache TTL. Failures are logged and never fail the calling route.
+export async function refreshAgentConnectionStatus(
+  req: NextRequest
+): Promise<void> {
+  const runtimeOrigin = process.env.COPILOTKIT_RUNTIME_ORIGIN;
+
+  if (!runtimeOrigin) {
+    return;
+  }
+
+  try {
+    const supabase = await getSupabaseServerClient();
+    const authHeader = req.headers.get("authorization");
+    const bearerToken = authHeader?.startsWith("Bearer ")
+      ? authHeader.slice("Bearer ".length)
+      : undefined;
+    const { accessToken } = await getValidatedUserAndToken(
+      supabase,
+      bearerToken
+    );
+
+    if (!accessToken) {
+      return;
+    }
+
+    const response = await fetch(
+      new URL("/composio/connections/refresh", runtimeOrigin),
+      {
+        method: "POST",
+        headers: { Authorization: `Bearer ${accessToken}` },
+      }
+    );
+
+    if (!response.ok) {
+      console.warn(
+        `Agent service refused the Composio connection refresh (HTTP ${response.status}).`
+      );
+    }
+  } catch (error) {
+    console.warn(
+      "Failed to refresh the agent service's Composio connection status",
+      error instanceof Error ? error : { error }
+    );
+  }
+}